@@ -4,6 +4,14 @@ from models import db
 from app.config import config
 from app.utils import init_db_connection
 from app.routes import register_routes
+from app.http_client import http_client
+from app.rate_limiter import rate_limiters
+from app.cache import result_cache
+from app.image_cache import grn_image_cache
+from app.gtin_cache import gtin_cache
+from app.name_matcher import sku_catalogue
+from app.validation_jobs import validation_job_service
+from app.grn_documents import grn_document_service
 
 def create_app(config_name=None):
     """Flask app factory"""
@@ -18,6 +26,30 @@ def create_app(config_name=None):
 
     app.config.from_object(config[config_name])
 
+    # Apply timeouts, pool size and retry settings to the shared HTTP client
+    http_client.configure(config[config_name])
+
+    # Per-upstream token buckets (Gemini, GS1, Locus) used by the HTTP client
+    rate_limiters.configure(config[config_name])
+
+    # Select the result cache backend (in-process LRU or shared store)
+    result_cache.configure(config[config_name])
+
+    # Location and preprocessing settings of the on-disk GRN image cache
+    grn_image_cache.configure(config[config_name])
+
+    # TTLs and lookup concurrency of the GS1 GTIN cache
+    gtin_cache.configure(config[config_name])
+
+    # Refresh interval of the indexed SKU name catalogue used for fuzzy GRN item matching
+    sku_catalogue.configure(config[config_name])
+
+    # Runner and heartbeat settings of the background validation job queue
+    validation_job_service.configure(config[config_name])
+
+    # How long order details stored by validation are reused instead of fetched again
+    grn_document_service.configure(config[config_name])
+
     # Initialize database
     db.init_app(app)
 
@@ -1,11 +1,33 @@
-import requests
 import json
 import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from models import Order, OrderLineItem, db
+from app.http_client import http_client
+from app.projections import order_load_options, serialize_order
 
 logger = logging.getLogger(__name__)
 
+# Browser-style headers the Locus dashboard API expects on task-search calls
+TASK_SEARCH_BASE_HEADERS = {
+    "accept": "application/json",
+    "accept-language": "en-US,en;q=0.9",
+    "content-type": "application/json",
+    "l-custom-user-agent": "cerebro",
+    "priority": "u=1, i",
+    "sec-ch-ua": "\"Not)A;Brand\";v=\"8\", \"Chromium\";v=\"138\", \"Google Chrome\";v=\"138\"",
+    "sec-ch-ua-mobile": "?0",
+    "sec-ch-ua-platform": "\"Linux\"",
+    "sec-fetch-dest": "empty",
+    "sec-fetch-mode": "cors",
+    "sec-fetch-site": "cross-site"
+}
+
+# Header dicts kept for the most recently used access tokens (older tokens have expired anyway)
+HEADERS_CACHE_SIZE = 32
+
 class LocusAuth:
     def __init__(self, config=None):
         if config:
@@ -18,6 +40,70 @@ class LocusAuth:
             self.auth_url = "https://accounts.locus-dashboard.com"
             self.api_url = "https://oms.locus-api.com"
 
+        self.page_fetch_workers = max(1, getattr(config, 'LOCUS_PAGE_FETCH_WORKERS', 4))
+        self.page_fetch_retries = max(0, getattr(config, 'LOCUS_PAGE_FETCH_RETRIES', 2))
+
+        # Header dicts are built once per access token and reused across calls (LRU, HEADERS_CACHE_SIZE entries)
+        self._headers_cache = OrderedDict()
+        self._headers_lock = threading.Lock()
+
+    def _cached_headers(self, key, build):
+        with self._headers_lock:
+            headers = self._headers_cache.get(key)
+            if headers is None:
+                headers = build()
+                self._headers_cache[key] = headers
+                while len(self._headers_cache) > HEADERS_CACHE_SIZE:
+                    self._headers_cache.popitem(last=False)
+            else:
+                self._headers_cache.move_to_end(key)
+            return headers
+
+    def _task_search_headers(self, access_token):
+        """Headers for task-search requests (built once per token)"""
+        return self._cached_headers(('task-search', access_token),
+                                    lambda: dict(TASK_SEARCH_BASE_HEADERS, authorization=f"Bearer {access_token}"))
+
+    def _bearer_headers(self, access_token):
+        """Minimal headers for order/task detail requests (built once per token)"""
+        return self._cached_headers(('bearer', access_token), lambda: {
+            "accept": "application/json",
+            "authorization": f"Bearer {access_token}",
+            "l-custom-user-agent": "cerebro",
+        })
+
+    def _fetch_pages_concurrently(self, get_page, page_numbers):
+        """Fetch the given pages through a bounded worker pool.
+
+        Each page is retried on its own (up to ``page_fetch_retries`` extra
+        attempts) so one bad page never drops the pages after it. Returns a
+        list of ``(page_num, page_data)`` tuples in page order; ``page_data``
+        is None for pages that still failed after all retries.
+        """
+        def fetch_with_retry(page_num):
+            for attempt in range(self.page_fetch_retries + 1):
+                try:
+                    page_data = get_page(page_num)
+                except Exception as e:
+                    logger.warning(f"ORDER SEARCH: Page {page_num} attempt {attempt + 1} raised: {e}")
+                    page_data = None
+                if page_data:
+                    return page_data
+                if attempt < self.page_fetch_retries:
+                    logger.warning(f"ORDER SEARCH: Retrying page {page_num} (attempt {attempt + 2} of {self.page_fetch_retries + 1})")
+            return None
+
+        page_numbers = list(page_numbers)
+        if not page_numbers:
+            return []
+
+        workers = min(self.page_fetch_workers, len(page_numbers))
+        logger.info(f"ORDER SEARCH: Fetching {len(page_numbers)} pages with {workers} workers")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # executor.map preserves input order, so pages come back in sequence
+            results = list(executor.map(fetch_with_retry, page_numbers))
+        return list(zip(page_numbers, results))
+
     def get_personnel_info(self, username):
         """Get minimal personnel information"""
         try:
@@ -27,7 +113,7 @@ class LocusAuth:
                 "accept-language": "en-US,en;q=0.9",
             }
 
-            response = requests.get(url, headers=headers)
+            response = http_client.get(url, headers=headers)
             response.raise_for_status()
             return response.json()
         except Exception as e:
@@ -55,7 +141,7 @@ class LocusAuth:
                 "connection": personnel_data['passwordAuthDetails']['connectionName']
             }
 
-            response = requests.post(url, headers=headers, json=payload)
+            response = http_client.post(url, headers=headers, json=payload, retries=0)
             return response.status_code == 200
         except Exception as e:
             logger.error(f"Error during authentication: {e}")
@@ -78,7 +164,7 @@ class LocusAuth:
                 "redirect_uri": "https://illa-frontdoor.locus-dashboard.com/#/login/callback"
             }
 
-            response = requests.post(url, headers=headers, json=payload)
+            response = http_client.post(url, headers=headers, json=payload, retries=0)
             if response.status_code == 200:
                 return response.json()
             return None
@@ -100,26 +186,9 @@ class LocusAuth:
 
             logger.info(f"Caching {len(orders)} orders to database for date {date_str} (cache key: {cache_key_suffix})")
 
-            for order_data in orders:
-                try:
-                    order_id = order_data.get('id')
-                    if not order_id:
-                        continue
-
-                    # Check if order already exists and update or create accordingly
-                    existing_order = Order.query.filter_by(id=order_id).first()
-                    if existing_order:
-                        # Update existing order using data protection service
-                        self._update_existing_order_record(existing_order, order_data, client_id, order_date)
-                    else:
-                        # Create new order
-                        self._create_new_order_record(order_data, client_id, order_date)
-
-                except Exception as e:
-                    order_id_for_error = order_data.get('id', 'unknown') if isinstance(order_data, dict) else 'invalid_data'
-                    logger.error(f"Error caching order {order_id_for_error}: {e}")
-                    logger.debug(f"Problematic order data keys: {list(order_data.keys()) if isinstance(order_data, dict) else 'not a dict'}")
-                    continue
+            # Set-based merge: one IN lookup, bulk upserts, protected orders via DataProtectionService
+            from app.order_merge import order_merge_service
+            order_merge_service.merge_orders(orders, client_id, order_date)
 
             # Only commit if we have a valid db session
             try:
@@ -179,6 +248,12 @@ class LocusAuth:
                 db.session.delete(order)
                 orders_deleted += 1
 
+            # Keep the day's dashboard counters and the tour counters in step with the remaining orders
+            from app.dashboard_stats import dashboard_stats_service
+            from app.tours import tour_service
+            dashboard_stats_service.recompute_days([order_date])
+            tour_service.apply_order_changes([(tour_service.order_state(order), None) for order in unmodified_orders])
+
             db.session.commit()
 
             logger.info(f"EDIT PRESERVATION: Cleared {orders_deleted} unmodified orders and {line_items_deleted} line items for date {date_str}")
@@ -200,7 +275,8 @@ class LocusAuth:
 
             # For now, we'll return all cached orders and let the calling code filter
             # In the future, we could enhance this to store cache keys per status combination
-            orders = Order.query.filter_by(client_id=client_id, date=order_date).all()
+            # Export shape: every column the API format needs, without loading raw_data
+            orders = Order.query.options(*order_load_options('export')).filter_by(client_id=client_id, date=order_date).all()
 
             if not orders:
                 return None
@@ -215,7 +291,7 @@ class LocusAuth:
                 try:
                     # Use current database fields (including manual edits) instead of raw_data
                     # This ensures that manual edits are reflected in the orders homepage
-                    order_dict = order.to_dict()
+                    order_dict = serialize_order(order, 'export')
 
                     # Convert to the API format expected by frontend
                     # Map database fields to API format
@@ -260,6 +336,7 @@ class LocusAuth:
                         'skills': order_dict['skills'],
                         'tags': order_dict['tags'],
                         'custom_fields': order_dict['custom_fields'],
+                        'grn_url': order_dict['grn_url'],
                         # Add modification tracking info for frontend
                         'is_modified': order_dict['is_modified'],
                         'modified_fields': order_dict['modified_fields'],
@@ -346,20 +423,7 @@ class LocusAuth:
     def _fetch_all_orders_from_api(self, access_token, client_id, team_id, date):
         """Fetch all pages of orders from task-search API"""
         url = f"{self.base_url}/v1/client/{client_id}/task-search?include=FLEET%2CLOCATION%2CCROSSDOCK&countsOnly=false&pageSize=50"
-        headers = {
-            "accept": "application/json",
-            "accept-language": "en-US,en;q=0.9",
-            "authorization": f"Bearer {access_token}",
-            "content-type": "application/json",
-            "l-custom-user-agent": "cerebro",
-            "priority": "u=1, i",
-            "sec-ch-ua": "\"Not)A;Brand\";v=\"8\", \"Chromium\";v=\"138\", \"Google Chrome\";v=\"138\"",
-            "sec-ch-ua-mobile": "?0",
-            "sec-ch-ua-platform": "\"Linux\"",
-            "sec-fetch-dest": "empty",
-            "sec-fetch-mode": "cors",
-            "sec-fetch-site": "cross-site"
-        }
+        headers = self._task_search_headers(access_token)
 
         if not date:
             date = datetime.now().strftime("%Y-%m-%d")
@@ -394,7 +458,7 @@ class LocusAuth:
             }
 
             logger.info(f"REFRESH API: Making request to page {page_num} with payload: {payload}")
-            response = requests.post(url, json=payload, headers=headers)
+            response = http_client.post(url, json=payload, headers=headers, idempotent=True)
             response.raise_for_status()
             result = response.json()
             tasks = result.get('tasks', [])
@@ -445,20 +509,7 @@ class LocusAuth:
     def _fetch_single_page_from_api(self, access_token, client_id, team_id, date):
         """Fetch single page of orders from task-search API"""
         url = f"{self.base_url}/v1/client/{client_id}/task-search?include=FLEET%2CLOCATION%2CCROSSDOCK&countsOnly=false&pageSize=50"
-        headers = {
-            "accept": "application/json",
-            "accept-language": "en-US,en;q=0.9",
-            "authorization": f"Bearer {access_token}",
-            "content-type": "application/json",
-            "l-custom-user-agent": "cerebro",
-            "priority": "u=1, i",
-            "sec-ch-ua": "\"Not)A;Brand\";v=\"8\", \"Chromium\";v=\"138\", \"Google Chrome\";v=\"138\"",
-            "sec-ch-ua-mobile": "?0",
-            "sec-ch-ua-platform": "\"Linux\"",
-            "sec-fetch-dest": "empty",
-            "sec-fetch-mode": "cors",
-            "sec-fetch-site": "cross-site"
-        }
+        headers = self._task_search_headers(access_token)
 
         if not date:
             date = datetime.now().strftime("%Y-%m-%d")
@@ -489,7 +540,7 @@ class LocusAuth:
             "skipPaginationInfo": False
         }
 
-        response = requests.post(url, json=payload, headers=headers)
+        response = http_client.post(url, json=payload, headers=headers, idempotent=True)
         response.raise_for_status()
         page_data = response.json()
 
@@ -535,25 +586,12 @@ class LocusAuth:
                 logger.info(f"No cached orders found for {date} (statuses: {cache_key_suffix}). Fetching from API...")
 
             url = f"{self.base_url}/v1/client/{client_id}/task-search?include=FLEET%2CLOCATION%2CCROSSDOCK&countsOnly=false&pageSize=50"
-            headers = {
-                "accept": "application/json",
-                "accept-language": "en-US,en;q=0.9",
-                "authorization": f"Bearer {access_token}",
-                "content-type": "application/json",
-                "l-custom-user-agent": "cerebro",
-                "priority": "u=1, i",
-                "sec-ch-ua": "\"Not)A;Brand\";v=\"8\", \"Chromium\";v=\"138\", \"Google Chrome\";v=\"138\"",
-                "sec-ch-ua-mobile": "?0",
-                "sec-ch-ua-platform": "\"Linux\"",
-                "sec-fetch-dest": "empty",
-                "sec-fetch-mode": "cors",
-                "sec-fetch-site": "cross-site"
-            }
+            headers = self._task_search_headers(access_token)
 
             if not date:
                 date = datetime.now().strftime("%Y-%m-%d")
 
-            def get_page(page_num):
+            def get_page(page_num, retries=0):
                 # Base filters (team and date) for task-search
                 filters = [
                     {
@@ -588,7 +626,8 @@ class LocusAuth:
 
                 logger.debug(f"Making API request to {url}")
                 logger.debug(f"Payload: {json.dumps(payload, indent=2)}")
-                response = requests.post(url, headers=headers, json=payload)
+                # Pages 2..N are retried by _fetch_pages_concurrently, so no client-level retries on top
+                response = http_client.post(url, headers=headers, json=payload, retries=retries, idempotent=True)
                 logger.info(f"API response status: {response.status_code}")
                 if response.status_code == 200:
                     result = response.json()
@@ -652,7 +691,7 @@ class LocusAuth:
 
             # Fetch first page to get numberOfPages info
             logger.info(f"ORDER SEARCH: Fetching first page to get pagination info...")
-            first_page_data = get_page(1)
+            first_page_data = get_page(1, retries=None)
 
             if not first_page_data:
                 logger.error("ORDER SEARCH: Failed to fetch first page")
@@ -668,12 +707,11 @@ class LocusAuth:
             logger.info(f"ORDER SEARCH: First page fetched: {len(all_orders)} orders")
             logger.info(f"ORDER SEARCH: Total pages to fetch: {number_of_pages}, Total elements: {total_elements}")
 
-            # Fetch remaining pages if there are more than 1 page
+            # Fetch remaining pages in parallel if there are more than 1 page
+            failed_pages = []
             if number_of_pages and number_of_pages > 1:
-                for page_num in range(2, number_of_pages + 1):
-                    logger.info(f"ORDER SEARCH: Fetching page {page_num} of {number_of_pages}...")
-                    page_data = get_page(page_num)
-
+                page_results = self._fetch_pages_concurrently(get_page, range(2, number_of_pages + 1))
+                for page_num, page_data in page_results:
                     if page_data:
                         orders_in_page_data = page_data.get('orders', [])
                         if orders_in_page_data:
@@ -682,8 +720,8 @@ class LocusAuth:
                         else:
                             logger.warning(f"ORDER SEARCH: No orders found in page {page_num}")
                     else:
-                        logger.warning(f"ORDER SEARCH: Failed to fetch page {page_num}")
-                        break
+                        failed_pages.append(page_num)
+                        logger.warning(f"ORDER SEARCH: Failed to fetch page {page_num} after retries")
 
             total_fetched = len(all_orders)
 
@@ -700,10 +738,11 @@ class LocusAuth:
             response_data = {
                 "orders": all_orders,
                 "totalCount": total_fetched,
-                "pagesFetched": number_of_pages or 1,
+                "pagesFetched": (number_of_pages or 1) - len(failed_pages),
                 "statusTotals": status_totals,
                 "requestedStatuses": order_statuses,
-                "totalElements": total_elements
+                "totalElements": total_elements,
+                "failedPages": failed_pages
             }
 
             # Cache the fetched data (skip if no app context for debug/testing)
@@ -723,13 +762,9 @@ class LocusAuth:
         """Fetch detailed order information by order ID"""
         try:
             url = f"{self.api_url}/v1/client/{client_id}/order/{order_id}?include=HOMEBASE%2CLOCATION%2CSKU"
-            headers = {
-                "accept": "application/json",
-                "authorization": f"Bearer {access_token}",
-                "l-custom-user-agent": "cerebro",
-            }
+            headers = self._bearer_headers(access_token)
 
-            response = requests.get(url, headers=headers)
+            response = http_client.get(url, headers=headers)
             if response.status_code == 200:
                 return response.json()
             else:
@@ -743,13 +778,9 @@ class LocusAuth:
         """Fetch detailed task information by task ID - provides richer data than order endpoint"""
         try:
             url = f"{self.api_url}/v1/client/{client_id}/task/{task_id}"
-            headers = {
-                "accept": "application/json",
-                "authorization": f"Bearer {access_token}",
-                "l-custom-user-agent": "cerebro",
-            }
+            headers = self._bearer_headers(access_token)
 
-            response = requests.get(url, headers=headers)
+            response = http_client.get(url, headers=headers)
             if response.status_code == 200:
                 return response.json()
             else:
@@ -792,44 +823,18 @@ class LocusAuth:
     def smart_merge_orders_to_database(self, orders_data, client_id, date_str):
         """Merge orders to database with data protection - update existing (respecting isModified flags), add new ones"""
         try:
-            from app.data_protection import data_protection_service
-
             order_date = datetime.strptime(date_str, "%Y-%m-%d").date()
             orders = orders_data.get('orders', [])
 
-            updated_count = 0
-            added_count = 0
-            protected_count = 0
-
             logger.info(f"SMART MERGE: Processing {len(orders)} orders for {date_str}")
 
-            for order_data in orders:
-                order_id = order_data.get('id')
-                if not order_id:
-                    continue
-
-                # Check if order already exists
-                existing_order = Order.query.filter_by(id=order_id).first()
-
-                if existing_order:
-                    # Check if this order has been manually modified
-                    if existing_order.is_modified:
-                        protected_fields = data_protection_service.get_protected_fields(existing_order)
-                        logger.info(f"PROTECTED ORDER: {order_id} has {len(protected_fields)} protected fields: {protected_fields}")
-                        protected_count += 1
-
-                    # Use data protection service to safely update
-                    data_protection_service.safe_update_order(existing_order, order_data, client_id, order_date)
-                    updated_count += 1
-                    logger.debug(f"Updated existing order: {order_id}")
-                else:
-                    # Add new order
-                    self._create_new_order_record(order_data, client_id, order_date)
-                    added_count += 1
-                    logger.debug(f"Added new order: {order_id}")
+            # Set-based merge: one IN lookup, bulk upserts, protected orders via DataProtectionService
+            from app.order_merge import order_merge_service
+            stats = order_merge_service.merge_orders(orders, client_id, order_date)
+            protected_count = stats['protected']
 
             db.session.commit()
-            logger.info(f"SMART MERGE COMPLETE: {updated_count} updated, {added_count} added, {protected_count} had protected fields")
+            logger.info(f"SMART MERGE COMPLETE: {stats['updated']} updated, {stats['added']} added, {protected_count} had protected fields ({stats['rows_per_second']} rows/sec)")
 
             # Log protection summary for monitoring
             if protected_count > 0:
@@ -842,182 +847,6 @@ class LocusAuth:
             db.session.rollback()
             return False
 
-    def _create_new_order_record(self, order_data, client_id, order_date):
-        """Helper method to create a new order record"""
-        from models import OrderLineItem
-
-        order_id = order_data.get('id')
-
-        # Extract order information
-        order_status = order_data.get('orderStatus', '')
-
-        # Create order instance
-        order = Order(
-            id=order_id,
-            client_id=client_id,
-            date=order_date,
-            order_status=order_status,
-            raw_data=json.dumps(order_data)
-        )
-
-        # Extract location data (defensive programming)
-        location = order_data.get('location')
-        if location and isinstance(location, dict):
-            order.location_name = location.get('name')
-            address = location.get('address')
-            if address and isinstance(address, dict):
-                order.location_address = address.get('formattedAddress')
-                order.location_city = address.get('city')
-                order.location_country_code = address.get('countryCode')
-
-            # Extract coordinates if available
-            latLng = location.get('latLng', {})
-            if latLng and isinstance(latLng, dict):
-                lat = latLng.get('lat') or latLng.get('latitude')
-                lng = latLng.get('lng') or latLng.get('longitude')
-                logger.info(f"[COORDINATES] Creating new order {order_id}: lat={lat}, lng={lng}")
-                if lat is not None:
-                    try:
-                        order.location_latitude = float(lat)
-                        logger.info(f"[COORDINATES] Successfully set latitude {lat} for new order {order_id}")
-                    except (ValueError, TypeError):
-                        logger.warning(f"[COORDINATES] Invalid latitude value for new order {order_id}: {lat}")
-                if lng is not None:
-                    try:
-                        order.location_longitude = float(lng)
-                        logger.info(f"[COORDINATES] Successfully set longitude {lng} for new order {order_id}")
-                    except (ValueError, TypeError):
-                        logger.warning(f"[COORDINATES] Invalid longitude value for new order {order_id}: {lng}")
-            else:
-                logger.warning(f"[COORDINATES] No latLng data found for new order {order_id}")
-
-        # Extract tour/delivery data (defensive programming)
-        order_metadata = order_data.get('orderMetadata')
-        if order_metadata and isinstance(order_metadata, dict):
-            tour_detail = order_metadata.get('tourDetail')
-            if tour_detail and isinstance(tour_detail, dict):
-                order.rider_name = tour_detail.get('riderName')
-                order.vehicle_registration = tour_detail.get('vehicleRegistrationNumber')
-
-                # Extract tour data
-                tour_id = tour_detail.get('tourId')
-                if tour_id:
-                    from models import Tour
-                    order.tour_id = tour_id
-
-                    # Parse tour ID components
-                    tour_date, plan_id, tour_name, tour_number = Tour.parse_tour_id(tour_id)
-                    if tour_date:
-                        order.tour_date = tour_date
-                        order.tour_plan_id = plan_id
-                        order.tour_name = tour_name
-                        order.tour_number = tour_number or 0
-
-            # Extract completion data
-            completion_time = order_metadata.get('homebaseCompleteOn')
-            if completion_time:
-                try:
-                    order.completed_on = datetime.fromisoformat(completion_time.replace('Z', '+00:00'))
-                except:
-                    pass
-
-        # Extract enhanced data from task-search
-        if 'rider_id' in order_data:
-            order.rider_id = order_data.get('rider_id')
-        if 'rider_phone' in order_data:
-            order.rider_phone = order_data.get('rider_phone')
-        if 'vehicle_id' in order_data:
-            order.vehicle_id = order_data.get('vehicle_id')
-        if 'vehicle_model' in order_data:
-            order.vehicle_model = order_data.get('vehicle_model')
-        if 'transporter_name' in order_data:
-            order.transporter_name = order_data.get('transporter_name')
-
-        # Task-specific data
-        if 'task_source' in order_data:
-            order.task_source = order_data.get('task_source')
-        if 'plan_id' in order_data:
-            order.plan_id = order_data.get('plan_id')
-        if 'planned_tour_name' in order_data:
-            order.planned_tour_name = order_data.get('planned_tour_name')
-        if 'sequence_in_batch' in order_data:
-            order.sequence_in_batch = order_data.get('sequence_in_batch')
-        if 'partially_delivered' in order_data:
-            order.partially_delivered = order_data.get('partially_delivered')
-        if 'reassigned' in order_data:
-            order.reassigned = order_data.get('reassigned')
-        if 'rejected' in order_data:
-            order.rejected = order_data.get('rejected')
-        if 'unassigned' in order_data:
-            order.unassigned = order_data.get('unassigned')
-
-        # Performance metrics
-        if 'tardiness' in order_data:
-            order.tardiness = order_data.get('tardiness')
-        if 'sla_status' in order_data:
-            order.sla_status = order_data.get('sla_status')
-        if 'amount_collected' in order_data:
-            order.amount_collected = order_data.get('amount_collected')
-        if 'effective_tat' in order_data:
-            order.effective_tat = order_data.get('effective_tat')
-        if 'allowed_dwell_time' in order_data:
-            order.allowed_dwell_time = order_data.get('allowed_dwell_time')
-
-        # Time tracking
-        if 'eta_updated_on' in order_data and order_data.get('eta_updated_on'):
-            try:
-                order.eta_updated_on = datetime.fromisoformat(order_data['eta_updated_on'].replace('Z', '+00:00'))
-            except:
-                pass
-        if 'tour_updated_on' in order_data and order_data.get('tour_updated_on'):
-            try:
-                order.tour_updated_on = datetime.fromisoformat(order_data['tour_updated_on'].replace('Z', '+00:00'))
-            except:
-                pass
-        if 'initial_assignment_at' in order_data and order_data.get('initial_assignment_at'):
-            try:
-                order.initial_assignment_at = datetime.fromisoformat(order_data['initial_assignment_at'].replace('Z', '+00:00'))
-            except:
-                pass
-        if 'initial_assignment_by' in order_data:
-            assignment_by = order_data.get('initial_assignment_by')
-            order.initial_assignment_by = json.dumps(assignment_by) if isinstance(assignment_by, dict) else assignment_by
-
-        # Additional metadata
-        if 'task_time_slot' in order_data:
-            order.task_time_slot = order_data.get('task_time_slot')
-        if 'skills' in order_data:
-            order.skills = json.dumps(order_data.get('skills', []))
-        if 'tags' in order_data:
-            order.tags = json.dumps(order_data.get('tags', []))
-        if 'custom_fields' in order_data:
-            order.custom_fields = json.dumps(order_data.get('custom_fields', {}))
-        if 'cancellation_reason' in order_data:
-            order.cancellation_reason = order_data.get('cancellation_reason')
-
-        db.session.add(order)
-
-        # Add line items if they exist
-        line_items = order_data.get('lineItems', [])
-        for item in line_items:
-            line_item = OrderLineItem(
-                order_id=order_id,
-                sku_id=item.get('skuId', ''),
-                name=item.get('name', ''),
-                quantity=item.get('quantity', 0),
-                quantity_unit=item.get('quantityUnit', ''),
-                transacted_quantity=item.get('transactedQuantity'),
-                transaction_status=item.get('transactionStatus', '')
-            )
-            db.session.add(line_item)
-
-    def _update_existing_order_record(self, existing_order, order_data, client_id, order_date):
-        """Helper method to update an existing order record with data protection"""
-        from app.data_protection import data_protection_service
-
-        # Use the data protection service to safely update the order
-        data_protection_service.safe_update_order(existing_order, order_data, client_id, order_date)
-
     def _extract_order_from_task(self, task):
         """Extract order data from task data format"""
         try:
@@ -0,0 +1,436 @@
+"""
+Result Cache
+Pluggable TTL cache for computed results: in-process LRU or a shared Redis-compatible store,
+with tag-based invalidation by date and order id
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Entries that are not bounded to specific dates carry this tag and are dropped on any date invalidation
+ALL_DATES_TAG = 'date:*'
+
+# Session.info key of the invalidations waiting for the session's transaction to commit
+PENDING_INVALIDATION_KEY = 'result_cache_pending_invalidation'
+
+
+def date_tag(value):
+    return f"date:{value.isoformat() if hasattr(value, 'isoformat') else value}"
+
+
+def order_tag(order_id):
+    return f"order:{order_id}"
+
+
+class CacheBackend:
+    """Interface shared by the cache implementations"""
+
+    def get(self, key):
+        """Return the cached value or None"""
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None, tags=()):
+        """Store a value for ``ttl`` seconds, indexed under the given tags"""
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def invalidate_tags(self, tags):
+        """Drop every entry carrying any of the tags; returns the number of entries dropped"""
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def get_stats(self):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+
+class LRUCache(CacheBackend):
+    """In-process cache: OrderedDict LRU with O(1) get/set/evict, per-entry TTL and a tag index"""
+
+    def __init__(self, maxsize=256, default_ttl=300):
+        self.maxsize = maxsize
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value, tags)
+        self._tags = {}  # tag -> set of keys
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(('hits', 'misses', 'sets', 'evictions', 'expirations', 'invalidations'), 0)
+
+    def _remove(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+
+            if entry[0] < time.time():
+                self._remove(key)
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None, tags=()):
+        expires_at = time.time() + (self.default_ttl if ttl is None else ttl)
+        tags = frozenset(tags)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires_at, value, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            self._stats['sets'] += 1
+
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+                self._stats['evictions'] += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def invalidate_tags(self, tags):
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys.update(self._tags.get(tag, ()))
+            for key in keys:
+                self._remove(key)
+            self._stats['invalidations'] += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        stats.update({'backend': 'memory', 'maxsize': self.maxsize, 'default_ttl': self.default_ttl})
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        return stats
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class LocalRedis:
+    """Thread-safe stand-in for the subset of the redis-py client used by SharedCache.
+
+    Keeps strings and sets in process memory with key expiry and an
+    allkeys-lru bound, so the shared backend can run without a Redis server
+    (development, tests, single-process deployments).
+    """
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._data = OrderedDict()  # key -> value (bytes or set)
+        self._expires = {}
+        self._lock = threading.Lock()
+        self._evicted_keys = 0
+
+    @staticmethod
+    def _name(name):
+        # Redis treats bytes and str key names alike
+        return name.decode() if isinstance(name, bytes) else name
+
+    def _alive(self, key):
+        expires_at = self._expires.get(key)
+        if expires_at is not None and expires_at < time.time():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+            return False
+        return key in self._data
+
+    def _touch(self, key):
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_keys:
+            evicted, _ = self._data.popitem(last=False)
+            self._expires.pop(evicted, None)
+            self._evicted_keys += 1
+
+    def get(self, name):
+        name = self._name(name)
+        with self._lock:
+            if not self._alive(name):
+                return None
+            self._data.move_to_end(name)
+            return self._data[name]
+
+    def set(self, name, value, ex=None):
+        name = self._name(name)
+        with self._lock:
+            self._data[name] = value.encode() if isinstance(value, str) else value
+            if ex:
+                self._expires[name] = time.time() + ex
+            else:
+                self._expires.pop(name, None)
+            self._touch(name)
+            return True
+
+    def delete(self, *names):
+        with self._lock:
+            removed = 0
+            for name in map(self._name, names):
+                if self._data.pop(name, None) is not None:
+                    removed += 1
+                self._expires.pop(name, None)
+            return removed
+
+    def sadd(self, name, *values):
+        name = self._name(name)
+        with self._lock:
+            members = self._data.get(name) if self._alive(name) else None
+            if members is None:
+                members = set()
+                self._data[name] = members
+            before = len(members)
+            members.update(value.encode() if isinstance(value, str) else value for value in values)
+            self._touch(name)
+            return len(members) - before
+
+    def smembers(self, name):
+        name = self._name(name)
+        with self._lock:
+            if not self._alive(name):
+                return set()
+            return set(self._data[name])
+
+    def expire(self, name, seconds):
+        name = self._name(name)
+        with self._lock:
+            if not self._alive(name):
+                return False
+            self._expires[name] = time.time() + seconds
+            return True
+
+    def incr(self, name, amount=1):
+        name = self._name(name)
+        with self._lock:
+            value = int(self._data[name]) + amount if self._alive(name) else amount
+            self._data[name] = str(value).encode()
+            self._touch(name)
+            return value
+
+    def mget(self, names):
+        return [self.get(name) for name in names]
+
+    def scan_iter(self, match=None):
+        prefix = match[:-1] if match and match.endswith('*') else match
+        with self._lock:
+            keys = [key for key in self._data if self._alive(key)]
+        return [key.encode() if isinstance(key, str) else key
+                for key in keys if prefix is None or key.startswith(prefix)]
+
+    def info(self, section=None):
+        with self._lock:
+            return {'evicted_keys': self._evicted_keys, 'keys': len(self._data)}
+
+
+class SharedCache(CacheBackend):
+    """Cache stored in a Redis-compatible server so every worker sees the same entries.
+
+    Values are JSON encoded. Each tag is a set of entry keys; invalidating a
+    tag deletes its members. Size is bounded by the server's maxmemory/LRU
+    policy (LocalRedis enforces ``max_keys``). Hit/miss counters are kept in
+    the store, so they are totals across workers.
+    """
+
+    def __init__(self, client, prefix='locusassist:cache', default_ttl=300):
+        self.client = client
+        self.prefix = prefix
+        self.default_ttl = default_ttl
+
+    def _key(self, key):
+        return f"{self.prefix}:entry:{key}"
+
+    def _tag_key(self, tag):
+        return f"{self.prefix}:tag:{tag}"
+
+    def _count(self, counter, amount=1):
+        try:
+            self.client.incr(f"{self.prefix}:stats:{counter}", amount)
+        except Exception as e:
+            logger.warning(f"CACHE: Failed to update {counter} counter: {e}")
+
+    def get(self, key):
+        try:
+            raw = self.client.get(self._key(key))
+        except Exception as e:
+            logger.warning(f"CACHE: Shared cache read failed: {e}")
+            return None
+
+        if raw is None:
+            self._count('misses')
+            return None
+        self._count('hits')
+        return json.loads(raw)
+
+    def set(self, key, value, ttl=None, tags=()):
+        ttl = self.default_ttl if ttl is None else ttl
+        try:
+            entry_key = self._key(key)
+            self.client.set(entry_key, json.dumps(value, default=str), ex=ttl)
+            for tag in tags:
+                tag_key = self._tag_key(tag)
+                self.client.sadd(tag_key, entry_key)
+                # Tag sets only need to outlive the entries they index
+                self.client.expire(tag_key, ttl)
+            self._count('sets')
+        except Exception as e:
+            logger.warning(f"CACHE: Shared cache write failed: {e}")
+
+    def delete(self, key):
+        self.client.delete(self._key(key))
+
+    def invalidate_tags(self, tags):
+        removed = 0
+        for tag in tags:
+            tag_key = self._tag_key(tag)
+            members = list(self.client.smembers(tag_key))
+            if members:
+                removed += self.client.delete(*members)
+            self.client.delete(tag_key)
+        if removed:
+            self._count('invalidations', removed)
+        return removed
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=f"{self.prefix}:entry:*")) + \
+            list(self.client.scan_iter(match=f"{self.prefix}:tag:*"))
+        if keys:
+            self.client.delete(*keys)
+
+    def get_stats(self):
+        counters = ('hits', 'misses', 'sets', 'invalidations')
+        values = self.client.mget([f"{self.prefix}:stats:{counter}" for counter in counters])
+        stats = {counter: int(value or 0) for counter, value in zip(counters, values)}
+        try:
+            stats['evictions'] = int(self.client.info('stats').get('evicted_keys', 0))
+        except Exception:
+            stats['evictions'] = None
+        stats['size'] = len(self)
+        stats.update({'backend': 'shared', 'client': type(self.client).__name__, 'default_ttl': self.default_ttl})
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        return stats
+
+    def __len__(self):
+        return len(list(self.client.scan_iter(match=f"{self.prefix}:entry:*")))
+
+
+class ResultCache:
+    """Process-wide handle on the configured cache backend"""
+
+    def __init__(self):
+        self.backend = LRUCache()
+
+    def configure(self, config):
+        """Select the backend from CACHE_* settings in the app config"""
+        backend = getattr(config, 'CACHE_BACKEND', 'memory')
+        ttl = getattr(config, 'CACHE_DEFAULT_TTL', 300)
+
+        if backend == 'shared':
+            redis_url = getattr(config, 'CACHE_REDIS_URL', None)
+            client = None
+            if redis_url:
+                try:
+                    import redis
+                    client = redis.Redis.from_url(redis_url)
+                except ImportError:
+                    logger.warning("CACHE: redis package not installed, using the in-process LocalRedis store")
+            if client is None:
+                client = LocalRedis(max_keys=getattr(config, 'CACHE_MAX_ENTRIES', 256) * 4)
+            self.backend = SharedCache(client, default_ttl=ttl)
+        else:
+            self.backend = LRUCache(maxsize=getattr(config, 'CACHE_MAX_ENTRIES', 256), default_ttl=ttl)
+
+        logger.info(f"CACHE: Using {type(self.backend).__name__} backend (ttl {ttl}s)")
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def set(self, key, value, ttl=None, tags=()):
+        self.backend.set(key, value, ttl=ttl, tags=tags)
+
+    def delete(self, key):
+        self.backend.delete(key)
+
+    def invalidate(self, dates=None, order_ids=None):
+        """Drop entries tagged with any of the dates or order ids (and every entry not bounded by date)"""
+        tags = [order_tag(order_id) for order_id in order_ids or ()]
+        if dates:
+            tags.extend(date_tag(value) for value in dates)
+            tags.append(ALL_DATES_TAG)
+        removed = self.backend.invalidate_tags(tags) if tags else 0
+        logger.info(f"CACHE: Invalidated {removed} entries for {len(dates or ())} date(s), {len(order_ids or ())} order(s)")
+        return removed
+
+    def invalidate_on_commit(self, session, dates=None, order_ids=None):
+        """Invalidate once the session's transaction commits (nothing happens on rollback).
+
+        Invalidating before the commit would let a concurrent request cache
+        the rows as they were before it again.
+        """
+        pending = session.info.setdefault(PENDING_INVALIDATION_KEY, {'dates': set(), 'order_ids': set()})
+        pending['dates'].update(value for value in dates or () if value)
+        pending['order_ids'].update(order_ids or ())
+
+    def clear(self):
+        self.backend.clear()
+
+    def get_stats(self):
+        return self.backend.get_stats()
+
+    def __len__(self):
+        return len(self.backend)
+
+
+# Global cache instance
+result_cache = ResultCache()
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_pending(session):
+    pending = session.info.pop(PENDING_INVALIDATION_KEY, None)
+    if pending and (pending['dates'] or pending['order_ids']):
+        try:
+            result_cache.invalidate(dates=list(pending['dates']), order_ids=list(pending['order_ids']))
+        except Exception as e:
+            logger.warning(f"CACHE: Invalidation after commit failed: {e}")
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def _discard_pending(session, transaction):
+    # Runs after after_commit; a savepoint ending leaves the outer transaction's invalidations in place
+    if transaction.parent is None:
+        session.info.pop(PENDING_INVALIDATION_KEY, None)
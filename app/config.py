@@ -22,9 +22,78 @@ class Config:
     GOOGLE_AI_API_KEY = os.getenv('GOOGLE_AI_API_KEY')
     GOOGLE_AI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash-exp:generateContent"
 
-    # Rate Limiting Configuration
-    MAX_CONCURRENT_API_CALLS = 10
-    MAX_API_CALLS_PER_MINUTE = 12
+    # Rate Limiting Configuration (token bucket per upstream: calls/minute, burst size, concurrent requests)
+    MAX_CONCURRENT_API_CALLS = int(os.getenv('MAX_CONCURRENT_API_CALLS', 10))  # Gemini
+    MAX_API_CALLS_PER_MINUTE = int(os.getenv('MAX_API_CALLS_PER_MINUTE', 12))  # Gemini
+    GEMINI_BURST = int(os.getenv('GEMINI_BURST', 1))  # burst + refill stay within MAX_API_CALLS_PER_MINUTE in any minute
+    GS1_CALLS_PER_MINUTE = int(os.getenv('GS1_CALLS_PER_MINUTE', 60))
+    GS1_BURST = int(os.getenv('GS1_BURST', 10))
+    GS1_MAX_CONCURRENT = int(os.getenv('GS1_MAX_CONCURRENT', 4))
+    LOCUS_CALLS_PER_MINUTE = int(os.getenv('LOCUS_CALLS_PER_MINUTE', 300))
+    LOCUS_BURST = int(os.getenv('LOCUS_BURST', 20))
+    LOCUS_MAX_CONCURRENT = int(os.getenv('LOCUS_MAX_CONCURRENT', 8))
+    # Directory of shared bucket files so all worker processes draw from one bucket (unset: per process)
+    RATE_LIMIT_SHARED_DIR = os.getenv('RATE_LIMIT_SHARED_DIR')
+
+    # Shared outbound HTTP client (per-host keep-alive pools)
+    HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))
+    HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 30))
+    HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', 20))
+    HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', 3))
+    HTTP_BACKOFF_BASE = float(os.getenv('HTTP_BACKOFF_BASE', 0.5))
+    HTTP_MAX_BACKOFF = float(os.getenv('HTTP_MAX_BACKOFF', 30))  # longer Retry-After answers fail the attempt
+
+    # Order filter pagination: 'database' (LIMIT/OFFSET + GROUP BY totals) or 'memory' (legacy full-result slicing)
+    FILTER_PAGINATION_MODE = os.getenv('FILTER_PAGINATION_MODE', 'database')
+
+    # Result cache: 'memory' (per-process LRU) or 'shared' (Redis-compatible store; CACHE_REDIS_URL, else in-process stand-in)
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memory')
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL')
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 256))
+    CACHE_DEFAULT_TTL = int(os.getenv('CACHE_DEFAULT_TTL', 300))
+
+    # GRN image cache: preprocessed images on disk, keyed by URL and content hash, LRU-bounded
+    GRN_IMAGE_CACHE_ENABLED = os.getenv('GRN_IMAGE_CACHE_ENABLED', 'true').lower() == 'true'
+    GRN_IMAGE_CACHE_DIR = os.getenv('GRN_IMAGE_CACHE_DIR', os.path.join('instance', 'grn_image_cache'))
+    GRN_IMAGE_CACHE_MAX_MB = int(os.getenv('GRN_IMAGE_CACHE_MAX_MB', 512))
+    # Hours a URL -> content hash entry is trusted before the URL is downloaded again
+    GRN_IMAGE_URL_TTL_HOURS = float(os.getenv('GRN_IMAGE_URL_TTL_HOURS', 24))
+    # Longest side GRN images are downscaled to, and JPEG quality of the re-encoded upload
+    GRN_IMAGE_MAX_DIMENSION = int(os.getenv('GRN_IMAGE_MAX_DIMENSION', 1600))
+    GRN_IMAGE_JPEG_QUALITY = int(os.getenv('GRN_IMAGE_JPEG_QUALITY', 80))
+
+    # GS1 GTIN lookup cache (gtin_products table): found products, "not found" answers, concurrent lookups per GRN
+    GTIN_CACHE_TTL_HOURS = float(os.getenv('GTIN_CACHE_TTL_HOURS', 24 * 30))
+    GTIN_CACHE_NEGATIVE_TTL_HOURS = float(os.getenv('GTIN_CACHE_NEGATIVE_TTL_HOURS', 24))
+    GTIN_LOOKUP_WORKERS = int(os.getenv('GTIN_LOOKUP_WORKERS', 4))
+
+    # Known SKU names (order line item history, GS1 products) indexed for matching GRN items that fit no order line
+    SKU_CATALOGUE_ENABLED = os.getenv('SKU_CATALOGUE_ENABLED', 'true').lower() == 'true'
+    SKU_CATALOGUE_REFRESH_SECONDS = int(os.getenv('SKU_CATALOGUE_REFRESH_SECONDS', 3600))
+
+    # Background validate-all jobs: 'thread' (worker thread in the web process) or 'process' (run validation_worker.py)
+    VALIDATION_JOB_RUNNER = os.getenv('VALIDATION_JOB_RUNNER', 'thread')
+    VALIDATION_JOB_HEARTBEAT_SECONDS = float(os.getenv('VALIDATION_JOB_HEARTBEAT_SECONDS', 15))
+    VALIDATION_JOB_STALE_SECONDS = float(os.getenv('VALIDATION_JOB_STALE_SECONDS', 120))  # running jobs without a heartbeat this long are resumed
+    VALIDATION_JOB_POLL_SECONDS = float(os.getenv('VALIDATION_JOB_POLL_SECONDS', 2))
+    # Orders packed into one Gemini request by validation jobs (1 = one request per order), and that request's output budget
+    GEMINI_BATCH_SIZE = int(os.getenv('GEMINI_BATCH_SIZE', 3))
+    GEMINI_BATCH_MAX_OUTPUT_TOKENS = int(os.getenv('GEMINI_BATCH_MAX_OUTPUT_TOKENS', 8192))
+    # Single-order validations read the answer from streamGenerateContent, checking items as they arrive
+    GEMINI_STREAMING = os.getenv('GEMINI_STREAMING', 'true').lower() == 'true'
+    # Order details fetched by validation are reused for this long instead of fetched from Locus again
+    ORDER_DETAIL_MAX_AGE_SECONDS = int(os.getenv('ORDER_DETAIL_MAX_AGE_SECONDS', 6 * 3600))
+
+    # Status/day totals for date-only order filters: 'stats' (sum of dashboard_stats rows) or 'query' (GROUP BY over orders)
+    FILTER_TOTALS_SOURCE = os.getenv('FILTER_TOTALS_SOURCE', 'stats')
+
+    # Tour counters are updated as orders change; tour_stats_reconciler.py checks the last N tour days for drift this often
+    TOUR_STATS_RECONCILE_SECONDS = float(os.getenv('TOUR_STATS_RECONCILE_SECONDS', 900))
+    TOUR_STATS_RECONCILE_DAYS = int(os.getenv('TOUR_STATS_RECONCILE_DAYS', 3))
+
+    # Locus task-search pagination (pages 2..N are fetched in parallel)
+    LOCUS_PAGE_FETCH_WORKERS = int(os.getenv('LOCUS_PAGE_FETCH_WORKERS', 4))
+    LOCUS_PAGE_FETCH_RETRIES = int(os.getenv('LOCUS_PAGE_FETCH_RETRIES', 2))
 
     # Locus API URLs
     LOCUS_BASE_URL = "https://dash.locus-api.com"
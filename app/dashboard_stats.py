@@ -0,0 +1,353 @@
+"""
+Dashboard Statistics
+Per-day pre-aggregated order and validation counters stored in dashboard_stats
+"""
+
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import Numeric, case, cast, func
+from models import DashboardStats, Order, OrderLineItem, ValidationResult, db
+
+logger = logging.getLogger(__name__)
+
+# Counters contributed by the latest validation of each order
+VALIDATION_COUNTERS = (
+    'validated_orders', 'valid_grns', 'invalid_grns', 'grns_with_issues',
+    'total_gtins_verified', 'gtins_matched', 'documents_detected', 'no_documents_detected',
+    'confidence_score_sum', 'processing_time_sum'
+)
+
+# Counters summed when a date range is requested
+SUMMED_COUNTERS = (
+    'total_orders', 'completed_orders', 'pending_orders', 'cancelled_orders', 'partially_delivered_orders',
+    'total_quantity', 'delivered_quantity'
+) + VALIDATION_COUNTERS
+
+# Keep IN lists well below driver parameter limits
+STATS_CHUNK_SIZE = 1000
+
+
+def _as_date(value):
+    if isinstance(value, str):
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def _load_json_list(value):
+    try:
+        data = json.loads(value) if value else []
+    except (TypeError, ValueError):
+        return []
+    return data if isinstance(data, list) else []
+
+
+class DashboardStatsService:
+    """Maintains one DashboardStats row per order date.
+
+    Order counters (status totals, partial deliveries, quantities) are
+    re-aggregated with a GROUP BY for the dates touched by a merge or edit.
+    Validation counters are adjusted by the difference between an order's
+    previous and new latest validation. Range summaries are sums over the
+    stored rows; dates without a row are aggregated on first use.
+    """
+
+    def validation_contribution(self, validation):
+        """Counter values one validation adds to its order's day (all zero for None)"""
+        contribution = dict.fromkeys(VALIDATION_COUNTERS, 0)
+        if validation is None:
+            return contribution
+
+        gtin_verification = _load_json_list(validation.gtin_verification)
+        contribution.update({
+            'validated_orders': 1,
+            'valid_grns': 1 if validation.is_valid else 0,
+            'invalid_grns': 0 if validation.is_valid else 1,
+            'grns_with_issues': 1 if _load_json_list(validation.discrepancies) else 0,
+            'total_gtins_verified': sum(1 for item in gtin_verification if isinstance(item, dict) and item.get('gs1_verified')),
+            'gtins_matched': sum(1 for item in gtin_verification if isinstance(item, dict) and item.get('name_match')),
+            'documents_detected': 1 if validation.has_document else 0,
+            'no_documents_detected': 0 if validation.has_document else 1,
+            'confidence_score_sum': float(validation.confidence_score or 0),
+            'processing_time_sum': float(validation.processing_time or 0)
+        })
+        return contribution
+
+    def _create_missing_rows(self, days):
+        """Insert empty stats rows for the days that have none; returns the days created.
+
+        Uses INSERT ... ON CONFLICT (date) DO NOTHING so concurrent requests
+        aggregating the same day never fail on the unique date.
+        """
+        days = list(days)
+        existing = set()
+        for start in range(0, len(days), STATS_CHUNK_SIZE):
+            existing.update(row[0] for row in db.session.query(DashboardStats.date).filter(
+                DashboardStats.date.in_(days[start:start + STATS_CHUNK_SIZE])).all())
+        missing = [day for day in days if day not in existing]
+        if not missing:
+            return []
+
+        dialect = db.engine.dialect.name
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+
+        table = DashboardStats.__table__
+        stmt = dialect_insert(table).on_conflict_do_nothing(index_elements=[table.c.date])
+        for start in range(0, len(missing), STATS_CHUNK_SIZE):
+            db.session.execute(stmt, [{'date': day} for day in missing[start:start + STATS_CHUNK_SIZE]])
+        return missing
+
+    def _load_rows(self, days):
+        """Return {date: stats row} for the given days"""
+        rows = {}
+        for start in range(0, len(days), STATS_CHUNK_SIZE):
+            for stats in DashboardStats.query.filter(DashboardStats.date.in_(days[start:start + STATS_CHUNK_SIZE])).all():
+                rows[_as_date(stats.date)] = stats
+        return rows
+
+    def _update_averages(self, stats):
+        validated = stats.validated_orders or 0
+        stats.avg_confidence_score = round((stats.confidence_score_sum or 0) / validated, 4) if validated else 0.0
+        stats.avg_processing_time = round((stats.processing_time_sum or 0) / validated, 4) if validated else 0.0
+        stats.last_updated = datetime.now(timezone.utc)
+
+    def refresh_order_counters(self, dates, fill_new_days=True):
+        """Re-aggregate the order counters of the given dates (caller commits).
+
+        One GROUP BY date, order_status plus one line-item quantity GROUP BY
+        covers every date in the batch. Rows created here also get their
+        validation counters unless ``fill_new_days`` is False.
+        """
+        days = sorted({_as_date(day) for day in dates if day})
+        if not days:
+            return 0
+
+        counters = {day: {'total_orders': 0, 'completed_orders': 0, 'cancelled_orders': 0,
+                          'partially_delivered_orders': 0, 'total_quantity': 0, 'delivered_quantity': 0,
+                          'status_totals': {}} for day in days}
+
+        for start in range(0, len(days), STATS_CHUNK_SIZE):
+            chunk = days[start:start + STATS_CHUNK_SIZE]
+
+            status_rows = db.session.query(
+                Order.date, Order.order_status, func.count(Order.id),
+                func.sum(case((Order.partially_delivered == True, 1), else_=0))
+            ).filter(Order.date.in_(chunk)).group_by(Order.date, Order.order_status).all()
+
+            for order_date, status, count, partial_count in status_rows:
+                day = counters[_as_date(order_date)]
+                day['total_orders'] += count
+                day['partially_delivered_orders'] += int(partial_count or 0)
+                if status:
+                    day['status_totals'][status] = day['status_totals'].get(status, 0) + count
+                if status == 'COMPLETED':
+                    day['completed_orders'] += count
+                elif status == 'CANCELLED':
+                    day['cancelled_orders'] += count
+
+            quantity_rows = db.session.query(
+                Order.date, func.sum(OrderLineItem.quantity), func.sum(OrderLineItem.transacted_quantity)
+            ).join(OrderLineItem, OrderLineItem.order_id == Order.id).filter(
+                Order.date.in_(chunk)).group_by(Order.date).all()
+
+            for order_date, quantity, delivered in quantity_rows:
+                day = counters[_as_date(order_date)]
+                day['total_quantity'] = int(quantity or 0)
+                day['delivered_quantity'] = int(delivered or 0)
+
+        new_days = self._create_missing_rows(days)
+        rows = self._load_rows(days)
+        for day, values in counters.items():
+            stats = rows[day]
+            status_totals = values.pop('status_totals')
+            for field, value in values.items():
+                setattr(stats, field, value)
+            stats.pending_orders = values['total_orders'] - values['completed_orders'] - values['cancelled_orders']
+            stats.status_totals = json.dumps(status_totals)
+            stats.last_updated = datetime.now(timezone.utc)
+
+        if new_days and fill_new_days:
+            self.refresh_validation_counters(new_days)
+
+        return len(days)
+
+    def refresh_validation_counters(self, dates):
+        """Recompute the validation counters of the given dates from the latest validation per order (caller commits)"""
+        days = sorted({_as_date(day) for day in dates if day})
+        if not days:
+            return 0
+
+        totals = {day: dict.fromkeys(VALIDATION_COUNTERS, 0) for day in days}
+
+        for start in range(0, len(days), STATS_CHUNK_SIZE):
+            chunk = days[start:start + STATS_CHUNK_SIZE]
+            order_dates = dict(db.session.query(Order.id, Order.date).filter(Order.date.in_(chunk)).all())
+            latest = ValidationResult.latest_for_orders(list(order_dates))
+
+            for order_id, validation in latest.items():
+                day_totals = totals[_as_date(order_dates[order_id])]
+                for field, value in self.validation_contribution(validation).items():
+                    day_totals[field] += value
+
+        self._create_missing_rows(days)
+        rows = self._load_rows(days)
+        for day, values in totals.items():
+            stats = rows[day]
+            for field, value in values.items():
+                setattr(stats, field, value)
+            self._update_averages(stats)
+
+        return len(days)
+
+    def recompute_days(self, dates):
+        """Rebuild every counter of the given dates from orders and validations (caller commits)"""
+        self.refresh_order_counters(dates, fill_new_days=False)
+        return self.refresh_validation_counters(dates)
+
+    def apply_validation_change(self, order_id, previous, current):
+        """Apply the difference between two validation contributions to the order's day (caller commits).
+
+        ``previous`` and ``current`` are dicts from validation_contribution().
+        Days without a stats row are aggregated from scratch instead.
+        """
+        order_date = db.session.query(Order.date).filter(Order.id == order_id).scalar()
+        if order_date is None:
+            return False
+
+        # One atomic UPDATE: validation workers adjust the same day concurrently.
+        # Right-hand sides read the row as it was before the UPDATE, so the averages
+        # are computed from the updated sums and count spelled out again.
+        updated = {field: func.coalesce(getattr(DashboardStats, field), 0) + (current[field] - previous[field])
+                   for field in VALIDATION_COUNTERS}
+        validated = updated['validated_orders']
+
+        def average(total):
+            return case((validated > 0, func.round(cast(total / validated, Numeric), 4)), else_=0.0)
+
+        values = dict(updated, avg_confidence_score=average(updated['confidence_score_sum']),
+                      avg_processing_time=average(updated['processing_time_sum']),
+                      last_updated=datetime.now(timezone.utc))
+        changed = DashboardStats.query.filter(DashboardStats.date == order_date) \
+            .update(values, synchronize_session=False)
+        if not changed:
+            self.recompute_days([order_date])
+        return True
+
+    def ensure_days(self, date_from, date_to):
+        """Aggregate every date in the range that has no stats row yet (commits when rows are added)"""
+        start, end = _as_date(date_from), _as_date(date_to)
+        existing = {row[0] for row in db.session.query(DashboardStats.date).filter(
+            DashboardStats.date >= start, DashboardStats.date <= end).all()}
+
+        missing = []
+        day = start
+        while day <= end:
+            if day not in existing:
+                missing.append(day)
+            day += timedelta(days=1)
+
+        if missing:
+            self.recompute_days(missing)
+            db.session.commit()
+            logger.info(f"DASHBOARD STATS: Aggregated {len(missing)} missing day(s) between {start} and {end}")
+        return len(missing)
+
+    def get_range_rows(self, date_from, date_to):
+        """Stats rows for the range (inclusive), filling in days that were never aggregated"""
+        self.ensure_days(date_from, date_to)
+        return DashboardStats.query.filter(
+            DashboardStats.date >= _as_date(date_from), DashboardStats.date <= _as_date(date_to)
+        ).order_by(DashboardStats.date).all()
+
+    def get_status_totals(self, date_from, date_to, order_statuses=None):
+        """Order counts for a date range from the stats rows.
+
+        Returns (total_count, status_totals, day_totals) in the same shape as
+        OrderFilterService._aggregate_totals; ``order_statuses`` restricts the
+        counts to those statuses as an order_status filter would.
+        """
+        statuses = {status.upper() for status in order_statuses} if order_statuses else None
+        total_count = 0
+        status_totals = {}
+        day_totals = {}
+
+        for stats in self.get_range_rows(date_from, date_to):
+            day_status_totals = json.loads(stats.status_totals) if stats.status_totals else {}
+            unknown = (stats.total_orders or 0) - sum(day_status_totals.values())
+            breakdown = {status: count for status, count in day_status_totals.items() if count}
+
+            if statuses is not None:
+                breakdown = {status: count for status, count in breakdown.items() if status in statuses}
+                unknown = 0
+            if not breakdown and not unknown:
+                continue
+
+            day_total = sum(breakdown.values()) + unknown
+            total_count += day_total
+            for status, count in breakdown.items():
+                status_totals[status] = status_totals.get(status, 0) + count
+            if unknown:
+                breakdown['UNKNOWN'] = unknown
+            day_totals[stats.date.isoformat()] = {'total_orders': day_total, 'status_breakdown': breakdown}
+
+        return total_count, status_totals, day_totals
+
+    def get_range_summary(self, date_from, date_to):
+        """Summary cards for a date range as sums over the pre-aggregated day rows"""
+        try:
+            rows = self.get_range_rows(date_from, date_to)
+
+            summary = dict.fromkeys(SUMMED_COUNTERS, 0)
+            status_totals = {}
+            for stats in rows:
+                for field in SUMMED_COUNTERS:
+                    summary[field] += getattr(stats, field) or 0
+                for status, count in (json.loads(stats.status_totals) if stats.status_totals else {}).items():
+                    status_totals[status] = status_totals.get(status, 0) + count
+
+            total_orders = summary['total_orders']
+            validated = summary['validated_orders']
+            confidence_sum = summary.pop('confidence_score_sum')
+            processing_sum = summary.pop('processing_time_sum')
+
+            summary.update({
+                'success': True,
+                'date_from': _as_date(date_from).isoformat(),
+                'date_to': _as_date(date_to).isoformat(),
+                'days': len(rows),
+                'status_totals': status_totals,
+                'avg_confidence_score': round(confidence_sum / validated, 4) if validated else 0.0,
+                'avg_processing_time': round(processing_sum / validated, 4) if validated else 0.0,
+                'completion_rate': round((summary['completed_orders'] / total_orders) * 100, 1) if total_orders else 0.0,
+                'delivery_rate': round((summary['delivered_quantity'] / summary['total_quantity']) * 100, 1) if summary['total_quantity'] else 0.0
+            })
+            return summary
+
+        except Exception as e:
+            logger.error(f"Error building dashboard stats summary: {e}")
+            return {'success': False, 'error': str(e)}
+
+    def backfill(self, date_from=None, date_to=None):
+        """Recompute stats rows for every order date in the range (all dates when omitted), committing per chunk"""
+        query = db.session.query(Order.date).distinct()
+        if date_from:
+            query = query.filter(Order.date >= _as_date(date_from))
+        if date_to:
+            query = query.filter(Order.date <= _as_date(date_to))
+        days = sorted(row[0] for row in query.all())
+
+        for start in range(0, len(days), STATS_CHUNK_SIZE):
+            self.recompute_days(days[start:start + STATS_CHUNK_SIZE])
+            db.session.commit()
+
+        logger.info(f"DASHBOARD STATS: Backfilled {len(days)} day(s)")
+        return len(days)
+
+
+# Global service instance
+dashboard_stats_service = DashboardStatsService()
@@ -6,6 +6,7 @@ Handles protecting manually modified fields from API overwrites
 import json
 import logging
 from datetime import datetime, timezone
+from app.grn_documents import find_grn_url
 from models import Order, OrderLineItem, db
 
 logger = logging.getLogger(__name__)
@@ -44,15 +45,20 @@ class DataProtectionService:
         """Safely update order record, respecting manually modified fields"""
         try:
             logger.info(f"Safe updating order {existing_order.id} (is_modified: {existing_order.is_modified})")
+            from app.tours import tour_service
+            previous_tour_state = tour_service.order_state(existing_order)
 
             # Get list of protected fields
             protected_fields = self.get_protected_fields(existing_order)
             if protected_fields:
                 logger.info(f"Order {existing_order.id} has {len(protected_fields)} protected fields: {protected_fields}")
 
-            # Always update raw_data and updated_at (system fields)
+            # Always update raw_data and updated_at (system fields), and the GRN URL when the payload carries one
             existing_order.raw_data = json.dumps(order_data)
             existing_order.updated_at = datetime.now(timezone.utc)
+            grn_url = find_grn_url(order_data)
+            if grn_url:
+                existing_order.grn_url = grn_url
 
             # Basic fields with protection
             if not self.is_field_modified(existing_order, 'order_status'):
@@ -187,6 +193,13 @@ class DataProtectionService:
             # Handle line items with protection
             self._safe_update_line_items(existing_order, order_data)
 
+            # Apply a status, tour or location change to the tour
+            current_tour_state = tour_service.order_state(existing_order)
+            if current_tour_state != previous_tour_state:
+                tour_detail = order_metadata.get('tourDetail') if order_metadata and isinstance(order_metadata, dict) else None
+                tour_service.apply_order_changes([(previous_tour_state, current_tour_state)],
+                                                 {existing_order.tour_id: tour_detail} if isinstance(tour_detail, dict) else None)
+
             logger.info(f"Successfully performed safe update for order {existing_order.id}")
 
         except Exception as e:
@@ -18,17 +18,41 @@ class EditingService:
     def __init__(self):
         pass
 
-    def invalidate_filter_cache(self):
-        """Invalidate the filter service cache after order/tour modifications"""
+    def invalidate_filter_cache(self, dates=None, order_ids=None):
+        """Invalidate cached filter results after order/tour modifications.
+
+        Only entries tagged with the given dates or order ids are dropped;
+        without arguments the whole cache is cleared.
+        """
         try:
-            from app.filters import filter_service
-            if hasattr(filter_service, '_filter_cache'):
-                filter_service._filter_cache.clear()
+            from app.cache import result_cache
+            if dates is None and order_ids is None:
+                result_cache.clear()
                 logger.info("Filter service cache invalidated after modification")
+            else:
+                result_cache.invalidate(dates=dates, order_ids=order_ids)
         except Exception as e:
             logger.warning(f"Failed to invalidate filter cache: {e}")
             # Not critical - continue without error
 
+    def refresh_dashboard_stats(self, order):
+        """Re-aggregate the dashboard counters for the order's date (committed with the edit)"""
+        try:
+            from app.dashboard_stats import dashboard_stats_service
+            dashboard_stats_service.refresh_order_counters([order.date])
+        except Exception as e:
+            logger.warning(f"Failed to refresh dashboard stats for order {order.id}: {e}")
+            # Not critical - the backfill command can rebuild the day
+
+    def refresh_tour_stats(self, changes):
+        """Apply (previous, current) order_state() pairs of edited orders to their tours (committed with the edit)"""
+        try:
+            from app.tours import tour_service
+            tour_service.apply_order_changes(changes)
+        except Exception as e:
+            logger.warning(f"Failed to update tour statistics: {e}")
+            # Not critical - tour_stats_reconciler.py repairs drifted tours
+
     def calculate_partial_delivery(self, order):
         """Calculate if order is partially delivered based on transaction quantities"""
         try:
@@ -135,8 +159,9 @@ class EditingService:
             # Save tour changes
             db.session.commit()
 
-            # Invalidate filter cache since tour data has changed
-            self.invalidate_filter_cache()
+            # Invalidate cached filter results for the dates this tour's orders fall on, and its tour day's filter options
+            tour_order_dates = [row[0] for row in db.session.query(Order.date).filter(Order.tour_id == tour_id).distinct().all()]
+            self.invalidate_filter_cache(dates=tour_order_dates + ([tour.tour_day] if tour.tour_day else []))
 
             # Propagate changes to all orders in this tour if requested
             propagated_orders = 0
@@ -207,6 +232,8 @@ class EditingService:
                     logger.info(f"Found {len(name_based_orders)} additional orders by tour_name match")
 
                 logger.info(f"Found {len(orders)} total unique orders to propagate tour changes to")
+                from app.tours import tour_service
+                previous_tour_states = {order.id: tour_service.order_state(order) for order in orders}
 
                 for order in orders:
                     order_updated = False
@@ -250,10 +277,14 @@ class EditingService:
                     if order_updated:
                         propagated_orders += 1
 
+                # Propagated statuses change the counters of the orders' tours
+                self.refresh_tour_stats([(previous_tour_states[order.id], tour_service.order_state(order)) for order in orders])
+
                 db.session.commit()
 
-                # Invalidate filter cache since orders were propagated
-                self.invalidate_filter_cache()
+                # Invalidate filter cache for the propagated orders and their dates
+                self.invalidate_filter_cache(dates={order.date for order in orders},
+                                             order_ids=[order.id for order in orders])
 
             return {
                 'success': True,
@@ -281,6 +312,8 @@ class EditingService:
 
             updated_fields = []
             original_data = {}
+            from app.tours import tour_service
+            previous_tour_state = tour_service.order_state(order)
 
             # Handle special fields first
             special_updates = {}
@@ -341,11 +374,15 @@ class EditingService:
                         updated_fields.append(field_name)
                         logger.info(f"Updated order {order_id} field '{field_name}' with special handling")
 
+            # Refresh the day's dashboard counters (status / partial delivery may have changed) and the tour's counters
+            self.refresh_dashboard_stats(order)
+            self.refresh_tour_stats([(previous_tour_state, tour_service.order_state(order))])
+
             # Save changes
             db.session.commit()
 
-            # Invalidate filter cache since order data has changed
-            self.invalidate_filter_cache()
+            # Invalidate cached filter results for this order's date
+            self.invalidate_filter_cache(dates=[order.date], order_ids=[order.id])
 
             return {
                 'success': True,
@@ -497,10 +534,12 @@ class EditingService:
                 self.track_field_modification(order, 'partially_delivered', calculated_partial_status, modified_by)
                 logger.info(f"Order {order_id} partially_delivered status updated to {calculated_partial_status} after line item changes")
 
+            self.refresh_dashboard_stats(order)
+
             db.session.commit()
 
-            # Invalidate filter cache since order line items have changed
-            self.invalidate_filter_cache()
+            # Invalidate cached filter results for this order's date
+            self.invalidate_filter_cache(dates=[order.date], order_ids=[order.id])
 
             logger.info(f"Updated line items for order {order_id}: {results['added']} items by {modified_by}")
 
@@ -951,11 +990,13 @@ def register_editing_routes(app):
                 editing_service.track_field_modification(order, 'partially_delivered', calculated_partial_status, modified_by)
                 logger.info(f"Order {order_id} partially_delivered status changed from {original_partial_status} to {calculated_partial_status}")
 
+            editing_service.refresh_dashboard_stats(order)
+
             # Save changes
             db.session.commit()
 
-            # Invalidate filter cache since transaction details have changed
-            editing_service.invalidate_filter_cache()
+            # Invalidate cached filter results for this order's date
+            editing_service.invalidate_filter_cache(dates=[order.date], order_ids=[order.id])
 
             logger.info(f"Updated transaction details for order {order_id}: {updated_items} items updated by {modified_by}")
 
@@ -3,19 +3,29 @@ Enhanced Order Filtering System
 Provides backend-driven filtering with dynamic filter generation
 """
 from datetime import datetime, timedelta
-from sqlalchemy import and_, or_, func, distinct
+from sqlalchemy import and_, or_, func, distinct, false
 from models import db, Order, OrderLineItem, ValidationResult
+from app.projections import SHAPES, order_load_options, serialize_orders, attach_line_item_previews
+from app.cache import result_cache, ALL_DATES_TAG, date_tag, order_tag
 import json
 
+# Date ranges longer than this are tagged as unbounded instead of per day
+MAX_TAGGED_DAYS = 366
+
+# Filter keys that do not restrict which orders are counted (plus order_status, handled by the stats lookup)
+STATS_NEUTRAL_KEYS = frozenset({'date', 'date_from', 'date_to', 'order_status', 'page', 'per_page', 'shape', 'pagination_mode'})
+
 
 class OrderFilterService:
     """Service class for handling order filtering operations"""
 
     def __init__(self):
         self.available_filters = self._generate_available_filters()
-        # Cache for filter results to improve performance
-        self._filter_cache = {}
-        self._cache_timeout = 300  # 5 minutes cache timeout
+
+    @property
+    def _filter_cache(self):
+        """Filter results live in the shared result cache (kept under the old name for callers that clear it)"""
+        return result_cache
 
     def _generate_available_filters(self):
         """Dynamically generate available filter options based on database schema"""
@@ -206,7 +216,7 @@ class OrderFilterService:
         """Return all available filter configurations"""
         return self.available_filters
 
-    def _get_cache_key(self, filters_data):
+    def _get_cache_key(self, filters_data, include_page=False):
         """Generate cache key from filter data"""
         import hashlib
         import json
@@ -214,16 +224,38 @@ class OrderFilterService:
         # Create a sorted dictionary for consistent cache keys
         cache_data = {}
         for key, value in sorted(filters_data.items()):
-            if key != 'page':  # Don't include page in cache key for result reuse
+            if key != 'page' or include_page:  # Page excluded in memory mode so full results can be re-sliced
                 cache_data[key] = value
 
         cache_string = json.dumps(cache_data, sort_keys=True)
-        return hashlib.md5(cache_string.encode()).hexdigest()
+        return f"filters:{hashlib.md5(cache_string.encode()).hexdigest()}"
+
+    def _cache_tags(self, filters_data, orders):
+        """Invalidation tags for a cached result: every date it covers plus the ids of the orders it holds"""
+        tags = {order_tag(order['id']) for order in orders}
 
-    def _is_cache_valid(self, cache_entry):
-        """Check if cache entry is still valid"""
-        import time
-        return time.time() - cache_entry['timestamp'] < self._cache_timeout
+        date_from = filters_data.get('date_from')
+        date_to = filters_data.get('date_to')
+        if not date_from and filters_data.get('date'):
+            date_from = date_to = filters_data['date']
+
+        try:
+            start = datetime.strptime(date_from, '%Y-%m-%d').date()
+            end = datetime.strptime(date_to, '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            # Open-ended or malformed ranges may contain orders from any date
+            tags.add(ALL_DATES_TAG)
+            return tags
+
+        if (end - start).days > MAX_TAGGED_DAYS:
+            tags.add(ALL_DATES_TAG)
+            return tags
+
+        day = start
+        while day <= end:
+            tags.add(date_tag(day))
+            day += timedelta(days=1)
+        return tags
 
     def apply_filters(self, filters_data, config=None):
         """
@@ -239,14 +271,21 @@ class OrderFilterService:
             dict: Filtered order results with metadata
         """
         try:
-            import time
+            db_pagination = self._use_db_pagination(filters_data, config)
 
-            # Generate cache key (excluding pagination)
-            cache_key = self._get_cache_key(filters_data)
+            # Generate cache key (excluding pagination unless the page is fetched from the database)
+            cache_key = self._get_cache_key(filters_data, include_page=db_pagination)
+            cached = result_cache.get(cache_key)
+
+            # Database-paginated entries hold exactly one page
+            if db_pagination and cached is not None:
+                cached_result = cached.copy()
+                cached_result['from_cache'] = True
+                return cached_result
 
-            # Check cache first (for non-paginated results)
-            if cache_key in self._filter_cache and self._is_cache_valid(self._filter_cache[cache_key]):
-                cached_result = self._filter_cache[cache_key]['data'].copy()
+            # Memory-mode entries hold the full result; slice the requested page
+            if not db_pagination and cached is not None:
+                cached_result = cached.copy()
 
                 # Apply pagination to cached results
                 page = int(filters_data.get('page', 1))
@@ -285,32 +324,19 @@ class OrderFilterService:
                 # Single date filtering
                 self._ensure_data_for_date_range(date_from, date_from, filters_data, app_config)
 
-            # Start with base query and order by date DESC for recent orders first
-            query = db.session.query(Order).order_by(Order.date.desc(), Order.created_at.desc())
+            query = self._build_filtered_query(filters_data)
 
-            # Apply basic filters
-            query = self._apply_basic_filters(query, filters_data)
-
-            # Apply location filters
-            query = self._apply_location_filters(query, filters_data)
-
-            # Apply delivery filters
-            query = self._apply_delivery_filters(query, filters_data)
-
-            # Apply line item filters
-            query = self._apply_line_item_filters(query, filters_data)
-
-            # Apply advanced search
-            query = self._apply_search_filter(query, filters_data)
+            if db_pagination:
+                result = self._apply_db_pagination(query, filters_data, app_config)
+                result_cache.set(cache_key, result, tags=self._cache_tags(filters_data, result['orders']))
+                return result
 
             # Execute query to get all filtered results (no pagination yet)
-            orders = query.all()
+            shape = self._get_shape(filters_data)
+            orders = query.options(*order_load_options(shape)).all()
 
             # Convert to dict format
-            orders_data = [order.to_dict() for order in orders]
-
-            # Apply validation filters (post-query filtering for complex validation logic)
-            filtered_orders = self._apply_validation_filters(orders_data, filters_data)
+            filtered_orders = self._serialize_orders(orders, shape)
 
             # Get pagination parameters
             page = int(filters_data.get('page', 1))
@@ -353,24 +379,15 @@ class OrderFilterService:
 
             # Cache the result (excluding pagination-specific data)
             cache_entry = {
-                'data': {
-                    'full_orders': filtered_orders,
-                    'total_count': total_filtered,
-                    'status_totals': status_totals,
-                    'day_totals': day_totals,
-                    'date_info': date_info,
-                    'applied_filters': filters_data,
-                    'success': True
-                },
-                'timestamp': time.time()
+                'full_orders': filtered_orders,
+                'total_count': total_filtered,
+                'status_totals': status_totals,
+                'day_totals': day_totals,
+                'date_info': date_info,
+                'applied_filters': filters_data,
+                'success': True
             }
-            self._filter_cache[cache_key] = cache_entry
-
-            # Clean up old cache entries (keep cache size manageable)
-            if len(self._filter_cache) > 50:
-                oldest_key = min(self._filter_cache.keys(),
-                                key=lambda k: self._filter_cache[k]['timestamp'])
-                del self._filter_cache[oldest_key]
+            result_cache.set(cache_key, cache_entry, tags=self._cache_tags(filters_data, filtered_orders))
 
             return result
 
@@ -385,6 +402,147 @@ class OrderFilterService:
                 'success': False
             }
 
+    def _use_db_pagination(self, filters_data, config=None):
+        """Decide between database pagination and the in-memory (full result) mode.
+
+        A request may pass 'pagination_mode' ('database' or 'memory');
+        otherwise FILTER_PAGINATION_MODE from the config applies.
+        """
+        mode = filters_data.get('pagination_mode') or self._config_value(config, 'FILTER_PAGINATION_MODE')
+        return (mode or 'database') == 'database'
+
+    def _config_value(self, config, key, default=None):
+        if config is None:
+            from flask import current_app
+            config = getattr(current_app, 'config', None)
+        if isinstance(config, dict):
+            return config.get(key, default)
+        return getattr(config, key, default)
+
+    def _stats_date_range(self, filters_data, config=None):
+        """(date_from, date_to) when the totals can be summed from dashboard_stats, else None.
+
+        Only requests filtered by a bounded date range and optionally order
+        status qualify; any other filter needs the GROUP BY over orders.
+        """
+        if self._config_value(config, 'FILTER_TOTALS_SOURCE', 'stats') != 'stats':
+            return None
+
+        for key, value in filters_data.items():
+            if key in STATS_NEUTRAL_KEYS or value in (None, '', [], 'all'):
+                continue
+            return None
+
+        date_from = filters_data.get('date_from')
+        date_to = filters_data.get('date_to')
+        if not date_from:
+            date_from = date_to = filters_data.get('date')
+        if not date_from or not date_to:
+            return None
+
+        try:
+            datetime.strptime(date_from, '%Y-%m-%d')
+            datetime.strptime(date_to, '%Y-%m-%d')
+        except (TypeError, ValueError):
+            return None
+        return date_from, date_to
+
+    def _get_shape(self, filters_data):
+        """Projection shape for the result rows ('list' unless the request asks otherwise)"""
+        shape = filters_data.get('shape', 'list')
+        return shape if shape in SHAPES else 'list'
+
+    def _serialize_orders(self, orders, shape):
+        """Serialise orders with the given shape; list rows get a line-item preview instead of raw_data"""
+        orders_data = serialize_orders(orders, shape)
+        if shape == 'list':
+            attach_line_item_previews(orders_data)
+        return orders_data
+
+    def _build_filtered_query(self, filters_data):
+        """Build the order query with every filter applied (not yet executed)"""
+        # Start with base query and order by date DESC for recent orders first
+        # (id breaks ties so LIMIT/OFFSET pages are stable)
+        query = db.session.query(Order).order_by(Order.date.desc(), Order.created_at.desc(), Order.id.desc())
+
+        # Apply basic filters
+        query = self._apply_basic_filters(query, filters_data)
+
+        # Apply location filters
+        query = self._apply_location_filters(query, filters_data)
+
+        # Apply delivery filters
+        query = self._apply_delivery_filters(query, filters_data)
+
+        # Apply line item filters
+        query = self._apply_line_item_filters(query, filters_data)
+
+        # Apply advanced search
+        query = self._apply_search_filter(query, filters_data)
+
+        # Apply validation filters (joined against the latest validation per order)
+        query = self._apply_validation_filters(query, filters_data)
+
+        return query
+
+    def _aggregate_totals(self, query):
+        """Status and per-day totals for the filtered query from one GROUP BY date, order_status"""
+        counts_query = query.with_entities(
+            Order.date, Order.order_status, func.count(distinct(Order.id))
+        ).order_by(None).group_by(Order.date, Order.order_status)
+
+        status_totals = {}
+        day_totals = {}
+        total_count = 0
+
+        for order_date, status, count in counts_query.all():
+            total_count += count
+            if status:
+                status_totals[status] = status_totals.get(status, 0) + count
+
+            day_key = order_date.isoformat() if hasattr(order_date, 'isoformat') else str(order_date or 'unknown')
+            day = day_totals.setdefault(day_key, {'total_orders': 0, 'status_breakdown': {}})
+            day['total_orders'] += count
+            status_key = status or 'UNKNOWN'
+            day['status_breakdown'][status_key] = day['status_breakdown'].get(status_key, 0) + count
+
+        return total_count, status_totals, day_totals
+
+    def _apply_db_pagination(self, query, filters_data, config=None):
+        """Fetch only the requested page (LIMIT/OFFSET) plus aggregate totals"""
+        page = max(1, int(filters_data.get('page', 1)))
+        per_page = max(1, int(filters_data.get('per_page', 50)))
+
+        stats_range = self._stats_date_range(filters_data, config)
+        if stats_range:
+            from app.dashboard_stats import dashboard_stats_service
+            order_status = filters_data.get('order_status')
+            if order_status in (None, '', [], 'all'):
+                order_statuses = None
+            else:
+                order_statuses = order_status if isinstance(order_status, list) else [order_status]
+            total_count, status_totals, day_totals = dashboard_stats_service.get_status_totals(
+                stats_range[0], stats_range[1], order_statuses)
+        else:
+            total_count, status_totals, day_totals = self._aggregate_totals(query)
+
+        shape = self._get_shape(filters_data)
+        page_orders = query.options(*order_load_options(shape)).limit(per_page).offset((page - 1) * per_page).all()
+
+        return {
+            'orders': self._serialize_orders(page_orders, shape),
+            'total_count': total_count,
+            'page': page,
+            'per_page': per_page,
+            'total_pages': max(1, (total_count + per_page - 1) // per_page),
+            'status_totals': status_totals,
+            'day_totals': day_totals,
+            'date_info': self._get_date_range_info(filters_data),
+            'applied_filters': filters_data,
+            'pagination_mode': 'database',
+            'success': True
+        }
+
     def _apply_basic_filters(self, query, filters_data):
         """Apply basic filters like date and order status"""
 
@@ -521,62 +679,48 @@ class OrderFilterService:
 
         return query
 
-    def _apply_validation_filters(self, orders_data, filters_data):
-        """Apply validation-related filters (post-query)"""
+    def _apply_validation_filters(self, query, filters_data):
+        """Apply validation-related filters as a join against each order's latest validation"""
 
         validation_filter = filters_data.get('has_validation', 'all')
 
         if validation_filter == 'all':
-            return orders_data
-
-        filtered_orders = []
-
-        for order in orders_data:
-            # Get validation results for this order
-            validation_results = db.session.query(ValidationResult).filter(
-                ValidationResult.order_id == order['id']
-            ).order_by(ValidationResult.validation_date.desc()).first()
-
-            include_order = False
-
-            if validation_filter == 'validated':
-                include_order = validation_results is not None
-            elif validation_filter == 'unvalidated':
-                include_order = validation_results is None
-            elif validation_filter == 'valid':
-                include_order = validation_results is not None and validation_results.is_valid
-            elif validation_filter == 'invalid':
-                include_order = validation_results is not None and not validation_results.is_valid
-            elif validation_filter == 'no_document':
-                include_order = validation_results is not None and validation_results.has_document is False
-            elif validation_filter == 'has_issues':
-                include_order = validation_results is not None and not validation_results.is_valid
-
-            # Apply confidence score filter
-            if include_order and filters_data.get('confidence_min'):
-                try:
-                    min_confidence = float(filters_data['confidence_min'])
-                    if validation_results and validation_results.confidence_score is not None:
-                        include_order = validation_results.confidence_score >= min_confidence
-                    else:
-                        include_order = False
-                except ValueError:
-                    pass
-
-            if include_order and filters_data.get('confidence_max'):
-                try:
-                    max_confidence = float(filters_data['confidence_max'])
-                    if validation_results and validation_results.confidence_score is not None:
-                        include_order = validation_results.confidence_score <= max_confidence
-                    else:
-                        include_order = False
-                except ValueError:
-                    pass
+            return query
+
+        # Rank only the validations of orders the other filters kept
+        candidates = query.with_entities(Order.id).order_by(None)
+        latest = ValidationResult.latest_subquery(candidates)
+        query = query.outerjoin(latest, latest.c.order_id == Order.id)
+
+        if validation_filter == 'validated':
+            query = query.filter(latest.c.order_id.isnot(None))
+        elif validation_filter == 'unvalidated':
+            query = query.filter(latest.c.order_id.is_(None))
+        elif validation_filter == 'valid':
+            query = query.filter(latest.c.is_valid.is_(True))
+        elif validation_filter in ('invalid', 'has_issues'):
+            query = query.filter(latest.c.order_id.isnot(None),
+                                 or_(latest.c.is_valid.is_(False), latest.c.is_valid.is_(None)))
+        elif validation_filter == 'no_document':
+            query = query.filter(latest.c.has_document.is_(False))
+        else:
+            # Unknown validation filter matches nothing
+            query = query.filter(false())
+
+        # Confidence bounds exclude orders without a scored validation
+        if filters_data.get('confidence_min'):
+            try:
+                query = query.filter(latest.c.confidence_score >= float(filters_data['confidence_min']))
+            except ValueError:
+                pass
 
-            if include_order:
-                filtered_orders.append(order)
+        if filters_data.get('confidence_max'):
+            try:
+                query = query.filter(latest.c.confidence_score <= float(filters_data['confidence_max']))
+            except ValueError:
+                pass
 
-        return filtered_orders
+        return query
 
     def _ensure_data_for_date_range(self, date_from, date_to, filters_data, config=None):
         """
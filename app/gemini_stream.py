@@ -0,0 +1,202 @@
+"""
+Gemini Streaming
+Server-sent event reader for streamGenerateContent, and an incremental parser that hands out
+each extracted_items entry of a GRN validation answer as soon as it is complete
+"""
+
+import json
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+ITEMS_KEY_PATTERN = re.compile(r'"extracted_items"\s*:\s*\[')
+ITEM_OR_END_PATTERN = re.compile(r'[^\s,]')
+STRUCTURE_PATTERN = re.compile(r'["\\{}\[\]]')
+STRING_END_PATTERN = re.compile(r'["\\]')
+
+# Top-level fields the prompt asks for ahead of extracted_items: (pattern, converter)
+HEADER_FIELDS = {
+    'has_document': (re.compile(r'"has_document"\s*:\s*(true|false)'), lambda value: value == 'true'),
+    'document_description': (re.compile(r'"document_description"\s*:\s*"((?:[^"\\]|\\.)*)"'),
+                             lambda value: json.loads(f'"{value}"', strict=False)),
+    'validation_result': (re.compile(r'"validation_result"\s*:\s*"([A-Z_]+)"'), str),
+    'confidence_score': (re.compile(r'"confidence_score"\s*:\s*([0-9]+(?:\.[0-9]+)?)'), float),
+}
+
+
+def is_event_stream(response):
+    return 'text/event-stream' in response.headers.get('content-type', '')
+
+
+def _event_text(data):
+    """(text, finish reason) of one streamed GenerateContentResponse chunk"""
+    try:
+        chunk = json.loads(data)
+    except ValueError:
+        logger.warning(f"GEMINI STREAM: Skipping undecodable event: {data[:100]!r}")
+        return '', None
+    candidates = chunk.get('candidates') or [{}]
+    parts = candidates[0].get('content', {}).get('parts', [])
+    return ''.join(part.get('text', '') for part in parts), candidates[0].get('finishReason')
+
+
+def iter_stream_text(response):
+    """Yield (text fragment, finish reason or None) for each event of a streamGenerateContent ?alt=sse response"""
+    data_lines = []
+    # chunk_size=None hands over data as it arrives instead of waiting for fixed-size reads
+    for line in response.iter_lines(chunk_size=None):
+        line = line.decode('utf-8') if isinstance(line, bytes) else line
+        if line.startswith('data:'):
+            data_lines.append(line[5:].strip())
+        elif not line and data_lines:
+            yield _event_text('\n'.join(data_lines))
+            data_lines = []
+    if data_lines:
+        yield _event_text('\n'.join(data_lines))
+
+
+class ExtractedItemsParser:
+    """Incremental parser for a streamed validation answer.
+
+    ``feed`` appends the next text fragment and returns the extracted_items
+    entries it completed. Scanning resumes where the previous fragment
+    stopped, so the whole answer is parsed in one linear pass.
+    """
+
+    def __init__(self):
+        self.text = ''
+        self.items = []
+        self.items_complete = False  # the closing ] of extracted_items has arrived
+        self._items_key_start = None
+        self._position = None
+        self._item_start = None
+        self._depth = 0
+        self._in_string = False
+
+    def feed(self, fragment):
+        self.text += fragment
+        if self._position is None:
+            match = ITEMS_KEY_PATTERN.search(self.text)
+            if not match:
+                return []
+            self._items_key_start = match.start()
+            self._position = match.end()
+
+        new_items = []
+        text = self.text
+        position = self._position
+        while position < len(text) and not self.items_complete:
+            if self._item_start is None:
+                # Between entries: the next one starts with {, the array ends with ]
+                match = ITEM_OR_END_PATTERN.search(text, position)
+                if not match:
+                    position = len(text)
+                    break
+                position = match.end()
+                if match.group() == '{':
+                    self._item_start = match.start()
+                    self._depth = 1
+                elif match.group() == ']':
+                    self.items_complete = True
+                continue
+
+            match = (STRING_END_PATTERN if self._in_string else STRUCTURE_PATTERN).search(text, position)
+            if not match:
+                position = len(text)
+                break
+            char = match.group()
+            position = match.end()
+            if char == '\\':
+                position += 1  # skip the escaped character, even if it has not arrived yet
+            elif char == '"':
+                self._in_string = not self._in_string
+            elif char in '{[':
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    item = self._decode(text[self._item_start:position])
+                    self._item_start = None
+                    if item is not None:
+                        self.items.append(item)
+                        new_items.append(item)
+
+        self._position = position
+        return new_items
+
+    def _decode(self, item_text):
+        try:
+            item = json.loads(item_text, strict=False)
+        except ValueError as e:
+            logger.warning(f"GEMINI STREAM: Skipping malformed extracted item ({e}): {item_text[:100]!r}")
+            return None
+        return item if isinstance(item, dict) else None
+
+    def header_fields(self):
+        """Top-level fields that arrived before extracted_items (has_document, validation_result, ...)"""
+        head = self.text if self._items_key_start is None else self.text[:self._items_key_start]
+        fields = {}
+        for field, (pattern, convert) in HEADER_FIELDS.items():
+            match = pattern.search(head)
+            if match:
+                try:
+                    fields[field] = convert(match.group(1))
+                except ValueError:
+                    continue
+        return fields
+
+
+class StreamedAnswer:
+    """A streamed validation answer: its text, the items parsed so far and how the stream ended"""
+
+    def __init__(self, started_at):
+        self.parser = ExtractedItemsParser()
+        self.started_at = started_at
+        self.finish_reason = None
+        self.error = None
+        self.gs1_products = {}  # GTIN lookups completed while streaming
+        self.first_item_ms = None
+        self.first_discrepancy_ms = None
+        self.early_discrepancies = 0
+        self.elapsed_ms = None
+
+    @property
+    def text(self):
+        return self.parser.text
+
+    @property
+    def items(self):
+        return self.parser.items
+
+    @property
+    def truncated(self):
+        """Cut off by an error or the output limit rather than finished by the model"""
+        return self.error is not None or self.finish_reason != 'STOP'
+
+    def _since_start(self):
+        return round((time.time() - self.started_at) * 1000, 1)
+
+    def item_received(self):
+        if self.first_item_ms is None:
+            self.first_item_ms = self._since_start()
+
+    def discrepancy_found(self):
+        self.early_discrepancies += 1
+        if self.first_discrepancy_ms is None:
+            self.first_discrepancy_ms = self._since_start()
+
+    def finished(self):
+        self.elapsed_ms = self._since_start()
+
+    def stats(self):
+        return {
+            'items_streamed': len(self.items),
+            'first_item_ms': self.first_item_ms,
+            'first_discrepancy_ms': self.first_discrepancy_ms,
+            'early_discrepancies': self.early_discrepancies,
+            'stream_ms': self.elapsed_ms,
+            'finish_reason': self.finish_reason,
+            'truncated': self.truncated
+        }
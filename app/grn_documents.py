@@ -0,0 +1,141 @@
+"""
+GRN Documents
+Finds the GRN (proof of delivery document) URL in Locus order payloads. Also stores the order
+details batch validation fetched, so candidates can be selected and validated from the database
+"""
+
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import exists, or_
+from models import Order, ValidationResult, db
+
+logger = logging.getLogger(__name__)
+
+# Places the GRN has been seen in order payloads, tried in order
+GRN_DOCUMENT_PATHS = (
+    ('orderMetadata', 'customerProofOfCompletion', 'Proof Of Delivery Document', 'Proof Of Delivery Document'),
+    ('orderMetadata', 'customerProofOfCompletion', 'proofOfDeliveryDocument'),
+    ('orderMetadata', 'customerProofOfCompletion', 'deliveryDocument'),
+    ('proofOfDelivery', 'document'),
+    ('proofOfDelivery', 'documentUrl'),
+    ('proofOfDelivery', 'deliveryDocument'),
+    ('customerProofOfCompletion', 'deliveryDocument'),
+    ('customerProofOfCompletion', 'document'),
+)
+
+# Statuses after which Locus no longer adds a GRN to the order
+TERMINAL_STATUSES = ('COMPLETED', 'CANCELLED')
+
+
+def _is_url(value):
+    return isinstance(value, str) and value.startswith('http')
+
+
+def _first_url(obj):
+    """First URL value of a nested dict (also inside lists of dicts), depth first in document order"""
+    if isinstance(obj, dict):
+        for value in obj.values():
+            if _is_url(value):
+                return value
+            url = _first_url(value)
+            if url:
+                return url
+    elif isinstance(obj, list):
+        for item in obj:
+            url = _first_url(item)
+            if url:
+                return url
+    return None
+
+
+def find_grn_url(order_data):
+    """GRN document URL of an order payload: a known path first, else any URL in its proof of completion; None if absent"""
+    if not isinstance(order_data, dict):
+        return None
+
+    for path in GRN_DOCUMENT_PATHS:
+        current_data = order_data
+        try:
+            for key in path:
+                current_data = current_data[key]
+        except (KeyError, TypeError, IndexError):
+            continue
+        if _is_url(current_data):
+            return current_data
+
+    order_metadata = order_data.get('orderMetadata')
+    proof_data = order_metadata.get('customerProofOfCompletion') if isinstance(order_metadata, dict) else None
+    return _first_url(proof_data) if proof_data else None
+
+
+class GrnDocumentService:
+    """Stored GRN URLs and order details for batch validation.
+
+    Ingest records the GRN URL of every payload that carries one. The order
+    detail a validation fetches is stored with the order; for
+    ``max_age_seconds`` afterwards it is reused instead of fetched again,
+    and a finished order whose fresh detail has no GRN is not a candidate.
+    Details of unfinished orders without a GRN are stored but never count
+    as fresh, since the GRN is usually added when the order completes.
+    """
+
+    def __init__(self, max_age_seconds=6 * 3600):
+        self.max_age_seconds = max_age_seconds
+
+    def configure(self, config):
+        """Apply ORDER_DETAIL_MAX_AGE_SECONDS from the app config"""
+        self.max_age_seconds = getattr(config, 'ORDER_DETAIL_MAX_AGE_SECONDS', self.max_age_seconds)
+
+    def _fresh_after(self):
+        return datetime.now(timezone.utc) - timedelta(seconds=self.max_age_seconds)
+
+    def record_detail(self, order_id, order_detail_data):
+        """Store a fetched order detail and the GRN URL it carries (no-op for orders not in the database)"""
+        try:
+            grn_url = find_grn_url(order_detail_data)
+            status = str(order_detail_data.get('orderStatus') or '').upper() if isinstance(order_detail_data, dict) else ''
+            Order.query.filter_by(id=order_id).update({
+                'detail_data': json.dumps(order_detail_data),
+                'detail_fetched_at': datetime.now(timezone.utc) if grn_url or status in TERMINAL_STATUSES else None,
+                'grn_url': grn_url
+            }, synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            logger.warning(f"GRN DOCUMENTS: Could not store order detail of {order_id}: {e}")
+            db.session.rollback()
+
+    def get_fresh_detail(self, order_id):
+        """Order detail stored less than max_age_seconds ago, or None"""
+        try:
+            detail_data = db.session.query(Order.detail_data) \
+                .filter(Order.id == order_id, Order.detail_fetched_at >= self._fresh_after()).scalar()
+            return json.loads(detail_data) if detail_data else None
+        except Exception as e:
+            logger.warning(f"GRN DOCUMENTS: Could not read stored order detail of {order_id}: {e}")
+            return None
+
+    def select_candidates(self, client_id, order_date, unvalidated_only=True):
+        """Orders of a date a validation job should look at, chosen in one query.
+
+        Candidates are orders with a stored GRN URL, plus orders whose GRN is
+        still unknown (no fresh detail yet, or not finished). Finished orders
+        whose fresh detail has no GRN are left out. With ``unvalidated_only``,
+        orders that already have a validation result are left out too.
+        Returns {'order_ids', 'with_grn', 'unknown'}.
+        """
+        validated = exists().where(ValidationResult.order_id == Order.id)
+        rows = db.session.query(Order.id, Order.grn_url.isnot(None), validated) \
+            .filter(Order.client_id == client_id, Order.date == order_date,
+                    or_(Order.grn_url.isnot(None), Order.detail_fetched_at.is_(None),
+                        Order.detail_fetched_at < self._fresh_after(),
+                        Order.order_status.is_(None), Order.order_status.notin_(TERMINAL_STATUSES))) \
+            .order_by(Order.created_at, Order.id).all()
+
+        with_grn = sum(1 for _, has_grn, _ in rows if has_grn)
+        order_ids = [order_id for order_id, _, is_validated in rows if not (unvalidated_only and is_validated)]
+        return {'order_ids': order_ids, 'with_grn': with_grn, 'unknown': len(rows) - with_grn}
+
+
+# Global GRN document service instance
+grn_document_service = GrnDocumentService()
@@ -0,0 +1,227 @@
+"""
+GTIN Cache
+Database-backed cache of GS1 Verified product lookups with TTL refresh, negative caching of
+"not found" answers and coalescing of concurrent lookups for the same GTIN
+"""
+
+import json
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from flask import has_app_context
+from sqlalchemy import func, select
+from models import db, GtinProduct
+
+logger = logging.getLogger(__name__)
+
+# GTINs per IN (...) query when loading cached rows
+GTIN_CHUNK_SIZE = 500
+
+
+class GtinLookupError(Exception):
+    """GS1 could not answer (network error, non-200); never cached, unlike a "not found" answer"""
+
+
+def _as_utc(value):
+    # SQLite hands back naive datetimes; everything here is stored in UTC
+    return value.replace(tzinfo=timezone.utc) if value is not None and value.tzinfo is None else value
+
+
+class GtinCache:
+    """GS1 product lookups cached in the gtin_products table.
+
+    Found products are kept for ``ttl``, "not found" answers for the shorter
+    ``negative_ttl``; expired rows are looked up again and refreshed in place.
+    Lookups that fail (GtinLookupError) are not cached. Concurrent callers in
+    this process asking for a GTIN that is already being looked up wait for
+    that lookup instead of sending their own. Database reads and writes happen
+    on the calling thread, on a connection separate from the caller's session; only the GS1 requests run on worker threads.
+    """
+
+    def __init__(self, ttl_hours=24 * 30, negative_ttl_hours=24, max_workers=4):
+        self.ttl = timedelta(hours=ttl_hours)
+        self.negative_ttl = timedelta(hours=negative_ttl_hours)
+        self.max_workers = max_workers
+
+        self._inflight = {}  # gtin -> Future of (found, product_info)
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def configure(self, config):
+        """Apply GTIN_CACHE_* settings from the app config"""
+        self.ttl = timedelta(hours=getattr(config, 'GTIN_CACHE_TTL_HOURS', self.ttl.total_seconds() / 3600))
+        self.negative_ttl = timedelta(hours=getattr(config, 'GTIN_CACHE_NEGATIVE_TTL_HOURS', self.negative_ttl.total_seconds() / 3600))
+        self.max_workers = getattr(config, 'GTIN_LOOKUP_WORKERS', self.max_workers)
+
+    def reset_stats(self):
+        self.stats = dict.fromkeys(('hits', 'negative_hits', 'misses', 'refreshes', 'coalesced', 'lookups', 'errors'), 0)
+
+    def _count(self, stats, **changes):
+        with self._lock:
+            for field, delta in changes.items():
+                self.stats[field] += delta
+                stats[field] = stats.get(field, 0) + delta
+
+    def get_many(self, gtins, lookup):
+        """Return ({gtin: product_info or None}, batch stats) for the given GTINs.
+
+        ``lookup(gtin)`` returns the product info dict, None when GS1 has no
+        such product, or raises GtinLookupError. GTINs whose lookup failed are
+        reported as None (not verified) for this call only.
+        """
+        gtins = list(dict.fromkeys(str(gtin) for gtin in gtins if gtin))
+        batch = dict.fromkeys(self.stats, 0)
+        results = {}
+        if not gtins:
+            return results, batch
+
+        now = datetime.now(timezone.utc)
+        cached = self._load(gtins)
+        pending = []
+        for gtin in gtins:
+            row = cached.get(gtin)
+            if row is not None and _as_utc(row.expires_at) > now:
+                results[gtin] = json.loads(row.product_info) if row.found and row.product_info else None
+                self._count(batch, **{'hits' if row.found else 'negative_hits': 1})
+            else:
+                pending.append(gtin)
+                self._count(batch, misses=1, refreshes=1 if row is not None else 0)
+
+        if pending:
+            fetched = self._lookup_coalesced(pending, lookup, batch)
+            results.update({gtin: product_info for gtin, (found, product_info) in fetched.items()})
+            self._store({gtin: answer for gtin, answer in fetched.items() if answer[0] is not None}, now)
+
+        return results, batch
+
+    def get(self, gtin, lookup):
+        """Product info for a single GTIN (None when not found or the lookup failed)"""
+        results, _ = self.get_many([gtin], lookup)
+        return results.get(str(gtin))
+
+    def _lookup_coalesced(self, gtins, lookup, batch):
+        """Look up the GTINs concurrently; returns {gtin: (found, product_info)}, found is None on error.
+
+        Only answers from lookups started by this call are returned with a
+        non-None ``found`` - GTINs another caller was already looking up are
+        persisted by that caller.
+        """
+        owned, waiting = {}, {}
+        with self._lock:
+            for gtin in gtins:
+                future = self._inflight.get(gtin)
+                if future is None:
+                    future = Future()
+                    self._inflight[gtin] = future
+                    owned[gtin] = future
+                else:
+                    waiting[gtin] = future
+        if waiting:
+            self._count(batch, coalesced=len(waiting))
+
+        def run(gtin):
+            future = owned[gtin]
+            try:
+                product_info = lookup(gtin)
+                future.set_result((True if product_info else False, product_info or None))
+            except Exception as e:
+                logger.warning(f"GTIN CACHE: Lookup failed for {gtin}: {e}")
+                future.set_result((None, None))
+            finally:
+                with self._lock:
+                    self._inflight.pop(gtin, None)
+
+        if owned:
+            self._count(batch, lookups=len(owned))
+            workers = max(1, min(self.max_workers, len(owned)))
+            if workers == 1:
+                for gtin in owned:
+                    run(gtin)
+            else:
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    list(executor.map(run, owned))
+
+        answers = {}
+        for gtin, future in owned.items():
+            answers[gtin] = future.result()
+        for gtin, future in waiting.items():
+            found, product_info = future.result()
+            answers[gtin] = (None, product_info)  # stored by the caller that owns the lookup
+
+        errors = sum(1 for gtin in owned if answers[gtin][0] is None)
+        if errors:
+            self._count(batch, errors=errors)
+        return answers
+
+    def _load(self, gtins):
+        """Return {gtin: cached row} read on a connection of its own (the caller's session is left alone)"""
+        if not has_app_context():
+            return {}
+        table = GtinProduct.__table__
+        rows = {}
+        try:
+            with db.engine.connect() as connection:
+                for start in range(0, len(gtins), GTIN_CHUNK_SIZE):
+                    chunk = gtins[start:start + GTIN_CHUNK_SIZE]
+                    for row in connection.execute(select(table).where(table.c.gtin.in_(chunk))):
+                        rows[row.gtin] = row
+        except Exception as e:
+            logger.warning(f"GTIN CACHE: Could not read cached GTINs: {e}")
+        return rows
+
+    def _store(self, answers, now):
+        """Upsert rows for fresh answers in a transaction of its own (never the caller's session)"""
+        if not answers or not has_app_context():
+            return
+        dialect = db.engine.dialect.name
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+
+        table = GtinProduct.__table__
+        stmt = dialect_insert(table)
+        stmt = stmt.on_conflict_do_update(index_elements=[table.c.gtin], set_={
+            'found': stmt.excluded.found,
+            'product_info': stmt.excluded.product_info,
+            'fetched_at': stmt.excluded.fetched_at,
+            'expires_at': stmt.excluded.expires_at,
+            'lookup_count': func.coalesce(table.c.lookup_count, 0) + 1,
+        })
+        rows = [{
+            'gtin': gtin,
+            'found': found,
+            'product_info': json.dumps(product_info) if found else None,
+            'fetched_at': now,
+            'expires_at': now + (self.ttl if found else self.negative_ttl),
+            'lookup_count': 1,
+        } for gtin, (found, product_info) in answers.items()]
+        try:
+            with db.engine.begin() as connection:
+                for start in range(0, len(rows), GTIN_CHUNK_SIZE):
+                    connection.execute(stmt, rows[start:start + GTIN_CHUNK_SIZE])
+        except Exception as e:
+            logger.warning(f"GTIN CACHE: Could not store {len(answers)} GTIN(s): {e}")
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        return self.with_ratio(stats)
+
+    def stats_since(self, snapshot):
+        """Counters accumulated since an earlier get_stats() result (e.g. over one batch run)"""
+        current = self.get_stats()
+        return self.with_ratio({field: current[field] - snapshot.get(field, 0) for field in self.stats})
+
+    @staticmethod
+    def with_ratio(stats):
+        """Add hit_ratio (positive and negative hits over all requests) to a stats dict"""
+        stats = dict(stats)
+        requests_total = stats.get('hits', 0) + stats.get('negative_hits', 0) + stats.get('misses', 0)
+        stats['hit_ratio'] = round((stats.get('hits', 0) + stats.get('negative_hits', 0)) / requests_total, 3) if requests_total else 0.0
+        return stats
+
+
+# Global GTIN cache instance
+gtin_cache = GtinCache()
@@ -205,6 +205,7 @@ class HeatmapService:
                 'success': True,
                 'heatmap_data': heatmap_data,
                 'statistics': statistics,
+                'date_summary': self._get_date_summary(date, date_from, date_to),
                 'aggregation_level': aggregation_level,
                 'date_filter': date_display,
                 'date_from': date_from,
@@ -463,6 +464,19 @@ class HeatmapService:
         heatmap_points.sort(key=lambda x: x['intensity'], reverse=True)
         return heatmap_points
 
+    def _get_date_summary(self, date: str = None, date_from: str = None, date_to: str = None) -> Optional[Dict]:
+        """Order and validation totals for the whole date range (including orders without coordinates),
+        summed from the pre-aggregated dashboard_stats rows"""
+        from app.dashboard_stats import dashboard_stats_service
+
+        range_start = date_from or date
+        range_end = date_to or range_start
+        if not range_start:
+            return None
+
+        summary = dashboard_stats_service.get_range_summary(range_start, range_end)
+        return summary if summary.get('success') else None
+
     def _calculate_statistics(self, orders: List[Order]) -> Dict:
         """Calculate overall statistics for the heatmap data"""
         total_orders = len(orders)
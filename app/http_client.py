@@ -0,0 +1,217 @@
+"""
+Shared HTTP Client
+Pooled keep-alive sessions for all outbound Locus, GS1 and Gemini calls
+"""
+
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.rate_limiter import rate_limiters
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+# A POST that failed with a 5xx or timed out may already have been processed (and billed): only 429 is safe to resend
+NON_IDEMPOTENT_RETRY_STATUS_CODES = frozenset({429})
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+
+
+class HostMetrics:
+    """Per-host request counters, latency histogram and pool saturation"""
+
+    def __init__(self, pool_maxsize):
+        self.pool_maxsize = pool_maxsize
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.status_codes = {}
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total_latency = 0.0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.saturated_requests = 0
+
+    def to_dict(self):
+        histogram = {f"le_{bound}": count for bound, count in zip(LATENCY_BUCKETS, self.latency_buckets)}
+        histogram['le_inf'] = self.latency_buckets[-1]
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'retries': self.retries,
+            'status_codes': dict(self.status_codes),
+            'avg_latency_ms': round(self.total_latency / self.requests * 1000, 1) if self.requests else 0,
+            'latency_histogram': histogram,
+            'pool_maxsize': self.pool_maxsize,
+            'in_flight': self.in_flight,
+            'peak_in_flight': self.peak_in_flight,
+            'saturated_requests': self.saturated_requests
+        }
+
+
+class HttpClient:
+    """Shared HTTP client with per-host connection pools, default timeouts and retries"""
+
+    def __init__(self, connect_timeout=5, read_timeout=30, pool_maxsize=20, max_retries=3, backoff_base=0.5,
+                 max_backoff=30):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.pool_maxsize = pool_maxsize
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+
+        self._sessions = {}
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def configure(self, config):
+        """Apply HTTP_* settings from the app config"""
+        self.connect_timeout = getattr(config, 'HTTP_CONNECT_TIMEOUT', self.connect_timeout)
+        self.read_timeout = getattr(config, 'HTTP_READ_TIMEOUT', self.read_timeout)
+        self.pool_maxsize = getattr(config, 'HTTP_POOL_MAXSIZE', self.pool_maxsize)
+        self.max_retries = getattr(config, 'HTTP_MAX_RETRIES', self.max_retries)
+        self.backoff_base = getattr(config, 'HTTP_BACKOFF_BASE', self.backoff_base)
+        self.max_backoff = getattr(config, 'HTTP_MAX_BACKOFF', self.max_backoff)
+
+    def _get_session(self, host):
+        """Return the keep-alive session for a host, creating it on first use"""
+        session = self._sessions.get(host)
+        if session is not None:
+            return session
+
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                # Retries are handled here (with jitter and metrics), not by urllib3
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize, max_retries=0)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._sessions[host] = session
+                self._metrics[host] = HostMetrics(self.pool_maxsize)
+                logger.info(f"HTTP CLIENT: Opened connection pool for {host} (maxsize {self.pool_maxsize})")
+            return session
+
+    def _backoff_delay(self, attempt, response=None):
+        """Exponential backoff with full jitter, honouring Retry-After when given.
+
+        Returns None when the server asks to wait longer than ``max_backoff``:
+        the attempt fails instead of holding the caller (and its worker) that long.
+        """
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after and retry_after.isdigit():
+                delay = float(retry_after)
+                return delay if delay <= self.max_backoff else None
+        return random.uniform(0, min(self.backoff_base * (2 ** attempt), self.max_backoff))
+
+    def _record(self, host, **changes):
+        with self._lock:
+            metrics = self._metrics[host]
+            for field, delta in changes.items():
+                setattr(metrics, field, getattr(metrics, field) + delta)
+
+    def request(self, method, url, retries=None, idempotent=None, **kwargs):
+        """Send a request through the host's pooled session.
+
+        Retries 429/5xx responses and connection errors up to ``retries`` times
+        (default ``max_retries``) with jittered backoff. Non-idempotent requests
+        (POST, unless the caller passes ``idempotent=True`` for a read-only
+        POST) are only retried on 429. The final response (or one whose
+        Retry-After exceeds ``max_backoff``) is returned as-is; the final
+        connection error is re-raised. Every attempt to a
+        rate-limited upstream (Gemini, GS1, Locus) first takes a token and
+        concurrency slot from its bucket.
+        """
+        host = urlsplit(url).netloc
+        session = self._get_session(host)
+        limiter = rate_limiters.for_host(host)
+        kwargs.setdefault('timeout', (self.connect_timeout, self.read_timeout))
+        max_retries = self.max_retries if retries is None else retries
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        retry_status_codes = RETRY_STATUS_CODES if idempotent else NON_IDEMPOTENT_RETRY_STATUS_CODES
+
+        attempt = 0
+        while True:
+            with self._lock:
+                metrics = self._metrics[host]
+                metrics.in_flight += 1
+                metrics.peak_in_flight = max(metrics.peak_in_flight, metrics.in_flight)
+                if metrics.in_flight > metrics.pool_maxsize:
+                    metrics.saturated_requests += 1
+
+            start = time.perf_counter()
+            response = None
+            error = None
+            try:
+                if limiter is not None:
+                    with limiter.slot():
+                        response = session.request(method, url, **kwargs)
+                else:
+                    response = session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    metrics.in_flight -= 1
+                    metrics.requests += 1
+                    metrics.total_latency += elapsed
+                    bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if elapsed <= bound), len(LATENCY_BUCKETS))
+                    metrics.latency_buckets[bucket] += 1
+                    if response is not None:
+                        metrics.status_codes[response.status_code] = metrics.status_codes.get(response.status_code, 0) + 1
+                    else:
+                        metrics.errors += 1
+
+            if error is not None:
+                retryable = idempotent
+            else:
+                retryable = response.status_code in retry_status_codes
+            if not retryable or attempt >= max_retries:
+                if error is not None:
+                    raise error
+                return response
+
+            delay = self._backoff_delay(attempt, response)
+            if delay is None:
+                logger.warning(f"HTTP CLIENT: {method} {host} asked to retry after {response.headers.get('Retry-After')}s "
+                               f"(more than {self.max_backoff}s), not retrying")
+                return response
+            reason = f"HTTP {response.status_code}" if response is not None else type(error).__name__
+            logger.warning(f"HTTP CLIENT: {method} {host} failed ({reason}), retry {attempt + 1}/{max_retries} in {delay:.2f}s")
+            self._record(host, retries=1)
+            if response is not None:
+                response.close()  # hand a streamed response's connection back to the pool
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def get_metrics(self):
+        """Snapshot of per-host metrics"""
+        with self._lock:
+            return {host: metrics.to_dict() for host, metrics in self._metrics.items()}
+
+    def reset_metrics(self):
+        with self._lock:
+            for host, metrics in self._metrics.items():
+                self._metrics[host] = HostMetrics(metrics.pool_maxsize)
+
+
+# Global HTTP client instance
+http_client = HttpClient()
@@ -0,0 +1,305 @@
+"""
+GRN Image Cache
+Content-addressed on-disk cache of GRN images, preprocessed (downscaled and recompressed) for Gemini upload
+"""
+
+import base64
+import hashlib
+import io
+import logging
+import math
+import mmap
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Gemini bills images up to 384px on both sides as one 258-token tile, larger images per 768px tile
+IMAGE_TILE_TOKENS = 258
+IMAGE_TILE_SIZE = 768
+IMAGE_SMALL_SIZE = 384
+
+
+def estimate_image_tokens(width, height):
+    """Approximate Gemini input tokens for an image of the given size"""
+    if not width or not height:
+        return IMAGE_TILE_TOKENS
+    if width <= IMAGE_SMALL_SIZE and height <= IMAGE_SMALL_SIZE:
+        return IMAGE_TILE_TOKENS
+    return math.ceil(width / IMAGE_TILE_SIZE) * math.ceil(height / IMAGE_TILE_SIZE) * IMAGE_TILE_TOKENS
+
+
+def detect_image_format(content_type, image_url):
+    """Image format from the content-type header or URL extension (jpeg by default)"""
+    content_type = (content_type or '').lower()
+    url = (image_url or '').lower()
+    if 'png' in content_type or url.endswith('.png'):
+        return 'png'
+    if 'pdf' in content_type or url.endswith('.pdf'):
+        return 'pdf'
+    return 'jpeg'
+
+
+def preprocess_image(content, image_format, max_dimension=1600, jpeg_quality=80):
+    """Downscale and recompress an image for upload.
+
+    Returns (bytes, format, size, original size); sizes are None for PDFs
+    and anything Pillow cannot decode, which are returned unchanged. The
+    recompressed version is only used when it is smaller or was downscaled.
+    """
+    if image_format == 'pdf':
+        return content, image_format, None, None
+
+    try:
+        from PIL import Image, ImageOps
+
+        with Image.open(io.BytesIO(content)) as image:
+            image = ImageOps.exif_transpose(image)
+            original_size = image.size
+
+            if max(image.size) > max_dimension:
+                image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+
+            output = io.BytesIO()
+            image.save(output, format='JPEG', quality=jpeg_quality, optimize=True)
+            processed = output.getvalue()
+
+            if len(processed) < len(content) or image.size != original_size:
+                return processed, 'jpeg', image.size, original_size
+            return content, image_format, original_size, original_size
+
+    except Exception as e:
+        logger.warning(f"IMAGE CACHE: Could not preprocess image ({image_format}), uploading original: {e}")
+        return content, image_format, None, None
+
+
+class GrnImageCache:
+    """On-disk cache of preprocessed GRN images.
+
+    Layout under ``cache_dir``:
+      urls/<sha256(url)>                      -> "<content sha256> <format>"
+      objects/<sha[:2]>/<sha>_<profile>.<ext> -> preprocessed image bytes
+
+    Images are stored by the hash of the downloaded content, so the same
+    document under several URLs is stored once. A URL entry is trusted for
+    ``url_ttl_seconds`` after its download; after that the URL is fetched
+    again, so an image replaced behind the same URL is picked up (and a
+    validation fingerprint built from the content hash changes with it).
+    Total object size is kept under ``max_bytes`` by evicting least recently
+    used files; reads go through mmap so base64 encoding does not copy the
+    file into a bytes object first.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=512 * 1024 * 1024, max_dimension=1600, jpeg_quality=80, enabled=True,
+                 url_ttl_seconds=24 * 3600):
+        self.cache_dir = cache_dir or os.path.join('instance', 'grn_image_cache')
+        self.max_bytes = max_bytes
+        self.max_dimension = max_dimension
+        self.jpeg_quality = jpeg_quality
+        self.enabled = enabled
+        self.url_ttl_seconds = url_ttl_seconds
+
+        self._lru = None  # path -> size, least recently used first (loaded from disk on first use)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._url_locks = {}
+        self.reset_stats()
+
+    def configure(self, config):
+        """Apply GRN_IMAGE_* settings from the app config"""
+        self.cache_dir = getattr(config, 'GRN_IMAGE_CACHE_DIR', self.cache_dir)
+        self.max_bytes = getattr(config, 'GRN_IMAGE_CACHE_MAX_MB', self.max_bytes // (1024 * 1024)) * 1024 * 1024
+        self.max_dimension = getattr(config, 'GRN_IMAGE_MAX_DIMENSION', self.max_dimension)
+        self.jpeg_quality = getattr(config, 'GRN_IMAGE_JPEG_QUALITY', self.jpeg_quality)
+        self.enabled = getattr(config, 'GRN_IMAGE_CACHE_ENABLED', self.enabled)
+        self.url_ttl_seconds = getattr(config, 'GRN_IMAGE_URL_TTL_HOURS', self.url_ttl_seconds / 3600) * 3600
+        with self._lock:
+            self._lru = None
+
+    def _count(self, **changes):
+        with self._lock:
+            for field, delta in changes.items():
+                self.stats[field] += delta
+
+    def reset_stats(self):
+        self.stats = dict.fromkeys(('hits', 'misses', 'evictions', 'bytes_downloaded', 'bytes_uploaded',
+                                    'tokens_original', 'tokens_uploaded'), 0)
+
+    @property
+    def profile(self):
+        """Preprocessing settings baked into object names so a config change never serves stale output"""
+        return f"d{self.max_dimension}q{self.jpeg_quality}"
+
+    def _url_path(self, image_url):
+        return os.path.join(self.cache_dir, 'urls', hashlib.sha256(image_url.encode('utf-8')).hexdigest())
+
+    def _object_path(self, content_hash, image_format):
+        extension = 'pdf' if image_format == 'pdf' else image_format
+        return os.path.join(self.cache_dir, 'objects', content_hash[:2], f"{content_hash}_{self.profile}.{extension}")
+
+    def _load_index(self):
+        """Build the LRU order from file modification times (called with the lock held)"""
+        if self._lru is not None:
+            return
+        entries = []
+        objects_dir = os.path.join(self.cache_dir, 'objects')
+        for root, _, files in os.walk(objects_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, path, stat.st_size))
+        entries.sort()
+        self._lru = OrderedDict((path, size) for _, path, size in entries)
+        self._total_bytes = sum(self._lru.values())
+
+    def _touch(self, path):
+        with self._lock:
+            self._load_index()
+            if path in self._lru:
+                self._lru.move_to_end(path)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _add(self, path, size):
+        """Record a new object and evict least recently used objects beyond max_bytes"""
+        with self._lock:
+            self._load_index()
+            if path in self._lru:
+                self._total_bytes -= self._lru.pop(path)
+            self._lru[path] = size
+            self._total_bytes += size
+
+            while self._total_bytes > self.max_bytes and len(self._lru) > 1:
+                evicted, evicted_size = self._lru.popitem(last=False)
+                self._total_bytes -= evicted_size
+                self.stats['evictions'] += 1  # lock already held
+                try:
+                    os.remove(evicted)
+                except OSError:
+                    pass
+
+    def _read_base64(self, path):
+        """Base64-encode a cached object through a read-only memory map"""
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return ''
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return base64.b64encode(mapped).decode('ascii')
+
+    def _write_atomic(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _lookup(self, image_url):
+        """Cached (base64, format) for a URL, or None (also once the URL entry is older than url_ttl_seconds)"""
+        try:
+            with open(self._url_path(image_url), 'r') as f:
+                if time.time() - os.fstat(f.fileno()).st_mtime > self.url_ttl_seconds:
+                    return None
+                content_hash, image_format = f.read().split()
+        except (OSError, ValueError):
+            return None
+
+        path = self._object_path(content_hash, image_format)
+        try:
+            image_base64 = self._read_base64(path)
+        except OSError:
+            return None  # evicted by this or another process
+
+        self._touch(path)
+        return image_base64, image_format
+
+    def _url_lock(self, image_url):
+        with self._lock:
+            return self._url_locks.setdefault(image_url, threading.Lock())
+
+    def get_image(self, image_url, fetch):
+        """Return (base64, format) for a GRN image, downloading through ``fetch`` on a miss.
+
+        ``fetch(image_url)`` returns (content bytes, content_type). Concurrent
+        requests for the same URL in this process share one download.
+        """
+        if not self.enabled:
+            content, content_type = fetch(image_url)
+            if not content:
+                return None, None
+            return self._prepare(content, detect_image_format(content_type, image_url))[:2]
+
+        cached = self._lookup(image_url)
+        if cached:
+            self._count(hits=1)
+            logger.info(f"IMAGE CACHE: Hit for {image_url}")
+            return cached
+
+        url_lock = self._url_lock(image_url)
+        try:
+            with url_lock:
+                return self._fetch_and_store(image_url, fetch)
+        finally:
+            with self._lock:
+                if self._url_locks.get(image_url) is url_lock and not url_lock.locked():
+                    del self._url_locks[image_url]
+
+    def _fetch_and_store(self, image_url, fetch):
+        """Miss path, called with the URL lock held"""
+        cached = self._lookup(image_url)
+        if cached:
+            self._count(hits=1)
+            return cached
+
+        self._count(misses=1)
+        content, content_type = fetch(image_url)
+        if not content:
+            return None, None
+
+        image_format = detect_image_format(content_type, image_url)
+        content_hash = hashlib.sha256(content).hexdigest()
+        image_base64, upload_format, processed = self._prepare(content, image_format)
+
+        try:
+            path = self._object_path(content_hash, upload_format)
+            self._write_atomic(path, processed)
+            self._write_atomic(self._url_path(image_url), f"{content_hash} {upload_format}".encode('ascii'))
+            self._add(path, len(processed))
+        except OSError as e:
+            logger.warning(f"IMAGE CACHE: Could not write cache entry for {image_url}: {e}")
+
+        return image_base64, upload_format
+
+    def _prepare(self, content, image_format):
+        """Preprocess downloaded bytes; returns (base64, upload format, processed bytes)"""
+        processed, upload_format, size, original_size = preprocess_image(
+            content, image_format, self.max_dimension, self.jpeg_quality)
+
+        self._count(bytes_downloaded=len(content), bytes_uploaded=len(processed))
+        if size:
+            self._count(tokens_original=estimate_image_tokens(*original_size), tokens_uploaded=estimate_image_tokens(*size))
+
+        logger.info(f"IMAGE CACHE: Preprocessed {image_format} {len(content)} -> {len(processed)} bytes ({upload_format})")
+        return base64.b64encode(processed).decode('ascii'), upload_format, processed
+
+    def get_stats(self):
+        with self._lock:
+            self._load_index()
+            stats = dict(self.stats)
+            stats.update({'objects': len(self._lru), 'disk_bytes': self._total_bytes, 'max_bytes': self.max_bytes})
+        stats['bytes_saved'] = stats['bytes_downloaded'] - stats['bytes_uploaded']
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        return stats
+
+
+# Global GRN image cache instance
+grn_image_cache = GrnImageCache()
@@ -0,0 +1,258 @@
+"""
+Product Name Matcher
+Bilingual (Arabic/English) product-name normalisation and similarity scoring, and an n-gram
+inverted index over the catalogue of known SKU names for fast candidate search
+"""
+
+import heapq
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+from functools import lru_cache
+from flask import has_app_context
+from models import db, OrderLineItem, GtinProduct
+
+logger = logging.getLogger(__name__)
+
+ARABIC_DIACRITICS = "ًٌٍَُِّْ"
+
+# One pass instead of a str.replace per character: drop diacritics, fold alef/ta marbuta/ya variants
+NORMALIZE_TABLE = str.maketrans({
+    **{diacritic: None for diacritic in ARABIC_DIACRITICS},
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا',
+    'ة': 'ه',  # Ta marbuta to ha
+    'ي': 'ى',  # Alif maksura normalization
+})
+
+NON_WORD_PATTERN = re.compile(r'[^\w\s\u0600-\u06FF]')
+
+ARABIC_STOPWORDS = frozenset({'من', 'في', 'على', 'إلى', 'مع', 'هذا', 'هذه', 'ذلك', 'التي', 'الذي', 'كل', 'بعض'})
+ENGLISH_STOPWORDS = frozenset({'the', 'and', 'or', 'of', 'in', 'on', 'at', 'to', 'for', 'with', 'by', 'a', 'an'})
+STOPWORDS = ARABIC_STOPWORDS | ENGLISH_STOPWORDS
+
+NGRAM_SIZE = 3
+
+
+@lru_cache(maxsize=65536)
+def normalize_name(text):
+    """Lowercase, strip Arabic diacritics and letter variants, replace punctuation with spaces, collapse whitespace"""
+    if not text:
+        return ""
+    text = text.lower().strip().translate(NORMALIZE_TABLE)
+    return ' '.join(NON_WORD_PATTERN.sub(' ', text).split())
+
+
+@lru_cache(maxsize=65536)
+def meaningful_words(normalized):
+    """Words of a normalised name minus stopwords and single letters"""
+    if not normalized:
+        return frozenset()
+    return frozenset(word for word in normalized.split() if len(word) > 1 and word not in STOPWORDS)
+
+
+def name_ngrams(normalized):
+    """Character n-grams of a normalised name, padded so short words still produce grams"""
+    padded = f" {normalized} "
+    return {padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1)}
+
+
+def match_threshold(name):
+    """Score a match needs: more lenient for Arabic and mixed Arabic/English names"""
+    has_arabic = any('\u0600' <= char <= '\u06FF' for char in name)
+    has_english = any(char.isascii() and char.isalpha() for char in name)
+    if has_arabic and has_english:
+        return 0.55
+    if has_arabic:
+        return 0.6
+    return 0.65
+
+
+def name_similarity(extracted, candidate, floor=0.0):
+    """Similarity of two normalised names: the better of the word score and the difflib ratio.
+
+    The word score weighs Jaccard overlap of the meaningful words 0.6 and
+    containment of the extracted words 0.4. The (expensive) difflib ratio
+    is only computed when its cheap upper bounds could beat both the word
+    score and ``floor``, so results above ``floor`` are exact.
+    """
+    if extracted == candidate:
+        return 1.0
+
+    score = 0.0
+    extracted_words = meaningful_words(extracted)
+    candidate_words = meaningful_words(candidate)
+    if extracted_words and candidate_words:
+        intersection = len(extracted_words & candidate_words)
+        union = len(extracted_words | candidate_words)
+        jaccard_score = intersection / union if union > 0 else 0
+        containment_score = intersection / len(extracted_words)
+        score = (jaccard_score * 0.6) + (containment_score * 0.4)
+
+    bound = max(score, floor)
+    matcher = SequenceMatcher(None, extracted, candidate)
+    if matcher.real_quick_ratio() > bound and matcher.quick_ratio() > bound:
+        score = max(score, matcher.ratio())
+    return score
+
+
+def best_name_match(extracted_name, candidates, min_score=0.0):
+    """Best of (label, name) candidates for an extracted name: (is_match, score, best label).
+
+    Scores below ``min_score`` may be reported lower than their exact value;
+    anything at or above it is exact.
+    """
+    extracted = normalize_name(extracted_name)
+    best_label = None
+    best_score = 0.0
+
+    for label, candidate_name in candidates:
+        candidate = normalize_name(candidate_name)
+        if not candidate:
+            continue
+        if extracted == candidate:
+            return True, 1.0, label
+
+        score = name_similarity(extracted, candidate, floor=max(best_score, min_score - 1e-9))
+        if score > best_score:
+            best_score = score
+            best_label = label
+
+    return best_score >= match_threshold(extracted_name), best_score, best_label
+
+
+class NameIndex:
+    """Inverted index from name n-grams to catalogue entries.
+
+    ``search`` ranks entries by shared n-grams and scores only the best
+    ranked ones with ``name_similarity``, so lookups stay fast as the
+    catalogue grows.
+    """
+
+    def __init__(self):
+        self.entries = []  # (key, name, normalized)
+        self.gram_counts = []
+        self.postings = defaultdict(list)
+        self._keys = set()
+
+    def add(self, key, name):
+        normalized = normalize_name(name)
+        if not normalized or (key, normalized) in self._keys:
+            return
+        self._keys.add((key, normalized))
+        entry_id = len(self.entries)
+        self.entries.append((key, name, normalized))
+        grams = name_ngrams(normalized)
+        self.gram_counts.append(len(grams))
+        for gram in grams:
+            self.postings[gram].append(entry_id)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def search(self, name, limit=5, min_score=0.0, candidates=20):
+        """Up to ``limit`` (key, name, score) entries most similar to ``name``, best first"""
+        normalized = normalize_name(name)
+        if not normalized:
+            return []
+
+        grams = name_ngrams(normalized)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+
+        # Rank by Dice coefficient of the n-gram sets so long names don't win on raw overlap
+        ranked = heapq.nlargest(candidates, shared.items(),
+                                key=lambda item: item[1] / (len(grams) + self.gram_counts[item[0]]))
+
+        # Best ranked first, so the running top-``limit`` floor prunes most later candidates before difflib runs
+        results = []
+        floor = min_score - 1e-9
+        for entry_id, _ in ranked:
+            key, entry_name, entry_normalized = self.entries[entry_id]
+            score = name_similarity(normalized, entry_normalized, floor=floor)
+            if score >= min_score and (len(results) < limit or score > results[-1][2]):
+                results.append((key, entry_name, score))
+                results.sort(key=lambda result: result[2], reverse=True)
+                del results[limit:]
+                if len(results) == limit:
+                    floor = max(floor, results[-1][2])
+        return results
+
+
+class SkuNameCatalogue:
+    """Names of every known SKU (order line item history and GS1 products), indexed for fuzzy lookups.
+
+    The index is rebuilt from the database when older than the refresh
+    interval; lookups outside an app context use whatever index was built last.
+    """
+
+    def __init__(self, refresh_seconds=3600):
+        self.refresh_seconds = refresh_seconds
+        self.enabled = True
+        self._index = NameIndex()
+        self._built_at = None
+        self._lock = threading.Lock()
+
+    def configure(self, config):
+        """Apply SKU_CATALOGUE_* settings from the app config"""
+        self.enabled = getattr(config, 'SKU_CATALOGUE_ENABLED', self.enabled)
+        self.refresh_seconds = getattr(config, 'SKU_CATALOGUE_REFRESH_SECONDS', self.refresh_seconds)
+        self._index = NameIndex()
+        self._built_at = None
+
+    def build(self, entries):
+        """Replace the index with (sku_id, name) entries"""
+        index = NameIndex()
+        for sku_id, name in entries:
+            index.add(sku_id, name)
+        self._index = index
+        self._built_at = time.monotonic()
+        return index
+
+    def _load_entries(self):
+        entries = [tuple(row) for row in db.session.query(OrderLineItem.sku_id, OrderLineItem.name).distinct()]
+
+        for gtin, product_info in db.session.query(GtinProduct.gtin, GtinProduct.product_info) \
+                .filter(GtinProduct.found.is_(True)).all():
+            try:
+                product = json.loads(product_info) if isinstance(product_info, str) else (product_info or {})
+            except ValueError:
+                continue
+            names = product.get('product_names', {})
+            for name in {product.get('product_name'), names.get('english'), names.get('arabic')}:
+                if name:
+                    entries.append((f"gtin:{gtin}", name))
+        return entries
+
+    def get_index(self):
+        """Current index, rebuilt first if stale and the database is reachable"""
+        stale = self._built_at is None or time.monotonic() - self._built_at > self.refresh_seconds
+        if stale and has_app_context():
+            with self._lock:
+                if self._built_at is None or time.monotonic() - self._built_at > self.refresh_seconds:
+                    try:
+                        start = time.perf_counter()
+                        index = self.build(self._load_entries())
+                        logger.info(f"SKU CATALOGUE: Indexed {len(index)} names in {(time.perf_counter() - start) * 1000:.0f}ms")
+                    except Exception as e:
+                        logger.error(f"SKU CATALOGUE: Could not load catalogue: {e}")
+                        self._built_at = time.monotonic()
+        return self._index
+
+    def match(self, name, min_score=0.6):
+        """Best catalogue entry for a name as {'sku_id', 'name', 'score'}, or None"""
+        if not self.enabled:
+            return None
+        results = self.get_index().search(name, limit=1, min_score=min_score)
+        if not results:
+            return None
+        sku_id, catalogue_name, score = results[0]
+        return {'sku_id': sku_id, 'name': catalogue_name, 'score': round(score, 3)}
+
+
+# Global SKU name catalogue instance
+sku_catalogue = SkuNameCatalogue()
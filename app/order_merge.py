@@ -0,0 +1,353 @@
+"""
+Order Merge Service
+Set-based ingest of task-search orders: one IN lookup, in-memory diff and bulk upserts
+"""
+
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from sqlalchemy import insert
+from app.grn_documents import find_grn_url
+from models import Order, OrderLineItem, Tour, db
+
+logger = logging.getLogger(__name__)
+
+# Keep IN lists and multi-row statements well below driver parameter limits
+MERGE_CHUNK_SIZE = 500
+
+# Columns an upsert never overwrites on an existing row (the per-row update path leaves them alone too)
+INSERT_ONLY_COLUMNS = frozenset({'id', 'client_id', 'date', 'created_at'})
+
+# order_data key -> column, copied when the key is present (mirrors DataProtectionService.safe_update_order)
+PLAIN_FIELDS = (
+    'rider_name', 'rider_id', 'rider_phone', 'vehicle_registration', 'vehicle_id', 'vehicle_model',
+    'transporter_name', 'task_source', 'plan_id', 'planned_tour_name', 'sequence_in_batch',
+    'partially_delivered', 'reassigned', 'rejected', 'unassigned', 'tardiness', 'sla_status',
+    'amount_collected', 'effective_tat', 'allowed_dwell_time', 'task_time_slot', 'cancellation_reason'
+)
+DATETIME_FIELDS = ('eta_updated_on', 'tour_updated_on', 'initial_assignment_at')
+
+
+def _parse_datetime(value):
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, ValueError, TypeError):
+        return None
+
+
+def _chunks(items, size=MERGE_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class OrderMergeService:
+    """Bulk merge of API orders into the orders table, respecting manual modifications"""
+
+    def build_order_row(self, order_data, client_id, order_date, now=None):
+        """Map one API order onto a dict of Order columns.
+
+        Only columns the API payload actually provides are included, so an
+        upsert leaves everything else on the existing row untouched.
+        """
+        row = {
+            'id': order_data.get('id'),
+            'client_id': client_id,
+            'date': order_date,
+            'raw_data': json.dumps(order_data),
+            'updated_at': now or datetime.now(timezone.utc)
+        }
+
+        if 'orderStatus' in order_data:
+            row['order_status'] = order_data.get('orderStatus')
+
+        # Payloads without a GRN (task-search) leave a URL found earlier in place
+        grn_url = find_grn_url(order_data)
+        if grn_url:
+            row['grn_url'] = grn_url
+
+        location = order_data.get('location')
+        if location and isinstance(location, dict):
+            if 'name' in location:
+                row['location_name'] = location.get('name')
+
+            address = location.get('address')
+            if address and isinstance(address, dict):
+                for api_key, column in (('formattedAddress', 'location_address'), ('city', 'location_city'), ('countryCode', 'location_country_code')):
+                    if api_key in address:
+                        row[column] = address.get(api_key)
+
+            latLng = location.get('latLng', {})
+            if latLng and isinstance(latLng, dict):
+                for column, keys in (('location_latitude', ('lat', 'latitude')), ('location_longitude', ('lng', 'longitude'))):
+                    value = latLng.get(keys[0]) or latLng.get(keys[1])
+                    if value is not None:
+                        try:
+                            row[column] = float(value)
+                        except (ValueError, TypeError):
+                            logger.warning(f"[COORDINATES] Invalid {column} value for order {row['id']}: {value}")
+
+        for field in PLAIN_FIELDS:
+            if field in order_data:
+                row[field] = order_data.get(field)
+
+        if 'skills' in order_data:
+            value = order_data.get('skills')
+            row['skills'] = json.dumps(value if isinstance(value, list) else [])
+        if 'tags' in order_data:
+            value = order_data.get('tags')
+            row['tags'] = json.dumps(value if isinstance(value, list) else [])
+        if 'custom_fields' in order_data:
+            value = order_data.get('custom_fields')
+            row['custom_fields'] = json.dumps(value if isinstance(value, dict) else {})
+            # Filtered custom fields go to their indexed columns too (the ORM path does this on assignment)
+            row.update(Order.custom_field_columns(value))
+
+        if 'initial_assignment_by' in order_data:
+            assignment_by = order_data.get('initial_assignment_by')
+            row['initial_assignment_by'] = json.dumps(assignment_by) if isinstance(assignment_by, dict) else assignment_by
+
+        for field in DATETIME_FIELDS:
+            if order_data.get(field):
+                parsed = _parse_datetime(order_data[field])
+                if parsed:
+                    row[field] = parsed
+
+        order_metadata = order_data.get('orderMetadata')
+        if order_metadata and isinstance(order_metadata, dict):
+            completed_on = _parse_datetime(order_metadata.get('homebaseCompleteOn'))
+            if completed_on:
+                row['completed_on'] = completed_on
+
+            tour_detail = order_metadata.get('tourDetail')
+            if tour_detail and isinstance(tour_detail, dict):
+                tour_id = tour_detail.get('tourId')
+                if tour_id:
+                    row['tour_id'] = tour_id
+                    tour_date, plan_id, tour_name, tour_number = Tour.parse_tour_id(tour_id)
+                    if tour_date:
+                        row['tour_date'] = tour_date
+                        row['tour_day'] = Tour.parse_tour_day(tour_date)
+                        row['tour_plan_id'] = plan_id
+                        row['tour_name'] = tour_name
+                        row['tour_number'] = tour_number or 0
+
+                # Tour detail wins over the flat rider/vehicle fields, as in the per-row path
+                if tour_detail.get('riderName'):
+                    row['rider_name'] = tour_detail.get('riderName')
+                if tour_detail.get('vehicleRegistrationNumber'):
+                    row['vehicle_registration'] = tour_detail.get('vehicleRegistrationNumber')
+
+        return row
+
+    def build_line_item_rows(self, order_id, order_data):
+        """Map the API lineItems of one order onto OrderLineItem column dicts"""
+        return [
+            {
+                'order_id': order_id,
+                'sku_id': item.get('skuId', ''),
+                'name': item.get('name', ''),
+                'quantity': item.get('quantity', 0),
+                'quantity_unit': item.get('quantityUnit', ''),
+                'transacted_quantity': item.get('transactedQuantity'),
+                'transaction_status': item.get('transactionStatus', '')
+            }
+            for item in order_data.get('lineItems', []) or []
+        ]
+
+    def _load_existing(self, order_ids):
+        """One IN query per chunk: id -> (is_modified, tour state as TourService.order_state)"""
+        existing = {}
+        for chunk in _chunks(order_ids):
+            rows = db.session.query(Order.id, Order.is_modified, Order.tour_id, Order.order_status,
+                                    Order.location_city, Order.location_name).filter(Order.id.in_(chunk)).all()
+            for order_id, is_modified, *tour_state in rows:
+                existing[order_id] = (is_modified, tuple(tour_state))
+        return existing
+
+    def _upsert_orders(self, rows):
+        """Write order rows with INSERT ... ON CONFLICT (id) DO UPDATE, grouped by column set"""
+        dialect = db.engine.dialect.name
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        elif dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            dialect_insert = None
+
+        # executemany needs every row in a statement to share the same keys
+        groups = {}
+        for row in rows:
+            groups.setdefault(tuple(sorted(row)), []).append(row)
+
+        for columns, group_rows in groups.items():
+            update_columns = [column for column in columns if column not in INSERT_ONLY_COLUMNS]
+            for chunk in _chunks(group_rows):
+                if dialect_insert is None:
+                    self._upsert_orders_generic(chunk)
+                    continue
+                stmt = dialect_insert(Order.__table__)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[Order.__table__.c.id],
+                    set_={column: stmt.excluded[column] for column in update_columns}
+                )
+                db.session.execute(stmt, chunk)
+
+    def _upsert_orders_generic(self, rows):
+        """Fallback for databases without ON CONFLICT support"""
+        existing_ids = set(self._load_existing([row['id'] for row in rows]))
+        new_rows = [row for row in rows if row['id'] not in existing_ids]
+        updated_rows = [{k: v for k, v in row.items() if k not in INSERT_ONLY_COLUMNS or k == 'id'} for row in rows if row['id'] in existing_ids]
+        if new_rows:
+            db.session.bulk_insert_mappings(Order, new_rows)
+        if updated_rows:
+            db.session.bulk_update_mappings(Order, updated_rows)
+
+    def _replace_line_items(self, order_ids, line_item_rows):
+        """Delete line items for the given orders and insert the new set in bulk"""
+        for chunk in _chunks(order_ids):
+            OrderLineItem.query.filter(OrderLineItem.order_id.in_(chunk)).delete(synchronize_session=False)
+        for chunk in _chunks(line_item_rows):
+            db.session.execute(insert(OrderLineItem), chunk)
+
+    def _write_batch(self, rows, line_items):
+        """Upsert order rows and replace their line items, isolating bad orders.
+
+        The batch is written in one savepoint. If that fails, each order is
+        written in a savepoint of its own and the ones that still fail are
+        skipped with a log line. Returns the ids of the orders written.
+        """
+        try:
+            with db.session.begin_nested():
+                self._upsert_orders(rows)
+                self._replace_line_items([row['id'] for row in rows],
+                                         [item for row in rows for item in line_items[row['id']]])
+            return [row['id'] for row in rows]
+        except Exception as e:
+            logger.warning(f"BULK MERGE: Batch write failed ({e}), writing orders one by one")
+
+        written = []
+        for row in rows:
+            try:
+                with db.session.begin_nested():
+                    self._upsert_orders([row])
+                    self._replace_line_items([row['id']], line_items[row['id']])
+                written.append(row['id'])
+            except Exception as e:
+                logger.error(f"BULK MERGE: Skipping order {row['id']}: {e}")
+        return written
+
+    def merge_orders(self, orders, client_id, order_date):
+        """Merge a batch of API orders into the database (caller commits).
+
+        Existing orders are loaded with a single IN query. Orders that were
+        never manually modified are written with bulk upserts and bulk line-item
+        replacement; every manually modified order (is_modified) keeps going through
+        DataProtectionService.safe_update_order so their protected fields,
+        line items and partial-delivery status are preserved. An order that
+        cannot be mapped or written is skipped (and counted as failed)
+        without affecting the rest of the batch.
+
+        The day's dashboard_stats order counters are refreshed in the same
+        transaction, and new orders or changed statuses/tours are applied to
+        the tour counters. Cached filter results of the day are invalidated
+        once the caller commits. Returns a stats dict including rows/sec for
+        the batch.
+        """
+        from app.data_protection import data_protection_service
+        from app.dashboard_stats import dashboard_stats_service
+        from app.cache import result_cache
+        from app.tours import tour_service
+
+        start = time.perf_counter()
+        now = datetime.now(timezone.utc)
+
+        # Deduplicate by id (last occurrence wins, as with the per-row loop)
+        batch = {}
+        for order_data in orders:
+            if isinstance(order_data, dict) and order_data.get('id'):
+                batch[order_data['id']] = order_data
+        order_ids = list(batch)
+
+        existing = self._load_existing(order_ids)
+
+        bulk_rows = []
+        line_items = {}
+        protected_ids = []
+        failed_ids = []
+        # (previous, current) tour state per order, and tourDetail per tour for tours created here
+        tour_changes = {}
+        tour_details = {}
+
+        for order_id, order_data in batch.items():
+            previous = None
+            if order_id in existing:
+                is_modified, tour_state = existing[order_id]
+                if is_modified:
+                    # safe_update_order decides field by field, as the per-order merge did
+                    protected_ids.append(order_id)
+                    continue
+                previous = tour_state
+
+            try:
+                row = self.build_order_row(order_data, client_id, order_date, now)
+                line_items[order_id] = self.build_line_item_rows(order_id, order_data)
+            except Exception as e:
+                logger.error(f"BULK MERGE: Skipping order {order_id}, could not map it: {e}")
+                failed_ids.append(order_id)
+                continue
+            bulk_rows.append(row)
+
+            current = tuple(row.get(column, previous and previous[index]) for index, column in
+                            enumerate(('tour_id', 'order_status', 'location_city', 'location_name')))
+            tour_changes[order_id] = (previous, current)
+            if row.get('tour_id'):
+                tour_details.setdefault(row['tour_id'], order_data['orderMetadata']['tourDetail'])
+
+        written_ids = self._write_batch(bulk_rows, line_items) if bulk_rows else []
+        failed_ids.extend(row['id'] for row in bulk_rows if row['id'] not in set(written_ids))
+        if written_ids:
+            # Before the protected orders, which apply their own changes
+            tour_service.apply_order_changes([tour_changes[order_id] for order_id in written_ids], tour_details)
+
+        # Manually modified orders: load them in one query and apply field-level protection
+        protected_count = 0
+        for chunk in _chunks(protected_ids):
+            for existing_order in Order.query.filter(Order.id.in_(chunk)).all():
+                order_id = existing_order.id
+                try:
+                    with db.session.begin_nested():
+                        data_protection_service.safe_update_order(existing_order, batch[order_id], client_id, order_date)
+                    protected_count += 1
+                except Exception as e:
+                    logger.error(f"BULK MERGE: Skipping protected order {order_id}: {e}")
+                    failed_ids.append(order_id)
+
+        if batch:
+            dashboard_stats_service.refresh_order_counters([order_date])
+            # Cached filter results for this date are stale once the merge is committed
+            result_cache.invalidate_on_commit(db.session, dates=[order_date])
+
+        elapsed = time.perf_counter() - start
+        total = len(batch)
+        written = set(written_ids)
+        added_count = sum(1 for order_id in written if order_id not in existing)
+        stats = {
+            'date': order_date.isoformat() if hasattr(order_date, 'isoformat') else str(order_date),
+            'total': total,
+            'added': added_count,
+            'updated': len(written) - added_count,
+            'protected': protected_count,
+            'failed': len(failed_ids),
+            'line_items': sum(len(line_items[order_id]) for order_id in written),
+            'elapsed_seconds': round(elapsed, 3),
+            'rows_per_second': round(total / elapsed, 1) if elapsed > 0 else float(total)
+        }
+        logger.info(f"BULK MERGE: {stats['date']} - {total} orders ({added_count} added, {stats['updated']} updated, "
+                    f"{protected_count} protected, {len(failed_ids)} failed) in {elapsed:.2f}s "
+                    f"({stats['rows_per_second']} rows/sec)")
+        return stats
+
+
+# Global service instance
+order_merge_service = OrderMergeService()
@@ -0,0 +1,108 @@
+"""
+Order Projections
+Named column shapes for serialising orders without loading or decoding raw_data
+"""
+
+import json
+from sqlalchemy.orm import load_only
+from models import Order, OrderLineItem
+
+# Columns every listing needs (no JSON payloads)
+LIST_COLUMNS = (
+    'id', 'client_id', 'date', 'order_status',
+    'location_name', 'location_address', 'location_city', 'location_country_code',
+    'location_latitude', 'location_longitude',
+    'tour_id', 'tour_date', 'tour_plan_id', 'tour_name', 'tour_number',
+    'rider_name', 'rider_id', 'rider_phone',
+    'vehicle_registration', 'vehicle_id', 'vehicle_model', 'transporter_name',
+    'completed_on', 'task_source', 'plan_id', 'planned_tour_name', 'sequence_in_batch',
+    'partially_delivered', 'reassigned', 'rejected', 'unassigned', 'cancellation_reason',
+    'tardiness', 'sla_status', 'amount_collected', 'effective_tat', 'allowed_dwell_time',
+    'task_time_slot', 'grn_url', 'is_modified', 'modified_fields', 'last_modified_by', 'last_modified_at',
+    'created_at', 'updated_at'
+)
+
+# Listing columns plus the small JSON/text fields used by exports and legacy API responses
+EXPORT_COLUMNS = LIST_COLUMNS + (
+    'eta_updated_on', 'tour_updated_on', 'initial_assignment_at', 'initial_assignment_by',
+    'skills', 'tags', 'custom_fields'
+)
+
+SHAPES = {
+    'list': LIST_COLUMNS,
+    'export': EXPORT_COLUMNS,
+    'detail': None  # every column, serialised with Order.to_dict()
+}
+
+_DATETIME_COLUMNS = frozenset({
+    'date', 'completed_on', 'eta_updated_on', 'tour_updated_on', 'initial_assignment_at',
+    'last_modified_at', 'created_at', 'updated_at'
+})
+_JSON_COLUMNS = {'skills': None, 'tags': None, 'custom_fields': None, 'modified_fields': []}
+
+
+def order_load_options(shape='list'):
+    """Loader options restricting an Order query to the columns of a shape"""
+    columns = SHAPES[shape]
+    if columns is None:
+        return []
+    return [load_only(*(getattr(Order, column) for column in columns))]
+
+
+def serialize_order(order, shape='list'):
+    """Serialise an Order using the named shape.
+
+    'detail' is the full Order.to_dict() (including decoded raw_data);
+    'list' and 'export' only touch their own columns, so deferred columns
+    such as raw_data are never loaded.
+    """
+    columns = SHAPES[shape]
+    if columns is None:
+        return order.to_dict()
+
+    data = {}
+    for column in columns:
+        value = getattr(order, column)
+        if column in _DATETIME_COLUMNS:
+            value = value.isoformat() if value else None
+        elif column in _JSON_COLUMNS:
+            value = json.loads(value) if value else _JSON_COLUMNS[column]
+        data[column] = value
+    return data
+
+
+def serialize_orders(orders, shape='list'):
+    return [serialize_order(order, shape) for order in orders]
+
+
+def attach_line_item_previews(order_dicts, preview_size=3, chunk_size=1000):
+    """Add line_item_count and the first few line items to serialised orders (one IN query per chunk).
+
+    Preview items use the Locus lineItems keys so listing cards can render
+    them exactly like items taken from raw_data.
+    """
+    by_id = {order['id']: order for order in order_dicts}
+    for order in order_dicts:
+        order['line_item_count'] = 0
+        order['line_items_preview'] = []
+
+    order_ids = list(by_id)
+    for start in range(0, len(order_ids), chunk_size):
+        chunk = order_ids[start:start + chunk_size]
+        items = OrderLineItem.query.options(load_only(
+            OrderLineItem.order_id, OrderLineItem.sku_id, OrderLineItem.name,
+            OrderLineItem.quantity, OrderLineItem.transacted_quantity
+        )).filter(OrderLineItem.order_id.in_(chunk)).order_by(OrderLineItem.id).all()
+
+        for item in items:
+            order = by_id[item.order_id]
+            order['line_item_count'] += 1
+            if len(order['line_items_preview']) < preview_size:
+                order['line_items_preview'].append({
+                    'id': item.sku_id,
+                    'name': item.name,
+                    'quantity': item.quantity,
+                    'transactionStatus': {'transactedQuantity': item.transacted_quantity}
+                })
+
+    return order_dicts
@@ -0,0 +1,369 @@
+"""
+Quantity Reconciliation
+Unit tables parsed once per order and one-pass reconciliation of GRN quantities against order lines
+"""
+
+import logging
+import re
+from collections import defaultdict
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_UNITS_PER_BOX = 12
+QUANTITY_TOLERANCE = 0.05  # 5% of the ordered quantity, at least 1 unit
+
+NUMBER_PATTERN = re.compile(r'(\d+(?:\.\d+)?)')
+PACK_SIZE_PATTERN = re.compile(r'(\d+)(?:x|X|\*)(\d+)')
+
+# Package configurations, tried in order: (5+1)*4, 2*10, 6x12
+PACKAGE_PATTERNS = (
+    (re.compile(r'\((\d+)\+(\d+)\)\*(\d+)'), lambda m: (int(m[1]) + int(m[2])) * int(m[3])),
+    (re.compile(r'(\d+)\*(\d+)'), lambda m: int(m[1]) * int(m[2])),
+    (re.compile(r'(\d+)x(\d+)'), lambda m: int(m[1]) * int(m[2])),
+)
+
+# (from unit, to unit) -> (operation, operand, ratio); box -> unit depends on the order line's pack size
+FIXED_CONVERSIONS = {
+    ('unit', 'box'): ('div', DEFAULT_UNITS_PER_BOX, 1 / DEFAULT_UNITS_PER_BOX),
+    ('kg', 'g'): ('mul', 1000, 1000),
+    ('g', 'kg'): ('div', 1000, 1 / 1000),
+    ('l', 'ml'): ('mul', 1000, 1000),
+    ('ml', 'l'): ('div', 1000, 1 / 1000),
+}
+SAME_UNIT = ('same', None, 1.0)
+NO_CONVERSION = ('none', None, None)
+
+
+@lru_cache(maxsize=4096)
+def parse_package_quantity(quantity_str):
+    """Total units of a package configuration like (5+1)*4: (quantity, 'calculated' or 'direct'), (None, None) if empty"""
+    if not quantity_str:
+        return None, None
+
+    quantity_str = str(quantity_str).strip()
+    number_match = NUMBER_PATTERN.search(quantity_str)
+    base_quantity = float(number_match.group(1)) if number_match else 0
+
+    for pattern, calculator in PACKAGE_PATTERNS:
+        match = pattern.search(quantity_str)
+        if match:
+            return calculator(match), 'calculated'
+
+    return base_quantity, 'direct'
+
+
+@lru_cache(maxsize=4096)
+def pack_size(product_context):
+    """Units per box from a "12x6"-style pattern in a product name/SKU, or None"""
+    match = PACK_SIZE_PATTERN.search(str(product_context)) if product_context else None
+    return int(match.group(1)) * int(match.group(2)) if match else None
+
+
+class QuantityReconciler:
+    """Unit normalisation, conversion and GRN-vs-order quantity reconciliation.
+
+    Unit spellings are resolved through one alias table (and memoised),
+    order lines are indexed by SKU once per validation, and converted
+    quantities are computed per conversion kind over all matched items.
+    """
+
+    def __init__(self, uom_conversions):
+        self.aliases = {}
+        for standard_unit, variations in uom_conversions.items():
+            self.aliases.setdefault(standard_unit, standard_unit)
+            for variation in variations:
+                self.aliases.setdefault(variation, standard_unit)
+        self._units = {}
+
+    def normalize_unit(self, unit_str):
+        """Standard form of a unit spelling; raises for non-string units like the original string handling did"""
+        if not unit_str:
+            return 'unit'
+        try:
+            return self._units[unit_str]
+        except (KeyError, TypeError):
+            pass
+        unit_lower = unit_str.lower().strip()
+        normalized = self.aliases.get(unit_lower, unit_lower)
+        if len(self._units) < 4096:
+            self._units[unit_str] = normalized
+        return normalized
+
+    def conversion(self, from_unit, to_unit, units_per_box=None):
+        """(operation, operand, ratio) converting from_unit quantities to to_unit"""
+        from_unit_norm = self.normalize_unit(from_unit)
+        to_unit_norm = self.normalize_unit(to_unit)
+        if from_unit_norm == to_unit_norm:
+            return SAME_UNIT
+        if from_unit_norm == 'box' and to_unit_norm == 'unit':
+            if units_per_box is not None:
+                return 'mul', units_per_box, units_per_box
+            return 'default_box', DEFAULT_UNITS_PER_BOX, DEFAULT_UNITS_PER_BOX
+        return FIXED_CONVERSIONS.get((from_unit_norm, to_unit_norm), NO_CONVERSION)
+
+    def convert(self, from_qty, from_unit, to_unit, product_context=None):
+        """Convert one quantity: (converted quantity, ratio or None when no conversion is known)"""
+        try:
+            operation, operand, ratio = self.conversion(from_unit, to_unit, pack_size(product_context))
+            if operation == 'default_box':
+                logger.warning(f"Using default box->unit conversion: 1 box = {operand} units")
+            elif operation == 'none':
+                logger.warning(f"No conversion available from {from_unit} to {to_unit}")
+            return apply_conversion([from_qty], operation, operand)[0], ratio
+        except Exception as e:
+            logger.error(f"Error converting {from_qty} {from_unit} to {to_unit}: {e}")
+            return from_qty, None
+
+    def reconcile(self, validation_data, order_items):
+        """Check every extracted item's quantity against the order line it matched.
+
+        Sets each matched item's status (and quantity_equivalent on a match),
+        appends QUANTITY_MISMATCH discrepancies and stores uom_analysis.
+        Items are joined to order lines through a SKU index, converted per
+        conversion kind, then compared in document order. Like the original
+        item-by-item check, an item that cannot be checked stops the pass
+        with earlier items updated and the discrepancies left untouched.
+        """
+        extracted_items = validation_data.get('extracted_items', [])
+        enhanced_discrepancies = list(validation_data.get('discrepancies', []))
+        order_lines = OrderLines(order_items)
+
+        # Pass 1: join items to order lines and parse quantities
+        rows, failure = [], None
+        for extracted_item in extracted_items:
+            try:
+                row = self._join(extracted_item, order_lines)
+            except Exception as e:
+                failure = e
+                break
+            if row is not None:
+                rows.append(row)
+
+        # Pass 2: converted quantities, one operation per conversion kind
+        groups = defaultdict(list)
+        for position, row in enumerate(rows):
+            groups[row['conversion']].append(position)
+        converted = [None] * len(rows)
+        defaulted = 0
+        for (operation, operand, _), positions in groups.items():
+            quantities = apply_conversion([rows[p]['quantity'] for p in positions], operation, operand)
+            for position, quantity in zip(positions, quantities):
+                converted[position] = quantity
+            if operation == 'default_box':
+                defaulted += len(positions)
+        if defaulted:
+            logger.warning(f"Using default box->unit conversion (1 box = {DEFAULT_UNITS_PER_BOX} units) for {defaulted} items")
+
+        # Pass 3: compare in document order
+        conversions_attempted = 0
+        successful_conversions = 0
+        for row, converted_qty in zip(rows, converted):
+            conversions_attempted += 1
+            outcome = self._compare(row, converted_qty)
+            if outcome is None:
+                successful_conversions += bool(row['conversion'][2])
+            else:
+                enhanced_discrepancies.append(outcome)
+        if failure is not None:
+            raise failure
+
+        validation_data['discrepancies'] = enhanced_discrepancies
+        validation_data['uom_analysis'] = {
+            'conversions_attempted': conversions_attempted,
+            'successful_conversions': successful_conversions,
+            'unresolved_uom_issues': conversions_attempted - successful_conversions
+        }
+        return validation_data
+
+    def check_item(self, extracted_item, order_lines):
+        """Reconcile a single item (e.g. while the answer is streaming): the same (attempted, resolved, discrepancy) or None"""
+        row = self._join(extracted_item, order_lines)
+        if row is None:
+            return None
+        operation, operand, ratio = row['conversion']
+        discrepancy = self._compare(row, apply_conversion([row['quantity']], operation, operand)[0])
+        return True, discrepancy is None and bool(ratio), discrepancy
+
+    def _join(self, extracted_item, order_lines):
+        """Order line, parsed quantity and conversion of one extracted item; None if it matched no order line"""
+        matched_sku = extracted_item.get('matched_order_sku')
+        if not matched_sku:
+            return None
+        order_item = order_lines.get(matched_sku)
+        if not order_item:
+            return None
+
+        extracted_qty = extracted_item.get('extracted_quantity', 0)
+        extracted_unit = extracted_item.get('extracted_unit', 'unit')
+        order_unit = order_item.get('unit', 'unit')
+
+        package_config = extracted_item.get('package_config')
+        if package_config:
+            parsed_qty, _ = parse_package_quantity(str(package_config))
+            if parsed_qty:
+                extracted_qty = parsed_qty
+
+        try:
+            quantity = float(extracted_qty)
+        except Exception as e:
+            logger.error(f"UoM conversion failed: {e}")
+            raise
+
+        try:
+            conversion = self.conversion(extracted_unit, order_unit,
+                                         order_lines.units_per_box(matched_sku, order_item))
+        except Exception as e:
+            logger.error(f"Error converting {quantity} {extracted_unit} to {order_unit}: {e}")
+            conversion = NO_CONVERSION
+
+        return {
+            'item': extracted_item,
+            'order_item': order_item,
+            'sku': matched_sku,
+            'quantity': quantity,
+            'extracted_qty': extracted_qty,
+            'extracted_unit': extracted_unit,
+            'conversion': conversion
+        }
+
+    def _compare(self, row, converted_qty):
+        """Set the item's status; the QUANTITY_MISMATCH discrepancy, or None when quantities agree"""
+        extracted_item = row['item']
+        order_item = row['order_item']
+        order_qty = order_item.get('quantity', 0)
+        order_unit = order_item.get('unit', 'unit')
+
+        order_qty_float = float(order_qty)
+        tolerance = max(1, order_qty_float * QUANTITY_TOLERANCE)
+
+        if abs(converted_qty - order_qty_float) <= tolerance:
+            extracted_item['quantity_equivalent'] = converted_qty
+            extracted_item['status'] = 'MATCHED'
+            return None
+
+        extracted_item['status'] = 'QUANTITY_MISMATCH'
+
+        percentage_diff = abs(converted_qty - order_qty_float) / order_qty_float * 100
+        if percentage_diff > 20:
+            severity = 'HIGH'
+        elif percentage_diff > 10:
+            severity = 'MEDIUM'
+        else:
+            severity = 'LOW'
+
+        converted_note = f' (≈{converted_qty:.1f} {order_unit})' if row['conversion'][2] else ''
+        return {
+            'type': 'QUANTITY_MISMATCH',
+            'description': f'Quantity mismatch for {row["sku"]}',
+            'expected': f'{order_qty} {order_unit}',
+            'actual': f'{row["extracted_qty"]} {row["extracted_unit"]}' + converted_note,
+            'sku_id': row['sku'],
+            'severity': severity,
+            'percentage_diff': round(percentage_diff, 1)
+        }
+
+
+def apply_conversion(quantities, operation, operand):
+    """Converted quantities for one conversion kind"""
+    if operation in ('mul', 'default_box'):
+        return [quantity * operand for quantity in quantities]
+    if operation == 'div':
+        return [quantity / operand for quantity in quantities]
+    return quantities
+
+
+class OrderLines:
+    """Order line items of one validation indexed by SKU (first line wins, as a linear scan would)"""
+
+    def __init__(self, order_items):
+        self.by_sku = {}
+        for order_item in order_items:
+            self.by_sku.setdefault(order_item['sku_id'], order_item)
+        self._units_per_box = {}
+
+    def get(self, sku):
+        try:
+            return self.by_sku.get(sku)
+        except TypeError:  # unhashable SKU from the model never equals an order SKU
+            return None
+
+    def units_per_box(self, sku, order_item):
+        """Pack size from the order line's name and SKU, parsed once per line"""
+        if sku not in self._units_per_box:
+            self._units_per_box[sku] = pack_size(f"{order_item.get('name', '')} {sku}")
+        return self._units_per_box[sku]
+
+
+class ExtractedItemIndex:
+    """What the missing-item check asks of the extracted items, computed once per validation.
+
+    The check used to walk every extracted item for every order line. Here
+    each item's SKU, name, confidence and GS1 product are read once, with the
+    same field accesses - so malformed items raise while building the index
+    just as they did inside that loop.
+    """
+
+    def __init__(self, extracted_items, validation_data, threshold):
+        self.threshold = threshold
+        self.skus = set()
+        self.names = {}  # lowercased extracted names, in document order
+        self.gs1_products = {}  # id -> name-matched GS1 product of an extracted GTIN
+        self.confident = False  # some item matched with at least ``threshold`` confidence
+        self.unrated_skus = set()  # SKUs of items whose match_confidence is not a number
+        self._gtin_verification = None
+
+        for extracted_item in extracted_items:
+            extracted_sku = extracted_item.get('extracted_sku', '').lower().strip()
+            extracted_name = extracted_item.get('extracted_name', '').lower().strip()
+            extracted_gtin = extracted_item.get('extracted_gtin')
+            match_confidence = extracted_item.get('match_confidence', 0)
+
+            if extracted_sku:
+                self.skus.add(extracted_sku)
+            if extracted_name:
+                self.names.setdefault(extracted_name, None)
+            try:
+                if match_confidence >= threshold:
+                    self.confident = True
+            except TypeError:
+                self.unrated_skus.add(extracted_sku)
+            if extracted_gtin:
+                self._add_gtin(extracted_gtin, validation_data)
+
+    def _add_gtin(self, extracted_gtin, validation_data):
+        if self._gtin_verification is None:
+            self._gtin_verification = {}
+            for entry in validation_data.get('gtin_verification', []):
+                self._gtin_verification.setdefault(entry.get('gtin'), entry)
+
+        gtin_info = self._gtin_verification.get(extracted_gtin)
+        if gtin_info and gtin_info.get('name_match', False):
+            gs1_product = gtin_info.get('gs1_product_info', {})
+            if gs1_product.get('product_name', '').lower():
+                self.gs1_products[id(gs1_product)] = gs1_product
+
+    def matched_by_sku_or_confidence(self, order_sku):
+        """Whether a direct SKU match or a confident AI match covers this order line"""
+        if self.unrated_skus and (not order_sku or self.unrated_skus != {order_sku}):
+            raise TypeError("match_confidence of an extracted item is not a number")
+        return (bool(order_sku) and order_sku in self.skus) or self.confident
+
+    def matched_by_name(self, order_name, bilingual_match):
+        """Whether a name-verified GTIN product or an extracted name matches this order line"""
+        for gs1_product in self.gs1_products.values():
+            name_match, score = bilingual_match(order_name, gs1_product, min_score=self.threshold)
+            if name_match and score >= self.threshold:
+                return True
+
+        if not order_name:
+            return False
+        for extracted_name in self.names:
+            mock_product = {
+                'product_names': {'primary': extracted_name, 'english': extracted_name},
+                'brand_names': {'primary': '', 'english': ''}
+            }
+            name_match, score = bilingual_match(order_name, mock_product, min_score=self.threshold)
+            if name_match and score >= self.threshold:
+                return True
+        return False
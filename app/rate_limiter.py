@@ -0,0 +1,286 @@
+"""
+Rate Limiter
+Per-upstream token buckets (Gemini, GS1, Locus) with non-blocking acquire, FIFO reservations,
+asyncio support and optional cross-process coordination through a shared state file
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: cross-process coordination falls back to per-process buckets
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Upstream name -> host suffixes whose requests it limits
+UPSTREAM_HOSTS = {
+    'gemini': ('generativelanguage.googleapis.com',),
+    'gs1': ('gs1.org',),
+    'locus': ('locus-api.com', 'locus-dashboard.com'),
+}
+
+# Upstreams enforcing a quota per minute: their burst plus one minute of refill must stay within it
+PER_MINUTE_QUOTA_UPSTREAMS = ('gemini',)
+
+
+class RateLimitTimeout(Exception):
+    """No token (or concurrency slot) became available within the caller's timeout"""
+
+
+class LocalBucketState:
+    """Bucket state (tokens, last refill time) shared by the threads of one process"""
+
+    def __init__(self, capacity):
+        self._state = {'tokens': float(capacity), 'updated': time.time()}
+        self._lock = threading.Lock()
+
+    def transact(self, update):
+        """Run ``update(state) -> result`` atomically; the update mutates the state dict in place"""
+        with self._lock:
+            return update(self._state)
+
+
+class FileBucketState(LocalBucketState):
+    """Bucket state kept in a small JSON file and updated under flock, so every worker process shares one bucket.
+
+    The lock is only held for the read-modify-write of the reservation,
+    never while a caller waits for its token.
+    """
+
+    def __init__(self, capacity, path):
+        super().__init__(capacity)
+        self.path = path
+        self.capacity = capacity
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    def transact(self, update):
+        with self._lock, open(self.path, 'a+') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                try:
+                    state = json.loads(f.read() or '{}')
+                except ValueError:
+                    state = {}
+                state.setdefault('tokens', float(self.capacity))
+                state.setdefault('updated', time.time())
+
+                result = update(state)
+
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state))
+                f.flush()
+                return result
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class TokenBucket:
+    """Token bucket refilled at ``rate_per_minute`` up to ``capacity`` tokens, plus an optional concurrency cap.
+
+    ``acquire`` reserves a token under the state lock - the balance may go
+    negative - then sleeps outside the lock until the reservation falls due.
+    Waiters are therefore served in the order they arrived and a throttled
+    caller never holds up one that could go right away.
+    """
+
+    def __init__(self, name, rate_per_minute, capacity=None, max_concurrent=None, state=None):
+        self.name = name
+        self.rate = rate_per_minute / 60.0  # tokens per second
+        self.capacity = capacity or max(1, int(rate_per_minute))
+        self.max_concurrent = max_concurrent
+        self.state = state or LocalBucketState(self.capacity)
+        self._slots = threading.BoundedSemaphore(max_concurrent) if max_concurrent else None
+
+        self._metrics_lock = threading.Lock()
+        self._metrics = dict.fromkeys(('acquired', 'rejected', 'throttled', 'timeouts', 'waiting', 'peak_waiting',
+                                       'in_flight', 'peak_in_flight'), 0)
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _reserve(self, tokens, max_wait):
+        """Take ``tokens`` now and return the seconds until they are covered, or None if that exceeds max_wait"""
+        def update(state):
+            now = time.time()
+            state['tokens'] = min(self.capacity, state['tokens'] + (now - state['updated']) * self.rate)
+            state['updated'] = now
+
+            wait = max(0.0, (tokens - state['tokens']) / self.rate) if self.rate > 0 else (0.0 if state['tokens'] >= tokens else float('inf'))
+            if max_wait is not None and wait > max_wait:
+                return None
+            state['tokens'] -= tokens
+            return wait
+
+        return self.state.transact(update)
+
+    def _count(self, **changes):
+        with self._metrics_lock:
+            for field, delta in changes.items():
+                self._metrics[field] += delta
+            self._metrics['peak_waiting'] = max(self._metrics['peak_waiting'], self._metrics['waiting'])
+            self._metrics['peak_in_flight'] = max(self._metrics['peak_in_flight'], self._metrics['in_flight'])
+
+    def _record_wait(self, wait):
+        with self._metrics_lock:
+            self._metrics['acquired'] += 1
+            if wait > 0:
+                self._metrics['throttled'] += 1
+                self._wait_total += wait
+                self._wait_max = max(self._wait_max, wait)
+
+    def try_acquire(self, tokens=1):
+        """Take tokens only if they are available right now; never blocks"""
+        wait = self._reserve(tokens, max_wait=0)
+        if wait is None:
+            self._count(rejected=1)
+            return False
+        self._record_wait(0)
+        return True
+
+    def acquire(self, tokens=1, timeout=None):
+        """Block until tokens are available (in arrival order); False if that would take longer than ``timeout``"""
+        wait = self._reserve(tokens, max_wait=timeout)
+        if wait is None:
+            self._count(timeouts=1)
+            return False
+        if wait > 0:
+            logger.info(f"RATE LIMIT: {self.name} throttled, waiting {wait:.2f}s")
+            self._count(waiting=1)
+            try:
+                time.sleep(wait)
+            finally:
+                self._count(waiting=-1)
+        self._record_wait(wait)
+        return True
+
+    async def acquire_async(self, tokens=1, timeout=None):
+        """Asyncio variant of acquire: waits with asyncio.sleep so the event loop keeps running"""
+        wait = self._reserve(tokens, max_wait=timeout)
+        if wait is None:
+            self._count(timeouts=1)
+            return False
+        if wait > 0:
+            self._count(waiting=1)
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self._count(waiting=-1)
+        self._record_wait(wait)
+        return True
+
+    @contextmanager
+    def slot(self, timeout=None):
+        """Hold a concurrency slot and one token for the duration of a call"""
+        if self._slots is not None and not self._slots.acquire(timeout=timeout):
+            self._count(timeouts=1)
+            raise RateLimitTimeout(f"{self.name}: no concurrency slot within {timeout}s")
+        try:
+            if not self.acquire(timeout=timeout):
+                raise RateLimitTimeout(f"{self.name}: no token within {timeout}s")
+            self._count(in_flight=1)
+            try:
+                yield
+            finally:
+                self._count(in_flight=-1)
+        finally:
+            if self._slots is not None:
+                self._slots.release()
+
+    @asynccontextmanager
+    async def async_slot(self, timeout=None):
+        """Asyncio variant of slot; the concurrency slot is polled without blocking the event loop"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if self._slots is not None:
+            while not self._slots.acquire(blocking=False):
+                if deadline is not None and time.monotonic() >= deadline:
+                    self._count(timeouts=1)
+                    raise RateLimitTimeout(f"{self.name}: no concurrency slot within {timeout}s")
+                await asyncio.sleep(0.01)
+        try:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not await self.acquire_async(timeout=remaining):
+                raise RateLimitTimeout(f"{self.name}: no token within {timeout}s")
+            self._count(in_flight=1)
+            try:
+                yield
+            finally:
+                self._count(in_flight=-1)
+        finally:
+            if self._slots is not None:
+                self._slots.release()
+
+    def get_metrics(self):
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+            metrics['total_wait_seconds'] = round(self._wait_total, 3)
+            metrics['max_wait_seconds'] = round(self._wait_max, 3)
+            metrics['avg_wait_seconds'] = round(self._wait_total / metrics['throttled'], 3) if metrics['throttled'] else 0.0
+        metrics.update({
+            'rate_per_minute': round(self.rate * 60, 2),
+            'capacity': self.capacity,
+            'max_concurrent': self.max_concurrent,
+            'shared': isinstance(self.state, FileBucketState)
+        })
+        return metrics
+
+
+class RateLimiterRegistry:
+    """The configured bucket of each upstream, looked up by name or request host"""
+
+    def __init__(self):
+        self.buckets = {}
+
+    def configure(self, config):
+        """Build the buckets from <UPSTREAM>_CALLS_PER_MINUTE / _BURST / _MAX_CONCURRENT settings"""
+        shared_dir = getattr(config, 'RATE_LIMIT_SHARED_DIR', None)
+        if shared_dir and fcntl is None:
+            logger.warning("RATE LIMIT: fcntl not available, buckets are per process")
+            shared_dir = None
+
+        limits = {
+            'gemini': (getattr(config, 'MAX_API_CALLS_PER_MINUTE', 12), getattr(config, 'GEMINI_BURST', 1),
+                       getattr(config, 'MAX_CONCURRENT_API_CALLS', 10)),
+            'gs1': (getattr(config, 'GS1_CALLS_PER_MINUTE', 60), getattr(config, 'GS1_BURST', None),
+                    getattr(config, 'GS1_MAX_CONCURRENT', None)),
+            'locus': (getattr(config, 'LOCUS_CALLS_PER_MINUTE', 300), getattr(config, 'LOCUS_BURST', None),
+                      getattr(config, 'LOCUS_MAX_CONCURRENT', None)),
+        }
+
+        buckets = {}
+        for name, (rate, burst, max_concurrent) in limits.items():
+            capacity = burst or max(1, int(rate))
+            if name in PER_MINUTE_QUOTA_UPSTREAMS and rate > 1:
+                # A full bucket is spent at once and refills for the rest of the minute
+                capacity = min(capacity, int(rate) - 1)
+                rate = rate - capacity
+            state = FileBucketState(capacity, os.path.join(shared_dir, f"{name}.bucket")) if shared_dir else None
+            buckets[name] = TokenBucket(name, rate, capacity=capacity, max_concurrent=max_concurrent, state=state)
+            logger.info(f"RATE LIMIT: {name} {rate}/min refill, burst {capacity}, "
+                        f"concurrency {max_concurrent or 'unbounded'}{', shared' if state else ''}")
+        self.buckets = buckets
+
+    def get(self, name):
+        return self.buckets.get(name)
+
+    def for_host(self, host):
+        """Bucket limiting requests to ``host`` (None for hosts without a limit)"""
+        host = (host or '').split(':')[0].lower()
+        for name, suffixes in UPSTREAM_HOSTS.items():
+            if any(host == suffix or host.endswith('.' + suffix) for suffix in suffixes):
+                return self.buckets.get(name)
+        return None
+
+    def get_metrics(self):
+        return {name: bucket.get_metrics() for name, bucket in self.buckets.items()}
+
+
+# Global rate limiter registry (configured from the app config in create_app)
+rate_limiters = RateLimiterRegistry()
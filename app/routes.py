@@ -1,17 +1,22 @@
-from flask import render_template, request, redirect, url_for, session, flash, jsonify, make_response
+from flask import render_template, request, redirect, url_for, session, flash, jsonify, make_response, Response
 from datetime import datetime
 import json
 import logging
-import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
 from PIL import Image
 import io
 
-from models import ValidationResult, Order
+from models import db, ValidationResult, Order
 from app.auth import LocusAuth
 from app.validators import GoogleAIValidator
-from app.utils import rate_limit_api_call, api_rate_limiter
+from app.rate_limiter import rate_limiters
 from app.filters import filter_service
+from app.http_client import http_client
+from app.cache import result_cache
+from app.image_cache import grn_image_cache
+from app.gtin_cache import gtin_cache
+from app.validation_jobs import validation_job_service
+from app.grn_documents import find_grn_url, grn_document_service
 
 logger = logging.getLogger(__name__)
 
@@ -219,11 +224,16 @@ def store_order_from_api_data(order_data, date_str):
         if order_data.get('custom_fields'):
             new_order.custom_fields = json.dumps(order_data['custom_fields'])
 
-        # Raw data
+        # Raw data, and the GRN URL for candidate selection by validation jobs
         new_order.raw_data = json.dumps(order_data)
+        new_order.grn_url = find_grn_url(order_data)
 
-        # Add to session and commit
+        # Add to session, refresh the day's dashboard counters and the order's tour, and commit
+        from app.dashboard_stats import dashboard_stats_service
+        from app.tours import tour_service
         db.session.add(new_order)
+        dashboard_stats_service.refresh_order_counters([order_date])
+        tour_service.apply_order_changes([(None, tour_service.order_state(new_order))])
         db.session.commit()
 
         logger.info(f"Successfully stored order {order_data.get('id')} from API data")
@@ -242,132 +252,97 @@ def register_routes(app, config):
 
     def has_grn_document(order_data):
         """Check if an order has a GRN document available"""
-        try:
-            order_id = order_data.get('id', 'unknown')
-
-            # Try different possible paths where the GRN might be stored
-            possible_paths = [
-                # Direct path
-                ['orderMetadata', 'customerProofOfCompletion', 'Proof Of Delivery Document', 'Proof Of Delivery Document'],
-                ['orderMetadata', 'customerProofOfCompletion', 'proofOfDeliveryDocument'],
-                ['orderMetadata', 'customerProofOfCompletion', 'deliveryDocument'],
-                # Alternative paths
-                ['proofOfDelivery', 'document'],
-                ['proofOfDelivery', 'documentUrl'],
-                ['proofOfDelivery', 'deliveryDocument'],
-                ['customerProofOfCompletion', 'deliveryDocument'],
-                ['customerProofOfCompletion', 'document'],
-            ]
-
-            # Try each possible path
-            for path in possible_paths:
-                current_data = order_data
-                try:
-                    for key in path:
-                        current_data = current_data[key]
-                    if isinstance(current_data, str) and current_data.startswith('http'):
-                        logger.info(f"Order {order_id}: Found GRN document at path: {' -> '.join(path)}")
-                        return True
-                except (KeyError, TypeError):
-                    continue
-
-            # If still no URL, try to find any URL in the proof data
-            proof_data = order_data.get('orderMetadata', {}).get('customerProofOfCompletion', {})
-            if proof_data:
-                def find_urls_recursive(obj, path=""):
-                    urls = []
-                    if isinstance(obj, dict):
-                        for key, value in obj.items():
-                            new_path = f"{path}.{key}" if path else key
-                            if isinstance(value, str) and value.startswith('http'):
-                                urls.append((new_path, value))
-                            elif isinstance(value, (dict, list)):
-                                urls.extend(find_urls_recursive(value, new_path))
-                    elif isinstance(obj, list):
-                        for i, item in enumerate(obj):
-                            new_path = f"{path}[{i}]"
-                            urls.extend(find_urls_recursive(item, new_path))
-                    return urls
-
-                found_urls = find_urls_recursive(proof_data)
-                if found_urls:
-                    logger.info(f"Order {order_id}: Found GRN document via recursive search: {found_urls[0]}")
-                    return True
-
-            logger.info(f"Order {order_id}: No GRN document found")
-            return False
-        except Exception as e:
-            logger.error(f"Error checking GRN document for order: {e}")
-            return False
-
-    def validate_single_order_worker(order_basic, date, force_reprocess=False):
-        """Worker function to validate a single order in a thread"""
-        # Create application context for database operations in thread
-        with app.app_context():
-            try:
-                order_id = order_basic.get('id')
-                if not order_id:
-                    return {
-                        'order_id': 'unknown',
-                        'success': False,
-                        'error': 'No order ID found',
-                        'is_valid': False
-                    }
+        grn_url = find_grn_url(order_data)
+        logger.debug(f"Order {order_data.get('id', 'unknown')}: GRN document {grn_url or 'not found'}")
+        return grn_url is not None
+
+    def apply_local_line_item_edits(order_detail_data):
+        """Order detail with line items edited in this app (update_order_line_items) in place of the Locus copy"""
+        order = db.session.get(Order, order_detail_data.get('id'))
+        if order is None or not order.is_modified or 'line_items' not in json.loads(order.modified_fields or '[]'):
+            return order_detail_data
+        line_items = json.loads(order.raw_data or '{}').get('orderMetadata', {}).get('lineItems')
+        if line_items is None:
+            return order_detail_data
+        return dict(order_detail_data, lineItems=line_items)
+
+    def resolve_order_for_validation(order_basic, force_reprocess=False):
+        """Order detail and GRN URL to validate, or the result to report without calling Google AI.
+
+        Returns (result, order_detail_data, grn_url); ``result`` is set when
+        the order cannot be validated or a stored validation can be reused.
+        An order detail fetched within ORDER_DETAIL_MAX_AGE_SECONDS is read
+        from the database instead of fetched again.
+        A stored result whose input fingerprint still matches is reused even
+        with ``force_reprocess``: only orders whose inputs changed go to Gemini.
+        """
+        order_id = order_basic.get('id')
+        if not order_id:
+            return {
+                'order_id': 'unknown',
+                'success': False,
+                'error': 'No order ID found',
+                'is_valid': False
+            }, None, None
 
-                # Get detailed order data
-                order_detail_data = locus_auth.get_order_detail(
-                    config.BEARER_TOKEN,
-                    'illa-frontdoor',
-                    order_id
-                )
+        # Detailed order data: the copy a recent run stored, else fetched from Locus and stored
+        order_detail_data = grn_document_service.get_fresh_detail(order_id)
+        if order_detail_data is None:
+            order_detail_data = locus_auth.get_order_detail(
+                config.BEARER_TOKEN,
+                'illa-frontdoor',
+                order_id
+            )
+            if order_detail_data:
+                grn_document_service.record_detail(order_id, order_detail_data)
 
-                if not order_detail_data:
-                    return {
-                        'order_id': order_id,
-                        'success': False,
-                        'error': 'Could not fetch order details',
-                        'is_valid': False
-                    }
+        if not order_detail_data:
+            return {
+                'order_id': order_id,
+                'success': False,
+                'error': 'Could not fetch order details',
+                'is_valid': False
+            }, None, None
+
+        # Get GRN document URL
+        grn_url = find_grn_url(order_detail_data)
+        if not grn_url:
+            return {
+                'order_id': order_id,
+                'success': False,
+                'error': 'Order has no GRN document - skipped from validation',
+                'is_valid': False,
+                'skipped_no_grn': True
+            }, None, None
 
-                # Check if order has GRN document first
-                if not has_grn_document(order_detail_data):
-                    return {
-                        'order_id': order_id,
-                        'success': False,
-                        'error': 'Order has no GRN document - skipped from validation',
-                        'is_valid': False,
-                        'skipped_no_grn': True
-                    }
+        order_detail_data = apply_local_line_item_edits(order_detail_data)
 
-                # Get GRN document URL
-                grn_url = None
-                if (order_detail_data.get('orderMetadata', {}).get('customerProofOfCompletion', {}).get('Proof Of Delivery Document')):
-                    grn_url = order_detail_data['orderMetadata']['customerProofOfCompletion']['Proof Of Delivery Document']['Proof Of Delivery Document']
+        # Check for existing validation result to avoid unnecessary API calls
+        stored_result = ai_validator.find_reusable_validation(order_detail_data, grn_url,
+                                                              reuse_unfingerprinted=not force_reprocess)
+        if stored_result:
+            logger.info(f"Using stored validation result for order {order_id}")
+            stored_result['order_id'] = order_id
+            stored_result['from_cache'] = True
+            return stored_result, None, None
 
-                if not grn_url:
-                    return {
-                        'order_id': order_id,
-                        'success': False,
-                        'error': 'No GRN document found',
-                        'is_valid': False
-                    }
+        return None, order_detail_data, grn_url
 
-                # Check for existing validation result to avoid unnecessary API calls
-                if not force_reprocess:
-                    stored_result = ai_validator.get_stored_validation_result(order_id, grn_url)
-                    if stored_result:
-                        logger.info(f"Using stored validation result for order {order_id}")
-                        stored_result['order_id'] = order_id
-                        stored_result['from_cache'] = True
-                        return stored_result
+    def validate_single_order_worker(order_basic, date, force_reprocess=False):
+        """Worker function to validate a single order in a thread"""
+        # Create application context for database operations in thread
+        with app.app_context():
+            try:
+                result, order_detail_data, grn_url = resolve_order_for_validation(order_basic, force_reprocess)
+                if result is not None:
+                    return result
 
                 # Validate using Google AI with rate limiting (only if not cached or forced reprocess)
+                order_id = order_basic.get('id')
                 logger.info(f"Calling Google AI API for order {order_id}")
 
-                # Apply rate limiting and concurrency control
-                with api_rate_limiter:  # Limit concurrent API calls
-                    rate_limit_api_call()  # Apply time-based rate limiting
-                    validation_result = ai_validator.validate_grn_against_order(order_detail_data, grn_url)
+                # Gemini rate and concurrency limits are applied per request by the shared HTTP client
+                validation_result = ai_validator.validate_grn_against_order(order_detail_data, grn_url)
 
                 validation_result['order_id'] = order_id
                 validation_result['from_cache'] = False
@@ -383,6 +358,37 @@ def register_routes(app, config):
                     'from_cache': False
                 }
 
+    def validate_order_batch_worker(order_basics, date, force_reprocess=False):
+        """Worker function validating several orders in a thread with one Google AI request; results keyed by order id"""
+        with app.app_context():
+            results = {}
+            to_validate = []
+            for order_basic in order_basics:
+                order_id = order_basic.get('id', 'unknown')
+                try:
+                    result, order_detail_data, grn_url = resolve_order_for_validation(order_basic, force_reprocess)
+                except Exception as e:
+                    logger.error(f"Error preparing order {order_id} for validation: {e}")
+                    result = {'order_id': order_id, 'success': False, 'error': str(e), 'is_valid': False, 'from_cache': False}
+                if result is not None:
+                    results[order_id] = result
+                else:
+                    to_validate.append((order_detail_data, grn_url))
+
+            if to_validate:
+                logger.info(f"Calling Google AI API for {len(to_validate)} orders in one batch")
+                try:
+                    batch_results = ai_validator.validate_grn_batch(to_validate)
+                except Exception as e:
+                    logger.error(f"Error validating order batch in worker thread: {e}")
+                    batch_results = {order_detail_data.get('id'): {'success': False, 'error': str(e), 'is_valid': False}
+                                     for order_detail_data, _ in to_validate}
+                for order_id, validation_result in batch_results.items():
+                    validation_result['order_id'] = order_id
+                    validation_result['from_cache'] = False
+                    results[order_id] = validation_result
+            return results
+
     @app.route('/')
     def index():
         """Main route - directly show dashboard with provided token"""
@@ -507,15 +513,19 @@ def register_routes(app, config):
 
         # Enhance orders with validation summaries and GRN status
         if orders_data and orders_data.get('orders'):
+            # Latest validation for every order on the page in one query
+            stored_validations = ai_validator.get_latest_validation_results(
+                [order.get('id') for order in orders_data['orders']])
+
             for order in orders_data['orders']:
                 order_id = order.get('id')
 
-                # Check if order has GRN document
-                order['has_grn'] = has_grn_document(order)
+                # Check if order has GRN document (URL stored at ingest, else the payload itself)
+                order['has_grn'] = bool(order.get('grn_url')) or has_grn_document(order)
 
                 if order_id:
                     # Get validation summary for this order
-                    validation_summary = ai_validator.get_stored_validation_result(order_id)
+                    validation_summary = stored_validations.get(order_id)
                     if validation_summary:
                         # Parse stored JSON fields if they're strings
                         try:
@@ -966,63 +976,13 @@ def register_routes(app, config):
                     'error': f'Order {order_id} not found'
                 })
 
-            # Get GRN document URL - try multiple possible paths
-            grn_url = None
-
-            # Try different possible paths where the GRN might be stored
-            possible_paths = [
-                # Direct path
-                ['orderMetadata', 'customerProofOfCompletion', 'Proof Of Delivery Document', 'Proof Of Delivery Document'],
-                ['orderMetadata', 'customerProofOfCompletion', 'proofOfDeliveryDocument'],
-                ['orderMetadata', 'customerProofOfCompletion', 'deliveryDocument'],
-                # Alternative paths
-                ['proofOfDelivery', 'document'],
-                ['proofOfDelivery', 'documentUrl'],
-                ['proofOfDelivery', 'deliveryDocument'],
-                ['customerProofOfCompletion', 'deliveryDocument'],
-                ['customerProofOfCompletion', 'document'],
-            ]
-
-            # Debug: Log the available proof keys
-            proof_data = order_detail_data.get('orderMetadata', {}).get('customerProofOfCompletion', {})
-            logger.info(f"Available proof keys for order {order_id}: {list(proof_data.keys())}")
+            # Keep the stored detail and GRN URL current for validation jobs
+            grn_document_service.record_detail(order_id, order_detail_data)
 
-            # Try each possible path
-            for path in possible_paths:
-                current_data = order_detail_data
-                try:
-                    for key in path:
-                        current_data = current_data[key]
-                    if isinstance(current_data, str) and current_data.startswith('http'):
-                        grn_url = current_data
-                        logger.info(f"Found GRN URL at path {' -> '.join(path)}: {grn_url}")
-                        break
-                except (KeyError, TypeError):
-                    continue
-
-            # If still no URL, try to find any URL in the proof data
-            if not grn_url and proof_data:
-                def find_urls_recursive(obj, path=""):
-                    urls = []
-                    if isinstance(obj, dict):
-                        for key, value in obj.items():
-                            new_path = f"{path}.{key}" if path else key
-                            if isinstance(value, str) and value.startswith('http'):
-                                urls.append((new_path, value))
-                            elif isinstance(value, (dict, list)):
-                                urls.extend(find_urls_recursive(value, new_path))
-                    elif isinstance(obj, list):
-                        for i, item in enumerate(obj):
-                            new_path = f"{path}[{i}]"
-                            urls.extend(find_urls_recursive(item, new_path))
-                    return urls
-
-                found_urls = find_urls_recursive(proof_data)
-                logger.info(f"Found URLs in proof data: {found_urls}")
-
-                if found_urls:
-                    grn_url = found_urls[0][1]  # Take the first URL found
-                    logger.info(f"Using first found URL: {grn_url}")
+            # Get GRN document URL
+            grn_url = find_grn_url(order_detail_data)
+            proof_data = order_detail_data.get('orderMetadata', {}).get('customerProofOfCompletion', {})
+            logger.info(f"GRN URL for order {order_id}: {grn_url}")
 
             if not grn_url:
                 # Enhanced error message with available data structure
@@ -1035,8 +995,9 @@ def register_routes(app, config):
                     }
                 })
 
-            # Check if there's a stored validation result for this order and GRN
-            stored_result = ai_validator.get_stored_validation_result(order_id, grn_url)
+            # Check if there's a stored validation result for this order and GRN that still matches its inputs
+            order_detail_data = apply_local_line_item_edits(order_detail_data)
+            stored_result = ai_validator.find_reusable_validation(order_detail_data, grn_url)
 
             # If force reprocess is requested, skip stored result
             force_reprocess = False
@@ -1125,9 +1086,54 @@ def register_routes(app, config):
                 'error': str(e)
             })
 
+    def plan_validation_orders(job):
+        """Orders a validation job should validate: those with a GRN document, minus already validated ones in cost-effective mode.
+
+        The date's orders are loaded into the database if needed. Candidates
+        then come from one query over the GRN URLs stored at ingest. Orders
+        whose GRN is still unknown stay candidates until a fetched detail shows
+        whether they have one.
+        """
+        date = job.date.isoformat()
+
+        # Make sure the date's orders are stored (served from the database when they already are)
+        orders_data = locus_auth.get_orders(
+            config.BEARER_TOKEN,
+            'illa-frontdoor',
+            date=date,
+            fetch_all=True
+        )
+
+        if not orders_data or not orders_data.get('orders'):
+            raise RuntimeError('No orders found')
+
+        total_orders = len(orders_data['orders'])
+        unvalidated_only = job.validate_mode == 'unvalidated_only' and not job.force_reprocess
+        candidates = grn_document_service.select_candidates('illa-frontdoor', job.date, unvalidated_only)
+        orders_without_grn = max(total_orders - candidates['with_grn'] - candidates['unknown'], 0)
+        order_ids = candidates['order_ids']
+
+        logger.info(f"Total orders: {total_orders}, with GRN: {candidates['with_grn']}, GRN not yet known: "
+                    f"{candidates['unknown']}, without GRN: {orders_without_grn}, to validate: {len(order_ids)}"
+                    f"{' (unvalidated only)' if unvalidated_only else ''}")
+        return {
+            'total_orders': total_orders,
+            'orders_with_grn': candidates['with_grn'],
+            'orders_without_grn': orders_without_grn,
+            'order_ids': order_ids
+        }
+
+    # Background validation jobs run the same planning and per-order steps (in a thread or validation_worker.py)
+    validation_job_service.register_handlers(plan_validation_orders, validate_single_order_worker,
+                                             validate_order_batch_worker)
+
     @app.route('/validate-all-orders', methods=['POST'])
     def validate_all_orders():
-        """Validate all orders for today against their GRN documents using parallel processing with cost optimization"""
+        """Queue a background job validating all orders of a date against their GRN documents.
+
+        Returns immediately with the job id; progress is available from
+        /api/validation-jobs/<job_id> and streamed from .../events.
+        """
         try:
             date = request.args.get('date', datetime.now().strftime("%Y-%m-%d"))
 
@@ -1146,140 +1152,118 @@ def register_routes(app, config):
             except Exception:
                 pass  # Use defaults
 
-            logger.info(f"Starting batch validation with {max_workers} threads, mode: {validate_mode}")
-
-            # Get all orders
-            orders_data = locus_auth.get_orders(
-                config.BEARER_TOKEN,
-                'illa-frontdoor',
-                date=date,
-                fetch_all=True
-            )
-
-            if not orders_data or not orders_data.get('orders'):
-                return jsonify({
-                    'success': False,
-                    'error': 'No orders found'
-                })
+            job_date = datetime.strptime(date, "%Y-%m-%d").date()
+            job = validation_job_service.enqueue(job_date, validate_mode, force_reprocess, max_workers, app=app)
+            logger.info(f"Queued batch validation job {job.id} with {max_workers} threads, mode: {validate_mode}")
 
-            all_orders = orders_data['orders']
+            return jsonify({
+                'success': True,
+                'job_id': job.id,
+                'status': job.status,
+                'validate_mode': validate_mode,
+                'threads_used': max_workers,
+                'status_url': url_for('api_validation_job_status', job_id=job.id),
+                'events_url': url_for('api_validation_job_events', job_id=job.id)
+            }), 202
 
-            # First, filter out orders without GRN documents
-            orders_with_grn = []
-            orders_without_grn = 0
-            for order in all_orders:
-                if has_grn_document(order):
-                    orders_with_grn.append(order)
-                else:
-                    orders_without_grn += 1
-
-            logger.info(f"Filtered out {orders_without_grn} orders without GRN documents")
-
-            # Filter orders based on validation mode to minimize API costs
-            orders_to_validate = []
-            if validate_mode == 'unvalidated_only':
-                logger.info("Filtering to only unvalidated orders to minimize API costs...")
-                for order in orders_with_grn:
-                    order_id = order.get('id')
-                    if order_id:
-                        # Quick check for stored validation result
-                        stored_result = ai_validator.get_stored_validation_result(order_id)
-                        if not stored_result or force_reprocess:
-                            orders_to_validate.append(order)
-            else:
-                orders_to_validate = orders_with_grn
+        except Exception as e:
+            logger.error(f"Error queueing validation job: {e}")
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            })
 
-            total_orders = len(all_orders)
-            total_orders_with_grn = len(orders_with_grn)
-            orders_to_process = len(orders_to_validate)
+    @app.route('/api/validation-jobs/<int:job_id>', methods=['GET'])
+    def api_validation_job_status(job_id):
+        """Progress, counters and throughput of a validation job (results with ?include_results=true)"""
+        try:
+            include_results = request.args.get('include_results', 'false').lower() == 'true'
+            status = validation_job_service.get_status(job_id, include_results=include_results)
+            if status is None:
+                return jsonify({'success': False, 'error': 'Job not found'}), 404
 
-            logger.info(f"Total orders: {total_orders}, Orders to validate: {orders_to_process}")
+            if status['status'] in ('queued', 'running') and validation_job_service.runner == 'thread':
+                # Picks the job back up if the process that ran it went away
+                validation_job_service.ensure_thread_worker(app)
 
-            if orders_to_process == 0:
-                return jsonify({
-                    'success': True,
-                    'message': 'All orders already validated - no API calls needed!',
-                    'total_orders': total_orders,
-                    'processed': 0,
-                    'errors': 0,
-                    'skipped': total_orders,
-                    'results': [],
-                    'api_calls_saved': total_orders,
-                    'threads_used': 0
-                })
+            return jsonify({'success': True, 'job': status}), 200
+        except Exception as e:
+            logger.error(f"Error getting validation job {job_id}: {e}")
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 500
 
-            validation_results = []
-            processed = 0
-            errors = 0
-            progress_lock = threading.Lock()
-
-            # Use ThreadPoolExecutor for parallel processing with rate limiting
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                # Submit validation tasks only for orders that need validation
-                future_to_order = {
-                    executor.submit(validate_single_order_worker, order, date, force_reprocess): order
-                    for order in orders_to_validate
-                }
+    @app.route('/api/validation-jobs/<int:job_id>/events', methods=['GET'])
+    def api_validation_job_events(job_id):
+        """Server-Sent Events: one 'order' event per completed order, 'progress' after each batch, 'done' at the end.
 
-                # Collect results as they complete
-                for future in as_completed(future_to_order):
-                    order = future_to_order[future]
-                    try:
-                        result = future.result()
-                        with progress_lock:
-                            validation_results.append(result)
-                            if result.get('success', False):
-                                processed += 1
-                            else:
-                                errors += 1
-
-                            # Log progress every 10 completions
-                            total_completed = processed + errors
-                            if total_completed % 10 == 0 or total_completed == orders_to_process:
-                                logger.info(f"Progress: {total_completed}/{orders_to_process} orders completed")
-
-                    except Exception as e:
-                        with progress_lock:
-                            logger.error(f"Error processing future for order {order.get('id', 'unknown')}: {e}")
-                            validation_results.append({
-                                'order_id': order.get('id', 'unknown'),
-                                'success': False,
-                                'error': f'Thread execution error: {str(e)}',
-                                'is_valid': False
-                            })
-                            errors += 1
-
-            # Count API calls made vs cached results
-            api_calls_made = sum(1 for result in validation_results if not result.get('from_cache', False))
-            cached_results = sum(1 for result in validation_results if result.get('from_cache', False))
-            skipped_orders = total_orders - orders_to_process
-            skipped_no_grn = sum(1 for result in validation_results if result.get('skipped_no_grn', False))
-
-            logger.info(f"Batch validation completed: {processed} processed, {errors} errors")
-            logger.info(f"API optimization: {api_calls_made} API calls made, {cached_results} from cache, {skipped_orders} skipped")
-            logger.info(f"Orders excluded: {orders_without_grn} without GRN documents")
+        Event ids are completion sequence numbers, so a reconnecting
+        EventSource (Last-Event-ID) continues where it left off.
+        """
+        try:
+            after = int(request.headers.get('Last-Event-ID') or request.args.get('after', 0))
+        except ValueError:
+            after = 0
+
+        def stream(after_sequence):
+            while True:
+                with app.app_context():
+                    # Status first: once it is final, every event is already stored and read below
+                    status = validation_job_service.get_status(job_id)
+                    events = validation_job_service.get_events(job_id, after_sequence)
+                    db.session.remove()
+
+                if status is None:
+                    yield f"event: error\ndata: {json.dumps({'error': 'Job not found'})}\n\n"
+                    return
+
+                for event in events:
+                    after_sequence = event['sequence']
+                    yield f"id: {after_sequence}\nevent: order\ndata: {json.dumps(event, default=str)}\n\n"
+
+                if events or status['status'] not in ('queued', 'running'):
+                    yield f"event: progress\ndata: {json.dumps(status, default=str)}\n\n"
+
+                if status['status'] not in ('queued', 'running') and len(events) < 200:
+                    yield f"event: done\ndata: {json.dumps(status, default=str)}\n\n"
+                    return
+
+                if not events:
+                    # Keeps proxies from closing an idle stream
+                    yield ": keep-alive\n\n"
+                    time.sleep(validation_job_service.poll_interval)
+
+        response = Response(stream(after), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
 
+    @app.route('/api/validation-jobs/<int:job_id>/cancel', methods=['POST'])
+    def api_cancel_validation_job(job_id):
+        """Stop a queued or running validation job (orders already validated keep their results)"""
+        try:
+            cancelled = validation_job_service.cancel(job_id)
+            return jsonify({'success': cancelled, 'job': validation_job_service.get_status(job_id)}), 200 if cancelled else 409
+        except Exception as e:
+            logger.error(f"Error cancelling validation job {job_id}: {e}")
             return jsonify({
-                'success': True,
-                'total_orders': total_orders,
-                'orders_with_grn': total_orders_with_grn,
-                'orders_without_grn': orders_without_grn,
-                'processed': processed,
-                'errors': errors,
-                'skipped': skipped_orders,
-                'results': validation_results,
-                'threads_used': max_workers,
-                'api_calls_made': api_calls_made,
-                'cached_results': cached_results,
-                'validate_mode': validate_mode
-            })
+                'success': False,
+                'error': str(e)
+            }), 500
 
+    @app.route('/api/validation-jobs/metrics', methods=['GET'])
+    def api_validation_job_metrics():
+        """Queue depth (jobs and pending orders) and orders/minute over the last ?window minutes"""
+        try:
+            window = max(request.args.get('window', 15, type=int), 1)
+            return jsonify({'success': True, 'metrics': validation_job_service.get_metrics(window)}), 200
         except Exception as e:
-            logger.error(f"Error validating all orders: {e}")
+            logger.error(f"Error getting validation job metrics: {e}")
             return jsonify({
                 'success': False,
                 'error': str(e)
-            })
+            }), 500
 
     # API endpoints for testing compatibility
     @app.route('/api/login', methods=['POST'])
@@ -1490,6 +1474,39 @@ def register_routes(app, config):
                 'error': str(e)
             }), 500
 
+    @app.route('/api/system/cache-stats', methods=['GET'])
+    def api_cache_stats():
+        """Hit, miss and eviction counters of the result cache, the GRN image cache and the GTIN cache"""
+        try:
+            return jsonify({
+                'success': True,
+                'cache': result_cache.get_stats(),
+                'image_cache': grn_image_cache.get_stats(),
+                'gtin_cache': gtin_cache.get_stats()
+            }), 200
+        except Exception as e:
+            logger.error(f"Error getting cache stats: {e}")
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 500
+
+    @app.route('/api/system/http-metrics', methods=['GET'])
+    def api_http_metrics():
+        """Per-host metrics for outbound Locus, GS1 and Gemini calls, plus wait/throttle metrics of their rate limits"""
+        try:
+            return jsonify({
+                'success': True,
+                'hosts': http_client.get_metrics(),
+                'rate_limits': rate_limiters.get_metrics()
+            }), 200
+        except Exception as e:
+            logger.error(f"Error getting HTTP metrics: {e}")
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 500
+
     @app.route('/api/orders/filter', methods=['POST'])
     def api_filter_orders():
         """Main filtering endpoint - returns filtered orders based on criteria"""
@@ -1513,9 +1530,11 @@ def register_routes(app, config):
 
             # Enhance orders with validation summaries and GRN status
             enhanced_orders = []
+            stored_validations = ai_validator.get_latest_validation_results(
+                [order['id'] for order in result['orders']])
             for order in result['orders']:
                 # Add validation summary
-                validation_summary = ai_validator.get_stored_validation_result(order['id'])
+                validation_summary = stored_validations.get(order['id'])
                 if validation_summary:
                     order['validation_summary'] = {
                         'has_validation': True,
@@ -1899,6 +1918,26 @@ def register_routes(app, config):
         response.headers['Expires'] = '0'
         return response
 
+    @app.route('/api/dashboard/stats')
+    def api_dashboard_stats():
+        """Summary cards for an order-date range, summed from the per-day dashboard_stats rows"""
+        from app.dashboard_stats import dashboard_stats_service
+
+        today = datetime.now().strftime("%Y-%m-%d")
+        date_from = request.args.get('date_from') or request.args.get('date') or today
+        date_to = request.args.get('date_to') or date_from
+
+        try:
+            datetime.strptime(date_from, "%Y-%m-%d")
+            datetime.strptime(date_to, "%Y-%m-%d")
+        except ValueError:
+            return jsonify({'success': False, 'error': 'Invalid date format. Please use YYYY-MM-DD.'}), 400
+
+        result = dashboard_stats_service.get_range_summary(date_from, date_to)
+        if request.args.get('include_days', 'false').lower() == 'true' and result.get('success'):
+            result['days_detail'] = [stats.to_dict() for stats in dashboard_stats_service.get_range_rows(date_from, date_to)]
+        return jsonify(result)
+
     @app.route('/api/tours/summary')
     def api_tours_summary():
         """API endpoint to get tour summary statistics"""
@@ -1909,6 +1948,9 @@ def register_routes(app, config):
         date_from = request.args.get('date_from')
         date_to = request.args.get('date_to')
 
+        # Order-date range as requested (before the tour-date shift below)
+        orders_range = (date_from, date_to or date_from) if date_from else ((date, date) if date else None)
+
         # Convert orders date to tour date if provided
         # Tours are created 1 day before the orders they contain
         if date_from and date_to:
@@ -1941,6 +1983,16 @@ def register_routes(app, config):
 
         result = tour_service.get_tour_summary_stats(date=date, date_from=date_from, date_to=date_to)
 
+        # Order and validation cards summed from the pre-aggregated dashboard_stats rows
+        if result.get('success') and orders_range:
+            from app.dashboard_stats import dashboard_stats_service
+            try:
+                datetime.strptime(orders_range[0], "%Y-%m-%d")
+                datetime.strptime(orders_range[1], "%Y-%m-%d")
+                result['order_stats'] = dashboard_stats_service.get_range_summary(*orders_range)
+            except ValueError:
+                pass
+
         response = make_response(jsonify(result))
         # Add cache-busting headers
         response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
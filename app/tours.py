@@ -5,16 +5,96 @@ Handles tour data operations, aggregation, and API endpoints
 
 import logging
 import json
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from collections import defaultdict
 from typing import List, Dict, Optional, Tuple
 
 from models import db, Order, Tour
-from sqlalchemy import func, desc, asc
+from app.projections import order_load_options, serialize_orders
+from app.cache import result_cache, ALL_DATES_TAG, date_tag
+from app.filters import MAX_TAGGED_DAYS
+from sqlalchemy import func, desc, asc, case, and_, not_, exists, update, bindparam
 from sqlalchemy.orm import sessionmaker
 
 logger = logging.getLogger(__name__)
 
+# Keep IN lists and multi-row upserts well below driver parameter limits
+TOUR_STATS_CHUNK_SIZE = 500
+
+# Order counters of a tour, kept up to date incrementally as its orders change
+TOUR_COUNTER_COLUMNS = ('total_orders', 'completed_orders', 'cancelled_orders', 'pending_orders', 'waiting_orders')
+# Tour columns a statistics refresh writes (each is skipped on tours where it was edited manually)
+TOUR_STATISTICS_COLUMNS = TOUR_COUNTER_COLUMNS + ('tour_status', 'delivery_cities', 'delivery_areas')
+# Tour columns a statistics refresh only fills in when they are still empty
+TOUR_DETAIL_COLUMNS = ('rider_name', 'vehicle_registration', 'tour_start_time', 'tour_end_time')
+
+
+def tour_day_range(date: str = None, date_from: str = None, date_to: str = None, offset_days: int = 0):
+    """First and last tour day (inclusive) selected by the date / date_from / date_to filters.
+
+    date_from with date_to is a range, date_from or date alone a single day.
+    ``offset_days`` shifts both ends (tours run the day before their orders'
+    date). Returns (None, None) without a date; raises ValueError for a
+    malformed one.
+    """
+    if date_from and date_to:
+        first, last = date_from, date_to
+    elif date_from or date:
+        first = last = date_from or date
+    else:
+        return None, None
+    shift = timedelta(days=offset_days)
+    return (datetime.strptime(first, '%Y-%m-%d').date() + shift,
+            datetime.strptime(last, '%Y-%m-%d').date() + shift)
+
+
+def filter_tour_days(query, column, date: str = None, date_from: str = None, date_to: str = None, offset_days: int = 0):
+    """Restrict a query to a tour_day range (an index range scan on tour_day)"""
+    first, last = tour_day_range(date, date_from, date_to, offset_days)
+    if first is None:
+        return query
+    if first == last:
+        return query.filter(column == first)
+    return query.filter(column >= first, column <= last)
+
+
+def _facet_cache_tags(first_day, last_day):
+    """Cache tags of the facets of a tour day range: every tour day they read"""
+    if first_day is None or (last_day - first_day).days > MAX_TAGGED_DAYS:
+        return {ALL_DATES_TAG}
+    return {date_tag(first_day + timedelta(days=offset)) for offset in range((last_day - first_day).days + 1)}
+
+
+def invalidate_tour_facets(tour_days):
+    """Drop the cached filter options (facets) covering any of the tour days once the session commits"""
+    days = {day for day in tour_days if day}
+    if days:
+        result_cache.invalidate_on_commit(db.session, dates=days)
+
+
+def _json_set(value):
+    """Set of the values of a stored JSON list (empty for NULL or malformed text)"""
+    try:
+        values = json.loads(value) if value else []
+    except (json.JSONDecodeError, TypeError):
+        return set()
+    return set(values) if isinstance(values, list) else set()
+
+
+def _is_protected(column):
+    """SQL condition: the tour lists ``column`` among its manually modified fields"""
+    table = Tour.__table__
+    return and_(table.c.is_modified == True, table.c.modified_fields.like(f'%"{column}"%'))
+
+
+def _tour_status_expression():
+    """TourService.calculate_tour_status as a SQL expression over the stored counters"""
+    total, completed, cancelled, waiting = (func.coalesce(Tour.__table__.c[column], 0) for column in
+                                            ('total_orders', 'completed_orders', 'cancelled_orders', 'waiting_orders'))
+    return case((total == 0, 'WAITING'), (cancelled == total, 'CANCELLED'),
+                (completed + cancelled == total, 'COMPLETED'), (waiting == total, 'WAITING'), else_='ONGOING')
+
+
 class TourService:
     """Service class for managing tour data and operations"""
 
@@ -107,6 +187,7 @@ class TourService:
                         pass
 
             db.session.add(tour)
+            invalidate_tour_facets([tour.tour_day])
             db.session.commit()
 
             logger.info(f"Created new tour: {tour_id}")
@@ -141,22 +222,11 @@ class TourService:
             tour.completed_orders = len(completed_orders)
             tour.cancelled_orders = len(cancelled_orders)
             tour.pending_orders = tour.total_orders - tour.completed_orders - tour.cancelled_orders
+            tour.waiting_orders = len(waiting_orders)
 
             # Calculate tour status based on order statuses
-            if tour.total_orders == 0:
-                tour.tour_status = 'WAITING'
-            elif len(cancelled_orders) == tour.total_orders:
-                # All orders are cancelled
-                tour.tour_status = 'CANCELLED'
-            elif len(completed_orders) + len(cancelled_orders) == tour.total_orders:
-                # All orders are either completed or cancelled (consider cancelled as completed for tour)
-                tour.tour_status = 'COMPLETED'
-            elif len(waiting_orders) == tour.total_orders:
-                # All orders are waiting
-                tour.tour_status = 'WAITING'
-            else:
-                # Mixed statuses - some completed/ongoing/cancelled
-                tour.tour_status = 'ONGOING'
+            tour.tour_status = self.calculate_tour_status(tour.total_orders, len(completed_orders),
+                                                          len(cancelled_orders), len(waiting_orders))
 
             # Collect location data
             cities = set()
@@ -178,6 +248,7 @@ class TourService:
             if not tour.vehicle_registration and orders:
                 tour.vehicle_registration = orders[0].vehicle_registration
 
+            invalidate_tour_facets([tour.tour_day])
             db.session.commit()
             logger.info(f"Updated statistics for tour {tour_id}: {tour.total_orders} orders")
 
@@ -185,6 +256,328 @@ class TourService:
             logger.error(f"Error updating tour statistics for {tour_id}: {e}")
             db.session.rollback()
 
+    @staticmethod
+    def calculate_tour_status(total: int, completed: int, cancelled: int, waiting: int) -> str:
+        """Tour status from its order status counts (cancelled orders count as done)"""
+        if total == 0:
+            return 'WAITING'
+        if cancelled == total:
+            # All orders are cancelled
+            return 'CANCELLED'
+        if completed + cancelled == total:
+            # All orders are either completed or cancelled (consider cancelled as completed for tour)
+            return 'COMPLETED'
+        if waiting == total:
+            return 'WAITING'
+        # Mixed statuses - some completed/ongoing/cancelled
+        return 'ONGOING'
+
+    @staticmethod
+    def _parse_tour_time(value):
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except (AttributeError, ValueError, TypeError):
+            return None
+
+    def _aggregate_tour_orders(self, tour_ids: List[str]) -> Dict[str, dict]:
+        """Order statistics of the given tours: one GROUP BY tour_id and one DISTINCT location query per chunk"""
+        stats = {}
+        for start in range(0, len(tour_ids), TOUR_STATS_CHUNK_SIZE):
+            chunk = tour_ids[start:start + TOUR_STATS_CHUNK_SIZE]
+
+            rows = db.session.query(
+                Order.tour_id, func.count(Order.id),
+                func.sum(case((Order.order_status == 'COMPLETED', 1), else_=0)),
+                func.sum(case((Order.order_status == 'CANCELLED', 1), else_=0)),
+                func.sum(case((Order.order_status == 'WAITING', 1), else_=0)),
+                func.min(Order.rider_name), func.min(Order.vehicle_registration)
+            ).filter(Order.tour_id.in_(chunk)).group_by(Order.tour_id).all()
+
+            locations = self._tour_locations(chunk)
+            for tour_id, total, completed, cancelled, waiting, rider_name, vehicle_registration in rows:
+                cities, areas = locations.get(tour_id, (set(), set()))
+                stats[tour_id] = {'total': total, 'completed': int(completed or 0), 'cancelled': int(cancelled or 0),
+                                  'waiting': int(waiting or 0), 'rider_name': rider_name,
+                                  'vehicle_registration': vehicle_registration, 'cities': cities, 'areas': areas}
+        return stats
+
+    @staticmethod
+    def _tour_locations(tour_ids: List[str]) -> Dict[str, Tuple[set, set]]:
+        """{tour_id: (cities, areas)} of the orders of the given tours (one chunk), from one DISTINCT query"""
+        locations = {}
+        rows = db.session.query(Order.tour_id, Order.location_city, Order.location_name) \
+            .filter(Order.tour_id.in_(tour_ids)).distinct().all()
+        for tour_id, city, area in rows:
+            cities, areas = locations.setdefault(tour_id, (set(), set()))
+            if city:
+                cities.add(city)
+            if area:
+                areas.add(area)
+        return locations
+
+    def _refresh_tour_locations(self, tour_ids: List[str]):
+        """Rewrite delivery_cities / delivery_areas of existing tours from their orders, except where edited manually"""
+        table = Tour.__table__
+        values = {column: case((_is_protected(column), table.c[column]), else_=bindparam(f'v_{column}'))
+                  for column in ('delivery_cities', 'delivery_areas')}
+        stmt = update(table).where(table.c.tour_id == bindparam('b_tour_id')).values(values)
+        for start in range(0, len(tour_ids), TOUR_STATS_CHUNK_SIZE):
+            chunk = tour_ids[start:start + TOUR_STATS_CHUNK_SIZE]
+            locations = self._tour_locations(chunk)
+            params = []
+            for tour_id in chunk:
+                cities, areas = locations.get(tour_id, (set(), set()))
+                params.append({'b_tour_id': tour_id, 'v_delivery_cities': json.dumps(sorted(cities)),
+                               'v_delivery_areas': json.dumps(sorted(areas))})
+            db.session.execute(stmt, params)
+
+    def _upsert_tours(self, rows: List[dict]):
+        """Write tour rows with one INSERT ... ON CONFLICT (tour_id) DO UPDATE per chunk.
+
+        On existing tours, a column listed in the tour's modified_fields keeps
+        its value, and TOUR_DETAIL_COLUMNS are only filled in when empty.
+        """
+        dialect = db.engine.dialect.name
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+
+        table = Tour.__table__
+        for start in range(0, len(rows), TOUR_STATS_CHUNK_SIZE):
+            stmt = dialect_insert(table)
+            set_ = {'updated_at': stmt.excluded.updated_at}
+            for column in TOUR_STATISTICS_COLUMNS:
+                set_[column] = case((_is_protected(column), table.c[column]), else_=stmt.excluded[column])
+            for column in TOUR_DETAIL_COLUMNS:
+                current = func.nullif(table.c[column], '') if column in ('rider_name', 'vehicle_registration') else table.c[column]
+                set_[column] = case((_is_protected(column), table.c[column]),
+                                    else_=func.coalesce(current, stmt.excluded[column]))
+            stmt = stmt.on_conflict_do_update(index_elements=[table.c.tour_id], set_=set_)
+            db.session.execute(stmt, rows[start:start + TOUR_STATS_CHUNK_SIZE])
+
+    def bulk_update_tour_statistics(self, tour_details: Dict[str, Optional[dict]]) -> int:
+        """Create or refresh the Tour rows of many tours at once (caller commits).
+
+        ``tour_details`` maps tour ids to the tourDetail of one of their
+        orders (or None), used for rider, vehicle and start/end times. Order
+        statistics come from one GROUP BY tour_id aggregate, and all tours
+        are written with a single upsert that leaves manually modified
+        fields alone. Returns the number of tours written.
+        """
+        dialect = db.engine.dialect.name
+        if dialect not in ('postgresql', 'sqlite'):
+            # No ON CONFLICT support: per-tour path
+            for tour_id, tour_detail in tour_details.items():
+                self.get_or_create_tour(tour_id, tour_detail)
+                self.update_tour_statistics(tour_id)
+            return len(tour_details)
+
+        stats = self._aggregate_tour_orders(list(tour_details))
+        now = datetime.now(timezone.utc)
+        rows = []
+        for tour_id, tour_stats in stats.items():
+            tour_date, plan_id, tour_name, tour_number = self.parse_tour_id(tour_id)
+            if not tour_date:
+                logger.error(f"Could not parse tour ID: {tour_id}")
+                continue
+
+            tour_detail = tour_details.get(tour_id) or {}
+            total, completed, cancelled = tour_stats['total'], tour_stats['completed'], tour_stats['cancelled']
+            rows.append({
+                'tour_id': tour_id,
+                'tour_date': tour_date,
+                'tour_day': Tour.parse_tour_day(tour_date),
+                'tour_plan_id': plan_id,
+                'tour_name': tour_name,
+                'tour_number': tour_number or 0,
+                'rider_name': tour_detail.get('riderName') or tour_stats['rider_name'],
+                'vehicle_registration': tour_detail.get('vehicleRegistrationNumber') or tour_stats['vehicle_registration'],
+                'tour_start_time': self._parse_tour_time(tour_detail.get('tourStartTime')),
+                'tour_end_time': self._parse_tour_time(tour_detail.get('tourEndTime')),
+                'total_orders': total,
+                'completed_orders': completed,
+                'cancelled_orders': cancelled,
+                'pending_orders': total - completed - cancelled,
+                'waiting_orders': tour_stats['waiting'],
+                'tour_status': self.calculate_tour_status(total, completed, cancelled, tour_stats['waiting']),
+                'delivery_cities': json.dumps(sorted(tour_stats['cities'])),
+                'delivery_areas': json.dumps(sorted(tour_stats['areas'])),
+                'updated_at': now
+            })
+
+        if rows:
+            self._upsert_tours(rows)
+            invalidate_tour_facets(row['tour_day'] for row in rows)
+        logger.info(f"TOUR STATS: Refreshed {len(rows)} tours in bulk")
+        return len(rows)
+
+    @staticmethod
+    def order_contribution(order_status: Optional[str]) -> dict:
+        """Counter values one order with this status adds to its tour"""
+        completed = 1 if order_status == 'COMPLETED' else 0
+        cancelled = 1 if order_status == 'CANCELLED' else 0
+        return {'total_orders': 1, 'completed_orders': completed, 'cancelled_orders': cancelled,
+                'pending_orders': 1 - completed - cancelled, 'waiting_orders': 1 if order_status == 'WAITING' else 0}
+
+    def _existing_tour_ids(self, tour_ids: List[str]) -> set:
+        existing = set()
+        for start in range(0, len(tour_ids), TOUR_STATS_CHUNK_SIZE):
+            chunk = tour_ids[start:start + TOUR_STATS_CHUNK_SIZE]
+            existing.update(row[0] for row in db.session.query(Tour.tour_id).filter(Tour.tour_id.in_(chunk)).all())
+        return existing
+
+    def _rederive_tour_status(self, tour_ids: List[str]):
+        """Recompute tour_status from the stored counters, except on tours whose status was edited manually"""
+        table = Tour.__table__
+        for start in range(0, len(tour_ids), TOUR_STATS_CHUNK_SIZE):
+            chunk = tour_ids[start:start + TOUR_STATS_CHUNK_SIZE]
+            db.session.execute(update(table).where(table.c.tour_id.in_(chunk), not_(_is_protected('tour_status')))
+                               .values(tour_status=_tour_status_expression()))
+
+    @staticmethod
+    def order_state(order) -> tuple:
+        """(tour_id, order_status, location_city, location_name) of an order, as apply_order_changes takes it"""
+        return (order.tour_id, order.order_status, order.location_city, order.location_name)
+
+    def apply_order_changes(self, changes, tour_details: Dict[str, Optional[dict]] = None) -> int:
+        """Apply order inserts, deletions and status, tour or location changes to the tours (caller commits).
+
+        ``changes`` holds (previous, current) pairs of order_state() tuples
+        (tour_id and order_status first); previous is None for a new order and
+        current None for a deleted one. The net difference per tour is added
+        to the counters in SQL and the tour status re-derived, and tours that
+        gained, lost or relocated an order get their delivery cities and areas
+        rebuilt, leaving manually modified fields alone. Tours that have no row
+        yet are created from their orders with bulk_update_tour_statistics
+        (``tour_details`` as there). Returns the number of tours touched.
+        """
+        deltas = defaultdict(lambda: dict.fromkeys(TOUR_COUNTER_COLUMNS, 0))
+        relocated = set()
+        for previous, current in changes:
+            if previous == current:
+                continue
+            for state, sign in ((previous, -1), (current, 1)):
+                if state and state[0]:
+                    tour_delta = deltas[state[0]]
+                    for column, value in self.order_contribution(state[1]).items():
+                        tour_delta[column] += sign * value
+            if previous is None or current is None or previous[0] != current[0] or previous[2:] != current[2:]:
+                relocated.update(state[0] for state in (previous, current) if state and state[0])
+
+        deltas = {tour_id: delta for tour_id, delta in deltas.items() if any(delta.values())}
+        tour_ids = list(dict.fromkeys(list(deltas) + sorted(relocated)))
+        if not tour_ids:
+            return 0
+
+        existing = self._existing_tour_ids(tour_ids)
+        counted = [tour_id for tour_id in tour_ids if tour_id in existing and tour_id in deltas]
+        if counted:
+            table = Tour.__table__
+            values = {column: case((_is_protected(column), table.c[column]),
+                                   else_=func.coalesce(table.c[column], 0) + bindparam(f'd_{column}'))
+                      for column in TOUR_COUNTER_COLUMNS}
+            values['updated_at'] = datetime.now(timezone.utc)
+            stmt = update(table).where(table.c.tour_id == bindparam('b_tour_id')).values(values)
+            db.session.execute(stmt, [dict({'b_tour_id': tour_id}, **{f'd_{column}': value for column, value in deltas[tour_id].items()})
+                                      for tour_id in counted])
+            self._rederive_tour_status(counted)
+
+        located = [tour_id for tour_id in tour_ids if tour_id in existing and tour_id in relocated]
+        if located:
+            self._refresh_tour_locations(located)
+        # Orders joining, leaving or moving within a tour change its company owner and city facets
+        invalidate_tour_facets(Tour.parse_tour_day(self.parse_tour_id(tour_id)[0]) for tour_id in located)
+
+        missing = {tour_id: (tour_details or {}).get(tour_id) for tour_id in tour_ids if tour_id not in existing}
+        if missing:
+            self.bulk_update_tour_statistics(missing)
+
+        logger.debug(f"TOUR STATS: Applied order changes to {len(existing)} tours, created {len(missing)}")
+        return len(tour_ids)
+
+    def reconcile_tour_statistics(self, date_from: str = None, date_to: str = None, repair: bool = True) -> dict:
+        """Compare the stored tour counters and location lists with their orders and rebuild the tours that drifted.
+
+        Checks tours whose tour date falls in the range (all tours when
+        omitted) and orders in the range whose tour has no row, with one
+        GROUP BY per chunk of tours. With ``repair`` the drifted tours are
+        rebuilt and committed. Returns the drift report.
+        """
+        try:
+            query = db.session.query(Tour.tour_id, Tour.is_modified, Tour.modified_fields, Tour.tour_status,
+                                     Tour.delivery_cities, Tour.delivery_areas,
+                                     *(getattr(Tour, column) for column in TOUR_COUNTER_COLUMNS))
+            missing_query = db.session.query(Order.tour_id).filter(
+                Order.tour_id.isnot(None), Order.tour_id != '', ~exists().where(Tour.tour_id == Order.tour_id))
+            if date_from:
+                query = query.filter(Tour.tour_day >= datetime.strptime(date_from, '%Y-%m-%d').date())
+                missing_query = missing_query.filter(Order.date >= datetime.strptime(date_from, '%Y-%m-%d').date())
+            if date_to:
+                query = query.filter(Tour.tour_day <= datetime.strptime(date_to, '%Y-%m-%d').date())
+                missing_query = missing_query.filter(Order.date <= datetime.strptime(date_to, '%Y-%m-%d').date())
+            stored = query.all()
+            missing = [row[0] for row in missing_query.distinct().all()]
+
+            from app.data_protection import data_protection_service
+            drifted = []
+            emptied = []
+            for start in range(0, len(stored), TOUR_STATS_CHUNK_SIZE):
+                chunk = stored[start:start + TOUR_STATS_CHUNK_SIZE]
+                actual = self._aggregate_tour_orders([row.tour_id for row in chunk])
+                for row in chunk:
+                    stats = actual.get(row.tour_id, {'total': 0, 'completed': 0, 'cancelled': 0, 'waiting': 0,
+                                                     'cities': set(), 'areas': set()})
+                    expected = {
+                        'total_orders': stats['total'],
+                        'completed_orders': stats['completed'],
+                        'cancelled_orders': stats['cancelled'],
+                        'pending_orders': stats['total'] - stats['completed'] - stats['cancelled'],
+                        'waiting_orders': stats['waiting'],
+                        'tour_status': self.calculate_tour_status(stats['total'], stats['completed'],
+                                                                  stats['cancelled'], stats['waiting'])
+                    }
+                    # Location lists are compared as sets: older refreshes stored them unsorted
+                    expected_locations = {'delivery_cities': stats['cities'], 'delivery_areas': stats['areas']}
+                    if any(getattr(row, column) != value for column, value in expected.items()
+                           if not data_protection_service.is_field_modified(row, column)) or \
+                            any(_json_set(getattr(row, column)) != value for column, value in expected_locations.items()
+                                if not data_protection_service.is_field_modified(row, column)):
+                        drifted.append(row.tour_id)
+                        if row.tour_id not in actual:
+                            emptied.append(row.tour_id)
+
+            if drifted or missing:
+                logger.warning(f"TOUR STATS: {len(drifted)} of {len(stored)} tours drifted, {len(missing)} tours missing")
+
+            if repair and (drifted or missing):
+                self.bulk_update_tour_statistics({tour_id: None for tour_id in drifted + missing if tour_id not in emptied})
+                # Tours whose orders are all gone have nothing to aggregate: reset their counters
+                for start in range(0, len(emptied), TOUR_STATS_CHUNK_SIZE):
+                    chunk = emptied[start:start + TOUR_STATS_CHUNK_SIZE]
+                    for column in TOUR_COUNTER_COLUMNS:
+                        Tour.query.filter(Tour.tour_id.in_(chunk), not_(_is_protected(column))) \
+                            .update({column: 0}, synchronize_session=False)
+                    for column in ('delivery_cities', 'delivery_areas'):
+                        Tour.query.filter(Tour.tour_id.in_(chunk), not_(_is_protected(column))) \
+                            .update({column: '[]'}, synchronize_session=False)
+                self._rederive_tour_status(emptied)
+                db.session.commit()
+
+            return {
+                'success': True,
+                'checked_tours': len(stored),
+                'drifted_tours': len(drifted),
+                'missing_tours': len(missing),
+                'repaired': bool(repair and (drifted or missing)),
+                'tour_ids': (drifted + missing)[:100]
+            }
+
+        except Exception as e:
+            logger.error(f"Error reconciling tour statistics: {e}")
+            db.session.rollback()
+            return {'success': False, 'error': str(e)}
+
     def get_tours(self, date: str = None, date_from: str = None, date_to: str = None, page: int = 1, per_page: int = 50,
                   search: str = None, sort_by: str = 'tour_number',
                   sort_order: str = 'asc', vehicle: str = None,
@@ -196,23 +589,8 @@ class TourService:
             # Start with base query
             query = Tour.query
 
-            # For company owner filtering, we need to join with orders
-            needs_join = company_owner is not None
-
-            if needs_join:
-                query = query.join(Order, Tour.tour_id == Order.tour_id)
-
             # Date filtering - support both single date and date ranges
-            if date_from and date_to:
-                # Date range filtering
-                query = query.filter(Tour.tour_date >= date_from)
-                query = query.filter(Tour.tour_date <= f"{date_to}-23-59-59")  # Include full end date
-            elif date_from:
-                # Single date from date_from
-                query = query.filter(Tour.tour_date.like(f"{date_from}%"))
-            elif date:
-                # Single date (backward compatibility)
-                query = query.filter(Tour.tour_date.like(f"{date}%"))
+            query = filter_tour_days(query, Tour.tour_day, date, date_from, date_to)
 
             # Vehicle filtering
             if vehicle and vehicle.strip():
@@ -241,26 +619,11 @@ class TourService:
             if tour_status and tour_status.strip() and tour_status.upper() != 'ALL':
                 query = query.filter(Tour.tour_status == tour_status.upper())
 
-            # Company owner filtering (requires join with orders and custom_fields search)
+            # Company owner filtering: tours with an order of that company, from the indexed orders.company_owner
             if company_owner and company_owner.strip():
-                company_term = company_owner.strip()
-
-                # Get all orders first, then filter in Python (for complex JSON matching)
-                # This is less efficient but more reliable for JSON search
-                if not needs_join:
-                    query = query.join(Order, Tour.tour_id == Order.tour_id)
-                    needs_join = True
-
-                # Use subquery to find tour IDs with matching company owners
-                from sqlalchemy import exists
-                matching_orders_subquery = db.session.query(Order.tour_id).filter(
-                    Order.custom_fields.ilike(f'%{company_term}%')
-                ).distinct().subquery()
-
-                query = query.filter(Tour.tour_id.in_(
-                    db.session.query(matching_orders_subquery.c.tour_id)
-                ))
-                query = query.distinct()
+                company_orders = db.session.query(Order.tour_id).filter(Order.company_owner == company_owner.strip())
+                company_orders = filter_tour_days(company_orders, Order.tour_day, date, date_from, date_to)
+                query = query.filter(Tour.tour_id.in_(company_orders))
 
             # General search filtering (enhanced)
             if search and search.strip():
@@ -274,15 +637,10 @@ class TourService:
                     Tour.tour_status.ilike(search_term)
                 ]
 
-                # If we haven't joined orders yet, join for custom_fields search
-                if not needs_join:
-                    query = query.join(Order, Tour.tour_id == Order.tour_id, isouter=True)
-                    query = query.distinct()
-
-                # Add search in Company_Owner from custom_fields (simple text search)
-                search_conditions.append(
-                    Order.custom_fields.ilike(search_term)
-                )
+                # Join orders to search their company owner
+                query = query.join(Order, Tour.tour_id == Order.tour_id, isouter=True)
+                query = query.distinct()
+                search_conditions.append(Order.company_owner.ilike(search_term))
                 query = query.filter(db.or_(*search_conditions))
 
             # Order status filtering for clickable badges
@@ -380,105 +738,66 @@ class TourService:
                 'total_count': 0
             }
 
-    def get_filter_options(self, date: str = None, date_from: str = None, date_to: str = None) -> dict:
-        """Get available filter options for dropdowns"""
-        try:
-            # Get unique cities from tours delivery_cities (JSON field)
-            cities_query = Tour.query
-            # Apply date filtering
-            if date_from and date_to:
-                cities_query = cities_query.filter(Tour.tour_date >= date_from)
-                cities_query = cities_query.filter(Tour.tour_date <= f"{date_to}-23-59-59")
-            elif date_from:
-                cities_query = cities_query.filter(Tour.tour_date.like(f"{date_from}%"))
-            elif date:
-                cities_query = cities_query.filter(Tour.tour_date.like(f"{date}%"))
-
-            tours_with_cities = cities_query.filter(Tour.delivery_cities.isnot(None)).all()
-            cities_set = set()
-            for tour in tours_with_cities:
-                try:
-                    cities_data = json.loads(tour.delivery_cities) if isinstance(tour.delivery_cities, str) else tour.delivery_cities
-                    if isinstance(cities_data, list):
-                        cities_set.update(cities_data)
-                except (json.JSONDecodeError, TypeError):
-                    continue
-
-            # Get unique riders from tours
-            riders_query = Tour.query.filter(Tour.rider_name.isnot(None))
-            if date_from and date_to:
-                riders_query = riders_query.filter(Tour.tour_date >= date_from)
-                riders_query = riders_query.filter(Tour.tour_date <= f"{date_to}-23-59-59")
-            elif date_from:
-                riders_query = riders_query.filter(Tour.tour_date.like(f"{date_from}%"))
-            elif date:
-                riders_query = riders_query.filter(Tour.tour_date.like(f"{date}%"))
-            riders = [r[0] for r in riders_query.with_entities(Tour.rider_name).distinct().all() if r[0]]
-
-            # Get unique vehicles from tours
-            vehicles_query = Tour.query.filter(Tour.vehicle_registration.isnot(None))
-            if date_from and date_to:
-                vehicles_query = vehicles_query.filter(Tour.tour_date >= date_from)
-                vehicles_query = vehicles_query.filter(Tour.tour_date <= f"{date_to}-23-59-59")
-            elif date_from:
-                vehicles_query = vehicles_query.filter(Tour.tour_date.like(f"{date_from}%"))
-            elif date:
-                vehicles_query = vehicles_query.filter(Tour.tour_date.like(f"{date}%"))
-            vehicles = [v[0] for v in vehicles_query.with_entities(Tour.vehicle_registration).distinct().all() if v[0]]
-
-            # Get unique company owners from orders custom_fields
-            companies_query = Order.query.filter(Order.custom_fields.isnot(None))
-            from datetime import datetime, timedelta
-            if date_from and date_to:
-                try:
-                    # Convert orders date range to tour date range for filtering
-                    orders_start = datetime.strptime(date_from, "%Y-%m-%d")
-                    orders_end = datetime.strptime(date_to, "%Y-%m-%d")
-                    tour_start = orders_start - timedelta(days=1)
-                    tour_end = orders_end - timedelta(days=1)
-                    companies_query = companies_query.filter(Order.tour_date >= tour_start.strftime("%Y-%m-%d"))
-                    companies_query = companies_query.filter(Order.tour_date <= f"{tour_end.strftime('%Y-%m-%d')}-23-59-59")
-                except ValueError:
-                    pass
-            elif date_from:
-                try:
-                    orders_date = datetime.strptime(date_from, "%Y-%m-%d")
-                    tour_date = orders_date - timedelta(days=1)
-                    tour_date_str = tour_date.strftime("%Y-%m-%d")
-                    companies_query = companies_query.filter(Order.tour_date.like(f"{tour_date_str}%"))
-                except ValueError:
-                    pass
-            elif date:
-                # Convert orders date to tour date for filtering
-                try:
-                    orders_date = datetime.strptime(date, "%Y-%m-%d")
-                    tour_date = orders_date - timedelta(days=1)
-                    tour_date_str = tour_date.strftime("%Y-%m-%d")
-                    companies_query = companies_query.filter(Order.tour_date.like(f"{tour_date_str}%"))
-                except ValueError:
-                    pass
+    def _compute_facets(self, first_day, last_day) -> dict:
+        """Distinct values and tour counts of every tours page dropdown for a tour day range.
+
+        Riders, vehicles and cities come from one GROUP BY over the tours of
+        the range, so each distinct delivery_cities list is parsed once rather
+        than once per tour. Company owners come from one GROUP BY over the
+        indexed orders.company_owner of the orders on tours of the same days,
+        matching the get_tours company filter. Counts are tours.
+        """
+        tours_query = db.session.query(Tour.rider_name, Tour.vehicle_registration, Tour.delivery_cities, func.count())
+        if first_day is not None:
+            tours_query = tours_query.filter(Tour.tour_day >= first_day, Tour.tour_day <= last_day)
+        tour_groups = tours_query.group_by(Tour.rider_name, Tour.vehicle_registration, Tour.delivery_cities).all()
+
+        counts = {facet: defaultdict(int) for facet in ('cities', 'riders', 'vehicles', 'companies')}
+        total_tours = 0
+        for rider_name, vehicle_registration, delivery_cities, tour_count in tour_groups:
+            total_tours += tour_count
+            if rider_name:
+                counts['riders'][rider_name] += tour_count
+            if vehicle_registration:
+                counts['vehicles'][vehicle_registration] += tour_count
+            try:
+                cities = json.loads(delivery_cities) if delivery_cities else []
+            except (json.JSONDecodeError, TypeError):
+                continue
+            if isinstance(cities, list):
+                for city in set(cities):
+                    if city:
+                        counts['cities'][city] += tour_count
+
+        companies_query = db.session.query(Order.company_owner, func.count(func.distinct(Order.tour_id))) \
+            .filter(Order.company_owner.isnot(None))
+        if first_day is not None:
+            companies_query = companies_query.filter(Order.tour_day >= first_day, Order.tour_day <= last_day)
+        for company_owner, tour_count in companies_query.group_by(Order.company_owner).all():
+            counts['companies'][company_owner] = tour_count
+
+        facets = {facet: sorted(values) for facet, values in counts.items()}
+        facets['counts'] = {facet: dict(values) for facet, values in counts.items()}
+        facets['total_tours'] = total_tours
+        return facets
 
-            orders_with_custom_fields = companies_query.all()
-            companies_set = set()
-            for order in orders_with_custom_fields:
-                try:
-                    custom_fields = json.loads(order.custom_fields) if isinstance(order.custom_fields, str) else order.custom_fields
-                    if isinstance(custom_fields, dict) and 'Company_Owner' in custom_fields:
-                        company_owner = custom_fields['Company_Owner']
-                        if company_owner and company_owner.strip():
-                            companies_set.add(company_owner.strip())
-                except (json.JSONDecodeError, TypeError):
-                    continue
+    def get_filter_options(self, date: str = None, date_from: str = None, date_to: str = None) -> dict:
+        """Get available filter options for dropdowns, with the number of tours per value.
 
-            companies = sorted(list(companies_set))
+        The facets of a tour day range are cached in the result cache, tagged
+        with the days they cover, and dropped when tours of those days change
+        (invalidate_tour_facets).
+        """
+        try:
+            first_day, last_day = tour_day_range(date, date_from, date_to)
+            cache_key = f"tour_facets:{first_day}:{last_day}"
+            cached = result_cache.get(cache_key)
+            if cached is not None:
+                return dict(cached, from_cache=True)
 
-            return {
-                'success': True,
-                'cities': sorted(list(cities_set)),
-                'riders': sorted(riders),
-                'vehicles': sorted(vehicles),
-                'companies': sorted(companies)
-            }
+            result = dict(self._compute_facets(first_day, last_day), success=True)
+            result_cache.set(cache_key, result, tags=_facet_cache_tags(first_day, last_day))
+            return dict(result, from_cache=False)
 
         except Exception as e:
             logger.error(f"Error getting filter options: {e}")
@@ -505,7 +824,7 @@ class TourService:
                 }
 
             # Get all orders for this tour
-            orders = Order.query.filter_by(tour_id=tour_id).order_by(Order.id).all()
+            orders = Order.query.options(*order_load_options('export')).filter_by(tour_id=tour_id).order_by(Order.id).all()
 
             # Update tour statistics if orders exist
             if orders:
@@ -516,7 +835,7 @@ class TourService:
             return {
                 'success': True,
                 'tour': tour.to_dict(),
-                'orders': [order.to_dict() for order in orders],
+                'orders': serialize_orders(orders, 'export'),
                 'orders_count': len(orders)
             }
 
@@ -530,22 +849,27 @@ class TourService:
             }
 
     def get_tour_summary_stats(self, date: str = None, date_from: str = None, date_to: str = None) -> dict:
-        """Get summary statistics for all tours on a given date"""
+        """Get summary statistics for all tours on a given date.
+
+        Order counts are SUMs over the per-tour counters, computed in the
+        database; only the delivery_cities column is loaded for the city count.
+        """
         try:
-            query = Tour.query
+            query = db.session.query(Tour)
 
             # Apply date filtering
-            if date_from and date_to:
-                query = query.filter(Tour.tour_date >= date_from)
-                query = query.filter(Tour.tour_date <= f"{date_to}-23-59-59")
-            elif date_from:
-                query = query.filter(Tour.tour_date.like(f"{date_from}%"))
-            elif date:
-                query = query.filter(Tour.tour_date.like(f"{date}%"))
-
-            tours = query.all()
-
-            if not tours:
+            query = filter_tour_days(query, Tour.tour_day, date, date_from, date_to)
+
+            total_tours, total_orders, completed_orders, cancelled_orders, pending_orders, unique_riders = query.with_entities(
+                func.count(Tour.id),
+                func.coalesce(func.sum(Tour.total_orders), 0),
+                func.coalesce(func.sum(Tour.completed_orders), 0),
+                func.coalesce(func.sum(Tour.cancelled_orders), 0),
+                func.coalesce(func.sum(Tour.pending_orders), 0),
+                func.count(func.distinct(Tour.rider_name))
+            ).one()
+
+            if not total_tours:
                 return {
                     'success': True,
                     'total_tours': 0,
@@ -556,27 +880,13 @@ class TourService:
                     'unique_cities': 0
                 }
 
-            # Calculate summary statistics
-            total_tours = len(tours)
-            total_orders = sum(tour.total_orders for tour in tours)
-            completed_orders = sum(tour.completed_orders for tour in tours)
-            cancelled_orders = sum(tour.cancelled_orders for tour in tours)
-            pending_orders = sum(tour.pending_orders for tour in tours)
-
-            # Count unique riders and cities
-            unique_riders = set()
+            # Count unique cities
             all_cities = set()
-
-            for tour in tours:
-                if tour.rider_name:
-                    unique_riders.add(tour.rider_name)
-
-                if tour.delivery_cities:
-                    try:
-                        cities = json.loads(tour.delivery_cities)
-                        all_cities.update(cities)
-                    except json.JSONDecodeError:
-                        pass
+            for (delivery_cities,) in query.with_entities(Tour.delivery_cities).filter(Tour.delivery_cities.isnot(None)).all():
+                try:
+                    all_cities.update(json.loads(delivery_cities))
+                except json.JSONDecodeError:
+                    pass
 
             return {
                 'success': True,
@@ -585,7 +895,7 @@ class TourService:
                 'completed_orders': completed_orders,
                 'cancelled_orders': cancelled_orders,
                 'pending_orders': pending_orders,
-                'unique_riders': len(unique_riders),
+                'unique_riders': unique_riders,
                 'unique_cities': len(all_cities),
                 'completion_rate': round(((completed_orders + cancelled_orders) / total_orders * 100) if total_orders > 0 else 0, 1)
             }
@@ -616,7 +926,8 @@ class TourService:
                 }
 
             processed_orders = 0
-            updated_tours = set()
+            # tour_id -> tourDetail of its first order (rider, vehicle and start/end times)
+            tour_details = {}
 
             # Process each order to extract and update tour data
             for order in orders:
@@ -627,35 +938,23 @@ class TourService:
                             processed_orders += 1
 
                             # Track tours that need statistics update
-                            if order.tour_id:
-                                updated_tours.add(order.tour_id)
+                            if order.tour_id and order.tour_id not in tour_details:
+                                tour_details[order.tour_id] = raw_data.get('orderMetadata', {}).get('tourDetail')
                     except json.JSONDecodeError:
                         logger.warning(f"Order {order.id}: Could not parse raw_data")
 
             # Commit order updates
             db.session.commit()
 
-            # Update statistics for all affected tours
-            for tour_id in updated_tours:
-                # Create or update tour record
-                tour_detail = None
-                # Get tour detail from first order of this tour
-                sample_order = Order.query.filter_by(tour_id=tour_id).first()
-                if sample_order and sample_order.raw_data:
-                    try:
-                        raw_data = json.loads(sample_order.raw_data)
-                        tour_detail = raw_data.get('orderMetadata', {}).get('tourDetail', {})
-                    except json.JSONDecodeError:
-                        pass
-
-                self.get_or_create_tour(tour_id, tour_detail)
-                self.update_tour_statistics(tour_id)
+            # Create or update all affected tours in one aggregate and one upsert
+            self.bulk_update_tour_statistics(tour_details)
+            db.session.commit()
 
             return {
                 'success': True,
-                'message': f'Successfully processed {processed_orders} orders and updated {len(updated_tours)} tours',
+                'message': f'Successfully processed {processed_orders} orders and updated {len(tour_details)} tours',
                 'processed_orders': processed_orders,
-                'updated_tours': len(updated_tours)
+                'updated_tours': len(tour_details)
             }
 
         except Exception as e:
@@ -1,5 +1,3 @@
-import time
-import threading
 import logging
 from datetime import datetime, timedelta
 import json
@@ -8,34 +6,11 @@ from PIL import Image
 import io
 from models import db
 
-# Global rate limiting for Google API calls
-# Google Gemini API has limits: 15 requests per minute for free tier, 1000 for paid
-# We'll use a conservative approach: max 10 concurrent API calls + small delays
-api_rate_limiter = threading.Semaphore(10)  # Max 10 concurrent API calls
-api_call_times = []  # Track API call timing for rate limiting
-api_timing_lock = threading.Lock()
+# Outbound rate limiting (Gemini, GS1, Locus) lives in app/rate_limiter.py
 
 # Setup logging
 logger = logging.getLogger(__name__)
 
-def rate_limit_api_call():
-    """Rate limit Google API calls to respect billing limits"""
-    with api_timing_lock:
-        current_time = time.time()
-        # Remove API calls older than 60 seconds
-        global api_call_times
-        api_call_times = [t for t in api_call_times if current_time - t < 60]
-
-        # If we've made more than 12 calls in the last minute, add delay
-        if len(api_call_times) >= 12:
-            sleep_time = 60 - (current_time - api_call_times[0]) + 1
-            if sleep_time > 0:
-                logger.info(f"Rate limiting: sleeping {sleep_time:.1f} seconds to respect API limits")
-                time.sleep(sleep_time)
-
-        # Record this API call
-        api_call_times.append(current_time)
-
 def create_tables(app):
     """Create database tables if they don't exist"""
     with app.app_context():
@@ -0,0 +1,395 @@
+"""
+Validation Jobs
+Durable background queue for validate-all-orders: jobs and per-order checkpoints live in the
+database, so a restarted worker resumes where the last one stopped
+"""
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy import func, insert, or_
+from models import db, ValidationJob, ValidationJobItem
+from app.gtin_cache import gtin_cache
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ('queued', 'running')
+FINISHED_STATUSES = ('completed', 'failed', 'cancelled')
+
+# Per-order result fields kept in the checkpoint (what the dashboard renders)
+RESULT_FIELDS = ('message', 'error', 'discrepancies', 'confidence_score', 'skipped_no_grn')
+
+# Items inserted per statement when a job is planned
+ITEM_CHUNK_SIZE = 1000
+
+
+def _as_utc(value):
+    # SQLite hands back naive datetimes; everything here is stored in UTC
+    return value.replace(tzinfo=timezone.utc) if value is not None and value.tzinfo is None else value
+
+
+class ValidationJobService:
+    """Queue, worker loop and progress queries for validation jobs.
+
+    The order-specific steps are registered by the routes module
+    (``register_handlers``): ``plan_orders(job)`` returns the Locus order
+    counts and the ids to validate, ``validate_order(order, date, force)``
+    returns the per-order result dict and the optional
+    ``validate_batch(orders, date, force)`` validates several orders with one
+    Gemini request, returning their results keyed by order id. A worker claims a queued job (or a
+    running one whose heartbeat went stale), plans it once, then validates the
+    pending items on a thread pool and commits one checkpoint per completed
+    order from the worker thread.
+    """
+
+    def __init__(self):
+        self.plan_orders = None
+        self.validate_order = None
+        self.validate_batch = None
+        self.batch_size = 1
+        self.runner = 'thread'
+        self.heartbeat_interval = 15
+        self.stale_after = 120
+        self.poll_interval = 2
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._work_pending = False  # set by ensure_thread_worker, makes an idle thread worker look again
+
+    def configure(self, config):
+        """Apply VALIDATION_JOB_* settings from the app config"""
+        self.runner = getattr(config, 'VALIDATION_JOB_RUNNER', self.runner)
+        self.heartbeat_interval = getattr(config, 'VALIDATION_JOB_HEARTBEAT_SECONDS', self.heartbeat_interval)
+        self.stale_after = getattr(config, 'VALIDATION_JOB_STALE_SECONDS', self.stale_after)
+        self.poll_interval = getattr(config, 'VALIDATION_JOB_POLL_SECONDS', self.poll_interval)
+        self.batch_size = max(1, getattr(config, 'GEMINI_BATCH_SIZE', self.batch_size))
+
+    def register_handlers(self, plan_orders, validate_order, validate_batch=None):
+        self.plan_orders = plan_orders
+        self.validate_order = validate_order
+        self.validate_batch = validate_batch
+
+    # Queue
+
+    def enqueue(self, date, validate_mode='unvalidated_only', force_reprocess=False, max_workers=20, app=None):
+        """Queue a job for the date, or return the job already queued/running for it with the same mode"""
+        existing = ValidationJob.query.filter(
+            ValidationJob.date == date,
+            ValidationJob.validate_mode == validate_mode,
+            ValidationJob.force_reprocess == bool(force_reprocess),
+            ValidationJob.status.in_(ACTIVE_STATUSES)
+        ).order_by(ValidationJob.id.desc()).first()
+        if existing:
+            logger.info(f"VALIDATION JOB: Reusing active job {existing.id} for {date}")
+            job = existing
+        else:
+            job = ValidationJob(date=date, validate_mode=validate_mode, force_reprocess=bool(force_reprocess),
+                                max_workers=max_workers, status='queued')
+            db.session.add(job)
+            db.session.commit()
+            logger.info(f"VALIDATION JOB: Queued job {job.id} for {date} ({validate_mode}, {max_workers} workers)")
+
+        if self.runner == 'thread' and app is not None:
+            self.ensure_thread_worker(app)
+        return job
+
+    def cancel(self, job_id):
+        """Mark a queued or running job cancelled; a running worker stops after its in-flight orders"""
+        updated = ValidationJob.query.filter(ValidationJob.id == job_id, ValidationJob.status.in_(ACTIVE_STATUSES)) \
+            .update({'status': 'cancelled', 'finished_at': datetime.now(timezone.utc)}, synchronize_session=False)
+        db.session.commit()
+        return bool(updated)
+
+    def claim_next_job(self):
+        """Atomically take the oldest queued job, or a running job whose worker stopped heartbeating"""
+        now = datetime.now(timezone.utc)
+        stale_cutoff = now - timedelta(seconds=self.stale_after)
+        claimable = or_(ValidationJob.status == 'queued',
+                        (ValidationJob.status == 'running') & (ValidationJob.heartbeat_at < stale_cutoff))
+
+        candidates = db.session.query(ValidationJob.id).filter(claimable).order_by(ValidationJob.id).limit(5).all()
+        for (job_id,) in candidates:
+            # Conditional UPDATE: only one worker wins the row even without row locks
+            claimed = ValidationJob.query.filter(ValidationJob.id == job_id, claimable).update({
+                'status': 'running',
+                'worker_id': self.worker_id,
+                'heartbeat_at': now,
+                'started_at': func.coalesce(ValidationJob.started_at, now),
+                'attempts': func.coalesce(ValidationJob.attempts, 0) + 1
+            }, synchronize_session=False)
+            db.session.commit()
+            if claimed:
+                job = db.session.get(ValidationJob, job_id)
+                db.session.refresh(job)
+                if (job.attempts or 0) > 1:
+                    logger.info(f"VALIDATION JOB: Resuming job {job_id} (attempt {job.attempts})")
+                return job
+        return None
+
+    # Worker
+
+    def run_job(self, job):
+        """Plan (once) and validate every pending order of a claimed job"""
+        gtin_stats_before = gtin_cache.get_stats()
+        try:
+            if not job.planned:
+                self._plan(job)
+
+            pending = [order_id for (order_id,) in db.session.query(ValidationJobItem.order_id)
+                       .filter_by(job_id=job.id, status='pending').order_by(ValidationJobItem.id)]
+            logger.info(f"VALIDATION JOB: Job {job.id} has {len(pending)} pending orders")
+
+            if pending and not self._process(job, pending):
+                return job
+
+            # GTIN cache effectiveness over this run (includes any validations running alongside it)
+            gtin_stats = gtin_cache.stats_since(gtin_stats_before)
+            job.gtin_cache_stats = json.dumps(gtin_stats)
+            job.status = 'completed'
+            job.finished_at = datetime.now(timezone.utc)
+            db.session.commit()
+            logger.info(f"VALIDATION JOB: Job {job.id} completed - {job.processed} processed, {job.errors} errors, "
+                        f"{job.to_dict()['gemini_calls_avoided']} Gemini calls avoided ({job.unchanged_orders or 0} unchanged), "
+                        f"{self.orders_per_minute(job)} orders/min, GTIN cache hit ratio {gtin_stats['hit_ratio']:.0%}")
+
+        except Exception as e:
+            logger.error(f"VALIDATION JOB: Job {job.id} failed: {e}")
+            db.session.rollback()
+            job = db.session.get(ValidationJob, job.id)
+            job.status = 'failed'
+            job.error = str(e)
+            job.finished_at = datetime.now(timezone.utc)
+            db.session.commit()
+        return job
+
+    def _plan(self, job):
+        """Store the order counts and one pending item per order to validate.
+
+        Planning loads the date's orders from Locus and can outlast
+        ``stale_after``, so the job heartbeats while it runs; otherwise another
+        worker would reclaim the unplanned job and plan it a second time.
+        Items another worker already inserted for the job are kept as they are.
+        """
+        job.heartbeat_at = datetime.now(timezone.utc)
+        db.session.commit()
+        with self._heartbeat(job.id):
+            plan = self.plan_orders(job)
+        order_ids = list(dict.fromkeys(plan.get('order_ids', [])))
+
+        existing = {order_id for (order_id,) in db.session.query(ValidationJobItem.order_id).filter_by(job_id=job.id)}
+        new_ids = [order_id for order_id in order_ids if order_id not in existing]
+        for start in range(0, len(new_ids), ITEM_CHUNK_SIZE):
+            db.session.execute(insert(ValidationJobItem), [
+                {'job_id': job.id, 'order_id': order_id, 'status': 'pending'}
+                for order_id in new_ids[start:start + ITEM_CHUNK_SIZE]
+            ])
+
+        job.total_orders = plan.get('total_orders', len(order_ids))
+        job.orders_with_grn = plan.get('orders_with_grn', len(order_ids))
+        job.orders_without_grn = plan.get('orders_without_grn', 0)
+        job.orders_to_process = len(order_ids)
+        job.planned = True
+        job.heartbeat_at = datetime.now(timezone.utc)
+        db.session.commit()
+        logger.info(f"VALIDATION JOB: Planned job {job.id}: {len(order_ids)} of {job.total_orders} orders to validate")
+
+    @contextmanager
+    def _heartbeat(self, job_id):
+        """Refresh the job's heartbeat every heartbeat_interval from a side thread while the block runs"""
+        app = current_app._get_current_object()
+        stopped = threading.Event()
+
+        def beat():
+            while not stopped.wait(self.heartbeat_interval):
+                with app.app_context():
+                    try:
+                        ValidationJob.query.filter_by(id=job_id, worker_id=self.worker_id) \
+                            .update({'heartbeat_at': datetime.now(timezone.utc)}, synchronize_session=False)
+                        db.session.commit()
+                    except Exception as e:
+                        logger.warning(f"VALIDATION JOB: Heartbeat for job {job_id} failed: {e}")
+                        db.session.rollback()
+                    finally:
+                        db.session.remove()
+
+        thread = threading.Thread(target=beat, name=f'validation-job-{job_id}-heartbeat', daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            thread.join()
+
+    def _process(self, job, order_ids):
+        """Validate orders on a thread pool, checkpointing each result; returns False if the job was cancelled"""
+        date = job.date.isoformat()
+        force_reprocess = job.force_reprocess
+        batch_size = self.batch_size if self.validate_batch else 1
+        batches = [order_ids[start:start + batch_size] for start in range(0, len(order_ids), batch_size)]
+        executor = ThreadPoolExecutor(max_workers=max(1, min(job.max_workers or 1, len(batches))))
+        try:
+            # Each future validates one batch of orders (a single order when batching is off)
+            futures = {self._submit_batch(executor, batch, date, force_reprocess): batch for batch in batches}
+            remaining = set(futures)
+            while remaining:
+                done, remaining = wait(remaining, timeout=self.heartbeat_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        results = future.result()
+                        missing = {'success': False, 'error': 'No result returned for order', 'is_valid': False}
+                    except Exception as e:
+                        results = {}
+                        missing = {'success': False, 'error': f'Thread execution error: {str(e)}', 'is_valid': False}
+                    for order_id in futures[future]:
+                        self._checkpoint(job, order_id, results.get(order_id) or dict(missing))
+
+                job.heartbeat_at = datetime.now(timezone.utc)
+                db.session.commit()
+
+                if self._is_cancelled(job.id):
+                    logger.info(f"VALIDATION JOB: Job {job.id} cancelled, {len(remaining)} orders left pending")
+                    for future in remaining:
+                        future.cancel()
+                    return False
+            return True
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _submit_batch(self, executor, order_ids, date, force_reprocess):
+        if len(order_ids) == 1:
+            return executor.submit(lambda: {order_ids[0]: self.validate_order({'id': order_ids[0]}, date, force_reprocess)})
+        return executor.submit(self.validate_batch, [{'id': order_id} for order_id in order_ids], date, force_reprocess)
+
+    def _checkpoint(self, job, order_id, result):
+        """Record one order's result and bump the job counters in the same transaction"""
+        success = bool(result.get('success', False))
+        from_cache = bool(result.get('from_cache', False))
+
+        job.processed = (job.processed or 0) + (1 if success else 0)
+        job.errors = (job.errors or 0) + (0 if success else 1)
+        job.cached_results = (job.cached_results or 0) + (1 if from_cache else 0)
+        job.unchanged_orders = (job.unchanged_orders or 0) + (1 if result.get('fingerprint_match') else 0)
+        job.api_calls_made = (job.api_calls_made or 0) + (0 if from_cache else 1)
+
+        ValidationJobItem.query.filter_by(job_id=job.id, order_id=order_id).update({
+            'status': 'done' if success else 'error',
+            'sequence': job.processed + job.errors,
+            'success': success,
+            'is_valid': bool(result.get('is_valid', False)),
+            'from_cache': from_cache,
+            'result': json.dumps({field: result[field] for field in RESULT_FIELDS if result.get(field) is not None}, default=str),
+            'completed_at': datetime.now(timezone.utc)
+        }, synchronize_session=False)
+        # Commit per order so a crash loses at most the orders still in flight
+        db.session.commit()
+
+    def _is_cancelled(self, job_id):
+        status = db.session.query(ValidationJob.status).filter_by(id=job_id).scalar()
+        return status == 'cancelled'
+
+    def run_worker(self, app, stop_when_idle=False):
+        """Claim and run jobs until stopped; with ``stop_when_idle`` return once the queue is empty"""
+        logger.info(f"VALIDATION JOB: Worker {self.worker_id} started")
+        in_thread = threading.current_thread() is self._thread
+        while True:
+            if in_thread:
+                with self._thread_lock:
+                    self._work_pending = False
+            with app.app_context():
+                try:
+                    job = self.claim_next_job()
+                    if job:
+                        self.run_job(job)
+                        continue
+                except Exception as e:
+                    logger.error(f"VALIDATION JOB: Worker error: {e}")
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+            if stop_when_idle:
+                if in_thread:
+                    with self._thread_lock:
+                        if self._work_pending:
+                            continue  # a job was enqueued after this pass found the queue empty
+                        self._thread = None  # the next enqueue starts a fresh thread
+                logger.info(f"VALIDATION JOB: Worker {self.worker_id} idle, stopping")
+                return
+            time.sleep(self.poll_interval)
+
+    def ensure_thread_worker(self, app):
+        """Start an in-process worker thread unless one is already running (which then looks for work again)"""
+        with self._thread_lock:
+            self._work_pending = True
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self.run_worker, args=(app,), kwargs={'stop_when_idle': True},
+                                            name='validation-job-worker', daemon=True)
+            self._thread.start()
+
+    # Progress and metrics
+
+    @staticmethod
+    def orders_per_minute(job):
+        completed = (job.processed or 0) + (job.errors or 0)
+        started = _as_utc(job.started_at)
+        if not completed or started is None:
+            return 0.0
+        finished = _as_utc(job.finished_at) or datetime.now(timezone.utc)
+        minutes = max((finished - started).total_seconds() / 60, 1 / 60)
+        return round(completed / minutes, 2)
+
+    def get_status(self, job_id, include_results=False):
+        job = db.session.get(ValidationJob, job_id)
+        if job is None:
+            return None
+        status = job.to_dict()
+        status['orders_per_minute'] = self.orders_per_minute(job)
+        if include_results:
+            items = ValidationJobItem.query.filter(ValidationJobItem.job_id == job_id, ValidationJobItem.sequence.isnot(None)) \
+                .order_by(ValidationJobItem.sequence).all()
+            status['results'] = [item.to_dict() for item in items]
+        return status
+
+    def get_events(self, job_id, after_sequence=0, limit=200):
+        """Completed orders of a job with sequence > after_sequence, in completion order"""
+        items = ValidationJobItem.query.filter(ValidationJobItem.job_id == job_id,
+                                               ValidationJobItem.sequence > after_sequence) \
+            .order_by(ValidationJobItem.sequence).limit(limit).all()
+        return [item.to_dict() for item in items]
+
+    def get_metrics(self, window_minutes=15):
+        """Queue depth and recent throughput across all jobs"""
+        jobs_by_status = dict(db.session.query(ValidationJob.status, func.count(ValidationJob.id))
+                              .group_by(ValidationJob.status).all())
+        pending_orders = db.session.query(func.count(ValidationJobItem.id)) \
+            .join(ValidationJob, ValidationJob.id == ValidationJobItem.job_id) \
+            .filter(ValidationJobItem.status == 'pending', ValidationJob.status.in_(ACTIVE_STATUSES)).scalar() or 0
+        unplanned_jobs = db.session.query(func.count(ValidationJob.id)) \
+            .filter(ValidationJob.status == 'queued', ValidationJob.planned.isnot(True)).scalar() or 0
+
+        since = datetime.now(timezone.utc) - timedelta(minutes=window_minutes)
+        completed_recently = db.session.query(func.count(ValidationJobItem.id)) \
+            .filter(ValidationJobItem.completed_at >= since).scalar() or 0
+
+        return {
+            'queued_jobs': jobs_by_status.get('queued', 0),
+            'running_jobs': jobs_by_status.get('running', 0),
+            'jobs_by_status': jobs_by_status,
+            'queue_depth_orders': pending_orders,
+            'unplanned_jobs': unplanned_jobs,
+            'window_minutes': window_minutes,
+            'orders_completed_in_window': completed_recently,
+            'orders_per_minute': round(completed_recently / window_minutes, 2) if window_minutes else 0.0,
+            'runner': self.runner
+        }
+
+
+# Global validation job service instance
+validation_job_service = ValidationJobService()
@@ -0,0 +1,174 @@
+"""
+Validation Prompts
+Gemini prompt text for GRN validation, shared by single-order requests and batched multi-order requests
+"""
+
+import json
+
+# Part of every validation input fingerprint: bump it when a prompt or schema change should re-validate stored results
+PROMPT_VERSION = 'grn-v1'
+
+VALIDATION_WORKFLOW = """**STEP 1: DOCUMENT DETECTION (Critical First Step)**
+Examine the image carefully and determine:
+- Does this image contain a readable document (GRN, receipt, invoice, delivery note, etc.)?
+- Is the document clear and readable with structured data/text visible?
+- If NO document is detected or image is unclear/unreadable, set "has_document": false and "validation_result": "NO_DOCUMENT"
+
+**STEP 2: DATA EXTRACTION (Only if document detected)**
+If a document IS present, extract ALL visible items with maximum precision:
+- Product names/descriptions (both Arabic and English if present)
+- SKU codes/item codes/product IDs
+- Quantities with units (boxes, units, kg, etc.)
+- **GTIN/BARCODE NUMBERS** (13-digit codes starting with 622, 623, 624 for Egyptian products)
+- Package configurations (e.g., 5+1)*4, 2*10, etc.)
+- Unit of Measurement details
+
+**STEP 3: ITEM MATCHING LOGIC (Following PRD Priority)**
+For each extracted item, attempt matching using this EXACT priority order:
+1. **PRIMARY MATCH: SKU** - Match order.sku_id with extracted_sku (exact match)
+2. **SECONDARY MATCH: GTIN** - If no SKU match, use extracted_gtin for GS1 lookup
+3. **FUZZY NAME MATCHING** - Match product names (Arabic/English bilingual support)
+
+**STEP 4: QUANTITY VALIDATION WITH UOM HANDLING**
+Once items are matched, validate quantities considering:
+- Unit of Measurement discrepancies (e.g., "12 units" vs "1 box")
+- Package configurations (e.g., "6 boxes" vs "6*(5+1) units")
+- Weight vs count differences
+- Partial deliveries vs full orders
+
+**STEP 5: DISCREPANCY IDENTIFICATION**
+Flag ALL discrepancies with specific types:
+- MISSING_ITEM: In order but not found in GRN
+- EXTRA_ITEM: In GRN but not in order
+- QUANTITY_MISMATCH: Different quantities
+- GTIN_NAME_MISMATCH: GTIN verified but names don't match
+- GTIN_NOT_VERIFIED: GTIN not found in database
+- UOM_MISMATCH: Unit of measurement issues
+
+"""
+
+VALIDATION_REQUIREMENTS = """CRITICAL REQUIREMENTS:
+1. **DOCUMENT DETECTION FIRST** - If no readable document: has_document=false, validation_result="NO_DOCUMENT"
+2. **FOLLOW PRD MATCHING PRIORITY** - SKU first, then GTIN, then fuzzy name matching
+3. **UOM INTELLIGENCE** - Convert between units (boxes↔units, kg↔grams, etc.)
+4. **GTIN EXTRACTION** - ALWAYS look for 13-digit barcodes/GTINs starting with 622/623/624 and include in extracted_gtin field
+5. **PRECISE QUANTITY MATCHING** - Account for package configurations and include unit details
+6. **BILINGUAL SUPPORT** - Handle Arabic/English product names
+7. **SEVERITY ASSESSMENT** - Classify discrepancies by business impact
+8. **COMPLETE DATA EXTRACTION** - For each item, MUST include sku, gtin, name, quantity, and unit fields
+9. **SUMMARY ACCURACY** - Provide exact integer counts in summary section
+10. Return ONLY valid JSON, no markdown or extra text
+"""
+
+
+def _result_schema(total_items_expected):
+    """JSON schema of one order's validation result"""
+    return f"""{{
+    "has_document": true or false,
+    "document_description": "Brief description of document type found or why no document detected",
+    "validation_result": "VALID" or "INVALID" or "NO_DOCUMENT",
+    "confidence_score": 0.95,
+    "extracted_items": [
+        {{
+            "extracted_sku": "SKU/item code from document or null",
+            "extracted_gtin": "13-digit GTIN/barcode number or null",
+            "extracted_name": "product name/description from document",
+            "extracted_quantity": "quantity number from document",
+            "extracted_unit": "unit of measurement (boxes, units, kg, etc.)",
+            "extracted_weight": "weight value if available or null",
+            "package_config": "package configuration like (5+1)*4 or null",
+            "matched_order_sku": "matching order SKU or null",
+            "match_method": "SKU_MATCH or GTIN_MATCH or NAME_MATCH or NONE",
+            "match_confidence": 0.98,
+            "quantity_equivalent": "calculated equivalent quantity in order units",
+            "status": "MATCHED" or "EXTRA" or "QUANTITY_MISMATCH"
+        }}
+    ],
+    "discrepancies": [
+        {{
+            "type": "MISSING_ITEM" or "EXTRA_ITEM" or "QUANTITY_MISMATCH" or "UOM_MISMATCH" or "GTIN_NAME_MISMATCH" or "GTIN_NOT_VERIFIED",
+            "description": "Clear description of the specific issue",
+            "expected": "what was expected from order",
+            "actual": "what was found in GRN document",
+            "sku_id": "relevant SKU if applicable",
+            "gtin": "relevant GTIN if applicable",
+            "severity": "HIGH" or "MEDIUM" or "LOW"
+        }}
+    ],
+    "summary": {{
+        "total_items_expected": {total_items_expected},
+        "total_items_found": "number of items found in GRN (integer)",
+        "items_perfectly_matched": "items with exact SKU/GTIN/quantity match (integer)",
+        "items_with_discrepancies": "items with issues (integer)",
+        "gtins_extracted": "number of GTIN codes found (integer)",
+        "missing_items": "items in order but not in GRN (integer)",
+        "extra_items": "items in GRN but not in order (integer)",
+        "quantity_mismatches": "items with quantity differences (integer)"
+    }},
+    "uom_analysis": {{
+        "conversions_attempted": "number of UoM conversions tried",
+        "successful_conversions": "conversions that resolved discrepancies",
+        "unresolved_uom_issues": "remaining UoM conflicts"
+    }}
+}}"""
+
+
+def _order_section(order_items):
+    return f"""EXPECTED ORDER DATA:
+{json.dumps(order_items, indent=2)}
+
+CRITICAL MATCHING INSTRUCTIONS:
+- Total Expected Items: {len(order_items)} different SKUs
+- MUST match items by SKU first (exact match of sku_id field)
+- MUST include full product name and unit of measurement (UOM) data in response
+- Look for Egyptian GTIN codes: 13-digit numbers starting with 622, 623, 624
+- Common brands: PAPIA, FAMILIA
+- Package formats: (5+1)*4, 2*10, etc.
+- For each order item above, you MUST attempt to find a matching item in the GRN document
+- If you cannot match an item, it should be reported as MISSING_ITEM
+- Product names may appear in Arabic in the GRN but are in English in the order data
+
+"""
+
+
+def build_validation_prompt(order_items):
+    """Prompt for validating one GRN image against one order"""
+    return ("\nYou are a professional GRN validation system following a structured workflow. "
+            "Analyze this image systematically according to the Order Validation Workflow outlined below.\n\n"
+            + VALIDATION_WORKFLOW
+            + _order_section(order_items)
+            + "REQUIRED OUTPUT FORMAT (JSON only):\n" + _result_schema(len(order_items)) + "\n\n"
+            + VALIDATION_REQUIREMENTS)
+
+
+def build_batch_validation_prompt(orders):
+    """Prompt sections for validating several orders in one request.
+
+    ``orders`` is a list of (order_ref, order_items). Returns the text parts
+    in request order: the instructions, one section per order (its GRN image
+    goes right after it) and the output format.
+    """
+    instructions = (f"\nYou are a professional GRN validation system following a structured workflow. "
+                    f"This request contains {len(orders)} separate orders. Each order's expected data is followed by "
+                    f"its own GRN image. Validate every order independently against its own image only - never match "
+                    f"items across orders - following the Order Validation Workflow outlined below.\n\n"
+                    + VALIDATION_WORKFLOW)
+
+    sections = []
+    for position, (order_ref, order_items) in enumerate(orders, 1):
+        sections.append(f"=== ORDER {position} of {len(orders)} - order_ref: \"{order_ref}\" ===\n"
+                        + _order_section(order_items)
+                        + f"GRN IMAGE FOR order_ref \"{order_ref}\":\n")
+
+    output_format = ("REQUIRED OUTPUT FORMAT (JSON only):\n"
+                     "{\n"
+                     "    \"orders\": [\n"
+                     "        {\"order_ref\": \"order_ref exactly as given\", ...every field of the per-order result below...}\n"
+                     "    ]\n"
+                     "}\n"
+                     f"Return exactly {len(orders)} entries in \"orders\", one per order_ref, in the order given.\n\n"
+                     "PER-ORDER RESULT:\n"
+                     + _result_schema('"number of EXPECTED ORDER DATA items for that order (integer)"') + "\n\n"
+                     + VALIDATION_REQUIREMENTS)
+
+    return [instructions] + sections + [output_format]
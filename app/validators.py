@@ -2,39 +2,58 @@ import requests
 import json
 import logging
 import time
-import base64
+import hashlib
 import re
-import difflib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from flask import current_app, has_app_context
 from models import ValidationResult, db
+from app.http_client import http_client
+from app.image_cache import grn_image_cache
+from app.gtin_cache import gtin_cache, GtinLookupError
+from app.gemini_stream import StreamedAnswer, is_event_stream, iter_stream_text
+from app.quantity_reconciliation import ExtractedItemIndex, OrderLines, QuantityReconciler, parse_package_quantity
+from app.name_matcher import best_name_match, match_threshold, meaningful_words, normalize_name, sku_catalogue
+from app.validation_prompts import PROMPT_VERSION, build_validation_prompt, build_batch_validation_prompt
 
 logger = logging.getLogger(__name__)
 
 class GS1Validator:
+    # GS1 Verified search endpoint and the browser-style headers it expects
+    SEARCH_URL = "https://www.gs1.org/services/verified-by-gs1/results"
+    HEADERS = {
+        "accept": "application/json, text/javascript, */*; q=0.01",
+        "accept-language": "en-US,en;q=0.9",
+        "content-type": "application/x-www-form-urlencoded; charset=UTF-8",
+        "sec-ch-ua": '"Not)A;Brand";v="8", "Chromium";v="138", "Google Chrome";v="138"',
+        "sec-ch-ua-mobile": "?0",
+        "sec-ch-ua-platform": '"Linux"',
+        "sec-fetch-dest": "empty",
+        "sec-fetch-mode": "cors",
+        "sec-fetch-site": "same-origin",
+        "x-requested-with": "XMLHttpRequest"
+    }
+
     def __init__(self):
         pass
 
     def get_product_info(self, gtin):
-        """Fetch product information from GS1 Verified database"""
+        """Fetch product information from GS1 Verified database (through the GTIN cache)"""
+        return gtin_cache.get(gtin, self.lookup_product_info)
+
+    def get_products_info(self, gtins):
+        """Product info for several GTINs: ({gtin: product_info or None}, cache stats for the call).
+
+        Cached GTINs are answered from the gtin_products table; the rest are
+        looked up concurrently.
+        """
+        return gtin_cache.get_many(gtins, self.lookup_product_info)
+
+    def lookup_product_info(self, gtin):
+        """Query GS1 Verified directly; None when GS1 has no such product, GtinLookupError when it could not answer"""
         try:
             logger.info(f"Fetching GS1 product info for GTIN: {gtin}")
 
-            # GS1 Verified API endpoint
-            url = "https://www.gs1.org/services/verified-by-gs1/results"
-
-            headers = {
-                "accept": "application/json, text/javascript, */*; q=0.01",
-                "accept-language": "en-US,en;q=0.9",
-                "content-type": "application/x-www-form-urlencoded; charset=UTF-8",
-                "sec-ch-ua": '"Not)A;Brand";v="8", "Chromium";v="138", "Google Chrome";v="138"',
-                "sec-ch-ua-mobile": "?0",
-                "sec-ch-ua-platform": '"Linux"',
-                "sec-fetch-dest": "empty",
-                "sec-fetch-mode": "cors",
-                "sec-fetch-site": "same-origin",
-                "x-requested-with": "XMLHttpRequest"
-            }
-
             # Prepare form data for GTIN search
             form_data = {
                 "search_type": "gtin",
@@ -53,7 +72,7 @@ class GS1Validator:
             }
 
             # Make the request
-            response = requests.post(url, headers=headers, data=form_data, timeout=10)
+            response = http_client.post(self.SEARCH_URL, headers=self.HEADERS, data=form_data, timeout=(5, 10), idempotent=True)
 
             if response.status_code == 200:
                 result = response.json()
@@ -63,11 +82,13 @@ class GS1Validator:
                 return product_info
             else:
                 logger.error(f"GS1 API error: {response.status_code}")
-                return None
+                raise GtinLookupError(f"GS1 API returned {response.status_code}")
 
+        except GtinLookupError:
+            raise
         except Exception as e:
             logger.error(f"Error fetching GS1 data for GTIN {gtin}: {e}")
-            return None
+            raise GtinLookupError(str(e)) from e
 
     def parse_gs1_response(self, response_data, gtin):
         """Parse GS1 API response to extract product information"""
@@ -147,15 +168,26 @@ class GoogleAIValidator:
             self.api_key = config.GOOGLE_AI_API_KEY
             self.api_url = config.GOOGLE_AI_API_URL
             self.bearer_token = config.BEARER_TOKEN
+            self.batch_max_output_tokens = getattr(config, 'GEMINI_BATCH_MAX_OUTPUT_TOKENS', 8192)
+            self.streaming = getattr(config, 'GEMINI_STREAMING', True)
         else:
             # Fallback to environment variables
             import os
             self.api_key = os.getenv('GOOGLE_AI_API_KEY')
             self.api_url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash-exp:generateContent"
+            self.batch_max_output_tokens = 8192
+            self.streaming = os.getenv('GEMINI_STREAMING', 'true').lower() == 'true'
             self.bearer_token = "eyJhbGciOiJSUzI1NiIsInR5cCI6IkpXVCIsImtpZCI6Ik4wRTNNa1l3TlVGQk1EQkZOREEzTVRVMFEwSTJSRGxCUkRFelFqa3pOVFl4TWpZMlJUUkNNUSJ9.eyJsb2N1cy1hdHRyaWJ1dGVzIjp7ImN1c3RvbVZhbHVlcyI6eyJkYXRhQ2xpZW50SWQiOiJpbGxhLWZyb250ZG9vciJ9LCJwZXJzb25uZWxJZCI6ImlsbGEtZnJvbnRkb29yL3BlcnNvbm5lbC9BbWluIn0sImlzcyI6Imh0dHBzOi8vYWNjb3VudHMubG9jdXMtZGFzaGJvYXJkLmNvbS8iLCJzdWIiOiJhdXRoMHxwZXJzb25uZWxzfGlsbGEtZnJvbnRkb29yL3BlcnNvbm5lbC9BbWluIiwiYXVkIjpbImh0dHBzOi8vYXdzLXVzLWVhc3QtMS5sb2N1cy1hcGkuY29tIiwiaHR0cHM6Ly9sb2N1cy1hd3MtdXMtZWFzdC0xLmF1dGgwLmNvbS91c2VyaW5mbyJdLCJpYXQiOjE3NTg4NzQxMjIsImV4cCI6MTc1ODkxNzMyMiwic2NvcGUiOiJvcGVuaWQgcHJvZmlsZSBlbWFpbCIsImF6cCI6IkNMMm1sYnJMZ2Z3N2RTOGFkcDV4MzE5aXVQT0pySlZlIn0.lZGb9MynHmGDDUsPTT6PMfCosS3Dkzwd6vBEsneW3pn_w4rJjkby-jMSo8ljBrMhc9AypY43bX8Kfs86FZ2j3NNo_lUi9epSur1GyZf11S8GiH_lXlcHk-Kf-a47vimzo-ccmMJ-15UMYK9ekbWRUeg1-2Dbm-ENXkgIT-T58qh9FN7qf7zqOgPOFyLwBdCQLFF7su3Opzm7TTW1VLrt0_CBfczq_bcJ9sdl_iTYCTXlIBIwdeoqTwYXZoW7O9Ndprl9sp__h3_6QLHXnrdtEw8H3vcpeDc-Cke4iZZNvDdq8f3gIwEQVLyEAkrT_hpZfYFYDnc8xy0SQnQhiZ1mJw"
 
         self.gs1_validator = GS1Validator()
 
+        # Headers for GRN image downloads (built once, reused for every image)
+        self.image_headers = {
+            "authorization": f"Bearer {self.bearer_token}",
+            "user-agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36",
+            "accept": "*/*"
+        }
+
         # UoM conversion mappings
         self.uom_conversions = {
             'box': ['boxes', 'carton', 'cartons', 'case', 'cases'],
@@ -166,189 +198,47 @@ class GoogleAIValidator:
             'ml': ['milliliter', 'milliliters', 'millilitre', 'millilitres']
         }
 
-        # Common package multipliers
-        self.package_patterns = {
-            r'\((\d+)\+(\d+)\)\*(\d+)': lambda m: (int(m[1]) + int(m[2])) * int(m[3]),  # (5+1)*4
-            r'(\d+)\*(\d+)': lambda m: int(m[1]) * int(m[2]),  # 2*10
-            r'(\d+)x(\d+)': lambda m: int(m[1]) * int(m[2]),  # 6x12
-        }
+        # Unit alias table and quantity reconciliation built from the mappings above
+        self.quantity_reconciler = QuantityReconciler(self.uom_conversions)
+
+    @property
+    def stream_url(self):
+        """streamGenerateContent endpoint of the configured model"""
+        return self.api_url.replace(':generateContent', ':streamGenerateContent')
 
     def normalize_unit(self, unit_str):
         """Normalize unit of measurement to standard form"""
-        if not unit_str:
-            return 'unit'
-
-        unit_lower = unit_str.lower().strip()
-
-        for standard_unit, variations in self.uom_conversions.items():
-            if unit_lower == standard_unit or unit_lower in variations:
-                return standard_unit
-
-        return unit_lower
+        return self.quantity_reconciler.normalize_unit(unit_str)
 
     def parse_package_quantity(self, quantity_str):
         """Parse package configuration strings like (5+1)*4 to calculate total quantity"""
         if not quantity_str:
             return None, None
-
-        quantity_str = str(quantity_str).strip()
-
-        # Try to extract just the number first
-        number_match = re.search(r'(\d+(?:\.\d+)?)', quantity_str)
-        base_quantity = float(number_match.group(1)) if number_match else 0
-
-        # Try package patterns
-        for pattern, calculator in self.package_patterns.items():
-            match = re.search(pattern, quantity_str)
-            if match:
-                calculated_qty = calculator(match)
-                logger.info(f"Parsed package '{quantity_str}' -> {calculated_qty} units")
-                return calculated_qty, 'calculated'
-
-        return base_quantity, 'direct'
+        return parse_package_quantity(str(quantity_str))
 
     def convert_quantity_units(self, from_qty, from_unit, to_unit, product_context=None):
         """Convert quantities between different units of measurement"""
-        try:
-            from_unit_norm = self.normalize_unit(from_unit)
-            to_unit_norm = self.normalize_unit(to_unit)
-
-            if from_unit_norm == to_unit_norm:
-                return from_qty, 1.0  # Same unit, no conversion needed
-
-            # Handle box to unit conversions (common case)
-            if from_unit_norm == 'box' and to_unit_norm == 'unit':
-                # Try to infer items per box from product context or use common ratios
-                if product_context:
-                    # Look for patterns in product name/sku that might indicate pack size
-                    pack_matches = re.findall(r'(\d+)(?:x|X|\*)(\d+)', str(product_context))
-                    if pack_matches:
-                        pack_size = int(pack_matches[0][0]) * int(pack_matches[0][1])
-                        return from_qty * pack_size, pack_size
-
-                # Default assumptions for common products
-                default_multiplier = 12  # Assume 12 units per box as common
-                logger.warning(f"Using default box->unit conversion: 1 box = {default_multiplier} units")
-                return from_qty * default_multiplier, default_multiplier
-
-            elif from_unit_norm == 'unit' and to_unit_norm == 'box':
-                # Reverse conversion
-                default_divisor = 12
-                return from_qty / default_divisor, 1/default_divisor
-
-            # Weight conversions
-            elif from_unit_norm == 'kg' and to_unit_norm == 'g':
-                return from_qty * 1000, 1000
-            elif from_unit_norm == 'g' and to_unit_norm == 'kg':
-                return from_qty / 1000, 1/1000
-
-            # Volume conversions
-            elif from_unit_norm == 'l' and to_unit_norm == 'ml':
-                return from_qty * 1000, 1000
-            elif from_unit_norm == 'ml' and to_unit_norm == 'l':
-                return from_qty / 1000, 1/1000
-
-            # If no conversion available, return original with note
-            logger.warning(f"No conversion available from {from_unit} to {to_unit}")
-            return from_qty, None
+        return self.quantity_reconciler.convert(from_qty, from_unit, to_unit, product_context)
 
-        except Exception as e:
-            logger.error(f"Error converting {from_qty} {from_unit} to {to_unit}: {e}")
-            return from_qty, None
+    def check_item_quantity(self, extracted_item, order_lines):
+        """UoM-aware quantity check of one extracted item against the order line it matched.
+
+        ``order_lines`` is an OrderLines index of the order items. Sets the
+        item's status (and quantity_equivalent when it matches). Returns
+        (conversion attempted, resolved by a conversion, discrepancy or None),
+        or None when the item matched no order line.
+        """
+        return self.quantity_reconciler.check_item(extracted_item, order_lines)
 
     def validate_quantities_with_uom(self, validation_data, order_items):
         """Enhanced quantity validation with UoM conversion support"""
         try:
             logger.info("Starting enhanced quantity validation with UoM support")
+            self.quantity_reconciler.reconcile(validation_data, order_items)
 
-            extracted_items = validation_data.get('extracted_items', [])
-            enhanced_discrepancies = list(validation_data.get('discrepancies', []))
-            conversions_attempted = 0
-            successful_conversions = 0
-
-            for extracted_item in extracted_items:
-                matched_sku = extracted_item.get('matched_order_sku')
-                if not matched_sku:
-                    continue
-
-                # Find corresponding order item
-                order_item = next((item for item in order_items if item['sku_id'] == matched_sku), None)
-                if not order_item:
-                    continue
-
-                extracted_qty = extracted_item.get('extracted_quantity', 0)
-                extracted_unit = extracted_item.get('extracted_unit', 'unit')
-                order_qty = order_item.get('quantity', 0)
-                order_unit = order_item.get('unit', 'unit')
-
-                # Parse package configurations if present
-                package_config = extracted_item.get('package_config')
-                if package_config:
-                    parsed_qty, parse_method = self.parse_package_quantity(package_config)
-                    if parsed_qty:
-                        extracted_qty = parsed_qty
-                        logger.info(f"Used package configuration: {package_config} -> {parsed_qty}")
-
-                # Try UoM conversion
-                converted_qty = extracted_qty
-                conversion_ratio = None
-
-                try:
-                    converted_qty, conversion_ratio = self.convert_quantity_units(
-                        float(extracted_qty),
-                        extracted_unit,
-                        order_unit,
-                        product_context=f"{order_item.get('name', '')} {matched_sku}"
-                    )
-                    conversions_attempted += 1
-
-                    if conversion_ratio is not None:
-                        logger.info(f"UoM conversion: {extracted_qty} {extracted_unit} -> {converted_qty} {order_unit} (ratio: {conversion_ratio})")
-                except Exception as e:
-                    logger.error(f"UoM conversion failed: {e}")
-
-                # Check for quantity match after conversion
-                order_qty_float = float(order_qty)
-                tolerance = max(1, order_qty_float * 0.05)  # 5% tolerance or minimum 1 unit
-
-                if abs(converted_qty - order_qty_float) <= tolerance:
-                    # Quantities match within tolerance
-                    extracted_item['quantity_equivalent'] = converted_qty
-                    extracted_item['status'] = 'MATCHED'
-                    if conversion_ratio:
-                        successful_conversions += 1
-                else:
-                    # Quantity mismatch
-                    extracted_item['status'] = 'QUANTITY_MISMATCH'
-
-                    # Determine severity
-                    percentage_diff = abs(converted_qty - order_qty_float) / order_qty_float * 100
-                    if percentage_diff > 20:
-                        severity = 'HIGH'
-                    elif percentage_diff > 10:
-                        severity = 'MEDIUM'
-                    else:
-                        severity = 'LOW'
-
-                    enhanced_discrepancies.append({
-                        'type': 'QUANTITY_MISMATCH',
-                        'description': f'Quantity mismatch for {matched_sku}',
-                        'expected': f'{order_qty} {order_unit}',
-                        'actual': f'{extracted_qty} {extracted_unit}' + (f' (≈{converted_qty:.1f} {order_unit})' if conversion_ratio else ''),
-                        'sku_id': matched_sku,
-                        'severity': severity,
-                        'percentage_diff': round(percentage_diff, 1)
-                    })
-
-            # Update validation data
-            validation_data['discrepancies'] = enhanced_discrepancies
-            validation_data['uom_analysis'] = {
-                'conversions_attempted': conversions_attempted,
-                'successful_conversions': successful_conversions,
-                'unresolved_uom_issues': conversions_attempted - successful_conversions
-            }
-
-            logger.info(f"UoM validation complete: {successful_conversions}/{conversions_attempted} successful conversions")
+            uom_analysis = validation_data['uom_analysis']
+            logger.info(f"UoM validation complete: {uom_analysis['successful_conversions']}/"
+                        f"{uom_analysis['conversions_attempted']} successful conversions")
             return validation_data
 
         except Exception as e:
@@ -356,17 +246,11 @@ class GoogleAIValidator:
             return validation_data
 
     def download_image(self, image_url):
-        """Download image from URL and convert to base64"""
-        try:
-            logger.info(f"Attempting to download image from: {image_url}")
+        """Download image from URL and convert to base64 (through the GRN image cache)"""
+        def fetch(url):
+            logger.info(f"Attempting to download image from: {url}")
 
-            headers = {
-                "authorization": f"Bearer {self.bearer_token}",
-                "user-agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36",
-                "accept": "*/*"
-            }
-
-            response = requests.get(image_url, headers=headers, timeout=30)
+            response = http_client.get(url, headers=self.image_headers)
             logger.info(f"Image download response status: {response.status_code}")
 
             response.raise_for_status()
@@ -377,22 +261,13 @@ class GoogleAIValidator:
                 return None, None
 
             logger.info(f"Downloaded image size: {len(response.content)} bytes")
+            return response.content, response.headers.get('content-type', '')
 
-            # Convert to base64
-            image_base64 = base64.b64encode(response.content).decode('utf-8')
-
-            # Detect image format from content-type header or URL
-            image_format = 'jpeg'  # default
-            content_type = response.headers.get('content-type', '').lower()
-
-            if 'png' in content_type or image_url.lower().endswith('.png'):
-                image_format = 'png'
-            elif 'pdf' in content_type or image_url.lower().endswith('.pdf'):
-                image_format = 'pdf'
-            elif 'jpeg' in content_type or 'jpg' in content_type or image_url.lower().endswith('.jpg') or image_url.lower().endswith('.jpeg'):
-                image_format = 'jpeg'
-
-            logger.info(f"Detected image format: {image_format}")
+        try:
+            # Downscaled/recompressed for upload; repeat validations of the same GRN skip the download
+            image_base64, image_format = grn_image_cache.get_image(image_url, fetch)
+            if image_base64:
+                logger.info(f"Detected image format: {image_format}")
             return image_base64, image_format
 
         except requests.RequestException as e:
@@ -558,159 +433,113 @@ class GoogleAIValidator:
 
     def normalize_text_for_matching(self, text):
         """Advanced text normalization for better Arabic/English matching"""
-        if not text:
-            return ""
-
-        # Convert to lowercase
-        text = text.lower().strip()
-
-        # Remove common Arabic diacritics
-        arabic_diacritics = "ًٌٍَُِّْ"
-        for diacritic in arabic_diacritics:
-            text = text.replace(diacritic, "")
-
-        # Normalize common Arabic letter variations
-        text = text.replace("أ", "ا").replace("إ", "ا").replace("آ", "ا")
-        text = text.replace("ة", "ه")  # Ta marbuta to ha
-        text = text.replace("ي", "ى")  # Alif maksura normalization
-
-        # Remove punctuation and special characters but keep Arabic and alphanumeric
-        text = re.sub(r'[^\w\s\u0600-\u06FF]', ' ', text)
-
-        # Normalize whitespace
-        text = ' '.join(text.split())
-
-        return text
+        return normalize_name(text)
 
     def extract_meaningful_words(self, text):
         """Extract meaningful words, filtering out common stopwords"""
-        if not text:
-            return set()
-
-        # Arabic stopwords (common ones)
-        arabic_stopwords = {'من', 'في', 'على', 'إلى', 'مع', 'هذا', 'هذه', 'ذلك', 'التي', 'الذي', 'كل', 'بعض'}
-
-        # English stopwords (common ones)
-        english_stopwords = {'the', 'and', 'or', 'of', 'in', 'on', 'at', 'to', 'for', 'with', 'by', 'a', 'an'}
+        return set(meaningful_words(text))
 
-        words = set(text.split())
+    def calculate_bilingual_match(self, extracted_name, gs1_product, min_score=0.0):
+        """Advanced bilingual matching for Arabic/English product names.
 
-        # Filter out stopwords and very short words (but keep 2-letter words for Arabic)
-        meaningful_words = {word for word in words
-                          if len(word) > 1 and
-                          word not in arabic_stopwords and
-                          word not in english_stopwords}
-
-        return meaningful_words
-
-    def calculate_bilingual_match(self, extracted_name, gs1_product):
-        """Advanced bilingual matching for Arabic/English product names"""
+        Callers that only act on scores of at least ``min_score`` pass it so
+        hopeless candidates skip the full string comparison.
+        """
         try:
             if not extracted_name or not gs1_product:
                 return False, 0.0
 
-            # Use advanced normalization
-            extracted_name_normalized = self.normalize_text_for_matching(extracted_name)
-
             # Get all possible names to match against
-            match_candidates = []
-
-            # Add all GS1 names
             product_names = gs1_product.get('product_names', {})
             brand_names = gs1_product.get('brand_names', {})
+            match_candidates = [
+                ('product_en', product_names.get('english')),
+                ('brand_en', brand_names.get('english')),
+                ('product_ar', product_names.get('arabic')),
+                ('brand_ar', brand_names.get('arabic')),
+                # Primary and legacy names for backward compatibility
+                ('primary', product_names.get('primary')),
+                ('legacy_product', gs1_product.get('product_name')),
+                ('legacy_brand', gs1_product.get('brand_name')),
+            ]
 
-            # Add English names with normalization
-            if product_names.get('english'):
-                match_candidates.append(('product_en', self.normalize_text_for_matching(product_names['english'])))
-            if brand_names.get('english'):
-                match_candidates.append(('brand_en', self.normalize_text_for_matching(brand_names['english'])))
-
-            # Add Arabic names with normalization
-            if product_names.get('arabic'):
-                match_candidates.append(('product_ar', self.normalize_text_for_matching(product_names['arabic'])))
-            if brand_names.get('arabic'):
-                match_candidates.append(('brand_ar', self.normalize_text_for_matching(brand_names['arabic'])))
-
-            # Add primary name for backward compatibility
-            if product_names.get('primary'):
-                match_candidates.append(('primary', self.normalize_text_for_matching(product_names['primary'])))
-
-            # Add backward compatibility names
-            if gs1_product.get('product_name'):
-                match_candidates.append(('legacy_product', self.normalize_text_for_matching(gs1_product['product_name'])))
-            if gs1_product.get('brand_name'):
-                match_candidates.append(('legacy_brand', self.normalize_text_for_matching(gs1_product['brand_name'])))
-
-            logger.info(f"Matching '{extracted_name}' against {len(match_candidates)} candidates")
-
-            best_match = None
-            best_score = 0.0
-
-            for match_type, candidate_name in match_candidates:
-                if not candidate_name:
-                    continue
-
-                # Exact match (highest score)
-                if extracted_name_normalized == candidate_name:
-                    logger.info(f"EXACT normalized match found: '{extracted_name}' == '{candidate_name}' ({match_type})")
-                    return True, 1.0
-
-                # Advanced word-based matching using meaningful words
-                extracted_words = self.extract_meaningful_words(extracted_name_normalized)
-                candidate_words = self.extract_meaningful_words(candidate_name)
-
-                if extracted_words and candidate_words:
-                    # Jaccard similarity (intersection over union)
-                    intersection = len(extracted_words & candidate_words)
-                    union = len(extracted_words | candidate_words)
-                    jaccard_score = intersection / union if union > 0 else 0
-
-                    # Containment score (how much of extracted is in candidate)
-                    containment_score = intersection / len(extracted_words) if len(extracted_words) > 0 else 0
-
-                    # Combined score with bias towards containment
-                    combined_score = (jaccard_score * 0.6) + (containment_score * 0.4)
-
-                    logger.info(f"Word match: '{extracted_name}' vs '{candidate_name}' ({match_type}) = {combined_score:.3f}")
-
-                    if combined_score > best_score:
-                        best_score = combined_score
-                        best_match = (match_type, candidate_name)
+            is_match, best_score, best_match = best_name_match(extracted_name, match_candidates, min_score=min_score)
 
-                # Fuzzy string matching using difflib on normalized text
-                similarity = difflib.SequenceMatcher(None, extracted_name_normalized, candidate_name).ratio()
-                logger.info(f"String similarity: '{extracted_name}' vs '{candidate_name}' ({match_type}) = {similarity:.3f}")
+            logger.debug(f"Best match for '{extracted_name}': {best_match or 'none'} with score {best_score:.3f} "
+                         f"(threshold: {match_threshold(extracted_name):.2f}) - {'MATCH' if is_match else 'NO MATCH'}")
+            return is_match, best_score
 
-                if similarity > best_score:
-                    best_score = similarity
-                    best_match = (match_type, candidate_name)
+        except Exception as e:
+            logger.error(f"Error in bilingual matching: {e}")
+            return False, 0.0
 
-            # Dynamic threshold based on content language mix
-            # More lenient for mixed Arabic/English content
-            has_arabic = any('\u0600' <= char <= '\u06FF' for char in extracted_name)
-            has_english = any(char.isascii() and char.isalpha() for char in extracted_name)
+    def annotate_catalogue_matches(self, validation_data):
+        """Attach the closest known SKU to extracted items that matched no order line"""
+        try:
+            unmatched = [item for item in validation_data.get('extracted_items', [])
+                         if isinstance(item, dict) and not item.get('matched_order_sku') and item.get('extracted_name')]
+            for item in unmatched:
+                item['catalogue_match'] = sku_catalogue.match(item['extracted_name'])
+            if unmatched:
+                found = sum(1 for item in unmatched if item['catalogue_match'])
+                logger.info(f"SKU CATALOGUE: {found} of {len(unmatched)} unmatched GRN items resemble a known SKU")
+        except Exception as e:
+            logger.error(f"Error matching GRN items against the SKU catalogue: {e}")
+        return validation_data
+
+    def verify_item_gtin(self, item, gs1_product):
+        """Check an extracted item's name against its GS1 product (None if not in GS1): (verification entry, discrepancy or None)"""
+        gtin = item.get('extracted_gtin')
+        logger.info(f"Verifying GTIN: {gtin}")
+
+        gtin_verification_item = {
+            'gtin': gtin,
+            'extracted_name': item.get('extracted_name', ''),
+            'gs1_verified': gs1_product is not None,
+            'gs1_product_info': gs1_product
+        }
+        discrepancy = None
+
+        if gs1_product:
+            # Use advanced bilingual matching
+            extracted_name = item.get('extracted_name', '')
+            name_match, match_confidence = self.calculate_bilingual_match(extracted_name, gs1_product)
+
+            gtin_verification_item['name_match'] = name_match
+            gtin_verification_item['match_confidence'] = match_confidence
+
+            # Add discrepancy if names don't match
+            if not name_match:
+                discrepancy = {
+                    'type': 'GTIN_NAME_MISMATCH',
+                    'description': f'Product name mismatch for GTIN {gtin}',
+                    'expected': f'GS1 verified: {gs1_product.get("product_name", "N/A")} ({gs1_product.get("brand_name", "N/A")})',
+                    'actual': f'Document shows: {item.get("extracted_name", "N/A")}',
+                    'gtin': gtin
+                }
 
-            if has_arabic and has_english:
-                threshold = 0.55  # More lenient for mixed content
-            elif has_arabic:
-                threshold = 0.6   # Standard for Arabic
-            else:
-                threshold = 0.65  # Slightly stricter for English-only
-            is_match = best_score >= threshold
+            logger.info(f"GTIN {gtin} verified: {gs1_product.get('product_name', 'N/A')}")
+        else:
+            gtin_verification_item['name_match'] = False
+            gtin_verification_item['match_confidence'] = 0.0
+            discrepancy = {
+                'type': 'GTIN_NOT_VERIFIED',
+                'description': f'GTIN {gtin} could not be verified in GS1 database',
+                'expected': 'Valid GTIN in GS1 registry',
+                'actual': f'GTIN {gtin} not found or invalid',
+                'gtin': gtin
+            }
 
-            if best_match:
-                logger.info(f"Best match for '{extracted_name}': {best_match[1]} ({best_match[0]}) with score {best_score:.3f} (threshold: {threshold:.2f}) - {'MATCH' if is_match else 'NO MATCH'}")
-            else:
-                logger.info(f"No good match found for '{extracted_name}' (best score: {best_score:.3f}, threshold: {threshold:.2f})")
+            logger.warning(f"GTIN {gtin} not found in GS1 database")
 
-            return is_match, best_score
+        return gtin_verification_item, discrepancy
 
-        except Exception as e:
-            logger.error(f"Error in bilingual matching: {e}")
-            return False, 0.0
+    def enhance_with_gtin_verification(self, validation_data, gs1_products=None):
+        """Enhance validation results with GS1 GTIN verification.
 
-    def enhance_with_gtin_verification(self, validation_data):
-        """Enhance validation results with GS1 GTIN verification"""
+        ``gs1_products`` holds GTINs already looked up (e.g. while the answer
+        was streaming); only the others are looked up here.
+        """
         try:
             logger.info("Starting GTIN verification enhancement")
 
@@ -719,53 +548,23 @@ class GoogleAIValidator:
             gtin_verification = []
             enhanced_discrepancies = list(validation_data.get('discrepancies', []))
 
+            # Look up every unique GTIN of the GRN at once (cached or concurrent GS1 requests)
+            gtins = [str(item.get('extracted_gtin')) for item in extracted_items
+                     if item.get('extracted_gtin') and len(str(item.get('extracted_gtin'))) == 13]
+            known = gs1_products or {}
+            gs1_products, cache_stats = self.gs1_validator.get_products_info([gtin for gtin in gtins if gtin not in known])
+            gs1_products.update(known)
+            if gtins:
+                streamed = f"{len(known)} looked up while streaming, " if known else ""
+                logger.info(f"GTIN CACHE: {len(set(gtins))} unique GTINs, {streamed}{cache_stats['hits'] + cache_stats['negative_hits']} cached, "
+                            f"{cache_stats['lookups']} GS1 lookups, {cache_stats['coalesced']} shared")
+
             for item in extracted_items:
                 gtin = item.get('extracted_gtin')
                 if gtin and len(str(gtin)) == 13:
-                    logger.info(f"Verifying GTIN: {gtin}")
-
-                    # Get product info from GS1
-                    gs1_product = self.gs1_validator.get_product_info(str(gtin))
-
-                    gtin_verification_item = {
-                        'gtin': gtin,
-                        'extracted_name': item.get('extracted_name', ''),
-                        'gs1_verified': gs1_product is not None,
-                        'gs1_product_info': gs1_product
-                    }
-
-                    if gs1_product:
-                        # Use advanced bilingual matching
-                        extracted_name = item.get('extracted_name', '')
-                        name_match, match_confidence = self.calculate_bilingual_match(extracted_name, gs1_product)
-
-                        gtin_verification_item['name_match'] = name_match
-                        gtin_verification_item['match_confidence'] = match_confidence
-
-                        # Add discrepancy if names don't match
-                        if not name_match:
-                            enhanced_discrepancies.append({
-                                'type': 'GTIN_NAME_MISMATCH',
-                                'description': f'Product name mismatch for GTIN {gtin}',
-                                'expected': f'GS1 verified: {gs1_product.get("product_name", "N/A")} ({gs1_product.get("brand_name", "N/A")})',
-                                'actual': f'Document shows: {item.get("extracted_name", "N/A")}',
-                                'gtin': gtin
-                            })
-
-                        logger.info(f"GTIN {gtin} verified: {gs1_product.get('product_name', 'N/A')}")
-                    else:
-                        gtin_verification_item['name_match'] = False
-                        gtin_verification_item['match_confidence'] = 0.0
-                        enhanced_discrepancies.append({
-                            'type': 'GTIN_NOT_VERIFIED',
-                            'description': f'GTIN {gtin} could not be verified in GS1 database',
-                            'expected': 'Valid GTIN in GS1 registry',
-                            'actual': f'GTIN {gtin} not found or invalid',
-                            'gtin': gtin
-                        })
-
-                        logger.warning(f"GTIN {gtin} not found in GS1 database")
-
+                    gtin_verification_item, discrepancy = self.verify_item_gtin(item, gs1_products.get(str(gtin)))
+                    if discrepancy:
+                        enhanced_discrepancies.append(discrepancy)
                     gtin_verification.append(gtin_verification_item)
 
             # Update validation result based on GTIN verification
@@ -818,97 +617,45 @@ class GoogleAIValidator:
             CONSERVATIVE_MATCH_THRESHOLD = 0.7  # Higher threshold for considering items matched
             MIN_CONFIDENCE_FOR_MISSING = 0.95   # Very high confidence required to mark as missing
 
-            # Build comprehensive matching profile for each order item
+            # Profile the extracted items once instead of once per order item
+            extracted_index = ExtractedItemIndex(extracted_items, validation_data, CONSERVATIVE_MATCH_THRESHOLD) \
+                if order_items else None
+            extraction_completeness = validation_data.get('confidence_score', 0)
+            # A non-numeric confidence_score fails the missing-item decision below, so with one every
+            # strategy has to run to know whether that decision is reached
+            try:
+                extraction_completeness >= MIN_CONFIDENCE_FOR_MISSING
+                completeness_comparable = True
+            except TypeError:
+                completeness_comparable = False
+            overall_match_rate = None
+
             for order_item in order_items:
                 order_sku = order_item.get('sku_id', '').lower().strip()
                 order_name = order_item.get('name', '').lower().strip()
                 order_quantity = order_item.get('quantity', 0)
 
-                logger.info(f"Checking order item: {order_sku} - {order_name} (qty: {order_quantity})")
-
-                # Find potential matches with multiple matching strategies
-                potential_matches = []
-
-                for extracted_item in extracted_items:
-                    extracted_sku = extracted_item.get('extracted_sku', '').lower().strip()
-                    extracted_name = extracted_item.get('extracted_name', '').lower().strip()
-                    extracted_gtin = extracted_item.get('extracted_gtin')
-                    match_confidence = extracted_item.get('match_confidence', 0)
-
-                    # Strategy 1: Direct SKU match
-                    if order_sku and extracted_sku and order_sku == extracted_sku:
-                        potential_matches.append({
-                            'strategy': 'direct_sku',
-                            'confidence': 1.0,
-                            'item': extracted_item
-                        })
-                        logger.info(f"Direct SKU match found: {order_sku}")
-
-                    # Strategy 2: High confidence match from AI
-                    elif match_confidence >= CONSERVATIVE_MATCH_THRESHOLD:
-                        potential_matches.append({
-                            'strategy': 'ai_high_confidence',
-                            'confidence': match_confidence,
-                            'item': extracted_item
-                        })
-                        logger.info(f"High confidence AI match: {match_confidence}")
-
-                    # Strategy 3: GTIN verification match
-                    if extracted_gtin:
-                        gtin_verification = validation_data.get('gtin_verification', [])
-                        gtin_info = next((g for g in gtin_verification if g.get('gtin') == extracted_gtin), None)
-                        if gtin_info and gtin_info.get('name_match', False):
-                            # Cross-check if this GTIN product matches our order item
-                            gs1_product = gtin_info.get('gs1_product_info', {})
-                            gs1_name = gs1_product.get('product_name', '').lower()
-
-                            # Use bilingual matching for GTIN product name
-                            if gs1_name:
-                                gtin_name_match, gtin_match_score = self.calculate_bilingual_match(order_name, gs1_product)
-                                if gtin_name_match and gtin_match_score >= CONSERVATIVE_MATCH_THRESHOLD:
-                                    potential_matches.append({
-                                        'strategy': 'gtin_verified',
-                                        'confidence': gtin_match_score,
-                                        'item': extracted_item,
-                                        'gtin': extracted_gtin
-                                    })
-                                    logger.info(f"GTIN verified match: {extracted_gtin} with score {gtin_match_score}")
-
-                    # Strategy 4: Fuzzy name matching (only as additional confirmation)
-                    if order_name and extracted_name:
-                        # Create a mock GS1 product structure for bilingual matching
-                        mock_product = {
-                            'product_names': {'primary': extracted_name, 'english': extracted_name},
-                            'brand_names': {'primary': '', 'english': ''}
-                        }
-                        name_match, name_score = self.calculate_bilingual_match(order_name, mock_product)
-                        if name_match and name_score >= CONSERVATIVE_MATCH_THRESHOLD:
-                            potential_matches.append({
-                                'strategy': 'fuzzy_name',
-                                'confidence': name_score,
-                                'item': extracted_item
-                            })
-                            logger.info(f"Fuzzy name match: {order_name} -> {extracted_name} with score {name_score}")
+                logger.debug(f"Checking order item: {order_sku} - {order_name} (qty: {order_quantity})")
 
-                # Conservative decision making
-                best_match = None
-                if potential_matches:
-                    # Sort by confidence, prioritize direct matches
-                    potential_matches.sort(key=lambda x: (x['confidence'], 1 if x['strategy'] == 'direct_sku' else 0), reverse=True)
-                    best_match = potential_matches[0]
+                # Strategies 1-2: direct SKU match, or any high-confidence AI match
+                matched = extracted_index.matched_by_sku_or_confidence(order_sku)
 
-                    logger.info(f"Best match for {order_sku}: {best_match['strategy']} with confidence {best_match['confidence']}")
+                # Strategies 3-4: GTIN-verified or fuzzy name match. They can only keep an item from being
+                # marked missing, so they are skipped when the extraction could not support that anyway.
+                if not matched:
+                    if overall_match_rate is None:
+                        overall_match_rate = len([item for item in extracted_items if item.get('match_confidence', 0) >= 0.8])
+                    total_extracted = len(extracted_items)
+                    could_mark_missing = total_extracted > 0 and overall_match_rate / total_extracted >= 0.8
+                    if could_mark_missing or not completeness_comparable:
+                        matched = extracted_index.matched_by_name(order_name, self.calculate_bilingual_match)
 
                 # Ultra-conservative missing item logic
                 should_mark_missing = False
                 missing_confidence = 0.0
 
-                if not potential_matches:
+                if not matched:
                     # Only mark as missing if we have very high confidence in extraction completeness
-                    extraction_completeness = validation_data.get('confidence_score', 0)
-                    overall_match_rate = len([item for item in extracted_items if item.get('match_confidence', 0) >= 0.8])
-                    total_extracted = len(extracted_items)
-
                     if (extraction_completeness >= MIN_CONFIDENCE_FOR_MISSING and
                         total_extracted > 0 and
                         overall_match_rate / total_extracted >= 0.8):  # Most other items matched well
@@ -918,7 +665,7 @@ class GoogleAIValidator:
                         should_mark_missing = True
                         logger.info(f"Conservative missing item detected: {order_sku} with {missing_confidence} confidence")
                     else:
-                        logger.info(f"Not confident enough to mark {order_sku} as missing (extraction: {extraction_completeness}, match rate: {overall_match_rate}/{total_extracted})")
+                        logger.debug(f"Not confident enough to mark {order_sku} as missing (extraction: {extraction_completeness}, match rate: {overall_match_rate}/{total_extracted})")
 
                 # Add missing item discrepancy only if ultra-conservative criteria are met
                 if should_mark_missing:
@@ -954,12 +701,17 @@ class GoogleAIValidator:
             logger.error(f"Error in conservative missing item logic: {e}")
             return validation_data
 
-    def store_validation_result(self, order_id, grn_image_url, validation_result, processing_time_seconds):
+    def store_validation_result(self, order_id, grn_image_url, validation_result, processing_time_seconds, input_fingerprint=None):
         """Store validation result in database"""
         try:
             # Handle both normal validation result and fallback response structures
             validation_data = validation_result.get('validation_data', validation_result)
 
+            # Contribution of the order's current latest validation to the dashboard counters
+            from app.dashboard_stats import dashboard_stats_service
+            previous_latest = ValidationResult.latest_for_orders([order_id]).get(order_id)
+            previous_contribution = dashboard_stats_service.validation_contribution(previous_latest)
+
             # Check if validation result already exists for this order
             existing_validation = ValidationResult.query.filter_by(
                 order_id=order_id,
@@ -978,6 +730,7 @@ class GoogleAIValidator:
                 existing_validation.ai_response = validation_result.get('ai_response', '')
                 existing_validation.processing_time = processing_time_seconds
                 existing_validation.is_reprocessed = True
+                existing_validation.input_fingerprint = input_fingerprint
                 existing_validation.validation_date = datetime.now()
 
                 logger.info(f"Updated existing validation result for order {order_id}")
@@ -994,12 +747,18 @@ class GoogleAIValidator:
                     summary=json.dumps(validation_result.get('summary', {})),
                     gtin_verification=json.dumps(validation_result.get('gtin_verification', [])),
                     ai_response=validation_result.get('ai_response', ''),
-                    processing_time=processing_time_seconds
+                    processing_time=processing_time_seconds,
+                    input_fingerprint=input_fingerprint
                 )
 
                 db.session.add(validation_record)
                 logger.info(f"Created new validation result for order {order_id}")
 
+            # The stored record is now the latest validation for the order
+            stored_validation = existing_validation or validation_record
+            dashboard_stats_service.apply_validation_change(
+                order_id, previous_contribution, dashboard_stats_service.validation_contribution(stored_validation))
+
             db.session.commit()
             logger.info(f"Successfully stored validation result for order {order_id} in database")
             return True
@@ -1031,8 +790,250 @@ class GoogleAIValidator:
             logger.error(f"Error getting stored validation result: {e}")
             return None
 
-    def validate_grn_against_order(self, order_data, grn_image_url):
-        """Validate GRN document against order data using Google AI"""
+    def get_latest_validation_results(self, order_ids):
+        """Get the latest stored validation result for many orders in one query.
+
+        Returns a dict of order_id -> validation dict (same shape as
+        get_stored_validation_result); orders without a result are absent.
+        """
+        try:
+            latest = ValidationResult.latest_for_orders(order_ids)
+            logger.info(f"Loaded stored validation results for {len(latest)} of {len(order_ids)} orders")
+            return {order_id: validation.to_dict() for order_id, validation in latest.items()}
+        except Exception as e:
+            logger.error(f"Error getting stored validation results in batch: {e}")
+            return {}
+
+    def find_reusable_validation(self, order_data, grn_image_url, reuse_unfingerprinted=True):
+        """Stored result for the order's GRN that still holds for its current inputs, or None.
+
+        A fingerprinted result is reused only while the line items, the GRN
+        image content and the prompt version are unchanged. Results stored
+        before fingerprinting are reused only with ``reuse_unfingerprinted``.
+        """
+        order_id = order_data.get('id')
+        try:
+            validation = ValidationResult.query.filter_by(order_id=order_id, grn_image_url=grn_image_url) \
+                .order_by(ValidationResult.validation_date.desc()).first()
+            if validation is None:
+                return None
+            if not validation.input_fingerprint:
+                return validation.to_dict() if reuse_unfingerprinted else None
+
+            # Served from the GRN image cache when the image was validated before
+            image_base64, _ = self.download_image(grn_image_url)
+            if not image_base64:
+                return None
+            if self.compute_input_fingerprint(self.prepare_order_items(order_data), image_base64) != validation.input_fingerprint:
+                logger.info(f"Order {order_id} line items, GRN image or prompt changed since its last validation")
+                return None
+
+            logger.info(f"Order {order_id} inputs unchanged, reusing stored validation result")
+            result = validation.to_dict()
+            result['fingerprint_match'] = True
+            return result
+
+        except Exception as e:
+            logger.error(f"Error checking stored validation result for order {order_id}: {e}")
+            return None
+
+    def compute_input_fingerprint(self, order_items, image_base64):
+        """sha256 over everything a validation depends on: normalised line items, uploaded image and prompt version"""
+        def number(value):
+            try:
+                return float(value or 0)
+            except (TypeError, ValueError):
+                return str(value).strip()
+
+        normalised_items = sorted(
+            (str(item['sku_id']).strip(), str(item['name']).strip(), number(item['quantity']),
+             str(item['unit']).strip().lower(), number(item['weight']), str(item['weight_unit']).strip().lower())
+            for item in order_items
+        )
+        digest = hashlib.sha256()
+        digest.update(PROMPT_VERSION.encode('utf-8'))
+        digest.update(json.dumps(normalised_items, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        digest.update(hashlib.sha256(image_base64.encode('ascii')).digest())
+        return digest.hexdigest()
+
+    def prepare_order_items(self, order_data):
+        """Order line items in the shape the validation prompt expects"""
+        order_items = []
+        for item in order_data.get('lineItems') or []:
+            order_items.append({
+                'sku_id': item.get('id', ''),
+                'name': item.get('name', ''),
+                'quantity': item.get('quantity', 0),
+                'unit': item.get('quantityUnit', ''),
+                'weight': item.get('totalWeight', {}).get('value', 0) if item.get('totalWeight') else 0,
+                'weight_unit': item.get('totalWeight', {}).get('unit', '') if item.get('totalWeight') else ''
+            })
+        return order_items
+
+    def clean_ai_response(self, ai_response):
+        """Strip markdown fences, repair common JSON issues and drop the BOM from a model answer"""
+        # Remove any markdown formatting
+        ai_response = ai_response.strip()
+        if ai_response.startswith('```json'):
+            ai_response = ai_response[7:]
+        if ai_response.endswith('```'):
+            ai_response = ai_response[:-3]
+
+        # Clean up common JSON issues
+        ai_response = ai_response.strip()
+
+        # Try to fix common JSON issues
+        ai_response = self.fix_json_response(ai_response)
+
+        # Clean BOM and other invisible characters
+        return ai_response.encode('utf-8').decode('utf-8-sig').strip()
+
+    def finalize_validation(self, order_data, grn_image_url, order_items, validation_data, ai_response, validation_start_time,
+                            input_fingerprint=None, gs1_products=None, store=True):
+        """Run GS1, UoM and missing-item checks on a parsed AI answer and store it as the order's result (unless ``store`` is False)"""
+        # Enhance validation with GTIN verification from GS1
+        enhanced_validation = self.enhance_with_gtin_verification(validation_data, gs1_products)
+
+        # Apply enhanced quantity validation with UoM handling
+        uom_enhanced_validation = self.validate_quantities_with_uom(enhanced_validation, order_items)
+
+        # Apply ultra-conservative missing item detection logic
+        final_validation = self.apply_conservative_missing_item_logic(uom_enhanced_validation, order_items)
+
+        # Identify extra items that are known SKUs of other orders
+        final_validation = self.annotate_catalogue_matches(final_validation)
+
+        # Create result object
+        result = {
+            'success': True,
+            'is_valid': final_validation.get('validation_result') == 'VALID',
+            'validation_data': final_validation,
+            'confidence_score': final_validation.get('confidence_score', 0),
+            'discrepancies': final_validation.get('discrepancies', []),
+            'summary': final_validation.get('summary', {}),
+            'ai_response': ai_response,
+            'gtin_verification': final_validation.get('gtin_verification', []),
+            'input_fingerprint': input_fingerprint
+        }
+
+        # Store validation result in database
+        order_id = order_data.get('id')
+        if order_id and store:
+            processing_time = time.time() - validation_start_time
+            self.store_validation_result(order_id, grn_image_url, result, processing_time, input_fingerprint)
+
+        return result
+
+    def read_validation_stream(self, response, order_items, request_start, on_discrepancy=None):
+        """Consume a streamed validation answer, checking each extracted item as soon as it is complete.
+
+        An item's quantity/UoM discrepancy is reported through
+        ``on_discrepancy`` when the item arrives and its GTIN is looked up in
+        the background, with GTIN discrepancies reported as lookups finish.
+        The stored result is still built by finalize_validation from the whole
+        answer; these early checks surface problems sooner and have the GS1
+        lookups done by the time the answer ends. A stream that is cut off
+        returns what arrived before the cut.
+        """
+        answer = StreamedAnswer(request_start)
+        order_lines = OrderLines(order_items)
+        app = current_app._get_current_object() if has_app_context() else None
+        pending_gtins = {}  # gtin -> (first item carrying it, Future of its GS1 product)
+
+        def report(discrepancy):
+            answer.discrepancy_found()
+            if on_discrepancy:
+                try:
+                    on_discrepancy(discrepancy)
+                except Exception as e:
+                    logger.error(f"Error in streamed discrepancy callback: {e}")
+
+        def lookup_gtin(gtin):
+            if app is None:
+                return self.gs1_validator.get_products_info([gtin])[0].get(gtin)
+            with app.app_context():
+                return self.gs1_validator.get_products_info([gtin])[0].get(gtin)
+
+        def report_gtins(wait=False):
+            for gtin, (item, future) in list(pending_gtins.items()):
+                if not (wait or future.done()):
+                    continue
+                del pending_gtins[gtin]
+                try:
+                    answer.gs1_products[gtin] = future.result()
+                except Exception as e:
+                    logger.warning(f"GEMINI STREAM: Early GTIN lookup failed for {gtin}: {e}")
+                    continue
+                _, discrepancy = self.verify_item_gtin(item, answer.gs1_products[gtin])
+                if discrepancy:
+                    report(discrepancy)
+
+        with ThreadPoolExecutor(max_workers=max(1, gtin_cache.max_workers)) as executor:
+            try:
+                for fragment, finish_reason in iter_stream_text(response):
+                    answer.finish_reason = finish_reason or answer.finish_reason
+                    for item in answer.parser.feed(fragment):
+                        answer.item_received()
+                        try:
+                            outcome = self.check_item_quantity(dict(item), order_lines)
+                        except Exception as e:
+                            logger.warning(f"GEMINI STREAM: Early quantity check failed: {e}")
+                            outcome = None
+                        if outcome and outcome[2]:
+                            report(outcome[2])
+
+                        gtin = str(item.get('extracted_gtin') or '')
+                        if len(gtin) == 13 and gtin not in pending_gtins and gtin not in answer.gs1_products:
+                            pending_gtins[gtin] = (item, executor.submit(lookup_gtin, gtin))
+                    report_gtins()
+            except requests.RequestException as e:
+                answer.error = str(e)
+                logger.warning(f"GEMINI STREAM: Stream cut off after {len(answer.text)} chars: {e}")
+            finally:
+                response.close()
+            report_gtins(wait=True)
+
+        answer.finished()
+        logger.info(f"GEMINI STREAM: {len(answer.items)} items in {answer.elapsed_ms}ms (first item at {answer.first_item_ms}ms, "
+                    f"first discrepancy at {answer.first_discrepancy_ms}ms, {len(answer.gs1_products)} GTINs checked while streaming, "
+                    f"finish reason {answer.finish_reason})")
+        return answer
+
+    def recover_partial_answer(self, answer, order_items):
+        """Validation data from the items a cut-off stream completed, or None when it completed none"""
+        if not answer.items:
+            return None
+
+        header = answer.parser.header_fields()
+        reason = answer.error or f"finish reason {answer.finish_reason}"
+        logger.warning(f"GEMINI STREAM: Recovering {len(answer.items)} items from an incomplete answer ({reason})")
+        return {
+            'has_document': header.get('has_document', True),
+            'document_description': header.get('document_description', ''),
+            # The unread rest of the GRN may hide problems: never VALID, and too uncertain to call order items missing
+            'validation_result': 'INVALID',
+            'confidence_score': min(header.get('confidence_score', 0.5), 0.5),
+            'extracted_items': answer.items,
+            'discrepancies': [{
+                'type': 'INCOMPLETE_RESPONSE',
+                'description': f'AI response was cut off after {len(answer.items)} GRN items; remaining lines were not checked',
+                'expected': 'Complete validation of the GRN',
+                'actual': f'Response incomplete ({reason})',
+                'severity': 'MEDIUM'
+            }],
+            'summary': {
+                'total_items_expected': len(order_items),
+                'total_items_found': len(answer.items),
+                'response_truncated': True
+            }
+        }
+
+    def validate_grn_against_order(self, order_data, grn_image_url, on_discrepancy=None):
+        """Validate GRN document against order data using Google AI.
+
+        With streaming enabled, ``on_discrepancy(discrepancy)`` is called for
+        quantity and GTIN problems found while the answer is still arriving.
+        """
         if not self.api_key:
             return {
                 'success': False,
@@ -1055,18 +1056,8 @@ class GoogleAIValidator:
                 }
 
             # Prepare order data for comparison
-            order_items = []
-            if 'lineItems' in order_data:
-                for item in order_data['lineItems']:
-                    order_item = {
-                        'sku_id': item.get('id', ''),
-                        'name': item.get('name', ''),
-                        'quantity': item.get('quantity', 0),
-                        'unit': item.get('quantityUnit', ''),
-                        'weight': item.get('totalWeight', {}).get('value', 0) if item.get('totalWeight') else 0,
-                        'weight_unit': item.get('totalWeight', {}).get('unit', '') if item.get('totalWeight') else ''
-                    }
-                    order_items.append(order_item)
+            order_items = self.prepare_order_items(order_data)
+            input_fingerprint = self.compute_input_fingerprint(order_items, image_base64)
 
             # Debug logging
             logger.info(f"Prepared {len(order_items)} order items for validation:")
@@ -1074,122 +1065,7 @@ class GoogleAIValidator:
                 logger.info(f"  SKU: {item['sku_id']}, Name: {item['name']}, Qty: {item['quantity']} {item['unit']}")
 
             # Create enhanced prompt following PRD workflow requirements
-            prompt = f"""
-You are a professional GRN validation system following a structured workflow. Analyze this image systematically according to the Order Validation Workflow outlined below.
-
-**STEP 1: DOCUMENT DETECTION (Critical First Step)**
-Examine the image carefully and determine:
-- Does this image contain a readable document (GRN, receipt, invoice, delivery note, etc.)?
-- Is the document clear and readable with structured data/text visible?
-- If NO document is detected or image is unclear/unreadable, set "has_document": false and "validation_result": "NO_DOCUMENT"
-
-**STEP 2: DATA EXTRACTION (Only if document detected)**
-If a document IS present, extract ALL visible items with maximum precision:
-- Product names/descriptions (both Arabic and English if present)
-- SKU codes/item codes/product IDs
-- Quantities with units (boxes, units, kg, etc.)
-- **GTIN/BARCODE NUMBERS** (13-digit codes starting with 622, 623, 624 for Egyptian products)
-- Package configurations (e.g., 5+1)*4, 2*10, etc.)
-- Unit of Measurement details
-
-**STEP 3: ITEM MATCHING LOGIC (Following PRD Priority)**
-For each extracted item, attempt matching using this EXACT priority order:
-1. **PRIMARY MATCH: SKU** - Match order.sku_id with extracted_sku (exact match)
-2. **SECONDARY MATCH: GTIN** - If no SKU match, use extracted_gtin for GS1 lookup
-3. **FUZZY NAME MATCHING** - Match product names (Arabic/English bilingual support)
-
-**STEP 4: QUANTITY VALIDATION WITH UOM HANDLING**
-Once items are matched, validate quantities considering:
-- Unit of Measurement discrepancies (e.g., "12 units" vs "1 box")
-- Package configurations (e.g., "6 boxes" vs "6*(5+1) units")
-- Weight vs count differences
-- Partial deliveries vs full orders
-
-**STEP 5: DISCREPANCY IDENTIFICATION**
-Flag ALL discrepancies with specific types:
-- MISSING_ITEM: In order but not found in GRN
-- EXTRA_ITEM: In GRN but not in order
-- QUANTITY_MISMATCH: Different quantities
-- GTIN_NAME_MISMATCH: GTIN verified but names don't match
-- GTIN_NOT_VERIFIED: GTIN not found in database
-- UOM_MISMATCH: Unit of measurement issues
-
-EXPECTED ORDER DATA:
-{json.dumps(order_items, indent=2)}
-
-CRITICAL MATCHING INSTRUCTIONS:
-- Total Expected Items: {len(order_items)} different SKUs
-- MUST match items by SKU first (exact match of sku_id field)
-- MUST include full product name and unit of measurement (UOM) data in response
-- Look for Egyptian GTIN codes: 13-digit numbers starting with 622, 623, 624
-- Common brands: PAPIA, FAMILIA
-- Package formats: (5+1)*4, 2*10, etc.
-- For each order item above, you MUST attempt to find a matching item in the GRN document
-- If you cannot match an item, it should be reported as MISSING_ITEM
-- Product names may appear in Arabic in the GRN but are in English in the order data
-
-REQUIRED OUTPUT FORMAT (JSON only):
-{{
-    "has_document": true or false,
-    "document_description": "Brief description of document type found or why no document detected",
-    "validation_result": "VALID" or "INVALID" or "NO_DOCUMENT",
-    "confidence_score": 0.95,
-    "extracted_items": [
-        {{
-            "extracted_sku": "SKU/item code from document or null",
-            "extracted_gtin": "13-digit GTIN/barcode number or null",
-            "extracted_name": "product name/description from document",
-            "extracted_quantity": "quantity number from document",
-            "extracted_unit": "unit of measurement (boxes, units, kg, etc.)",
-            "extracted_weight": "weight value if available or null",
-            "package_config": "package configuration like (5+1)*4 or null",
-            "matched_order_sku": "matching order SKU or null",
-            "match_method": "SKU_MATCH or GTIN_MATCH or NAME_MATCH or NONE",
-            "match_confidence": 0.98,
-            "quantity_equivalent": "calculated equivalent quantity in order units",
-            "status": "MATCHED" or "EXTRA" or "QUANTITY_MISMATCH"
-        }}
-    ],
-    "discrepancies": [
-        {{
-            "type": "MISSING_ITEM" or "EXTRA_ITEM" or "QUANTITY_MISMATCH" or "UOM_MISMATCH" or "GTIN_NAME_MISMATCH" or "GTIN_NOT_VERIFIED",
-            "description": "Clear description of the specific issue",
-            "expected": "what was expected from order",
-            "actual": "what was found in GRN document",
-            "sku_id": "relevant SKU if applicable",
-            "gtin": "relevant GTIN if applicable",
-            "severity": "HIGH" or "MEDIUM" or "LOW"
-        }}
-    ],
-    "summary": {{
-        "total_items_expected": {len(order_items)},
-        "total_items_found": "number of items found in GRN (integer)",
-        "items_perfectly_matched": "items with exact SKU/GTIN/quantity match (integer)",
-        "items_with_discrepancies": "items with issues (integer)",
-        "gtins_extracted": "number of GTIN codes found (integer)",
-        "missing_items": "items in order but not in GRN (integer)",
-        "extra_items": "items in GRN but not in order (integer)",
-        "quantity_mismatches": "items with quantity differences (integer)"
-    }},
-    "uom_analysis": {{
-        "conversions_attempted": "number of UoM conversions tried",
-        "successful_conversions": "conversions that resolved discrepancies",
-        "unresolved_uom_issues": "remaining UoM conflicts"
-    }}
-}}
-
-CRITICAL REQUIREMENTS:
-1. **DOCUMENT DETECTION FIRST** - If no readable document: has_document=false, validation_result="NO_DOCUMENT"
-2. **FOLLOW PRD MATCHING PRIORITY** - SKU first, then GTIN, then fuzzy name matching
-3. **UOM INTELLIGENCE** - Convert between units (boxes↔units, kg↔grams, etc.)
-4. **GTIN EXTRACTION** - ALWAYS look for 13-digit barcodes/GTINs starting with 622/623/624 and include in extracted_gtin field
-5. **PRECISE QUANTITY MATCHING** - Account for package configurations and include unit details
-6. **BILINGUAL SUPPORT** - Handle Arabic/English product names
-7. **SEVERITY ASSESSMENT** - Classify discrepancies by business impact
-8. **COMPLETE DATA EXTRACTION** - For each item, MUST include sku, gtin, name, quantity, and unit fields
-9. **SUMMARY ACCURACY** - Provide exact integer counts in summary section
-10. Return ONLY valid JSON, no markdown or extra text
-"""
+            prompt = build_validation_prompt(order_items)
 
             # Prepare request to Google AI
             payload = {
@@ -1212,18 +1088,24 @@ CRITICAL REQUIREMENTS:
                 }
             }
 
-            headers = {
-                "Content-Type": "application/json"
-            }
-
             logger.info(f"Sending request to Google AI API with payload size: {len(str(payload))} chars")
 
-            response = requests.post(
-                f"{self.api_url}?key={self.api_key}",
-                headers=headers,
-                json=payload,
-                timeout=60
-            )
+            request_start = time.time()
+            if self.streaming:
+                response = http_client.post(
+                    f"{self.stream_url}?alt=sse&key={self.api_key}",
+                    headers={"Content-Type": "application/json"},
+                    json=payload,
+                    timeout=(5, 60),
+                    stream=True
+                )
+            else:
+                response = http_client.post(
+                    f"{self.api_url}?key={self.api_key}",
+                    headers={"Content-Type": "application/json"},
+                    json=payload,
+                    timeout=(5, 60)
+                )
 
             logger.info(f"Google AI API response status: {response.status_code}")
 
@@ -1235,63 +1117,60 @@ CRITICAL REQUIREMENTS:
                     'is_valid': False
                 }
 
-            # Check if response has content
-            if not response.content:
-                logger.error("Empty response from Google AI API")
-                return {
-                    'success': False,
-                    'error': 'Empty response from Google AI API',
-                    'is_valid': False
-                }
+            answer = None
+            if is_event_stream(response):
+                answer = self.read_validation_stream(response, order_items, request_start, on_discrepancy)
+                ai_response = answer.text
+                if not ai_response.strip():
+                    return {
+                        'success': False,
+                        'error': f'Empty streamed response from Google AI API{": " + answer.error if answer.error else ""}',
+                        'is_valid': False
+                    }
+            else:
+                # Check if response has content
+                if not response.content:
+                    logger.error("Empty response from Google AI API")
+                    return {
+                        'success': False,
+                        'error': 'Empty response from Google AI API',
+                        'is_valid': False
+                    }
 
-            logger.info(f"Google AI API response size: {len(response.content)} bytes")
+                logger.info(f"Google AI API response size: {len(response.content)} bytes")
 
-            try:
-                result = response.json()
-                logger.info(f"Successfully parsed Google AI API response")
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to decode Google AI API response: {e}")
-                logger.error(f"Response status: {response.status_code}")
-                logger.error(f"Response headers: {dict(response.headers)}")
-                logger.error(f"Response content (first 1000 chars): {response.text[:1000]}")
-                return {
-                    'success': False,
-                    'error': f'Invalid JSON response from Google AI API: {str(e)}',
-                    'is_valid': False,
-                    'debug_info': {
-                        'status_code': response.status_code,
-                        'content_type': response.headers.get('content-type', 'unknown'),
-                        'content_length': len(response.content)
+                try:
+                    result = response.json()
+                    logger.info(f"Successfully parsed Google AI API response")
+                except json.JSONDecodeError as e:
+                    logger.error(f"Failed to decode Google AI API response: {e}")
+                    logger.error(f"Response status: {response.status_code}")
+                    logger.error(f"Response headers: {dict(response.headers)}")
+                    logger.error(f"Response content (first 1000 chars): {response.text[:1000]}")
+                    return {
+                        'success': False,
+                        'error': f'Invalid JSON response from Google AI API: {str(e)}',
+                        'is_valid': False,
+                        'debug_info': {
+                            'status_code': response.status_code,
+                            'content_type': response.headers.get('content-type', 'unknown'),
+                            'content_length': len(response.content)
+                        }
                     }
-                }
 
-            if 'candidates' not in result or not result['candidates']:
-                return {
-                    'success': False,
-                    'error': 'No response from Google AI',
-                    'is_valid': False
-                }
+                if 'candidates' not in result or not result['candidates']:
+                    return {
+                        'success': False,
+                        'error': 'No response from Google AI',
+                        'is_valid': False
+                    }
 
-            # Parse the AI response
-            ai_response = result['candidates'][0]['content']['parts'][0]['text']
+                # Parse the AI response
+                ai_response = result['candidates'][0]['content']['parts'][0]['text']
 
             # Clean and parse JSON response
             try:
-                # Remove any markdown formatting
-                ai_response = ai_response.strip()
-                if ai_response.startswith('```json'):
-                    ai_response = ai_response[7:]
-                if ai_response.endswith('```'):
-                    ai_response = ai_response[:-3]
-
-                # Clean up common JSON issues
-                ai_response = ai_response.strip()
-
-                # Try to fix common JSON issues
-                ai_response = self.fix_json_response(ai_response)
-
-                # Clean BOM and other invisible characters
-                ai_response = ai_response.encode('utf-8').decode('utf-8-sig').strip()
+                ai_response = self.clean_ai_response(ai_response)
 
                 # Debug the first and last few characters
                 logger.info(f"JSON response starts with: {repr(ai_response[:50])}")
@@ -1304,33 +1183,11 @@ CRITICAL REQUIREMENTS:
 
                 validation_data = json.loads(ai_response)
 
-                # Enhance validation with GTIN verification from GS1
-                enhanced_validation = self.enhance_with_gtin_verification(validation_data)
-
-                # Apply enhanced quantity validation with UoM handling
-                uom_enhanced_validation = self.validate_quantities_with_uom(enhanced_validation, order_items)
-
-                # Apply ultra-conservative missing item detection logic
-                final_validation = self.apply_conservative_missing_item_logic(uom_enhanced_validation, order_items)
-
-                # Create result object
-                result = {
-                    'success': True,
-                    'is_valid': final_validation.get('validation_result') == 'VALID',
-                    'validation_data': final_validation,
-                    'confidence_score': final_validation.get('confidence_score', 0),
-                    'discrepancies': final_validation.get('discrepancies', []),
-                    'summary': final_validation.get('summary', {}),
-                    'ai_response': ai_response,
-                    'gtin_verification': final_validation.get('gtin_verification', [])
-                }
-
-                # Store validation result in database
-                order_id = order_data.get('id')
-                if order_id:
-                    processing_time = time.time() - validation_start_time
-                    self.store_validation_result(order_id, grn_image_url, result, processing_time)
-
+                result = self.finalize_validation(order_data, grn_image_url, order_items, validation_data, ai_response,
+                                                  validation_start_time, input_fingerprint,
+                                                  answer.gs1_products if answer else None)
+                if answer:
+                    result['streaming'] = answer.stats()
                 return result
 
             except json.JSONDecodeError as e:
@@ -1347,7 +1204,7 @@ CRITICAL REQUIREMENTS:
                     logger.info("Successfully parsed with strict=False")
 
                     # Continue with normal processing
-                    enhanced_validation = self.enhance_with_gtin_verification(validation_data)
+                    enhanced_validation = self.enhance_with_gtin_verification(validation_data, answer.gs1_products if answer else None)
                     uom_enhanced_validation = self.validate_quantities_with_uom(enhanced_validation, order_items)
                     final_validation = self.apply_conservative_missing_item_logic(uom_enhanced_validation, order_items)
 
@@ -1367,12 +1224,24 @@ CRITICAL REQUIREMENTS:
                     order_id = order_data.get('id')
                     if order_id:
                         processing_time = time.time() - validation_start_time
-                        self.store_validation_result(order_id, grn_image_url, result, processing_time)
+                        self.store_validation_result(order_id, grn_image_url, result, processing_time, input_fingerprint)
 
                     return result
 
                 except Exception as e2:
                     logger.error(f"Alternative parsing also failed: {e2}")
+
+                    # A cut-off stream still has the items completed before the cut. They are returned but
+                    # not stored, so the order stays unvalidated and is never served as a reusable result
+                    partial_validation = self.recover_partial_answer(answer, order_items) if answer else None
+                    if partial_validation:
+                        result = self.finalize_validation(order_data, grn_image_url, order_items, partial_validation,
+                                                          ai_response, validation_start_time, None, answer.gs1_products,
+                                                          store=False)
+                        result['partial'] = True
+                        result['streaming'] = answer.stats()
+                        return result
+
                     # Try to create a fallback response from partial data
                     fallback_response = self.create_fallback_response(ai_response)
                     if fallback_response:
@@ -1396,4 +1265,129 @@ CRITICAL REQUIREMENTS:
                 'success': False,
                 'error': str(e),
                 'is_valid': False
-            }
\ No newline at end of file
+            }
+
+    def validate_grn_batch(self, orders):
+        """Validate several orders' GRNs with a single Gemini request.
+
+        ``orders`` is a list of (order_data, grn_image_url); returns the
+        result of each order keyed by order id. Orders whose answer is missing
+        or unparseable in the batched response - every order, if the request
+        itself fails - are validated again with one request each.
+        """
+        if len(orders) <= 1 or not self.api_key:
+            return {order_data.get('id'): self.validate_grn_against_order(order_data, grn_image_url)
+                    for order_data, grn_image_url in orders}
+
+        validation_start_time = time.time()
+        results = {}
+        batch = []
+        for order_data, grn_image_url in orders:
+            image_base64, image_format = self.download_image(grn_image_url)
+            if not image_base64:
+                logger.error(f"Failed to download GRN image from: {grn_image_url}")
+                results[order_data.get('id')] = {'success': False, 'error': 'Failed to download GRN image', 'is_valid': False}
+                continue
+            batch.append((order_data, grn_image_url, self.prepare_order_items(order_data), image_base64, image_format))
+
+        answers = self._request_batch_validation(batch) if len(batch) > 1 else {}
+
+        retry = []
+        for order_data, grn_image_url, order_items, image_base64, _ in batch:
+            order_id = order_data.get('id')
+            answer = answers.get(str(order_id))
+            if not isinstance(answer, dict):
+                retry.append((order_data, grn_image_url))
+                continue
+            try:
+                result = self.finalize_validation(order_data, grn_image_url, order_items, answer,
+                                                  json.dumps(answer, ensure_ascii=False), validation_start_time,
+                                                  self.compute_input_fingerprint(order_items, image_base64))
+                result['batch_size'] = len(batch)
+                results[order_id] = result
+            except Exception as e:
+                logger.error(f"Error processing batched answer for order {order_id}: {e}")
+                retry.append((order_data, grn_image_url))
+
+        if retry:
+            logger.info(f"Batched GRN validation: {len(batch) - len(retry)} of {len(batch)} orders answered, "
+                        f"validating {len(retry)} individually")
+        for order_data, grn_image_url in retry:
+            results[order_data.get('id')] = self.validate_grn_against_order(order_data, grn_image_url)
+        return results
+
+    def _request_batch_validation(self, batch):
+        """One generateContent call for a batch; returns the per-order answers keyed by order_ref ({} on failure)"""
+        sections = build_batch_validation_prompt([(str(order_data.get('id')), order_items)
+                                                   for order_data, _, order_items, _, _ in batch])
+        parts = [{"text": sections[0]}]
+        for text, (_, _, _, image_base64, image_format) in zip(sections[1:-1], batch):
+            parts.append({"text": text})
+            parts.append({"inline_data": {"mime_type": f"image/{image_format}", "data": image_base64}})
+        parts.append({"text": sections[-1]})
+
+        payload = {
+            "contents": [{"parts": parts}],
+            "generationConfig": {
+                "temperature": 0.1,
+                "topK": 1,
+                "topP": 0.8,
+                "maxOutputTokens": min(4096 * len(batch), self.batch_max_output_tokens)
+            }
+        }
+
+        try:
+            logger.info(f"Sending batched request for {len(batch)} orders to Google AI API")
+            response = http_client.post(
+                f"{self.api_url}?key={self.api_key}",
+                headers={"Content-Type": "application/json"},
+                json=payload,
+                timeout=(5, 120)
+            )
+            if response.status_code != 200:
+                logger.error(f"Google AI API error for batched request: {response.status_code} - {response.text[:200]}")
+                return {}
+            ai_response = response.json()['candidates'][0]['content']['parts'][0]['text']
+        except Exception as e:
+            logger.error(f"Batched Google AI request failed: {e}")
+            return {}
+
+        return self.parse_batch_response(ai_response)
+
+    def parse_batch_response(self, ai_response):
+        """Per-order answers of a batched response keyed by order_ref.
+
+        A response cut off by the output limit still yields the orders whose
+        entries were completed before the cut.
+        """
+        ai_response = self.clean_ai_response(ai_response)
+        try:
+            entries = json.loads(ai_response, strict=False).get('orders', [])
+        except (json.JSONDecodeError, AttributeError) as e:
+            logger.warning(f"Batched AI response is not valid JSON ({e}), recovering completed orders")
+            entries = self._complete_batch_entries(ai_response)
+
+        answers = {}
+        for entry in entries if isinstance(entries, list) else []:
+            if isinstance(entry, dict) and entry.get('order_ref') is not None:
+                answers[str(entry.pop('order_ref'))] = entry
+        return answers
+
+    def _complete_batch_entries(self, ai_response):
+        """Decode the "orders" array entry by entry, stopping at the first incomplete one"""
+        match = re.search(r'"orders"\s*:\s*\[', ai_response)
+        if not match:
+            return []
+        decoder = json.JSONDecoder(strict=False)
+        entries = []
+        position = match.end()
+        while True:
+            while position < len(ai_response) and ai_response[position] in ' \t\r\n,':
+                position += 1
+            if position >= len(ai_response) or ai_response[position] != '{':
+                return entries
+            try:
+                entry, position = decoder.raw_decode(ai_response, position)
+            except json.JSONDecodeError:
+                return entries
+            entries.append(entry)
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Benchmark: tours page company filters, custom_fields JSON scans vs the extracted orders.company_owner
+
+Seeds --tours-per-day tours (and --orders-per-tour orders each, spread over
+--companies company owners) for every day of --days days of history. Then
+times, for one day and a four-week range:
+  * the company filter options: loading every order with custom_fields and
+    json-parsing each one, vs SELECT DISTINCT company_owner
+  * the company-filtered tour list: join plus ILIKE over the custom_fields
+    text in a subquery, vs an IN over the indexed company_owner lookup
+Reports the SQLite plan of the order lookup and the median time. Uses the
+in-memory SQLite testing config.
+
+Usage:
+    python benchmarks/bench_company_owner_filters.py [--days 365] [--tours-per-day 40] [--orders-per-tour 10] [--companies 25]
+"""
+
+import json
+import os
+import sys
+import time
+import logging
+import argparse
+import statistics
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import asc, insert
+from app import create_app
+from app.tours import filter_tour_days
+from migrations.explain_queries import explain_statement
+from models import db, Order, Tour
+
+REPEATS = 7
+
+
+def seed(days, tours_per_day, orders_per_tour, companies):
+    first_day = date.today() - timedelta(days=days)
+    tours, orders = [], []
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        for number in range(tours_per_day):
+            tour_date = f"{day.isoformat()}-{number % 24:02d}-15-00"
+            tour_id = f"{tour_date}*plan{offset}*tour-{number}"
+            tours.append({'tour_id': tour_id, 'tour_date': tour_date, 'tour_day': day, 'tour_plan_id': f'plan{offset}',
+                          'tour_name': f'tour-{number}', 'tour_number': number})
+            for n in range(orders_per_tour):
+                company = f"Company {(number * orders_per_tour + n) % companies:03d}"
+                orders.append({'id': f'{tour_id}-{n}', 'client_id': 'illa-frontdoor', 'date': day + timedelta(days=1),
+                               'order_status': 'COMPLETED', 'tour_id': tour_id, 'tour_date': tour_date, 'tour_day': day,
+                               'company_owner': company,
+                               'custom_fields': json.dumps({'Company_Owner': company, 'Region': 'North', 'PO': f'PO-{n}'})})
+    for start in range(0, len(tours), 5000):
+        db.session.execute(insert(Tour), tours[start:start + 5000])
+    for start in range(0, len(orders), 5000):
+        db.session.execute(insert(Order), orders[start:start + 5000])
+    db.session.commit()
+    return len(tours), len(orders)
+
+
+def legacy_companies(filters):
+    """get_filter_options companies as it was: every order with custom_fields, parsed in Python"""
+    orders = filter_tour_days(Order.query.filter(Order.custom_fields.isnot(None)), Order.tour_day,
+                              offset_days=-1, **filters).all()
+    companies = set()
+    for order in orders:
+        custom_fields = json.loads(order.custom_fields)
+        if isinstance(custom_fields, dict) and custom_fields.get('Company_Owner'):
+            companies.add(custom_fields['Company_Owner'].strip())
+    return sorted(companies)
+
+
+def companies(filters):
+    query = filter_tour_days(db.session.query(Order.company_owner).filter(Order.company_owner.isnot(None)),
+                             Order.tour_day, **filters)
+    return sorted(row[0] for row in query.distinct().all())
+
+
+def legacy_company_tours(company, filters):
+    """get_tours company filter as it was: join plus ILIKE over custom_fields in a subquery, then DISTINCT"""
+    matching = db.session.query(Order.tour_id).filter(Order.custom_fields.ilike(f'%{company}%')).distinct().subquery()
+    query = filter_tour_days(Tour.query.join(Order, Tour.tour_id == Order.tour_id), Tour.tour_day, **filters)
+    return query.filter(Tour.tour_id.in_(db.session.query(matching.c.tour_id))).distinct().order_by(asc(Tour.tour_number))
+
+
+def company_tours(company, filters):
+    company_orders = filter_tour_days(db.session.query(Order.tour_id).filter(Order.company_owner == company),
+                                      Order.tour_day, **filters)
+    query = filter_tour_days(Tour.query, Tour.tour_day, **filters)
+    return query.filter(Tour.tour_id.in_(company_orders)).order_by(asc(Tour.tour_number))
+
+
+def median_ms(run):
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--tours-per-day', type=int, default=40)
+    parser.add_argument('--orders-per-tour', type=int, default=10)
+    parser.add_argument('--companies', type=int, default=25)
+    args = parser.parse_args()
+
+    app = create_app('testing')
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with app.app_context():
+        db.create_all()
+        tour_count, order_count = seed(args.days, args.tours_per_day, args.orders_per_tour, args.companies)
+        db.session.execute(db.text("ANALYZE"))
+
+        today = date.today()
+        company = f"Company {args.companies // 2:03d}"
+        ranges = [
+            ('one day', {'date': (today - timedelta(days=10)).isoformat()}),
+            ('four weeks', {'date_from': (today - timedelta(days=38)).isoformat(),
+                            'date_to': (today - timedelta(days=10)).isoformat()}),
+        ]
+
+        print(f"📊 Tours page company filters ({args.days} days, {tour_count} tours, {order_count} orders, "
+              f"{args.companies} companies)")
+        print("=" * 100)
+        for range_name, filters in ranges:
+            assert legacy_companies(filters) == companies(filters)
+            legacy_ms = median_ms(lambda: legacy_companies(filters))
+            current_ms = median_ms(lambda: companies(filters))
+            print(f"{'options, ' + range_name:<22} custom_fields: {legacy_ms:>8.2f}ms  company_owner: {current_ms:>8.2f}ms  "
+                  f"({legacy_ms / current_ms:.1f}x)")
+
+            legacy, current = legacy_company_tours(company, filters), company_tours(company, filters)
+            assert [tour.tour_id for tour in legacy.all()] == [tour.tour_id for tour in current.all()]
+            legacy_ms, current_ms = median_ms(legacy.all), median_ms(current.all)
+            print(f"{'tours, ' + range_name:<22} custom_fields: {legacy_ms:>8.2f}ms  company_owner: {current_ms:>8.2f}ms  "
+                  f"({legacy_ms / current_ms:.1f}x)")
+            for label, query in (('before', legacy), ('after', current)):
+                plan, _ = explain_statement(query.statement, ('orders',))
+                print(f"{'':<22}   {label + ':':<7} {' | '.join(line for line in plan if 'orders' in line)}")
+
+        db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
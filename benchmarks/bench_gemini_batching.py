@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Benchmark: batched multi-order Gemini requests for GRN validation
+
+Starts a local stub of the generateContent endpoint (fixed latency per
+request plus per image, one quota unit per request) and validates the same
+orders with 1, 2, 3, 4 and 6 orders per request. Reports requests made,
+orders per quota unit, wall-clock time and the orders/minute the Gemini
+quota (MAX_API_CALLS_PER_MINUTE) allows at that batch size. With
+--malformed, that share of batched answers is unparseable and its orders
+fall back to one request each.
+
+Usage:
+    python benchmarks/bench_gemini_batching.py [--orders 48] [--workers 4] [--latency 0.3] [--per-image 0.1] [--malformed 0.0]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import Config
+from app.validators import GoogleAIValidator
+
+
+def make_answer(skus):
+    return {
+        'has_document': True,
+        'document_description': 'Stub GRN',
+        'validation_result': 'VALID',
+        'confidence_score': 0.95,
+        'extracted_items': [{'extracted_sku': sku, 'extracted_name': 'Stub item', 'extracted_quantity': '2',
+                             'extracted_unit': 'box', 'matched_order_sku': sku, 'match_method': 'SKU_MATCH',
+                             'status': 'MATCHED'} for sku in skus],
+        'discrepancies': [],
+        'summary': {'total_items_expected': len(skus), 'total_items_found': len(skus)}
+    }
+
+
+def make_handler(counters, latency, per_image, malformed, rng):
+    lock = threading.Lock()
+
+    class GenerateContentStub(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get('content-length', 0))
+            parts = json.loads(self.rfile.read(length))['contents'][0]['parts']
+            images = sum('inline_data' in part for part in parts)
+            with lock:
+                counters['requests'] += 1
+                counters['images'] += images
+                garbage = images > 1 and rng.random() < malformed
+
+            time.sleep(latency + per_image * images)
+
+            if garbage:
+                text = '{"orders": [{"order_ref": '
+            elif images > 1:
+                orders = []
+                for part in parts:
+                    ref = re.search(r'order_ref: "([^"]+)" ===', part.get('text', ''))
+                    if ref:
+                        skus = re.findall(r'"sku_id": "([^"]+)"', part['text'])
+                        orders.append(dict(make_answer(skus), order_ref=ref.group(1)))
+                text = json.dumps({'orders': orders})
+            else:
+                text = json.dumps(make_answer(re.findall(r'"sku_id": "([^"]+)"', parts[0]['text'])))
+
+            body = json.dumps({'candidates': [{'content': {'parts': [{'text': text}]}}]}).encode()
+            self.send_response(200)
+            self.send_header('content-type', 'application/json')
+            self.send_header('content-length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return GenerateContentStub
+
+
+def make_orders(count):
+    return [({'id': f'order-{i}', 'lineItems': [{'id': f'SKU-{i}-{n}', 'name': f'Item {n}', 'quantity': 2,
+                                                 'quantityUnit': 'box'} for n in range(3)]},
+             f'https://example.com/grn/{i}.jpg') for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=48)
+    parser.add_argument('--workers', type=int, default=4, help='concurrent requests, like validation job workers')
+    parser.add_argument('--latency', type=float, default=0.3, help='stub latency per request, seconds')
+    parser.add_argument('--per-image', type=float, default=0.1, help='extra stub latency per image, seconds')
+    parser.add_argument('--malformed', type=float, default=0.0, help='share of batched answers that fail to parse')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.CRITICAL)
+
+    counters = {'requests': 0, 'images': 0}
+    server = ThreadingHTTPServer(('127.0.0.1', 0),
+                                 make_handler(counters, args.latency, args.per_image, args.malformed, random.Random(7)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    validator = GoogleAIValidator()
+    validator.api_key = 'stub'
+    validator.api_url = f'http://127.0.0.1:{server.server_address[1]}/v1beta/models/stub:generateContent'
+    # Measure the model round trips only - image download and result storage are out of scope here
+    validator.download_image = lambda url: ('c3R1Yg==', 'jpeg')
+    validator.store_validation_result = lambda *args, **kwargs: None
+
+    orders = make_orders(args.orders)
+    quota = Config.MAX_API_CALLS_PER_MINUTE
+
+    print(f"📊 GRN validation: {args.orders} orders, {args.workers} workers, stub latency "
+          f"{args.latency * 1000:.0f}ms + {args.per_image * 1000:.0f}ms/image, {args.malformed:.0%} malformed batches")
+    print(f"   Gemini quota: {quota} requests/minute")
+    print("=" * 78)
+
+    for batch_size in (1, 2, 3, 4, 6):
+        counters.update(requests=0, images=0)
+        batches = [orders[start:start + batch_size] for start in range(0, len(orders), batch_size)]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            results = {}
+            for batch_results in executor.map(validator.validate_grn_batch, batches):
+                results.update(batch_results)
+        elapsed = time.perf_counter() - start
+
+        validated = sum(1 for result in results.values() if result.get('success'))
+        per_unit = validated / counters['requests'] if counters['requests'] else 0.0
+        print(f"batch={batch_size:<2} requests={counters['requests']:<4} orders/quota unit={per_unit:4.2f} "
+              f"wall={elapsed:5.2f}s quota-bound orders/min={per_unit * quota:6.1f} ok={validated}/{len(orders)}")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
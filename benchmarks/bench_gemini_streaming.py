@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Benchmark: streamed vs buffered Gemini answers for GRN validation
+
+Starts a local stub of generateContent / streamGenerateContent that "generates"
+a validation answer at a fixed rate (chunks of text every --chunk-delay
+seconds, sent as server-sent events when streaming) and a GS1 lookup stub with
+fixed latency. For each mode it reports the time to the first discrepancy
+(streaming: reported while the answer arrives; buffered: available once the
+whole answer is parsed and checked) and the total validation time. With
+--cut, the stream is dropped at that share of the answer and the recovered
+items are reported.
+
+Usage:
+    python benchmarks/bench_gemini_streaming.py [--items 40] [--chunk-chars 120] [--chunk-delay 0.02] [--gs1-latency 0.15] [--runs 3] [--cut 0.6]
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+import statistics
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.validators import GoogleAIValidator
+
+
+def make_order(items):
+    return {'id': 'bench-order', 'lineItems': [{'id': f'SKU-{n:03d}', 'name': f'Juhayna Juice {n} 1L', 'quantity': 12,
+                                                'quantityUnit': 'box'} for n in range(items)]}
+
+
+def make_answer_text(items):
+    extracted = []
+    for n in range(items):
+        extracted.append({
+            'extracted_sku': f'SKU-{n:03d}',
+            'extracted_gtin': f'62210000{n:05d}',
+            'extracted_name': f'Juhayna Juice {n} 1L',
+            # Every fifth line is short-delivered, the first one early in the document
+            'extracted_quantity': '6' if n % 5 == 2 else '12',
+            'extracted_unit': 'box',
+            'matched_order_sku': f'SKU-{n:03d}',
+            'match_method': 'SKU_MATCH',
+            'match_confidence': 0.97,
+            'status': 'MATCHED'
+        })
+    answer = {'has_document': True, 'document_description': 'Stub GRN', 'validation_result': 'VALID',
+              'confidence_score': 0.96, 'extracted_items': extracted, 'discrepancies': [],
+              'summary': {'total_items_expected': items, 'total_items_found': items}}
+    return json.dumps(answer, indent=2)
+
+
+def make_handler(answer_text, chunk_chars, chunk_delay, cut):
+    chunks = [answer_text[i:i + chunk_chars] for i in range(0, len(answer_text), chunk_chars)]
+    cut_at = int(len(chunks) * cut) if cut else None
+
+    class GeminiStub(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('content-length', 0)))
+            if ':streamGenerateContent' in self.path:
+                self.send_response(200)
+                self.send_header('content-type', 'text/event-stream')
+                self.send_header('transfer-encoding', 'chunked')
+                self.end_headers()
+                for number, chunk in enumerate(chunks):
+                    if number == cut_at:
+                        self.wfile.write(b'5\r\ndata:')  # drop the connection mid-event
+                        self.close_connection = True
+                        return
+                    time.sleep(chunk_delay)
+                    finish = {'finishReason': 'STOP'} if number == len(chunks) - 1 else {}
+                    event = {'candidates': [dict({'content': {'parts': [{'text': chunk}]}}, **finish)]}
+                    data = f"data: {json.dumps(event)}\r\n\r\n".encode()
+                    self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+            else:
+                time.sleep(chunk_delay * len(chunks))
+                body = json.dumps({'candidates': [{'content': {'parts': [{'text': answer_text}]}}]}).encode()
+                self.send_response(200)
+                self.send_header('content-type', 'application/json')
+                self.send_header('content-length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return GeminiStub, len(chunks)
+
+
+def run(validator, order, streaming):
+    validator.streaming = streaming
+    first = []
+    start = time.perf_counter()
+    result = validator.validate_grn_against_order(order, 'https://example.com/grn/bench.jpg',
+                                                  on_discrepancy=lambda d: first or first.append(time.perf_counter()))
+    total = time.perf_counter() - start
+    first_discrepancy = (first[0] if first else time.perf_counter()) - start
+    return first_discrepancy * 1000, total * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=40, help='GRN lines in the answer')
+    parser.add_argument('--chunk-chars', type=int, default=120, help='answer characters per streamed chunk')
+    parser.add_argument('--chunk-delay', type=float, default=0.02, help='seconds to "generate" one chunk')
+    parser.add_argument('--gs1-latency', type=float, default=0.15, help='seconds per GS1 lookup')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--cut', type=float, default=0.6, help='share of the stream sent before the cut-off run drops it')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.CRITICAL)
+    answer_text = make_answer_text(args.items)
+    order = make_order(args.items)
+
+    servers = []
+
+    def start_stub(cut):
+        handler, chunk_count = make_handler(answer_text, args.chunk_chars, args.chunk_delay, cut)
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f'http://127.0.0.1:{server.server_address[1]}/v1beta/models/stub:generateContent', chunk_count
+
+    def gs1_lookup(gtin):
+        time.sleep(args.gs1_latency)
+        return {'product_name': f'Juhayna Juice {int(gtin[-5:])} 1L', 'brand_name': 'Juhayna'}
+
+    validator = GoogleAIValidator()
+    validator.api_key = 'stub'
+    validator.api_url, chunk_count = start_stub(None)
+    # Measure the model answer and the checks on it - image download and result storage are out of scope here
+    validator.download_image = lambda url: ('c3R1Yg==', 'jpeg')
+    validator.store_validation_result = lambda *a, **kw: None
+    validator.gs1_validator.lookup_product_info = gs1_lookup
+
+    print(f"📊 GRN validation answer: {args.items} lines, {len(answer_text)} chars in {chunk_count} chunks "
+          f"({chunk_count * args.chunk_delay * 1000:.0f}ms to generate), GS1 lookup {args.gs1_latency * 1000:.0f}ms")
+    print("=" * 78)
+
+    outcomes = {}
+    for mode, streaming in (('buffered', False), ('streaming', True)):
+        runs = [run(validator, order, streaming) for _ in range(args.runs)]
+        first = statistics.median(r[0] for r in runs)
+        total = statistics.median(r[1] for r in runs)
+        outcomes[mode] = (first, total, runs[-1][2])
+        print(f"{mode:<10} first discrepancy {first:8.1f}ms   total {total:8.1f}ms   "
+              f"discrepancies {len(runs[-1][2].get('discrepancies', []))}")
+
+    buffered, streamed = outcomes['buffered'], outcomes['streaming']
+    same = buffered[2]['validation_data'] == streamed[2]['validation_data']
+    print(f"time to first discrepancy {buffered[0] / streamed[0]:5.1f}x sooner, total {buffered[1] / streamed[1]:4.2f}x faster, "
+          f"identical results: {same}")
+
+    if args.cut:
+        validator.api_url, _ = start_stub(args.cut)
+        _, total, result = run(validator, order, True)
+        recovered = len(result.get('validation_data', {}).get('extracted_items', []))
+        print(f"cut off at {args.cut:.0%}: success={result.get('success')} partial={result.get('partial', False)} "
+              f"recovered {recovered}/{args.items} lines in {total:.1f}ms")
+
+    for server in servers:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
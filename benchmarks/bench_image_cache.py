@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark: GRN image cache - bytes and tokens saved by downscaling, miss vs hit latency
+
+Generates synthetic phone-camera GRN photos (noisy text-like rows), serves
+them through a stub fetch with fixed latency and reports, for the first
+(miss) and second (hit) pass over the batch: wall-clock time, bytes
+downloaded vs uploaded to Gemini and the estimated image tokens.
+
+Usage:
+    python benchmarks/bench_image_cache.py [--images 20] [--width 4032] [--height 3024] [--latency 0.1]
+"""
+
+import io
+import os
+import sys
+import time
+import random
+import shutil
+import logging
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw
+
+from app.image_cache import GrnImageCache
+
+
+def make_grn_photo(index, width, height):
+    """A white page with dark text-like rows and sensor noise, saved as a high quality JPEG"""
+    rng = random.Random(index)
+    image = Image.new('RGB', (width, height), (245, 243, 238))
+    draw = ImageDraw.Draw(image)
+    row_height = max(height // 60, 8)
+    for y in range(row_height * 2, height - row_height * 2, row_height * 2):
+        x = width // 20
+        while x < width * 0.9:
+            word = rng.randint(width // 60, width // 15)
+            draw.rectangle([x, y, x + word, y + row_height], fill=(rng.randint(0, 60),) * 3)
+            x += word + width // 80
+    noise = Image.effect_noise((width, height), 12).convert('RGB')
+    image = Image.blend(image, noise, 0.08)
+
+    output = io.BytesIO()
+    image.save(output, format='JPEG', quality=92)
+    return output.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', type=int, default=20)
+    parser.add_argument('--width', type=int, default=4032)
+    parser.add_argument('--height', type=int, default=3024)
+    parser.add_argument('--latency', type=float, default=0.1, help='stub download latency per image, seconds')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+
+    photos = {f'https://grn.example/{i}.jpg': make_grn_photo(i, args.width, args.height) for i in range(args.images)}
+
+    def fetch(url):
+        time.sleep(args.latency)
+        return photos[url], 'image/jpeg'
+
+    cache_dir = tempfile.mkdtemp(prefix='grn_image_cache_')
+    cache = GrnImageCache(cache_dir=cache_dir)
+
+    print(f"📊 GRN image cache: {args.images} images {args.width}x{args.height}, "
+          f"{args.latency * 1000:.0f}ms stub download, max dimension {cache.max_dimension}")
+    print("=" * 60)
+
+    try:
+        for label in ('miss', 'hit'):
+            start = time.perf_counter()
+            payload_bytes = 0
+            for url in photos:
+                image_base64, _ = cache.get_image(url, fetch)
+                payload_bytes += len(image_base64)
+            elapsed = time.perf_counter() - start
+            print(f"{label:<4} wall={elapsed:6.2f}s per_image={elapsed / args.images * 1000:7.1f}ms "
+                  f"base64_payload={payload_bytes / 1024 / 1024:6.2f}MB")
+
+        stats = cache.get_stats()
+        downloaded, uploaded = stats['bytes_downloaded'], stats['bytes_uploaded']
+        print("-" * 60)
+        print(f"bytes downloaded: {downloaded / 1024 / 1024:8.2f}MB")
+        print(f"bytes uploaded:   {uploaded / 1024 / 1024:8.2f}MB")
+        print(f"bytes saved:      {stats['bytes_saved'] / 1024 / 1024:8.2f}MB ({stats['bytes_saved'] / downloaded:.0%})")
+        print(f"image tokens:     {stats['tokens_original']} -> {stats['tokens_uploaded']}")
+        print(f"hit ratio:        {stats['hit_ratio']:.0%}, on disk {stats['disk_bytes'] / 1024 / 1024:.2f}MB")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
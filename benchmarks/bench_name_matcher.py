@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Benchmark: bilingual product-name matching - legacy per-call normalisation vs the precompiled matcher
+
+Builds a synthetic catalogue of Arabic/English SKU names and a GRN whose
+lines are noisy copies of catalogue names (OCR-style typos, Arabic prefixes,
+diacritics), then reports:
+  * catalogue search: brute-force legacy scoring vs the n-gram index, with
+    top-1 agreement against the exact brute-force best match
+  * order matching: every GRN line against every order line, the way the
+    missing-item check does it, legacy vs calculate_bilingual_match
+
+Usage:
+    python benchmarks/bench_name_matcher.py [--catalogue 5000] [--lines 60] [--legacy-lines 6]
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import difflib
+import logging
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.name_matcher import NameIndex, best_name_match, normalize_name
+from app.validators import GoogleAIValidator
+
+BRANDS = ['Juhayna', 'Papia', 'Familia', 'Domty', 'Edita', 'Chipsy', 'Faragello', 'Beyti', 'Almarai', 'Fine', 'Lamar',
+          'Obour', 'Bisco Misr', 'Molto', 'Tiger', 'Lipton', 'Nescafe', 'Persil', 'Ariel', 'Zeina']
+PRODUCTS = ['Juice', 'Tissues', 'Toilet Roll', 'Cheese', 'Cake', 'Chips', 'Milk', 'Yogurt', 'Water', 'Biscuits',
+            'Croissant', 'Tea', 'Coffee', 'Detergent', 'Rice', 'Pasta', 'Oil', 'Sugar', 'Flour', 'Ghee']
+FLAVOURS = ['Mango', 'Orange', 'Strawberry', 'Plain', 'Chocolate', 'Vanilla', 'Cheese', 'Salt', 'Tomato', 'Guava']
+ARABIC = ['عَصير', 'مَناديل', 'جُبنة', 'كيك', 'شيبسي', 'لَبن', 'زبادي', 'مياه', 'بسكويت', 'شاي', 'قهوة', 'أرز']
+SIZES = ['100g', '250g', '500g', '1kg', '200ml', '1L', '1.5L', '(5+1)*4', '2*10', '6x12']
+
+
+def legacy_normalize(text):
+    """normalize_text_for_matching as it was: a str.replace chain on every call"""
+    if not text:
+        return ""
+    text = text.lower().strip()
+    for diacritic in "ًٌٍَُِّْ":
+        text = text.replace(diacritic, "")
+    text = text.replace("أ", "ا").replace("إ", "ا").replace("آ", "ا")
+    text = text.replace("ة", "ه")
+    text = text.replace("ي", "ى")
+    text = re.sub(r'[^\w\s؀-ۿ]', ' ', text)
+    return ' '.join(text.split())
+
+
+def legacy_words(text):
+    """extract_meaningful_words as it was: stopword sets rebuilt on every call"""
+    arabic_stopwords = {'من', 'في', 'على', 'إلى', 'مع', 'هذا', 'هذه', 'ذلك', 'التي', 'الذي', 'كل', 'بعض'}
+    english_stopwords = {'the', 'and', 'or', 'of', 'in', 'on', 'at', 'to', 'for', 'with', 'by', 'a', 'an'}
+    return {word for word in set(text.split())
+            if len(word) > 1 and word not in arabic_stopwords and word not in english_stopwords}
+
+
+def legacy_score(extracted_name, candidate_name):
+    """One candidate comparison of the old calculate_bilingual_match"""
+    extracted = legacy_normalize(extracted_name)
+    candidate = legacy_normalize(candidate_name)
+    if extracted == candidate:
+        return 1.0
+    score = 0.0
+    extracted_words, candidate_words = legacy_words(extracted), legacy_words(candidate)
+    if extracted_words and candidate_words:
+        intersection = len(extracted_words & candidate_words)
+        score = (intersection / len(extracted_words | candidate_words)) * 0.6 + (intersection / len(extracted_words)) * 0.4
+    return max(score, difflib.SequenceMatcher(None, extracted, candidate).ratio())
+
+
+def make_catalogue(size, rng):
+    names = set()
+    while len(names) < size:
+        name = f"{rng.choice(BRANDS)} {rng.choice(PRODUCTS)} {rng.choice(FLAVOURS)} {rng.choice(SIZES)}"
+        if rng.random() < 0.3:
+            name = f"{rng.choice(ARABIC)} {name}"
+        names.add(name)
+    return [(f"SKU-{i:05d}", name) for i, name in enumerate(sorted(names))]
+
+
+def make_noisy(name, rng):
+    chars = list(name)
+    for _ in range(rng.randint(1, 3)):
+        position = rng.randrange(len(chars))
+        chars[position] = rng.choice('abcdefghijklmnopqrstuvwxyz ')
+    noisy = ''.join(chars)
+    return f"{rng.choice(ARABIC)} {noisy}" if rng.random() < 0.3 else noisy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--catalogue', type=int, default=5000)
+    parser.add_argument('--lines', type=int, default=60, help='GRN lines (and order lines)')
+    parser.add_argument('--legacy-lines', type=int, default=6, help='GRN lines scored brute force (extrapolated)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.CRITICAL)
+    rng = random.Random(11)
+    catalogue = make_catalogue(args.catalogue, rng)
+    order_lines = rng.sample(catalogue, args.lines)
+    grn_lines = [make_noisy(name, rng) for _, name in order_lines]
+
+    print(f"📊 name matching: {len(catalogue)} catalogue names, {args.lines}-line GRN")
+    print("=" * 72)
+
+    # Catalogue search
+    start = time.perf_counter()
+    index = NameIndex()
+    for sku_id, name in catalogue:
+        index.add(sku_id, name)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    legacy_best = []
+    for line in grn_lines[:args.legacy_lines]:
+        legacy_best.append(max(catalogue, key=lambda entry: legacy_score(line, entry[1]))[0])
+    legacy_ms = (time.perf_counter() - start) * 1000 / args.legacy_lines * args.lines
+
+    start = time.perf_counter()
+    indexed_best = [(index.search(line, limit=1) or [(None,)])[0][0] for line in grn_lines]
+    indexed_ms = (time.perf_counter() - start) * 1000
+
+    agreement = sum(1 for legacy, indexed in zip(legacy_best, indexed_best) if legacy == indexed)
+    recovered = sum(1 for (sku_id, _), indexed in zip(order_lines, indexed_best) if sku_id == indexed)
+    print(f"catalogue search  legacy brute force ~{legacy_ms:9.1f}ms (extrapolated from {args.legacy_lines} lines)")
+    print(f"                  n-gram index        {indexed_ms:9.1f}ms (+{build_ms:.0f}ms one-off build) "
+          f"speedup {legacy_ms / indexed_ms:5.0f}x")
+    print(f"                  top-1 agrees with brute force {agreement}/{len(legacy_best)}, "
+          f"true SKU found {recovered}/{args.lines}")
+
+    # Order matching: every GRN line against every order line (missing-item check)
+    validator = GoogleAIValidator()
+    normalize_name.cache_clear()
+    start = time.perf_counter()
+    legacy_scores = [legacy_score(order_name, line) for _, order_name in order_lines for line in grn_lines]
+    legacy_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    exact_scores = [best_name_match(order_name, [('name', line)])[1] for _, order_name in order_lines for line in grn_lines]
+    exact_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    for _, order_name in order_lines:
+        for line in grn_lines:
+            validator.calculate_bilingual_match(order_name, {'product_names': {'english': line}}, min_score=0.7)
+    pruned_ms = (time.perf_counter() - start) * 1000
+
+    identical = all(abs(a - b) < 1e-12 for a, b in zip(legacy_scores, exact_scores))
+    pairs = len(legacy_scores)
+    print(f"order matching    legacy              {legacy_ms:9.1f}ms ({pairs} pairs)")
+    print(f"                  cached normalisation{exact_ms:9.1f}ms scores identical: {identical}")
+    print(f"                  with min_score=0.7  {pruned_ms:9.1f}ms speedup {legacy_ms / pruned_ms:5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark: concurrent task-search page fetching in LocusAuth.get_orders
+
+Starts a local stub of the Locus task-search endpoint (fixed per-request
+latency, 50 tasks per page) and reports wall-clock time to ingest every
+page with 1, 4 and 8 workers.
+
+Usage:
+    python benchmarks/bench_page_fetch.py [--pages 40] [--latency 0.15]
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.auth import LocusAuth
+
+PAGE_SIZE = 50
+
+
+def make_handler(number_of_pages, latency):
+    class TaskSearchStub(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get('content-length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            page = payload.get('page', 1)
+
+            time.sleep(latency)
+
+            tasks = [
+                {
+                    'id': f'task-{page}-{i}',
+                    'effectiveStatus': 'COMPLETED',
+                    'customerVisit': {'orderDetail': {}, 'location': {'name': f'Store {i}'}}
+                }
+                for i in range(PAGE_SIZE)
+            ]
+            body = json.dumps({
+                'tasks': tasks,
+                'paginationInfo': {
+                    'total': number_of_pages * PAGE_SIZE,
+                    'numberOfPages': number_of_pages,
+                    'currentPage': page
+                }
+            }).encode()
+
+            self.send_response(200)
+            self.send_header('content-type', 'application/json')
+            self.send_header('content-length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return TaskSearchStub
+
+
+class StubConfig:
+    LOCUS_AUTH_URL = 'http://127.0.0.1'
+    LOCUS_API_URL = 'http://127.0.0.1'
+    LOCUS_PAGE_FETCH_RETRIES = 2
+
+    def __init__(self, base_url, workers):
+        self.LOCUS_BASE_URL = base_url
+        self.LOCUS_PAGE_FETCH_WORKERS = workers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=40)
+    parser.add_argument('--latency', type=float, default=0.15, help='stub latency per request, seconds')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(args.pages, args.latency))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+
+    print(f"📊 task-search ingest: {args.pages} pages x {PAGE_SIZE} tasks, {args.latency * 1000:.0f}ms stub latency")
+    print("=" * 60)
+
+    baseline = None
+    for workers in (1, 4, 8):
+        auth = LocusAuth(StubConfig(base_url, workers))
+        # Measure fetching only - the database cache write is out of scope here
+        auth.cache_orders_to_database = lambda *args, **kwargs: None
+        start = time.perf_counter()
+        result = auth.get_orders('stub-token', date='2025-01-01', fetch_all=True, force_refresh=True)
+        elapsed = time.perf_counter() - start
+
+        baseline = baseline or elapsed
+        fetched = result['totalCount'] if result else 0
+        print(f"workers={workers:<2} wall={elapsed:6.2f}s orders={fetched:<5} speedup={baseline / elapsed:4.1f}x")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
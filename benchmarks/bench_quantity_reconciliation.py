@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Benchmark: GRN quantity reconciliation and missing-item check - legacy per-item loops vs QuantityReconciler
+
+Builds orders of increasing size with a GRN that mostly matches (unit
+spellings that need normalising, box->unit pack sizes, package configs like
+(5+1)*4, weights in grams against kilograms, some short deliveries) and times
+validate_quantities_with_uom followed by apply_conservative_missing_item_logic.
+The legacy versions are condensed copies of the old methods: a linear scan of
+the order for every GRN line, a walk of the unit mapping and regex compiles
+per conversion, and every extracted item name-matched against every order
+line. Results must be identical; time per line shows how each scales.
+
+Usage:
+    python benchmarks/bench_quantity_reconciliation.py [--lines 50 200 400 800 3200] [--legacy-max-lines 400] [--runs 3]
+"""
+
+import os
+import re
+import sys
+import copy
+import time
+import random
+import logging
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.validators import GoogleAIValidator
+
+BRANDS = ['Juhayna', 'Domty', 'Chipsy', 'Fine', 'Almarai', 'Edita', 'Lipton', 'Persil']
+PRODUCTS = ['Juice', 'Cheese', 'Chips', 'Tissues', 'Milk', 'Cake', 'Tea', 'Detergent']
+LINE_TYPES = [  # (order unit, order quantity, extracted unit, extracted quantity, package config, name suffix)
+    ('unit', 48, 'cartons', '2', None, '6x4'),
+    ('kg', 2, 'grams', '2000', None, '500g'),
+    ('box', 24, 'Box', '1', '(5+1)*4', ''),
+    ('pcs', 12, 'pieces', '12', None, '1L'),
+    ('box', 10, 'units', '120', None, ''),
+    ('l', 3, 'ml', '3000', None, '1L'),
+]
+
+
+class LegacyValidator(GoogleAIValidator):
+    """The quantity and missing-item methods as they were before QuantityReconciler (logging removed)"""
+
+    package_patterns = {
+        r'\((\d+)\+(\d+)\)\*(\d+)': lambda m: (int(m[1]) + int(m[2])) * int(m[3]),
+        r'(\d+)\*(\d+)': lambda m: int(m[1]) * int(m[2]),
+        r'(\d+)x(\d+)': lambda m: int(m[1]) * int(m[2]),
+    }
+
+    def normalize_unit(self, unit_str):
+        if not unit_str:
+            return 'unit'
+        unit_lower = unit_str.lower().strip()
+        for standard_unit, variations in self.uom_conversions.items():
+            if unit_lower == standard_unit or unit_lower in variations:
+                return standard_unit
+        return unit_lower
+
+    def parse_package_quantity(self, quantity_str):
+        if not quantity_str:
+            return None, None
+        quantity_str = str(quantity_str).strip()
+        number_match = re.search(r'(\d+(?:\.\d+)?)', quantity_str)
+        base_quantity = float(number_match.group(1)) if number_match else 0
+        for pattern, calculator in self.package_patterns.items():
+            match = re.search(pattern, quantity_str)
+            if match:
+                return calculator(match), 'calculated'
+        return base_quantity, 'direct'
+
+    def convert_quantity_units(self, from_qty, from_unit, to_unit, product_context=None):
+        from_unit_norm = self.normalize_unit(from_unit)
+        to_unit_norm = self.normalize_unit(to_unit)
+        if from_unit_norm == to_unit_norm:
+            return from_qty, 1.0
+        if from_unit_norm == 'box' and to_unit_norm == 'unit':
+            if product_context:
+                pack_matches = re.findall(r'(\d+)(?:x|X|\*)(\d+)', str(product_context))
+                if pack_matches:
+                    pack_size = int(pack_matches[0][0]) * int(pack_matches[0][1])
+                    return from_qty * pack_size, pack_size
+            return from_qty * 12, 12
+        if from_unit_norm == 'unit' and to_unit_norm == 'box':
+            return from_qty / 12, 1 / 12
+        if from_unit_norm == 'kg' and to_unit_norm == 'g':
+            return from_qty * 1000, 1000
+        if from_unit_norm == 'g' and to_unit_norm == 'kg':
+            return from_qty / 1000, 1 / 1000
+        if from_unit_norm == 'l' and to_unit_norm == 'ml':
+            return from_qty * 1000, 1000
+        if from_unit_norm == 'ml' and to_unit_norm == 'l':
+            return from_qty / 1000, 1 / 1000
+        return from_qty, None
+
+    def validate_quantities_with_uom(self, validation_data, order_items):
+        try:
+            extracted_items = validation_data.get('extracted_items', [])
+            enhanced_discrepancies = list(validation_data.get('discrepancies', []))
+            conversions_attempted = 0
+            successful_conversions = 0
+            for extracted_item in extracted_items:
+                matched_sku = extracted_item.get('matched_order_sku')
+                if not matched_sku:
+                    continue
+                order_item = next((item for item in order_items if item['sku_id'] == matched_sku), None)
+                if not order_item:
+                    continue
+                extracted_qty = extracted_item.get('extracted_quantity', 0)
+                extracted_unit = extracted_item.get('extracted_unit', 'unit')
+                order_qty = order_item.get('quantity', 0)
+                order_unit = order_item.get('unit', 'unit')
+                package_config = extracted_item.get('package_config')
+                if package_config:
+                    parsed_qty, _ = self.parse_package_quantity(package_config)
+                    if parsed_qty:
+                        extracted_qty = parsed_qty
+                converted_qty = extracted_qty
+                conversion_ratio = None
+                try:
+                    converted_qty, conversion_ratio = self.convert_quantity_units(
+                        float(extracted_qty), extracted_unit, order_unit,
+                        product_context=f"{order_item.get('name', '')} {matched_sku}")
+                    conversions_attempted += 1
+                except Exception:
+                    pass
+                order_qty_float = float(order_qty)
+                tolerance = max(1, order_qty_float * 0.05)
+                if abs(converted_qty - order_qty_float) <= tolerance:
+                    extracted_item['quantity_equivalent'] = converted_qty
+                    extracted_item['status'] = 'MATCHED'
+                    if conversion_ratio:
+                        successful_conversions += 1
+                else:
+                    extracted_item['status'] = 'QUANTITY_MISMATCH'
+                    percentage_diff = abs(converted_qty - order_qty_float) / order_qty_float * 100
+                    severity = 'HIGH' if percentage_diff > 20 else 'MEDIUM' if percentage_diff > 10 else 'LOW'
+                    enhanced_discrepancies.append({
+                        'type': 'QUANTITY_MISMATCH',
+                        'description': f'Quantity mismatch for {matched_sku}',
+                        'expected': f'{order_qty} {order_unit}',
+                        'actual': f'{extracted_qty} {extracted_unit}' + (f' (≈{converted_qty:.1f} {order_unit})' if conversion_ratio else ''),
+                        'sku_id': matched_sku,
+                        'severity': severity,
+                        'percentage_diff': round(percentage_diff, 1)
+                    })
+            validation_data['discrepancies'] = enhanced_discrepancies
+            validation_data['uom_analysis'] = {
+                'conversions_attempted': conversions_attempted,
+                'successful_conversions': successful_conversions,
+                'unresolved_uom_issues': conversions_attempted - successful_conversions
+            }
+            return validation_data
+        except Exception:
+            return validation_data
+
+    def apply_conservative_missing_item_logic(self, validation_data, order_items):
+        try:
+            extracted_items = validation_data.get('extracted_items', [])
+            filtered_discrepancies = [d for d in validation_data.get('discrepancies', []) if d.get('type') != 'MISSING_ITEM']
+            for order_item in order_items:
+                order_sku = order_item.get('sku_id', '').lower().strip()
+                order_name = order_item.get('name', '').lower().strip()
+                order_quantity = order_item.get('quantity', 0)
+                potential_matches = []
+                for extracted_item in extracted_items:
+                    extracted_sku = extracted_item.get('extracted_sku', '').lower().strip()
+                    extracted_name = extracted_item.get('extracted_name', '').lower().strip()
+                    extracted_gtin = extracted_item.get('extracted_gtin')
+                    match_confidence = extracted_item.get('match_confidence', 0)
+                    if order_sku and extracted_sku and order_sku == extracted_sku:
+                        potential_matches.append(('direct_sku', 1.0))
+                    elif match_confidence >= 0.7:
+                        potential_matches.append(('ai_high_confidence', match_confidence))
+                    if extracted_gtin:
+                        gtin_info = next((g for g in validation_data.get('gtin_verification', []) if g.get('gtin') == extracted_gtin), None)
+                        if gtin_info and gtin_info.get('name_match', False):
+                            gs1_product = gtin_info.get('gs1_product_info', {})
+                            if gs1_product.get('product_name', '').lower():
+                                name_match, score = self.calculate_bilingual_match(order_name, gs1_product, min_score=0.7)
+                                if name_match and score >= 0.7:
+                                    potential_matches.append(('gtin_verified', score))
+                    if order_name and extracted_name:
+                        mock_product = {'product_names': {'primary': extracted_name, 'english': extracted_name},
+                                        'brand_names': {'primary': '', 'english': ''}}
+                        name_match, score = self.calculate_bilingual_match(order_name, mock_product, min_score=0.7)
+                        if name_match and score >= 0.7:
+                            potential_matches.append(('fuzzy_name', score))
+                if not potential_matches:
+                    extraction_completeness = validation_data.get('confidence_score', 0)
+                    overall_match_rate = len([item for item in extracted_items if item.get('match_confidence', 0) >= 0.8])
+                    total_extracted = len(extracted_items)
+                    if (extraction_completeness >= 0.95 and total_extracted > 0 and overall_match_rate / total_extracted >= 0.8):
+                        filtered_discrepancies.append({
+                            'type': 'MISSING_ITEM',
+                            'description': 'Order item not found in GRN with high confidence',
+                            'expected': f'{order_item.get("name", "N/A")} (SKU: {order_sku}, Qty: {order_quantity})',
+                            'actual': 'Not found in delivery document',
+                            'confidence': min(extraction_completeness, 0.98),
+                            'conservative_analysis': True
+                        })
+            validation_data['discrepancies'] = filtered_discrepancies
+            summary = validation_data.get('summary', {})
+            missing_items = len([d for d in filtered_discrepancies if d.get('type') == 'MISSING_ITEM'])
+            summary['missing_items_conservative'] = missing_items
+            summary['conservative_analysis_applied'] = True
+            if missing_items > 0 and validation_data.get('validation_result') == 'VALID':
+                validation_data['validation_result'] = 'INVALID'
+            validation_data['summary'] = summary
+            return validation_data
+        except Exception:
+            return validation_data
+
+
+def make_case(lines, rng):
+    order_items, extracted_items, gtin_verification = [], [], []
+    for n in range(lines):
+        order_unit, order_qty, unit, qty, package_config, suffix = LINE_TYPES[n % len(LINE_TYPES)]
+        sku = f'SKU-{n:05d}'
+        name = f'{rng.choice(BRANDS)} {rng.choice(PRODUCTS)} {n} {suffix}'.strip()
+        order_items.append({'sku_id': sku, 'name': name, 'quantity': order_qty, 'unit': order_unit})
+        if rng.random() < 0.03:
+            continue  # not delivered
+        gtin = f'62210{n:08d}'
+        item = {'extracted_sku': sku if rng.random() < 0.8 else '', 'extracted_name': name.upper(),
+                'extracted_gtin': gtin, 'extracted_quantity': str(int(qty) // 2) if rng.random() < 0.1 else qty,
+                'extracted_unit': unit, 'matched_order_sku': sku, 'match_confidence': round(rng.uniform(0.55, 0.99), 2)}
+        if package_config:
+            item['package_config'] = package_config
+        extracted_items.append(item)
+        gtin_verification.append({'gtin': gtin, 'name_match': True, 'gs1_product_info': {'product_name': name}})
+    validation_data = {'validation_result': 'VALID', 'confidence_score': 0.97, 'extracted_items': extracted_items,
+                       'discrepancies': [], 'gtin_verification': gtin_verification, 'summary': {}}
+    return validation_data, order_items
+
+
+def time_checks(validator, validation_data, order_items, runs):
+    timings = []
+    for _ in range(runs):
+        data = copy.deepcopy(validation_data)
+        start = time.perf_counter()
+        data = validator.validate_quantities_with_uom(data, order_items)
+        data = validator.apply_conservative_missing_item_logic(data, order_items)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lines', type=int, nargs='+', default=[50, 200, 400, 800, 3200], help='order sizes to time')
+    parser.add_argument('--legacy-max-lines', type=int, default=400, help='largest order timed with the legacy code')
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.CRITICAL)
+    legacy, validator = LegacyValidator(), GoogleAIValidator()
+
+    print("📊 quantity reconciliation + conservative missing-item check")
+    print("=" * 86)
+    print(f"{'lines':>6} {'legacy ms':>11} {'µs/line':>9} {'new ms':>9} {'µs/line':>9} {'speedup':>8}  identical")
+    for lines in args.lines:
+        validation_data, order_items = make_case(lines, random.Random(lines))
+        new_ms, new_result = time_checks(validator, validation_data, order_items, args.runs)
+        if lines > args.legacy_max_lines:
+            print(f"{lines:>6} {'-':>11} {'-':>9} {new_ms:9.1f} {new_ms * 1000 / lines:9.1f} {'-':>8}  -")
+            continue
+        legacy_ms, legacy_result = time_checks(legacy, validation_data, order_items, 1)
+        print(f"{lines:>6} {legacy_ms:11.1f} {legacy_ms * 1000 / lines:9.1f} {new_ms:9.1f} {new_ms * 1000 / lines:9.1f} "
+              f"{legacy_ms / new_ms:7.0f}x  {legacy_result == new_result}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark: tours page date filters, tour_date string matching vs tour_day range scans
+
+Seeds --tours-per-day tours (and --orders-per-tour orders each) for every day
+of --days days of history. Then times the tours page queries: one day and a
+four-week range of tours (LIKE 'date%' / string comparison on tour_date vs
+tour_day), and the company-owner order lookup with its 1-day tour/order
+offset (LIKE on orders.tour_date vs orders.tour_day). Reports the SQLite
+plan and the median time. Uses the in-memory SQLite testing config.
+
+Usage:
+    python benchmarks/bench_tour_day_filters.py [--days 365] [--tours-per-day 40] [--orders-per-tour 10]
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import statistics
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import asc, insert
+from app import create_app
+from app.tours import filter_tour_days
+from migrations.explain_queries import explain_statement
+from models import db, Order, Tour
+
+REPEATS = 7
+
+
+def seed(days, tours_per_day, orders_per_tour):
+    first_day = date.today() - timedelta(days=days)
+    tours, orders = [], []
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        for number in range(tours_per_day):
+            tour_date = f"{day.isoformat()}-{number % 24:02d}-15-00"
+            tour_id = f"{tour_date}*plan{offset}*tour-{number}"
+            tours.append({'tour_id': tour_id, 'tour_date': tour_date, 'tour_day': day, 'tour_plan_id': f'plan{offset}',
+                          'tour_name': f'tour-{number}', 'tour_number': number})
+            for n in range(orders_per_tour):
+                orders.append({'id': f'{tour_id}-{n}', 'client_id': 'illa-frontdoor', 'date': day + timedelta(days=1),
+                               'order_status': 'COMPLETED', 'tour_id': tour_id, 'tour_date': tour_date, 'tour_day': day,
+                               'custom_fields': '{"Company_Owner": "Owner %d"}' % (n % 7)})
+    for start in range(0, len(tours), 5000):
+        db.session.execute(insert(Tour), tours[start:start + 5000])
+    for start in range(0, len(orders), 5000):
+        db.session.execute(insert(Order), orders[start:start + 5000])
+    db.session.commit()
+    return len(tours), len(orders)
+
+
+def median_ms(query):
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        query.all()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--tours-per-day', type=int, default=40)
+    parser.add_argument('--orders-per-tour', type=int, default=10)
+    args = parser.parse_args()
+
+    app = create_app('testing')
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with app.app_context():
+        db.create_all()
+        tour_count, order_count = seed(args.days, args.tours_per_day, args.orders_per_tour)
+        db.session.execute(db.text("ANALYZE"))
+
+        today = date.today()
+        day = (today - timedelta(days=10)).isoformat()
+        range_from, range_to = (today - timedelta(days=38)).isoformat(), (today - timedelta(days=10)).isoformat()
+        tour_day_before = (today - timedelta(days=11)).isoformat()
+
+        cases = [
+            ('tours, one day',
+             Tour.query.filter(Tour.tour_date.like(f"{day}%")).order_by(asc(Tour.tour_number)),
+             filter_tour_days(Tour.query, Tour.tour_day, date=day).order_by(asc(Tour.tour_number)), 'tours'),
+            ('tours, four weeks',
+             Tour.query.filter(Tour.tour_date >= range_from, Tour.tour_date <= f"{range_to}-23-59-59").order_by(asc(Tour.tour_number)),
+             filter_tour_days(Tour.query, Tour.tour_day, date_from=range_from, date_to=range_to).order_by(asc(Tour.tour_number)), 'tours'),
+            ('company owners, one day',
+             Order.query.filter(Order.custom_fields.isnot(None), Order.tour_date.like(f"{tour_day_before}%")),
+             filter_tour_days(Order.query.filter(Order.custom_fields.isnot(None)), Order.tour_day, date=day, offset_days=-1), 'orders'),
+        ]
+
+        print(f"📊 Tours page date filters ({args.days} days, {tour_count} tours, {order_count} orders)")
+        print("=" * 100)
+        for name, legacy, current, table in cases:
+            assert {row.id for row in legacy.all()} == {row.id for row in current.all()}
+            legacy_plan, _ = explain_statement(legacy.statement, (table,))
+            current_plan, _ = explain_statement(current.statement, (table,))
+            legacy_ms, current_ms = median_ms(legacy), median_ms(current)
+            print(f"{name:<24} tour_date: {legacy_ms:>8.2f}ms  tour_day: {current_ms:>8.2f}ms  ({legacy_ms / current_ms:.1f}x)")
+            print(f"{'':<24}   before: {legacy_plan[0]}")
+            print(f"{'':<24}   after:  {current_plan[0]}")
+
+        db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Benchmark: tours page filter options, one query per dropdown vs grouped facets with counts
+
+For each --tours-per-day size, seeds 28 days of tours (10 orders each, a
+pool of --riders riders/vehicles, 12 cities, 25 company owners) and times
+the filter options of the four-week range:
+  * the old get_filter_options: every tour loaded and its delivery_cities
+    parsed, distinct riders and vehicles, and every order's company owner
+  * the facet engine uncached (two GROUP BY queries with per-value counts)
+    and served from the result cache
+It reports queries, the median time and the JSON response size. Uses the
+in-memory SQLite testing config.
+
+Usage:
+    python benchmarks/bench_tour_facets.py [--tours-per-day 25 100 400] [--riders 150]
+"""
+
+import json
+import os
+import sys
+import time
+import logging
+import argparse
+import statistics
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, insert
+from app import create_app
+from app.cache import result_cache
+from app.tours import filter_tour_days, tour_service
+from models import db, Order, Tour
+
+DAYS = 28
+REPEATS = 5
+
+
+def seed(tours_per_day, riders):
+    Order.query.delete()
+    Tour.query.delete()
+    first_day = date.today() - timedelta(days=DAYS)
+    tours, orders = [], []
+    for offset in range(DAYS):
+        day = first_day + timedelta(days=offset)
+        for number in range(tours_per_day):
+            tour_date = f"{day.isoformat()}-{number % 24:02d}-15-00"
+            tour_id = f"{tour_date}*plan{offset}*tour-{number}"
+            cities = sorted({f"City {(number + k) % 12}" for k in range(3)})
+            tours.append({'tour_id': tour_id, 'tour_date': tour_date, 'tour_day': day, 'tour_plan_id': f'plan{offset}',
+                          'tour_name': f'tour-{number}', 'tour_number': number, 'rider_name': f'Rider {number % riders}',
+                          'vehicle_registration': f'VEH-{number % riders}', 'delivery_cities': json.dumps(cities)})
+            for n in range(10):
+                company = f"Company {(number + n) % 25:02d}"
+                orders.append({'id': f'{tour_id}-{n}', 'client_id': 'illa-frontdoor', 'date': day, 'order_status': 'COMPLETED',
+                               'tour_id': tour_id, 'tour_date': tour_date, 'tour_day': day,
+                               'company_owner': company, 'custom_fields': json.dumps({'Company_Owner': company})})
+    for start in range(0, len(tours), 5000):
+        db.session.execute(insert(Tour), tours[start:start + 5000])
+    for start in range(0, len(orders), 5000):
+        db.session.execute(insert(Order), orders[start:start + 5000])
+    db.session.commit()
+    db.session.execute(db.text("ANALYZE"))
+    return {'date_from': first_day.isoformat(), 'date_to': (first_day + timedelta(days=DAYS - 1)).isoformat()}
+
+
+def legacy_filter_options(date_from, date_to):
+    """get_filter_options as it was: four queries, JSON parsed per tour and per order"""
+    cities = set()
+    for tour in filter_tour_days(Tour.query, Tour.tour_day, date_from=date_from, date_to=date_to) \
+            .filter(Tour.delivery_cities.isnot(None)).all():
+        cities.update(json.loads(tour.delivery_cities))
+    riders = filter_tour_days(Tour.query.filter(Tour.rider_name.isnot(None)), Tour.tour_day,
+                              date_from=date_from, date_to=date_to).with_entities(Tour.rider_name).distinct().all()
+    vehicles = filter_tour_days(Tour.query.filter(Tour.vehicle_registration.isnot(None)), Tour.tour_day,
+                                date_from=date_from, date_to=date_to).with_entities(Tour.vehicle_registration).distinct().all()
+    companies = set()
+    for order in filter_tour_days(Order.query.filter(Order.custom_fields.isnot(None)), Order.tour_day,
+                                  date_from=date_from, date_to=date_to, offset_days=-1).all():
+        companies.add(json.loads(order.custom_fields)['Company_Owner'].strip())
+    return {'success': True, 'cities': sorted(cities), 'riders': sorted(r[0] for r in riders),
+            'vehicles': sorted(v[0] for v in vehicles), 'companies': sorted(companies)}
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+
+def measure(counter, run, before=None):
+    timings = []
+    for _ in range(REPEATS):
+        if before:
+            before()
+        counter.count = 0
+        start = time.perf_counter()
+        result = run()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), counter.count, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tours-per-day', type=int, nargs='+', default=[25, 100, 400])
+    parser.add_argument('--riders', type=int, default=150)
+    args = parser.parse_args()
+
+    app = create_app('testing')
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with app.app_context():
+        db.create_all()
+        counter = QueryCounter(db.engine)
+
+        print(f"📊 Tours page filter options, {DAYS}-day range ({args.riders} riders)")
+        print("=" * 96)
+        print(f"{'tours':>7} | {'old ms':>8} {'queries':>7} | {'facets ms':>9} {'queries':>7} | "
+              f"{'cached ms':>9} {'queries':>7} | {'old KB':>6} {'new KB':>6}")
+        for tours_per_day in args.tours_per_day:
+            filters = seed(tours_per_day, args.riders)
+
+            legacy_ms, legacy_queries, legacy = measure(counter, lambda: legacy_filter_options(**filters))
+            facets_ms, facets_queries, facets = measure(counter, lambda: tour_service.get_filter_options(**filters),
+                                                        before=result_cache.clear)
+            cached_ms, cached_queries, cached = measure(counter, lambda: tour_service.get_filter_options(**filters))
+            assert cached['from_cache'] and not facets['from_cache']
+            for facet in ('cities', 'riders', 'vehicles', 'companies'):
+                assert legacy[facet] == facets[facet]
+
+            legacy_kb, facets_kb = len(json.dumps(legacy)) / 1024, len(json.dumps(facets)) / 1024
+            print(f"{tours_per_day * DAYS:>7} | {legacy_ms:>8.1f} {legacy_queries:>7} | {facets_ms:>9.1f} {facets_queries:>7} | "
+                  f"{cached_ms:>9.2f} {cached_queries:>7} | {legacy_kb:>6.1f} {facets_kb:>6.1f}")
+
+        db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
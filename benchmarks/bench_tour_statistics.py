@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Benchmark: tour statistics refresh, per-tour queries vs one aggregate and one upsert
+
+Seeds N tours of ORDERS_PER_TOUR orders for one date and times the tour step
+of refresh_all_tour_data two ways: the previous loop (sample order query,
+get_or_create_tour and update_tour_statistics per tour) and
+bulk_update_tour_statistics. Each way runs twice: once creating the tours,
+once refreshing tours that already exist. Reports SQL statement count and
+wall-clock time. Uses the in-memory SQLite testing config.
+
+Usage:
+    python benchmarks/bench_tour_statistics.py [--tours 30 300 1000]
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+from app import create_app
+from app.order_merge import order_merge_service
+from app.tours import tour_service
+from models import db, Order, OrderLineItem, Tour
+
+ORDER_DATE = date(2025, 1, 1)
+ORDERS_PER_TOUR = 10
+STATUSES = ('COMPLETED', 'COMPLETED', 'CANCELLED', 'WAITING', 'ONGOING')
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+
+def seed(tour_count):
+    Tour.query.delete()
+    OrderLineItem.query.delete()
+    Order.query.delete()
+    orders = []
+    for number in range(tour_count):
+        tour_detail = {'tourId': f'2025-01-01-09-00-00*plan1*tour-{number}', 'riderName': f'Rider {number}',
+                       'vehicleRegistrationNumber': f'VEH-{number}', 'tourStartTime': '2025-01-01T09:00:00Z'}
+        for n in range(ORDERS_PER_TOUR):
+            orders.append({'id': f'order-{number}-{n}', 'orderStatus': STATUSES[(number + n) % len(STATUSES)],
+                           'location': {'name': f'Store {n}', 'address': {'city': f'City {n % 3}'}},
+                           'orderMetadata': {'tourDetail': tour_detail}})
+    order_merge_service.merge_orders(orders, 'illa-frontdoor', ORDER_DATE)
+    db.session.commit()
+    return {f'2025-01-01-09-00-00*plan1*tour-{number}': None for number in range(tour_count)}
+
+
+def legacy_refresh(tour_ids):
+    """The tour step of refresh_all_tour_data as it was: three lookups per tour"""
+    for tour_id in tour_ids:
+        tour_detail = None
+        sample_order = Order.query.filter_by(tour_id=tour_id).first()
+        if sample_order and sample_order.raw_data:
+            raw_data = json.loads(sample_order.raw_data)
+            tour_detail = raw_data.get('orderMetadata', {}).get('tourDetail', {})
+        tour_service.get_or_create_tour(tour_id, tour_detail)
+        tour_service.update_tour_statistics(tour_id)
+
+
+def bulk_refresh(tour_ids):
+    # refresh_all_tour_data collects the tour details while parsing raw_data for the order step
+    details = {}
+    for _, raw_data in db.session.query(Order.id, Order.raw_data).filter(Order.tour_id.in_(list(tour_ids))):
+        tour_detail = json.loads(raw_data)['orderMetadata']['tourDetail']
+        details.setdefault(tour_detail['tourId'], tour_detail)
+    tour_service.bulk_update_tour_statistics(details)
+    db.session.commit()
+
+
+def snapshot():
+    return {tour.tour_id: (tour.total_orders, tour.completed_orders, tour.cancelled_orders, tour.pending_orders,
+                           tour.tour_status, sorted(json.loads(tour.delivery_cities)),
+                           sorted(json.loads(tour.delivery_areas)), tour.rider_name, tour.vehicle_registration)
+            for tour in Tour.query.all()}
+
+
+def measure(counter, refresh, tour_ids):
+    counter.count = 0
+    start = time.perf_counter()
+    refresh(tour_ids)
+    elapsed = time.perf_counter() - start
+    db.session.expire_all()
+    return counter.count, elapsed * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tours', type=int, nargs='+', default=[30, 300, 1000])
+    args = parser.parse_args()
+
+    app = create_app('testing')
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with app.app_context():
+        db.create_all()
+        counter = QueryCounter(db.engine)
+
+        print(f"📊 Tour statistics refresh ({ORDERS_PER_TOUR} orders per tour)")
+        print("=" * 86)
+        print(f"{'tours':>6} {'run':>8} | {'loop queries':>12} {'loop ms':>9} | {'bulk queries':>12} {'bulk ms':>8} | {'speedup':>7}")
+        for tour_count in args.tours:
+            tour_ids = seed(tour_count)
+            results = {}
+            for name, refresh in (('loop', legacy_refresh), ('bulk', bulk_refresh)):
+                Tour.query.delete()
+                db.session.commit()
+                create = measure(counter, refresh, tour_ids)
+                update = measure(counter, refresh, tour_ids)
+                results[name] = (create, update, snapshot())
+
+            assert results['loop'][2] == results['bulk'][2], 'bulk refresh differs from the per-tour loop'
+            for run, index in (('create', 0), ('refresh', 1)):
+                (loop_queries, loop_ms), (bulk_queries, bulk_ms) = results['loop'][index], results['bulk'][index]
+                print(f"{tour_count:>6} {run:>8} | {loop_queries:>12} {loop_ms:>9.1f} | {bulk_queries:>12} {bulk_ms:>8.1f} "
+                      f"| {loop_ms / bulk_ms:>6.1f}x")
+
+        db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark: latest-validation lookup, per-order queries vs one batch query
+
+Seeds N orders with two ValidationResult rows each and compares
+get_stored_validation_result() called per order (as the dashboard used to)
+with get_latest_validation_results() for 50, 500 and 5,000 orders. Reports
+SQL statement count and wall-clock latency. Uses the in-memory SQLite
+testing config.
+
+Usage:
+    python benchmarks/bench_validation_lookup.py
+"""
+
+import os
+import sys
+import time
+import logging
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+from app import create_app
+from app.config import TestingConfig
+from app.validators import GoogleAIValidator
+from models import db, ValidationResult
+
+SIZES = (50, 500, 5000)
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+
+def seed(count):
+    now = datetime.now(timezone.utc)
+    rows = []
+    for i in range(count):
+        for age in (2, 1):
+            rows.append({
+                'order_id': f'bench-order-{i}',
+                'validation_date': now - timedelta(days=age),
+                'is_valid': age == 1,
+                'has_document': True,
+                'confidence_score': 0.9,
+                'summary': '{"gtins_verified": 2, "gtins_matched": 2}',
+                'discrepancies': '[]'
+            })
+    db.session.bulk_insert_mappings(ValidationResult, rows)
+    db.session.commit()
+
+
+def measure(counter, fn):
+    counter.count = 0
+    start = time.perf_counter()
+    fn()
+    return counter.count, (time.perf_counter() - start) * 1000
+
+
+def main():
+    app = create_app('testing')
+    logging.getLogger().setLevel(logging.WARNING)
+    validator = GoogleAIValidator(TestingConfig)
+
+    with app.app_context():
+        db.create_all()
+        seed(max(SIZES))
+        counter = QueryCounter(db.engine)
+
+        print("📊 Latest validation lookup (per-order vs batch)")
+        print("=" * 60)
+        print(f"{'orders':>7} | {'per-order queries':>17} {'ms':>9} | {'batch queries':>13} {'ms':>9}")
+        for size in SIZES:
+            order_ids = [f'bench-order-{i}' for i in range(size)]
+            loop_queries, loop_ms = measure(counter, lambda: [validator.get_stored_validation_result(oid) for oid in order_ids])
+            batch_queries, batch_ms = measure(counter, lambda: validator.get_latest_validation_results(order_ids))
+            print(f"{size:>7} | {loop_queries:>17} {loop_ms:>9.1f} | {batch_queries:>13} {batch_ms:>9.1f}")
+
+        db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Benchmark: validation job planning and order detail reuse - per-order GRN checks and detail fetches vs stored GRN URLs
+
+Seeds N orders for one date, 80% with a GRN, and a stored validation for
+half of them. Then times the two phases of a validate-all run:
+  * planning: the old per-order GRN path search (with its INFO log line per
+    order) plus a batch validation lookup, vs one candidate query over the
+    stored GRN URLs
+  * resolving: fetching every candidate's order detail from Locus again
+    (stubbed with --latency per request on --workers threads), vs reading
+    the detail stored by the previous run
+It also reports how many Locus requests each needs, and how long they take
+at LOCUS_CALLS_PER_MINUTE. Uses the in-memory SQLite testing config.
+
+Usage:
+    python benchmarks/bench_validation_planning.py [--orders 50 500 2000] [--latency 0.08] [--workers 8]
+"""
+
+import io
+import os
+import sys
+import time
+import logging
+import argparse
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+from app import create_app
+from app.config import TestingConfig
+from app.grn_documents import GRN_DOCUMENT_PATHS, grn_document_service
+from app.order_merge import order_merge_service
+from app.validators import GoogleAIValidator
+from models import db, Order, OrderLineItem, ValidationResult
+
+ORDER_DATE = date(2025, 1, 1)
+legacy_logger = logging.getLogger('bench.legacy')
+
+
+def legacy_has_grn_document(order_data):
+    """has_grn_document as it was: path search, recursive URL search, an INFO line per order"""
+    order_id = order_data.get('id', 'unknown')
+    for path in GRN_DOCUMENT_PATHS:
+        current_data = order_data
+        try:
+            for key in path:
+                current_data = current_data[key]
+            if isinstance(current_data, str) and current_data.startswith('http'):
+                legacy_logger.info(f"Order {order_id}: Found GRN document at path: {' -> '.join(path)}")
+                return True
+        except (KeyError, TypeError):
+            continue
+
+    proof_data = order_data.get('orderMetadata', {}).get('customerProofOfCompletion', {})
+    if proof_data:
+        def find_urls_recursive(obj, path=""):
+            urls = []
+            if isinstance(obj, dict):
+                for key, value in obj.items():
+                    new_path = f"{path}.{key}" if path else key
+                    if isinstance(value, str) and value.startswith('http'):
+                        urls.append((new_path, value))
+                    elif isinstance(value, (dict, list)):
+                        urls.extend(find_urls_recursive(value, new_path))
+            return urls
+
+        found_urls = find_urls_recursive(proof_data)
+        if found_urls:
+            legacy_logger.info(f"Order {order_id}: Found GRN document via recursive search: {found_urls[0]}")
+            return True
+
+    legacy_logger.info(f"Order {order_id}: No GRN document found")
+    return False
+
+
+def make_detail(n):
+    proof = {'Customer Delivery Photo': {'Customer Delivery Photo': f'https://example.com/photo/{n}.jpg'}}
+    if n % 5:
+        proof['Proof Of Delivery Document'] = {'Proof Of Delivery Document': f'https://example.com/grn/{n}.jpg'}
+    return {'id': f'bench-order-{n}', 'orderStatus': 'COMPLETED',
+            'orderMetadata': {'customerProofOfCompletion': proof},
+            'lineItems': [{'id': f'SKU-{i}', 'name': f'Item {i}', 'quantity': 5, 'quantityUnit': 'box'} for i in range(8)]}
+
+
+def seed(count):
+    Order.query.delete()
+    OrderLineItem.query.delete()
+    ValidationResult.query.delete()
+    details = [make_detail(n) for n in range(count)]
+    order_merge_service.merge_orders(details, 'illa-frontdoor', ORDER_DATE)
+    for detail in details:
+        grn_document_service.record_detail(detail['id'], detail)
+    db.session.bulk_insert_mappings(ValidationResult, [
+        {'order_id': detail['id'], 'grn_image_url': 'x', 'is_valid': True} for detail in details[::2]])
+    db.session.commit()
+    return details
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, nargs='+', default=[50, 500, 2000])
+    parser.add_argument('--latency', type=float, default=0.08, help='seconds per Locus order detail request')
+    parser.add_argument('--workers', type=int, default=8, help='concurrent detail requests')
+    args = parser.parse_args()
+
+    app = create_app('testing')
+    logging.getLogger().setLevel(logging.WARNING)
+    # The old check logged at INFO for every order: keep that cost in, without printing it
+    legacy_logger.addHandler(logging.StreamHandler(io.StringIO()))
+    legacy_logger.setLevel(logging.INFO)
+    legacy_logger.propagate = False
+    validator = GoogleAIValidator(TestingConfig)
+    calls_per_minute = TestingConfig.LOCUS_CALLS_PER_MINUTE
+
+    with app.app_context():
+        db.create_all()
+        counter = QueryCounter(db.engine)
+
+        print(f"📊 validate-all planning and order details ({args.latency * 1000:.0f}ms per Locus request, "
+              f"{args.workers} workers, {calls_per_minute} Locus calls/min)")
+        print("=" * 96)
+        print(f"{'orders':>7} | {'plan old ms':>11} {'new ms':>7} {'queries':>8} | {'fetches old':>11} {'new':>4} "
+              f"| {'resolve old ms':>14} {'new ms':>7} | {'Locus budget old':>16}")
+        for count in args.orders:
+            details = seed(count)
+
+            start = time.perf_counter()
+            with_grn = [detail['id'] for detail in details if legacy_has_grn_document(detail)]
+            stored = validator.get_latest_validation_results(with_grn)
+            legacy_ids = [order_id for order_id in with_grn if order_id not in stored]
+            legacy_plan_ms = (time.perf_counter() - start) * 1000
+
+            counter.count = 0
+            start = time.perf_counter()
+            candidates = grn_document_service.select_candidates('illa-frontdoor', ORDER_DATE)
+            plan_ms = (time.perf_counter() - start) * 1000
+            plan_queries = counter.count
+            assert sorted(candidates['order_ids']) == sorted(legacy_ids)
+
+            def fetch(order_id):
+                time.sleep(args.latency)
+                return details[int(order_id.rsplit('-', 1)[1])]
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.workers) as executor:
+                fetched = list(executor.map(fetch, legacy_ids))
+            legacy_resolve_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            reused = [grn_document_service.get_fresh_detail(order_id) for order_id in candidates['order_ids']]
+            resolve_ms = (time.perf_counter() - start) * 1000
+            assert reused == fetched
+
+            budget_minutes = len(legacy_ids) / calls_per_minute
+            print(f"{count:>7} | {legacy_plan_ms:>11.1f} {plan_ms:>7.1f} {plan_queries:>8} | {len(legacy_ids):>11} {0:>4} "
+                  f"| {legacy_resolve_ms:>14.0f} {resolve_ms:>7.0f} | {budget_minutes:>13.1f}min")
+
+        db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Database migration for extracted order custom fields
+
+Adds the columns of models.CUSTOM_FIELD_COLUMNS (orders.company_owner, the
+Company_Owner custom field), backfills them from the stored custom_fields
+JSON and creates ix_orders_company_owner_tour_day, used by the tours page
+company filter. On PostgreSQL the index is built CONCURRENTLY so the table
+stays writable.
+
+Usage:
+    python migrations/add_order_company_owner.py [--config development]
+"""
+
+import argparse
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+from app import create_app
+from models import db, Order, CUSTOM_FIELD_COLUMNS
+
+# (name, definition)
+INDEXES = [
+    ('ix_orders_company_owner_tour_day', '(company_owner, tour_day, tour_id)'),
+]
+
+BACKFILL_CHUNK_SIZE = 1000
+
+
+def backfill_custom_field_columns(connection):
+    """Fill the extracted columns from custom_fields, in id order; returns the number of orders updated"""
+    columns = list(CUSTOM_FIELD_COLUMNS.values())
+    missing = " AND ".join(f"{column} IS NULL" for column in columns)
+    assignments = ", ".join(f"{column} = :{column}" for column in columns)
+
+    updated = 0
+    last_id = ''
+    while True:
+        rows = connection.execute(text(
+            f"SELECT id, custom_fields FROM orders WHERE id > :last_id AND custom_fields IS NOT NULL AND {missing} "
+            f"ORDER BY id LIMIT :limit"), {'last_id': last_id, 'limit': BACKFILL_CHUNK_SIZE}).fetchall()
+        if not rows:
+            return updated
+        last_id = rows[-1][0]
+
+        found = [dict(Order.custom_field_columns(custom_fields), id=order_id) for order_id, custom_fields in rows]
+        found = [row for row in found if any(row[column] for column in columns)]
+        if found:
+            connection.execute(text(f"UPDATE orders SET {assignments} WHERE id = :id"), found)
+            updated += len(found)
+
+
+def add_order_company_owner():
+    """Add the missing columns, backfill them and create the index; safe to run more than once"""
+    inspector = inspect(db.engine)
+    dialect = db.engine.dialect.name
+    if 'orders' not in set(inspector.get_table_names()):
+        print("⚠️ orders table does not exist yet (created by db.create_all on startup)")
+        return True
+
+    try:
+        existing = {c['name'] for c in inspector.get_columns('orders')}
+        with db.engine.begin() as connection:
+            for column in CUSTOM_FIELD_COLUMNS.values():
+                if column in existing:
+                    print(f"⚠️ orders.{column} already exists")
+                    continue
+                connection.execute(text(f"ALTER TABLE orders ADD COLUMN {column} VARCHAR(255)"))
+                print(f"✅ Added orders.{column}")
+
+            updated = backfill_custom_field_columns(connection)
+            print(f"✅ Backfilled extracted custom fields for {updated} orders")
+
+        concurrently = "CONCURRENTLY " if dialect == 'postgresql' else ""
+        with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            for name, definition in INDEXES:
+                connection.execute(text(f"CREATE INDEX {concurrently}IF NOT EXISTS {name} ON orders {definition}"))
+                print(f"✅ Index {name} ready")
+            connection.execute(text("ANALYZE orders" if dialect == 'postgresql' else "ANALYZE"))
+
+        print("✅ Order company owner migration completed")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error adding order company owner column: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Add and backfill orders.company_owner from custom_fields')
+    parser.add_argument('--config', default='development', help='App config name (default: development)')
+    args = parser.parse_args()
+
+    app = create_app(args.config)
+    with app.app_context():
+        if not add_order_company_owner():
+            sys.exit(1)
@@ -0,0 +1,101 @@
+"""
+Database migration to store GRN document URLs on orders
+
+Adds orders.grn_url (filled at ingest from any payload that carries a GRN),
+orders.detail_data / detail_fetched_at (the order detail a validation last
+fetched, reused by validation jobs while fresh) and the partial index
+ix_orders_date_with_grn. Existing orders get grn_url backfilled from their
+stored raw_data.
+
+Usage:
+    python migrations/add_order_grn_url.py [--config development]
+"""
+
+import argparse
+import json
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+from app import create_app
+from app.grn_documents import find_grn_url
+from models import db
+
+# (column, definition)
+COLUMNS = [
+    ('grn_url', 'TEXT'),
+    ('detail_data', 'TEXT'),
+    ('detail_fetched_at', 'TIMESTAMP'),
+]
+
+INDEX_STATEMENT = "CREATE INDEX IF NOT EXISTS ix_orders_date_with_grn ON orders (date) WHERE grn_url IS NOT NULL"
+
+BACKFILL_CHUNK_SIZE = 1000
+
+
+def backfill_grn_urls(connection):
+    """Set grn_url of orders whose stored raw_data carries a GRN; returns the number of orders updated"""
+    updated = 0
+    last_id = ''
+    while True:
+        rows = connection.execute(text(
+            "SELECT id, raw_data FROM orders WHERE id > :last_id AND grn_url IS NULL AND raw_data IS NOT NULL "
+            "ORDER BY id LIMIT :limit"), {'last_id': last_id, 'limit': BACKFILL_CHUNK_SIZE}).fetchall()
+        if not rows:
+            return updated
+        last_id = rows[-1][0]
+
+        found = []
+        for order_id, raw_data in rows:
+            try:
+                grn_url = find_grn_url(json.loads(raw_data))
+            except ValueError:
+                continue
+            if grn_url:
+                found.append({'id': order_id, 'grn_url': grn_url})
+        if found:
+            connection.execute(text("UPDATE orders SET grn_url = :grn_url WHERE id = :id"), found)
+            updated += len(found)
+
+
+def add_order_grn_url():
+    """Add the missing columns and index, then backfill; safe to run more than once"""
+    inspector = inspect(db.engine)
+    if 'orders' not in set(inspector.get_table_names()):
+        print("⚠️ orders table does not exist yet (created by db.create_all on startup)")
+        return True
+
+    try:
+        existing = {c['name'] for c in inspector.get_columns('orders')}
+        with db.engine.begin() as connection:
+            for column, definition in COLUMNS:
+                if column in existing:
+                    print(f"⚠️ orders.{column} already exists")
+                    continue
+                connection.execute(text(f"ALTER TABLE orders ADD COLUMN {column} {definition}"))
+                print(f"✅ Added orders.{column}")
+
+            connection.execute(text(INDEX_STATEMENT))
+            print("✅ Index ix_orders_date_with_grn ready")
+
+            updated = backfill_grn_urls(connection)
+            print(f"✅ Backfilled grn_url for {updated} orders")
+
+        print("✅ Order GRN URL migration completed")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error adding order GRN URL columns: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Add orders.grn_url and stored order detail columns')
+    parser.add_argument('--config', default='development', help='App config name (default: development)')
+    args = parser.parse_args()
+
+    app = create_app(args.config)
+    with app.app_context():
+        if not add_order_grn_url():
+            sys.exit(1)
@@ -0,0 +1,109 @@
+"""
+Database migration to add indexes for the hot Order/Tour/ValidationResult queries
+
+PostgreSQL gets composite, partial and pg_trgm indexes (built CONCURRENTLY so
+live tables stay writable); SQLite gets the composite and partial indexes plus
+NOCASE indexes in place of trigram indexes.
+
+Usage:
+    python migrations/add_performance_indexes.py
+    python migrations/add_performance_indexes.py --explain    # also run migrations/explain_queries.py
+"""
+
+import argparse
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app import create_app
+from models import db
+
+# Indexes shared by both dialects: (name, table, definition)
+COMMON_INDEXES = [
+    # get_orders_from_database: WHERE client_id = ? AND date = ?
+    ('ix_orders_client_id_date', 'orders', '(client_id, date)'),
+    # Filters, heatmap and dashboard_stats aggregation: WHERE date ... AND order_status ...
+    ('ix_orders_date_order_status', 'orders', '(date, order_status)'),
+    # Filter listing order: ORDER BY date DESC, created_at DESC, id DESC
+    ('ix_orders_date_created_at_id', 'orders', '(date, created_at, id)'),
+    # Heatmap: only orders with coordinates, by date
+    ('ix_orders_date_with_coordinates', 'orders',
+     '(date) WHERE location_latitude IS NOT NULL AND location_longitude IS NOT NULL'),
+    # HeatmapService.get_location_details: lat/lng BETWEEN ranges
+    ('ix_orders_latitude_longitude', 'orders',
+     '(location_latitude, location_longitude) WHERE location_latitude IS NOT NULL'),
+    ('ix_order_line_items_order_id', 'order_line_items', '(order_id)'),
+    # Latest validation per order
+    ('ix_validation_results_order_id_validation_date', 'validation_results', '(order_id, validation_date)'),
+]
+
+# Substring (ILIKE '%term%') searches: trigram GIN indexes on PostgreSQL
+POSTGRES_TRIGRAM_INDEXES = [
+    ('ix_orders_rider_name_trgm', 'orders', 'rider_name'),
+    ('ix_orders_vehicle_registration_trgm', 'orders', 'vehicle_registration'),
+    ('ix_orders_location_name_trgm', 'orders', 'location_name'),
+    ('ix_tours_rider_name_trgm', 'tours', 'rider_name'),
+    ('ix_tours_vehicle_registration_trgm', 'tours', 'vehicle_registration'),
+]
+
+# SQLite has no trigram indexes; NOCASE indexes serve prefix LIKE searches only
+SQLITE_NOCASE_INDEXES = [
+    ('ix_orders_rider_name_nocase', 'orders', 'rider_name'),
+    ('ix_orders_vehicle_registration_nocase', 'orders', 'vehicle_registration'),
+]
+
+
+def get_index_statements(dialect):
+    """CREATE INDEX statements for the given dialect name"""
+    if dialect == 'postgresql':
+        statements = ["CREATE EXTENSION IF NOT EXISTS pg_trgm"]
+        statements += [f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} {definition}"
+                       for name, table, definition in COMMON_INDEXES]
+        statements += [f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} USING gin ({column} gin_trgm_ops)"
+                       for name, table, column in POSTGRES_TRIGRAM_INDEXES]
+        statements.append("ANALYZE orders")
+        statements.append("ANALYZE validation_results")
+        return statements
+
+    statements = [f"CREATE INDEX IF NOT EXISTS {name} ON {table} {definition}"
+                  for name, table, definition in COMMON_INDEXES]
+    statements += [f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({column} COLLATE NOCASE)"
+                   for name, table, column in SQLITE_NOCASE_INDEXES]
+    statements.append("ANALYZE")
+    return statements
+
+
+def add_performance_indexes():
+    """Create the indexes; CONCURRENTLY needs autocommit, so each statement runs on its own"""
+    dialect = db.engine.dialect.name
+    print(f"Adding performance indexes ({dialect})...")
+
+    try:
+        with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            for sql in get_index_statements(dialect):
+                connection.execute(text(sql))
+                print(f"✅ {sql}")
+
+        print("✅ Successfully added performance indexes")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error adding performance indexes: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Add indexes for the hot Order/Tour/ValidationResult queries')
+    parser.add_argument('--explain', action='store_true', help='Run the EXPLAIN check after creating the indexes')
+    parser.add_argument('--config', default='development', help='App config name (default: development)')
+    args = parser.parse_args()
+
+    # Create Flask app and run migration within app context
+    app = create_app(args.config)
+    with app.app_context():
+        if not add_performance_indexes():
+            sys.exit(1)
+        if args.explain:
+            from explain_queries import run_explain_check
+            sys.exit(0 if run_explain_check() else 1)
@@ -0,0 +1,99 @@
+"""
+Database migration for native tour day columns
+
+Adds tours.tour_day and orders.tour_day (the day of the tour_date string,
+e.g. '2024-09-23-21-15-02' -> 2024-09-23), backfills them from tour_date
+and creates the btree indexes used by the tours page date range filters:
+ix_tours_tour_day_tour_number and ix_orders_tour_day. On PostgreSQL the
+indexes are built CONCURRENTLY so the tables stay writable.
+
+Usage:
+    python migrations/add_tour_day.py [--config development]
+"""
+
+import argparse
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+from app import create_app
+from models import db, Tour
+
+TABLES = ('tours', 'orders')
+
+# (name, table, definition)
+INDEXES = [
+    ('ix_tours_tour_day_tour_number', 'tours', '(tour_day, tour_number)'),
+    ('ix_orders_tour_day', 'orders', '(tour_day)'),
+]
+
+BACKFILL_CHUNK_SIZE = 1000
+
+
+def backfill_tour_days(connection, table):
+    """Set tour_day from tour_date where it is missing, in id order; returns the number of rows updated"""
+    updated = 0
+    last_id = None
+    while True:
+        after = "AND id > :last_id " if last_id is not None else ""
+        rows = connection.execute(text(
+            f"SELECT id, tour_date FROM {table} WHERE tour_day IS NULL AND tour_date IS NOT NULL {after}"
+            f"ORDER BY id LIMIT :limit"), {'last_id': last_id, 'limit': BACKFILL_CHUNK_SIZE}).fetchall()
+        if not rows:
+            return updated
+        last_id = rows[-1][0]
+
+        days = [{'id': row_id, 'tour_day': Tour.parse_tour_day(tour_date)} for row_id, tour_date in rows]
+        days = [row for row in days if row['tour_day']]
+        if days:
+            connection.execute(text(f"UPDATE {table} SET tour_day = :tour_day WHERE id = :id"), days)
+            updated += len(days)
+
+
+def add_tour_day():
+    """Add the columns, backfill them and create the indexes; safe to run more than once"""
+    inspector = inspect(db.engine)
+    dialect = db.engine.dialect.name
+    existing_tables = set(inspector.get_table_names())
+
+    try:
+        with db.engine.begin() as connection:
+            for table in TABLES:
+                if table not in existing_tables:
+                    print(f"⚠️ {table} table does not exist yet (created by db.create_all on startup)")
+                    continue
+                if 'tour_day' in {column['name'] for column in inspector.get_columns(table)}:
+                    print(f"⚠️ {table}.tour_day already exists")
+                else:
+                    connection.execute(text(f"ALTER TABLE {table} ADD COLUMN tour_day DATE"))
+                    print(f"✅ Added {table}.tour_day")
+
+                updated = backfill_tour_days(connection, table)
+                print(f"✅ Backfilled tour_day for {updated} {table} rows")
+
+        concurrently = "CONCURRENTLY " if dialect == 'postgresql' else ""
+        with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            for name, table, definition in INDEXES:
+                if table in existing_tables:
+                    connection.execute(text(f"CREATE INDEX {concurrently}IF NOT EXISTS {name} ON {table} {definition}"))
+                    print(f"✅ Index {name} ready")
+            connection.execute(text("ANALYZE tours" if dialect == 'postgresql' else "ANALYZE"))
+
+        print("✅ Tour day migration completed")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error adding tour_day columns: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Add and backfill tours.tour_day / orders.tour_day')
+    parser.add_argument('--config', default='development', help='App config name (default: development)')
+    args = parser.parse_args()
+
+    app = create_app(args.config)
+    with app.app_context():
+        if not add_tour_day():
+            sys.exit(1)
@@ -0,0 +1,70 @@
+"""
+Database migration for incrementally maintained tour statistics
+
+Adds tours.waiting_orders (needed to re-derive the tour status from the
+counters alone) and then reconciles every tour with its orders, so the
+counters start out correct before order changes are applied as deltas.
+
+Usage:
+    python migrations/add_tour_waiting_orders.py [--config development] [--skip-reconcile]
+"""
+
+import argparse
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+from app import create_app
+from models import db
+
+
+def add_tour_waiting_orders():
+    """Add the waiting_orders column if missing; safe to run more than once"""
+    inspector = inspect(db.engine)
+    if 'tours' not in set(inspector.get_table_names()):
+        print("⚠️ tours table does not exist yet (created by db.create_all on startup)")
+        return True
+
+    try:
+        existing = {column['name'] for column in inspector.get_columns('tours')}
+        if 'waiting_orders' in existing:
+            print("⚠️ tours.waiting_orders already exists")
+            return True
+
+        with db.engine.begin() as connection:
+            connection.execute(text("ALTER TABLE tours ADD COLUMN waiting_orders INTEGER DEFAULT 0"))
+        print("✅ Added tours.waiting_orders")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error adding tours.waiting_orders: {e}")
+        return False
+
+
+def reconcile_tours():
+    """Rebuild the counters of every tour that does not match its orders"""
+    from app.tours import tour_service
+
+    result = tour_service.reconcile_tour_statistics(repair=True)
+    if not result['success']:
+        print(f"❌ Error reconciling tour statistics: {result['error']}")
+        return False
+
+    print(f"✅ Checked {result['checked_tours']} tours: rebuilt {result['drifted_tours']} drifted, "
+          f"created {result['missing_tours']} missing")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Add tours.waiting_orders and reconcile tour statistics')
+    parser.add_argument('--config', default='development', help='App config name (default: development)')
+    parser.add_argument('--skip-reconcile', action='store_true', help='Only alter the table')
+    args = parser.parse_args()
+
+    app = create_app(args.config)
+    with app.app_context():
+        if not add_tour_waiting_orders():
+            sys.exit(1)
+        if not args.skip_reconcile and not reconcile_tours():
+            sys.exit(1)
@@ -0,0 +1,63 @@
+"""
+Database migration to add validation input fingerprints
+
+Adds validation_results.input_fingerprint (sha256 of the normalised line
+items, GRN image content and prompt version a result was produced from) and
+validation_jobs.unchanged_orders. Existing results keep a NULL fingerprint:
+they are still reused by cost-effective runs, and re-validated once by runs
+with force_reprocess, after which they carry a fingerprint.
+
+Usage:
+    python migrations/add_validation_fingerprint.py [--config development]
+"""
+
+import argparse
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+from app import create_app
+from models import db
+
+# (table, column, definition)
+COLUMNS = [
+    ('validation_results', 'input_fingerprint', 'VARCHAR(64)'),
+    ('validation_jobs', 'unchanged_orders', 'INTEGER DEFAULT 0'),
+]
+
+
+def add_validation_fingerprint():
+    """Add the columns that are missing; safe to run more than once"""
+    inspector = inspect(db.engine)
+    tables = set(inspector.get_table_names())
+
+    try:
+        with db.engine.begin() as connection:
+            for table, column, definition in COLUMNS:
+                if table not in tables:
+                    print(f"⚠️ {table} table does not exist yet (created by db.create_all on startup)")
+                    continue
+                if column in {c['name'] for c in inspector.get_columns(table)}:
+                    print(f"⚠️ {table}.{column} already exists")
+                    continue
+                connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+                print(f"✅ Added {table}.{column}")
+
+        print("✅ Validation fingerprint migration completed")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error adding validation fingerprint columns: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Add validation input fingerprint columns')
+    parser.add_argument('--config', default='development', help='App config name (default: development)')
+    args = parser.parse_args()
+
+    app = create_app(args.config)
+    with app.app_context():
+        if not add_validation_fingerprint():
+            sys.exit(1)
@@ -0,0 +1,89 @@
+"""
+Database migration and backfill for the per-day dashboard_stats aggregation
+
+Adds the counter columns used by DashboardStatsService and rebuilds the
+stats rows for historical order dates.
+
+Usage:
+    python migrations/backfill_dashboard_stats.py                      # all dates
+    python migrations/backfill_dashboard_stats.py --date-from 2025-01-01 --date-to 2025-01-31
+    python migrations/backfill_dashboard_stats.py --skip-columns       # backfill only
+"""
+
+import argparse
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+from app import create_app
+from models import db
+
+# Columns added to dashboard_stats after the table was first created
+NEW_COLUMNS = {
+    'cancelled_orders': 'INTEGER DEFAULT 0',
+    'partially_delivered_orders': 'INTEGER DEFAULT 0',
+    'status_totals': 'TEXT',  # JSON object: order_status -> count
+    'total_quantity': 'INTEGER DEFAULT 0',
+    'delivered_quantity': 'INTEGER DEFAULT 0',
+    'confidence_score_sum': 'FLOAT DEFAULT 0',
+    'processing_time_sum': 'FLOAT DEFAULT 0'
+}
+
+
+def add_dashboard_stats_columns():
+    """Create dashboard_stats if needed and add any missing counter columns"""
+    try:
+        inspector = inspect(db.engine)
+        if not inspector.has_table('dashboard_stats'):
+            db.create_all()
+            print("✅ Created dashboard_stats table")
+            return True
+
+        existing = {column['name'] for column in inspector.get_columns('dashboard_stats')}
+        for column, definition in NEW_COLUMNS.items():
+            if column in existing:
+                print(f"⚠️ {column} column already exists")
+                continue
+            db.session.execute(text(f"ALTER TABLE dashboard_stats ADD COLUMN {column} {definition}"))
+            print(f"✅ Added {column} column")
+
+        db.session.commit()
+        return True
+
+    except Exception as e:
+        print(f"❌ Error adding dashboard_stats columns: {e}")
+        db.session.rollback()
+        return False
+
+
+def backfill_dashboard_stats(date_from=None, date_to=None):
+    """Rebuild the dashboard_stats rows for every order date in the range"""
+    from app.dashboard_stats import dashboard_stats_service
+
+    try:
+        days = dashboard_stats_service.backfill(date_from, date_to)
+        print(f"✅ Backfilled dashboard stats for {days} day(s)")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error backfilling dashboard stats: {e}")
+        db.session.rollback()
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Add dashboard_stats columns and backfill historical dates')
+    parser.add_argument('--date-from', help='First order date to rebuild (YYYY-MM-DD)')
+    parser.add_argument('--date-to', help='Last order date to rebuild (YYYY-MM-DD)')
+    parser.add_argument('--skip-columns', action='store_true', help='Only backfill, do not alter the table')
+    parser.add_argument('--config', default='development', help='App config name (default: development)')
+    args = parser.parse_args()
+
+    # Create Flask app and run migration within app context
+    app = create_app(args.config)
+    with app.app_context():
+        if not args.skip_columns and not add_dashboard_stats_columns():
+            sys.exit(1)
+        if not backfill_dashboard_stats(args.date_from, args.date_to):
+            sys.exit(1)
@@ -0,0 +1,171 @@
+"""
+EXPLAIN check for the hot service queries
+
+Builds each query the way the services do, runs EXPLAIN on it and reports
+any table that would be read with a sequential scan. On PostgreSQL
+enable_seqscan is switched off for the EXPLAIN, so a Seq Scan in the plan
+means no usable index exists (not just that the table is small).
+
+Usage:
+    python migrations/explain_queries.py            # exits 1 if a query regresses to a sequential scan
+    python migrations/explain_queries.py --verbose  # print every plan
+"""
+
+import argparse
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import date, timedelta
+from sqlalchemy import func, text
+from models import db, Order, OrderLineItem, ValidationResult, Tour, DashboardStats
+
+
+def _hot_queries():
+    """(name, statement, tables that must be read through an index, dialects or None for all)"""
+    from app.filters import filter_service
+    from app.tours import filter_tour_days
+
+    today = date.today()
+    week_ago = today - timedelta(days=7)
+    range_filters = {'date_from': week_ago.isoformat(), 'date_to': today.isoformat()}
+
+    filtered = filter_service._build_filtered_query(dict(range_filters, order_status='COMPLETED'))
+
+    return [
+        ('orders_by_client_and_date',
+         Order.query.filter_by(client_id='illa-frontdoor', date=today).statement, ('orders',), None),
+        ('filter_listing_page',
+         filter_service._build_filtered_query(range_filters).limit(50).statement, ('orders',), None),
+        ('filter_status_totals',
+         filtered.with_entities(Order.date, Order.order_status, func.count(Order.id))
+         .order_by(None).group_by(Order.date, Order.order_status).statement, ('orders',), None),
+        ('heatmap_orders_with_coordinates',
+         db.session.query(Order).filter(Order.location_latitude.isnot(None), Order.location_longitude.isnot(None),
+                                        Order.date >= week_ago, Order.date <= today).statement, ('orders',), None),
+        ('heatmap_location_details',
+         db.session.query(Order).filter(Order.location_latitude.between(29.99, 30.01),
+                                        Order.location_longitude.between(31.19, 31.21)).statement, ('orders',), None),
+        ('latest_validations',
+         ValidationResult.query.filter(ValidationResult.order_id.in_(['a', 'b']))
+         .order_by(ValidationResult.order_id, ValidationResult.validation_date.desc()).statement,
+         ('validation_results',), None),
+        ('line_item_previews',
+         OrderLineItem.query.filter(OrderLineItem.order_id.in_(['a', 'b'])).statement, ('order_line_items',), None),
+        ('tours_page_day_range',
+         filter_tour_days(Tour.query, Tour.tour_day, **range_filters).order_by(Tour.tour_number).statement,
+         ('tours',), None),
+        ('tour_facets_tours',
+         filter_tour_days(db.session.query(Tour.rider_name, Tour.vehicle_registration, Tour.delivery_cities, func.count()),
+                          Tour.tour_day, **range_filters)
+         .group_by(Tour.rider_name, Tour.vehicle_registration, Tour.delivery_cities).statement, ('tours',), None),
+        ('tour_facets_company_owners',
+         filter_tour_days(db.session.query(Order.company_owner, func.count(func.distinct(Order.tour_id)))
+                          .filter(Order.company_owner.isnot(None)), Order.tour_day, **range_filters)
+         .group_by(Order.company_owner).statement, ('orders',), None),
+        ('tours_by_company_owner',
+         Tour.query.filter(Tour.tour_id.in_(db.session.query(Order.tour_id).filter(Order.company_owner == 'Acme')))
+         .statement, ('orders',), None),
+        ('dashboard_stats_range',
+         DashboardStats.query.filter(DashboardStats.date >= week_ago, DashboardStats.date <= today).statement,
+         ('dashboard_stats',), None),
+        # Substring searches only avoid a scan with pg_trgm
+        ('orders_rider_search',
+         db.session.query(Order).filter(Order.rider_name.ilike('%ahmed%')).statement, ('orders',), ('postgresql',)),
+        ('orders_vehicle_search',
+         db.session.query(Order).filter(Order.vehicle_registration.ilike('%123%')).statement, ('orders',), ('postgresql',)),
+        ('tours_rider_search',
+         db.session.query(Tour).filter(Tour.rider_name.ilike('%ahmed%')).statement, ('tours',), ('postgresql',)),
+    ]
+
+
+def _compile(statement):
+    compiled = statement.compile(dialect=db.engine.dialect, compile_kwargs={'render_postcompile': True})
+    if compiled.positional:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+    return str(compiled), params
+
+
+def _postgres_seq_scans(plan, tables):
+    """Relations read by a Seq Scan node anywhere in a JSON plan"""
+    found = []
+    if plan.get('Node Type') == 'Seq Scan' and plan.get('Relation Name') in tables:
+        found.append(plan['Relation Name'])
+    for child in plan.get('Plans', []):
+        found.extend(_postgres_seq_scans(child, tables))
+    return found
+
+
+def explain_statement(statement, tables):
+    """Return (plan lines, tables read with a sequential scan) for one statement"""
+    sql, params = _compile(statement)
+    dialect = db.engine.dialect.name
+
+    with db.engine.connect() as connection:
+        if dialect == 'postgresql':
+            transaction = connection.begin()
+            try:
+                connection.execute(text("SET LOCAL enable_seqscan = off"))
+                plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}", params).scalar()
+            finally:
+                transaction.rollback()
+            root = plan[0]['Plan']
+            lines = list(_format_postgres_plan(root))
+            return lines, _postgres_seq_scans(root, tables)
+
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        lines = [row[-1] for row in rows]
+        seq_scans = []
+        for detail in lines:
+            parts = detail.split()
+            # "SCAN orders" is a full table scan; "SCAN orders USING INDEX ..." walks an index
+            if len(parts) >= 2 and parts[0] == 'SCAN' and parts[1] in tables and 'INDEX' not in detail:
+                seq_scans.append(parts[1])
+        return lines, seq_scans
+
+
+def _format_postgres_plan(plan, depth=0):
+    relation = f" on {plan['Relation Name']}" if plan.get('Relation Name') else ''
+    index = f" using {plan['Index Name']}" if plan.get('Index Name') else ''
+    yield f"{'  ' * depth}{plan['Node Type']}{relation}{index}"
+    for child in plan.get('Plans', []):
+        yield from _format_postgres_plan(child, depth + 1)
+
+
+def collect_plans():
+    """EXPLAIN every hot query that applies to the current dialect"""
+    dialect = db.engine.dialect.name
+    results = []
+    for name, statement, tables, dialects in _hot_queries():
+        if dialects and dialect not in dialects:
+            continue
+        plan, seq_scans = explain_statement(statement, tables)
+        results.append({'name': name, 'plan': plan, 'seq_scans': seq_scans, 'ok': not seq_scans})
+    return results
+
+
+def run_explain_check(verbose=False):
+    """Print the EXPLAIN summary; returns False if any query falls back to a sequential scan"""
+    results = collect_plans()
+    for result in results:
+        status = '✅' if result['ok'] else f"❌ sequential scan on {', '.join(result['seq_scans'])}"
+        print(f"{status} {result['name']}")
+        if verbose or not result['ok']:
+            for line in result['plan']:
+                print(f"      {line}")
+    return all(result['ok'] for result in results)
+
+
+if __name__ == "__main__":
+    from app import create_app
+
+    parser = argparse.ArgumentParser(description='EXPLAIN the hot service queries and flag sequential scans')
+    parser.add_argument('--verbose', action='store_true', help='Print every plan')
+    parser.add_argument('--config', default='development', help='App config name (default: development)')
+    args = parser.parse_args()
+
+    app = create_app(args.config)
+    with app.app_context():
+        sys.exit(0 if run_explain_check(args.verbose) else 1)
@@ -1,11 +1,37 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, timezone
+from sqlalchemy import event
 import json
 
 db = SQLAlchemy()
 
+# Custom fields the tours page filters on -> the indexed order columns they are extracted into at ingest
+CUSTOM_FIELD_COLUMNS = {
+    'Company_Owner': 'company_owner',
+}
+
 class Order(db.Model):
     __tablename__ = 'orders'
+    # Composite indexes for the hot listing/filter queries (PostgreSQL partial and trigram
+    # indexes are added by migrations/add_performance_indexes.py)
+    __table_args__ = (
+        db.Index('ix_orders_client_id_date', 'client_id', 'date'),
+        db.Index('ix_orders_date_order_status', 'date', 'order_status'),
+        db.Index('ix_orders_date_created_at_id', 'date', 'created_at', 'id'),
+        db.Index('ix_orders_date_with_coordinates', 'date',
+                 postgresql_where=db.text('location_latitude IS NOT NULL AND location_longitude IS NOT NULL'),
+                 sqlite_where=db.text('location_latitude IS NOT NULL AND location_longitude IS NOT NULL')),
+        db.Index('ix_orders_latitude_longitude', 'location_latitude', 'location_longitude',
+                 postgresql_where=db.text('location_latitude IS NOT NULL'),
+                 sqlite_where=db.text('location_latitude IS NOT NULL')),
+        db.Index('ix_orders_date_with_grn', 'date',
+                 postgresql_where=db.text('grn_url IS NOT NULL'),
+                 sqlite_where=db.text('grn_url IS NOT NULL')),
+        # Company owner filter options: orders of a tour day range
+        db.Index('ix_orders_tour_day', 'tour_day'),
+        # Company-filtered tour lists: tours of one company owner, optionally within a day range
+        db.Index('ix_orders_company_owner_tour_day', 'company_owner', 'tour_day', 'tour_id'),
+    )
 
     id = db.Column(db.String(255), primary_key=True)  # Locus Order ID
     client_id = db.Column(db.String(100), nullable=False)
@@ -25,6 +51,7 @@ class Order(db.Model):
     # Tour/Delivery data
     tour_id = db.Column(db.String(255), index=True)  # Full tour ID from API
     tour_date = db.Column(db.String(20))  # Parsed date from tour ID
+    tour_day = db.Column(db.Date)  # Day of tour_date, for range filters (kept in step with tour_date)
     tour_plan_id = db.Column(db.String(100))  # Parsed plan ID from tour ID
     tour_name = db.Column(db.String(50))  # Parsed tour name from tour ID
     tour_number = db.Column(db.Integer)  # Extracted number from tour name for sorting
@@ -70,10 +97,16 @@ class Order(db.Model):
     skills = db.Column(db.Text)  # JSON string of required skills
     tags = db.Column(db.Text)  # JSON string of tags
     custom_fields = db.Column(db.Text)  # JSON string of custom fields
+    company_owner = db.Column(db.String(255))  # Company_Owner custom field (kept in step with custom_fields)
 
     # Raw order data from Locus API
     raw_data = db.Column(db.Text)  # JSON string
 
+    # GRN document URL found in the order payload at ingest, and the order detail validation last fetched
+    grn_url = db.Column(db.Text)
+    detail_data = db.Column(db.Text)  # JSON string of the Locus order detail
+    detail_fetched_at = db.Column(db.DateTime)
+
     # Editing support fields
     is_modified = db.Column(db.Boolean, default=False)  # Flag to indicate manual modifications
     modified_fields = db.Column(db.Text)  # JSON string of modified field names
@@ -93,6 +126,24 @@ class Order(db.Model):
     def __repr__(self):
         return f'<Order {self.id}>'
 
+    @staticmethod
+    def custom_field_columns(custom_fields):
+        """Column values of the extracted custom fields (CUSTOM_FIELD_COLUMNS) for a dict or JSON string"""
+        if isinstance(custom_fields, str):
+            try:
+                custom_fields = json.loads(custom_fields)
+            except ValueError:
+                custom_fields = None
+        if not isinstance(custom_fields, dict):
+            custom_fields = {}
+
+        columns = {}
+        for field, column in CUSTOM_FIELD_COLUMNS.items():
+            value = custom_fields.get(field)
+            value = value.strip() if isinstance(value, str) else None
+            columns[column] = value[:255] if value else None
+        return columns
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -146,6 +197,7 @@ class Order(db.Model):
             'tags': json.loads(self.tags) if self.tags else None,
             'custom_fields': json.loads(self.custom_fields) if self.custom_fields else None,
             'raw_data': json.loads(self.raw_data) if self.raw_data else None,
+            'grn_url': self.grn_url,
             # Editing support fields
             'is_modified': self.is_modified,
             'modified_fields': json.loads(self.modified_fields) if self.modified_fields else [],
@@ -161,7 +213,7 @@ class OrderLineItem(db.Model):
     __tablename__ = 'order_line_items'
 
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.String(255), db.ForeignKey('orders.id'), nullable=False)
+    order_id = db.Column(db.String(255), db.ForeignKey('orders.id'), nullable=False, index=True)
 
     # Item data
     sku_id = db.Column(db.String(255), nullable=False)
@@ -186,6 +238,10 @@ class OrderLineItem(db.Model):
 
 class ValidationResult(db.Model):
     __tablename__ = 'validation_results'
+    # Latest-validation lookups: WHERE order_id IN (...) ORDER BY validation_date DESC
+    __table_args__ = (
+        db.Index('ix_validation_results_order_id_validation_date', 'order_id', 'validation_date'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.String(255), nullable=False)  # Removed FK constraint to allow standalone validation results
@@ -210,12 +266,71 @@ class ValidationResult(db.Model):
     is_reprocessed = db.Column(db.Boolean, default=False)
     processing_time = db.Column(db.Float)  # Time taken in seconds
 
+    # sha256 of the validation inputs (normalised line items, uploaded image, prompt version); NULL for older rows
+    input_fingerprint = db.Column(db.String(64))
+
     # Timestamps
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
 
     def __repr__(self):
         return f'<ValidationResult {self.order_id} - {"Valid" if self.is_valid else "Invalid"}>'
 
+    @staticmethod
+    def latest_subquery(order_ids=None):
+        """Subquery with one row per order: the columns of its most recent validation.
+
+        order_ids (a select of order ids) limits the ranking to those orders'
+        validations instead of the whole table.
+        """
+        ranked = db.session.query(
+            ValidationResult.order_id.label('order_id'),
+            ValidationResult.is_valid.label('is_valid'),
+            ValidationResult.has_document.label('has_document'),
+            ValidationResult.confidence_score.label('confidence_score'),
+            db.func.row_number().over(
+                partition_by=ValidationResult.order_id,
+                order_by=(ValidationResult.validation_date.desc(), ValidationResult.id.desc())
+            ).label('rn')
+        )
+        if order_ids is not None:
+            ranked = ranked.filter(ValidationResult.order_id.in_(order_ids))
+        ranked = ranked.subquery('ranked_validations')
+
+        return db.session.query(
+            ranked.c.order_id, ranked.c.is_valid, ranked.c.has_document, ranked.c.confidence_score
+        ).filter(ranked.c.rn == 1).subquery('latest_validation')
+
+    @staticmethod
+    def latest_for_orders(order_ids, chunk_size=1000):
+        """Return {order_id: most recent ValidationResult} using one windowed query per chunk"""
+        order_ids = list(dict.fromkeys(oid for oid in order_ids if oid))
+        latest = {}
+
+        for start in range(0, len(order_ids), chunk_size):
+            chunk = order_ids[start:start + chunk_size]
+
+            if db.engine.dialect.name == 'postgresql':
+                # DISTINCT ON keeps the first row per order_id in ORDER BY order
+                rows = ValidationResult.query.filter(ValidationResult.order_id.in_(chunk)) \
+                    .distinct(ValidationResult.order_id) \
+                    .order_by(ValidationResult.order_id, ValidationResult.validation_date.desc(), ValidationResult.id.desc()) \
+                    .all()
+            else:
+                ranked = db.session.query(
+                    ValidationResult.id.label('id'),
+                    db.func.row_number().over(
+                        partition_by=ValidationResult.order_id,
+                        order_by=(ValidationResult.validation_date.desc(), ValidationResult.id.desc())
+                    ).label('rn')
+                ).filter(ValidationResult.order_id.in_(chunk)).subquery()
+                rows = ValidationResult.query.join(ranked, ValidationResult.id == ranked.c.id) \
+                    .filter(ranked.c.rn == 1).all()
+
+            for row in rows:
+                latest[row.order_id] = row
+
+        return latest
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -232,9 +347,146 @@ class ValidationResult(db.Model):
             'ai_response': self.ai_response,
             'is_reprocessed': self.is_reprocessed,
             'processing_time': self.processing_time,
+            'input_fingerprint': self.input_fingerprint,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+class ValidationJob(db.Model):
+    """Background validate-all-orders run; progress is checkpointed per order in validation_job_items"""
+    __tablename__ = 'validation_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)  # queued, running, completed, failed, cancelled
+
+    # Request parameters
+    validate_mode = db.Column(db.String(20), default='unvalidated_only')
+    force_reprocess = db.Column(db.Boolean, default=False)
+    max_workers = db.Column(db.Integer, default=20)
+
+    # Planning (filled once, before the first order is validated)
+    planned = db.Column(db.Boolean, default=False)
+    total_orders = db.Column(db.Integer, default=0)
+    orders_with_grn = db.Column(db.Integer, default=0)
+    orders_without_grn = db.Column(db.Integer, default=0)
+    orders_to_process = db.Column(db.Integer, default=0)
+
+    # Progress counters (updated with every checkpoint)
+    processed = db.Column(db.Integer, default=0)
+    errors = db.Column(db.Integer, default=0)
+    api_calls_made = db.Column(db.Integer, default=0)
+    cached_results = db.Column(db.Integer, default=0)
+    unchanged_orders = db.Column(db.Integer, default=0)  # stored result reused because its input fingerprint matched
+    gtin_cache_stats = db.Column(db.Text)  # JSON: GTIN cache counters over the job's last run
+
+    # Worker bookkeeping
+    worker_id = db.Column(db.String(255))
+    attempts = db.Column(db.Integer, default=0)  # times the job was claimed (more than 1 means it was resumed)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    started_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<ValidationJob {self.id} {self.date} {self.status}>'
+
+    def to_dict(self):
+        completed = (self.processed or 0) + (self.errors or 0)
+        return {
+            'job_id': self.id,
+            'date': self.date.isoformat() if self.date else None,
+            'status': self.status,
+            'validate_mode': self.validate_mode,
+            'force_reprocess': self.force_reprocess,
+            'max_workers': self.max_workers,
+            'total_orders': self.total_orders or 0,
+            'orders_with_grn': self.orders_with_grn or 0,
+            'orders_without_grn': self.orders_without_grn or 0,
+            'orders_to_process': self.orders_to_process or 0,
+            'skipped': (self.total_orders or 0) - (self.orders_to_process or 0),
+            'processed': self.processed or 0,
+            'errors': self.errors or 0,
+            'completed': completed,
+            'remaining': max((self.orders_to_process or 0) - completed, 0),
+            'api_calls_made': self.api_calls_made or 0,
+            'cached_results': self.cached_results or 0,
+            'unchanged_orders': self.unchanged_orders or 0,
+            # Orders with a GRN that needed no Gemini call: validated before (skipped when planning) or answered from stored results
+            'gemini_calls_avoided': (self.orders_with_grn or 0) - (self.orders_to_process or 0) + (self.cached_results or 0),
+            'gtin_cache': json.loads(self.gtin_cache_stats) if self.gtin_cache_stats else None,
+            'attempts': self.attempts or 0,
+            'worker_id': self.worker_id,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'heartbeat_at': self.heartbeat_at.isoformat() if self.heartbeat_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class ValidationJobItem(db.Model):
+    """One order of a ValidationJob; ``sequence`` numbers completions for progress streaming"""
+    __tablename__ = 'validation_job_items'
+    __table_args__ = (
+        db.UniqueConstraint('job_id', 'order_id', name='uq_validation_job_items_job_order'),
+        # Resume: pending items of a job; event stream: completions after a sequence number
+        db.Index('ix_validation_job_items_job_id_status', 'job_id', 'status'),
+        db.Index('ix_validation_job_items_job_id_sequence', 'job_id', 'sequence'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('validation_jobs.id'), nullable=False)
+    order_id = db.Column(db.String(255), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, done, error
+
+    sequence = db.Column(db.Integer)
+    success = db.Column(db.Boolean)
+    is_valid = db.Column(db.Boolean)
+    from_cache = db.Column(db.Boolean)
+    result = db.Column(db.Text)  # JSON: the per-order fields the dashboard renders
+    completed_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<ValidationJobItem {self.job_id}/{self.order_id} {self.status}>'
+
+    def to_dict(self):
+        result = json.loads(self.result) if self.result else {}
+        result.update({
+            'order_id': self.order_id,
+            'status': self.status,
+            'sequence': self.sequence,
+            'success': self.success,
+            'is_valid': self.is_valid,
+            'from_cache': self.from_cache,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None
+        })
+        return result
+
+class GtinProduct(db.Model):
+    """Cached GS1 Verified lookup for one GTIN; found=False rows cache "not in GS1" answers"""
+    __tablename__ = 'gtin_products'
+
+    gtin = db.Column(db.String(14), primary_key=True)
+    found = db.Column(db.Boolean, nullable=False, default=False)
+    product_info = db.Column(db.Text)  # JSON object from GS1Validator.parse_gs1_response (NULL when not found)
+
+    fetched_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    lookup_count = db.Column(db.Integer, default=1)  # GS1 requests made for this GTIN over time
+
+    def __repr__(self):
+        return f'<GtinProduct {self.gtin} {"found" if self.found else "not found"}>'
+
+    def to_dict(self):
+        return {
+            'gtin': self.gtin,
+            'found': self.found,
+            'product_info': json.loads(self.product_info) if self.product_info else None,
+            'fetched_at': self.fetched_at.isoformat() if self.fetched_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+            'lookup_count': self.lookup_count
+        }
+
 class DashboardStats(db.Model):
     __tablename__ = 'dashboard_stats'
 
@@ -245,8 +497,15 @@ class DashboardStats(db.Model):
     total_orders = db.Column(db.Integer, default=0)
     completed_orders = db.Column(db.Integer, default=0)
     pending_orders = db.Column(db.Integer, default=0)
+    cancelled_orders = db.Column(db.Integer, default=0)
+    partially_delivered_orders = db.Column(db.Integer, default=0)
+    status_totals = db.Column(db.Text)  # JSON object: order_status -> count (NULL statuses only counted in total_orders)
 
-    # Validation statistics
+    # Line item quantities
+    total_quantity = db.Column(db.Integer, default=0)
+    delivered_quantity = db.Column(db.Integer, default=0)
+
+    # Validation statistics (latest validation per order)
     validated_orders = db.Column(db.Integer, default=0)
     valid_grns = db.Column(db.Integer, default=0)
     invalid_grns = db.Column(db.Integer, default=0)
@@ -260,9 +519,11 @@ class DashboardStats(db.Model):
     documents_detected = db.Column(db.Integer, default=0)
     no_documents_detected = db.Column(db.Integer, default=0)
 
-    # Average scores
+    # Average scores (sums are kept so ranges and incremental updates stay exact)
     avg_confidence_score = db.Column(db.Float, default=0.0)
     avg_processing_time = db.Column(db.Float, default=0.0)
+    confidence_score_sum = db.Column(db.Float, default=0.0)
+    processing_time_sum = db.Column(db.Float, default=0.0)
 
     # Timestamps
     last_updated = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
@@ -273,28 +534,38 @@ class DashboardStats(db.Model):
     def to_dict(self):
         return {
             'date': self.date.isoformat() if self.date else None,
-            'total_orders': self.total_orders,
-            'completed_orders': self.completed_orders,
-            'pending_orders': self.pending_orders,
-            'validated_orders': self.validated_orders,
-            'valid_grns': self.valid_grns,
-            'invalid_grns': self.invalid_grns,
-            'grns_with_issues': self.grns_with_issues,
-            'total_gtins_verified': self.total_gtins_verified,
-            'gtins_matched': self.gtins_matched,
-            'documents_detected': self.documents_detected,
-            'no_documents_detected': self.no_documents_detected,
-            'avg_confidence_score': self.avg_confidence_score,
-            'avg_processing_time': self.avg_processing_time,
+            'total_orders': self.total_orders or 0,
+            'completed_orders': self.completed_orders or 0,
+            'pending_orders': self.pending_orders or 0,
+            'cancelled_orders': self.cancelled_orders or 0,
+            'partially_delivered_orders': self.partially_delivered_orders or 0,
+            'status_totals': json.loads(self.status_totals) if self.status_totals else {},
+            'total_quantity': self.total_quantity or 0,
+            'delivered_quantity': self.delivered_quantity or 0,
+            'validated_orders': self.validated_orders or 0,
+            'valid_grns': self.valid_grns or 0,
+            'invalid_grns': self.invalid_grns or 0,
+            'grns_with_issues': self.grns_with_issues or 0,
+            'total_gtins_verified': self.total_gtins_verified or 0,
+            'gtins_matched': self.gtins_matched or 0,
+            'documents_detected': self.documents_detected or 0,
+            'no_documents_detected': self.no_documents_detected or 0,
+            'avg_confidence_score': self.avg_confidence_score or 0.0,
+            'avg_processing_time': self.avg_processing_time or 0.0,
             'last_updated': self.last_updated.isoformat() if self.last_updated else None
         }
 
 class Tour(db.Model):
     __tablename__ = 'tours'
+    __table_args__ = (
+        # Tours page: tours of a day range, in tour number order
+        db.Index('ix_tours_tour_day_tour_number', 'tour_day', 'tour_number'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     tour_id = db.Column(db.String(255), unique=True, nullable=False, index=True)  # Full tour ID
     tour_date = db.Column(db.String(20), nullable=False, index=True)  # Parsed date from tour ID
+    tour_day = db.Column(db.Date)  # Day of tour_date, for range filters (kept in step with tour_date)
     tour_plan_id = db.Column(db.String(100), nullable=False, index=True)  # Parsed plan ID
     tour_name = db.Column(db.String(50), nullable=False)  # Parsed tour name
     tour_number = db.Column(db.Integer, nullable=False, index=True)  # Extracted number for sorting
@@ -313,6 +584,7 @@ class Tour(db.Model):
     completed_orders = db.Column(db.Integer, default=0)
     cancelled_orders = db.Column(db.Integer, default=0)
     pending_orders = db.Column(db.Integer, default=0)
+    waiting_orders = db.Column(db.Integer, default=0)  # Orders still WAITING (all waiting -> tour WAITING)
 
     # Tour status (WAITING, ONGOING, CANCELLED, COMPLETED)
     tour_status = db.Column(db.String(20), default='WAITING')
@@ -356,6 +628,7 @@ class Tour(db.Model):
             'completed_orders': self.completed_orders,
             'cancelled_orders': self.cancelled_orders,
             'pending_orders': self.pending_orders,
+            'waiting_orders': self.waiting_orders,
             'tour_status': self.tour_status,
             'cancellation_reason': self.cancellation_reason,
             'delivery_cities': json.loads(self.delivery_cities) if self.delivery_cities else [],
@@ -394,4 +667,26 @@ class Tour(db.Model):
 
             return tour_date, plan_id, tour_name, tour_number
         except Exception:
-            return None, None, None, None
\ No newline at end of file
+            return None, None, None, None
+
+    @staticmethod
+    def parse_tour_day(tour_date):
+        """Day of a parsed tour date like '2024-09-23-21-15-02', or None"""
+        try:
+            return datetime.strptime(tour_date[:10], '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            return None
+
+
+@event.listens_for(Order.tour_date, 'set')
+@event.listens_for(Tour.tour_date, 'set')
+def _set_tour_day(target, value, oldvalue, initiator):
+    """Keep tour_day in step with tour_date on every ORM assignment (bulk upserts set both columns)"""
+    target.tour_day = Tour.parse_tour_day(value)
+
+
+@event.listens_for(Order.custom_fields, 'set')
+def _set_custom_field_columns(target, value, oldvalue, initiator):
+    """Keep the extracted custom field columns in step with custom_fields on every ORM assignment"""
+    for column, column_value in Order.custom_field_columns(value).items():
+        setattr(target, column, column_value)
@@ -0,0 +1,70 @@
+"""
+Order Test Fixtures
+Locus API order payloads and a database-backed TestCase shared by the order merge and tour tests
+"""
+
+import unittest
+from datetime import date
+from app import create_app
+from app.order_merge import order_merge_service
+from app.tours import tour_service
+from models import db
+
+CLIENT_ID = 'illa-frontdoor'
+ORDER_DATE = date(2025, 1, 3)
+TOUR_DATE = '2025-01-02-21-15-02'
+
+
+def tour_id(number, tour_date=TOUR_DATE):
+    return f'{tour_date}*plan1*tour-{number}'
+
+
+def make_order(order_id, tour_number=1, status='COMPLETED', city='Cairo', area=None, company='Acme',
+               rider=None, vehicle=None, tour_date=TOUR_DATE, items=2):
+    """Locus order on tour ``tour_number`` of ``tour_date``; the rider defaults to "Rider <tour_number>"."""
+    rider = rider or f'Rider {tour_number}'
+    day = tour_date[:10]
+    return {
+        'id': order_id,
+        'orderStatus': status,
+        'location': {
+            'name': area or f'Store {order_id}',
+            'address': {'formattedAddress': '1 Nile St', 'city': city, 'countryCode': 'EG'},
+            'latLng': {'lat': 30.05, 'lng': 31.23}
+        },
+        'orderMetadata': {
+            'tourDetail': {'tourId': tour_id(tour_number, tour_date), 'riderName': rider,
+                           'vehicleRegistrationNumber': vehicle or f'VEH-{rider.split()[-1]}',
+                           'tourStartTime': f'{day}T09:00:00Z', 'tourEndTime': f'{day}T17:30:00Z'}
+        },
+        'custom_fields': {'Company_Owner': company},
+        'lineItems': [
+            {'skuId': f'SKU-{i}', 'name': f'Item {i}', 'quantity': 5, 'quantityUnit': 'PIECES', 'transactedQuantity': 5}
+            for i in range(items)
+        ]
+    }
+
+
+class OrderTestCase(unittest.TestCase):
+    """Fresh testing app and in-memory database per test"""
+    order_date = ORDER_DATE
+
+    def setUp(self):
+        self.app = create_app('testing')
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def _merge(self, *orders):
+        """Merge the orders for ``order_date`` and commit; returns the merge stats"""
+        stats = order_merge_service.merge_orders(list(orders), CLIENT_ID, self.order_date)
+        db.session.commit()
+        return stats
+
+    def _tour_numbers(self, **filters):
+        return sorted(tour['tour_number'] for tour in tour_service.get_tours(**filters)['tours'])
@@ -662,6 +662,20 @@ class EnhancedFilters {
                 orderMetadata = orderData.orderMetadata || {};
                 tourDetail = orderMetadata.tourDetail || {};
                 lineItems = orderMetadata.lineItems || [];
+            } else {
+                // List projection: no raw_data, build the card from columns and the line item preview
+                location = {
+                    name: order.location_name,
+                    address: {
+                        city: order.location_city,
+                        formattedAddress: order.location_address
+                    }
+                };
+                tourDetail = {
+                    riderName: order.rider_name,
+                    vehicleRegistrationNumber: order.vehicle_registration
+                };
+                lineItems = order.line_items_preview || [];
             }
         } catch (e) {
             console.warn('Could not parse order raw_data:', e);
@@ -679,6 +693,9 @@ class EnhancedFilters {
             };
         }
 
+        // Full count may exceed the preview when orders come from the list projection
+        const lineItemCount = order.line_item_count ?? lineItems.length;
+
         return `
             <div class="order-card clickable-card hover-glow slide-in-left"
                  onclick="viewOrderDetail('${order.id}', '${this.getCurrentDate()}')"
@@ -776,9 +793,9 @@ class EnhancedFilters {
                     ` : ''}
 
                     <!-- Enhanced Line Items Summary -->
-                    ${lineItems.length > 0 ? `
+                    ${lineItemCount > 0 ? `
                         <div class="order-meta-section">
-                            <h6><i class="fas fa-list"></i>Items (${lineItems.length})</h6>
+                            <h6><i class="fas fa-list"></i>Items (${lineItemCount})</h6>
                             <div class="items-preview">
                                 <div class="items-list">
                                     ${lineItems.slice(0, 3).map(item => `
@@ -787,9 +804,9 @@ class EnhancedFilters {
                                             <span class="item-quantity">${item.transactionStatus?.transactedQuantity || item.quantity || 0}x</span>
                                         </div>
                                     `).join('')}
-                                    ${lineItems.length > 3 ? `
+                                    ${lineItemCount > 3 ? `
                                         <div class="text-center mt-2">
-                                            <small class="text-muted">+ ${lineItems.length - 3} more items</small>
+                                            <small class="text-muted">+ ${lineItemCount - 3} more items</small>
                                         </div>
                                     ` : ''}
                                 </div>
@@ -0,0 +1,98 @@
+import unittest
+import json
+from datetime import date
+from app.auth import LocusAuth
+from app.cache import result_cache
+from app.order_merge import order_merge_service
+from models import db, Order, OrderLineItem
+from order_fixtures import CLIENT_ID, OrderTestCase, make_order
+
+class BulkOrderMergeTestCase(OrderTestCase):
+    order_date = date(2025, 1, 1)
+
+    def setUp(self):
+        super().setUp()
+        self.auth = LocusAuth()
+
+    def test_inserts_new_orders_with_line_items(self):
+        """New orders and their line items are written in bulk"""
+        stats = self._merge(make_order('o1'), make_order('o2', items=3))
+
+        self.assertEqual(stats['added'], 2)
+        self.assertEqual(stats['updated'], 0)
+        self.assertIn('rows_per_second', stats)
+        order = db.session.get(Order, 'o1')
+        self.assertEqual(order.location_city, 'Cairo')
+        self.assertEqual(order.tour_name, 'tour-1')
+        self.assertEqual(order.rider_name, 'Rider 1')
+        self.assertEqual(OrderLineItem.query.filter_by(order_id='o2').count(), 3)
+
+    def test_updates_existing_orders_and_replaces_line_items(self):
+        """Re-merging updates columns in place and replaces line items"""
+        self.auth.cache_orders_to_database({'orders': [make_order('o1')]}, CLIENT_ID, '2025-01-01')
+        self.auth.smart_merge_orders_to_database({'orders': [make_order('o1', status='CANCELLED', city='Giza', items=1)]}, CLIENT_ID, '2025-01-01')
+
+        order = db.session.get(Order, 'o1')
+        self.assertEqual(order.order_status, 'CANCELLED')
+        self.assertEqual(order.location_city, 'Giza')
+        self.assertEqual(OrderLineItem.query.filter_by(order_id='o1').count(), 1)
+        self.assertEqual(Order.query.count(), 1)
+
+    def test_protected_fields_survive_merge(self):
+        """Manually modified fields and line items are not overwritten by the API"""
+        self.auth.cache_orders_to_database({'orders': [make_order('o1'), make_order('o2')]}, CLIENT_ID, '2025-01-01')
+        order = db.session.get(Order, 'o1')
+        order.order_status = 'COMPLETED_MANUALLY'
+        order.is_modified = True
+        order.modified_fields = json.dumps(['order_status', 'line_items'])
+        db.session.commit()
+
+        stats = self._merge(make_order('o1', status='CANCELLED', city='Giza', items=1), make_order('o2', status='CANCELLED'))
+
+        self.assertEqual(stats['protected'], 1)
+        protected = db.session.get(Order, 'o1')
+        self.assertEqual(protected.order_status, 'COMPLETED_MANUALLY')
+        self.assertEqual(protected.location_city, 'Giza')
+        self.assertEqual(OrderLineItem.query.filter_by(order_id='o1').count(), 2)
+        self.assertEqual(db.session.get(Order, 'o2').order_status, 'CANCELLED')
+
+    def test_modified_orders_without_recorded_fields_still_go_through_data_protection(self):
+        """is_modified orders take the per-order path even when modified_fields is empty"""
+        self.auth.cache_orders_to_database({'orders': [make_order('o1'), make_order('o2')]}, CLIENT_ID, '2025-01-01')
+        for modified_fields in (None, '[]'):
+            order = db.session.get(Order, 'o1')
+            order.is_modified = True
+            order.modified_fields = modified_fields
+            db.session.commit()
+
+            stats = self._merge(make_order('o1', status='CANCELLED'), make_order('o2'))
+            self.assertEqual((stats['protected'], stats['updated']), (1, 1))
+            self.assertEqual(db.session.get(Order, 'o1').order_status, 'CANCELLED')
+
+    def test_bad_orders_are_skipped_without_losing_the_batch(self):
+        """An order that cannot be mapped or written is skipped; the rest of the day is committed"""
+        unmappable = dict(make_order('o2'), lineItems=[None])
+        no_status = {'id': 'o3', 'custom_fields': {}}
+        self.assertTrue(self.auth.cache_orders_to_database({'orders': [make_order('o1'), unmappable, no_status, make_order('o4')]},
+                                                           CLIENT_ID, '2025-01-01'))
+
+        self.assertEqual(sorted(order.id for order in Order.query.all()), ['o1', 'o4'])
+        self.assertEqual(OrderLineItem.query.count(), 4)
+        stats = order_merge_service.merge_orders([make_order('o1'), no_status], CLIENT_ID, self.order_date)
+        self.assertEqual((stats['updated'], stats['failed']), (1, 1))
+
+    def test_filter_cache_is_invalidated_when_the_merge_commits(self):
+        """Cached results of the day stay until the merge is committed, and survive a rolled back merge"""
+        result_cache.set('filters:day', {'orders': []}, tags=['date:2025-01-02'])
+        order_merge_service.merge_orders([make_order('o1')], CLIENT_ID, date(2025, 1, 2))
+        self.assertIsNotNone(result_cache.get('filters:day'))
+        db.session.rollback()
+        db.session.commit()
+        self.assertIsNotNone(result_cache.get('filters:day'))
+
+        order_merge_service.merge_orders([make_order('o1')], CLIENT_ID, date(2025, 1, 2))
+        db.session.commit()
+        self.assertIsNone(result_cache.get('filters:day'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+from app.data_protection import data_protection_service
+from app.tours import tour_service
+from migrations.add_order_company_owner import backfill_custom_field_columns
+from models import db, Order
+from order_fixtures import CLIENT_ID, OrderTestCase, make_order
+
+class CompanyOwnerTestCase(OrderTestCase):
+    def test_company_owner_is_extracted_at_ingest(self):
+        self.assertEqual(Order.custom_field_columns('{"Company_Owner": "  Acme "}'), {'company_owner': 'Acme'})
+        self.assertEqual(Order.custom_field_columns({'Company_Owner': ''}), {'company_owner': None})
+        self.assertEqual(Order.custom_field_columns('not json'), {'company_owner': None})
+        self.assertEqual(Order.custom_field_columns(None), {'company_owner': None})
+
+        self._merge(make_order('o1', 1), {'id': 'o2', 'orderStatus': 'COMPLETED', 'custom_fields': 'bad'})
+        self.assertEqual(db.session.get(Order, 'o1').company_owner, 'Acme')
+        self.assertIsNone(db.session.get(Order, 'o2').company_owner)
+
+        # Payloads without custom fields leave the column alone
+        self._merge({'id': 'o1', 'orderStatus': 'COMPLETED'})
+        self.assertEqual(db.session.get(Order, 'o1').company_owner, 'Acme')
+
+        # Protected orders go through safe_update_order, which assigns custom_fields on the ORM object
+        order = db.session.get(Order, 'o1')
+        order.is_modified, order.modified_fields = True, '["order_status"]'
+        db.session.commit()
+        self._merge(make_order('o1', 1, company='Globex'))
+        self.assertEqual(db.session.get(Order, 'o1').company_owner, 'Globex')
+
+        order.modified_fields = '["custom_fields"]'
+        db.session.commit()
+        data_protection_service.safe_update_order(order, make_order('o1', 1, company='Initech'), CLIENT_ID, self.order_date)
+        self.assertEqual(order.company_owner, 'Globex')
+
+    def test_company_filters_use_the_extracted_column(self):
+        self._merge(make_order('o1', 1), make_order('o2', 2, company='Globex'), make_order('o3', 2),
+                    make_order('o4', 3, company='Acme Foods'), make_order('o5', 4, tour_date='2025-01-05-08-00-00'))
+
+        self.assertEqual(tour_service.get_filter_options(date='2025-01-02')['companies'], ['Acme', 'Acme Foods', 'Globex'])
+        self.assertEqual(tour_service.get_filter_options(date='2025-01-05')['companies'], ['Acme'])
+
+        # Exact company, without duplicate tours for tours with several of its orders
+        self.assertEqual(self._tour_numbers(company_owner='Acme'), [1, 2, 4])
+        self.assertEqual(self._tour_numbers(company_owner='Acme', date='2025-01-02'), [1, 2])
+        self.assertEqual(self._tour_numbers(company_owner='Globex', date_from='2025-01-04'), [])
+        self.assertEqual(self._tour_numbers(search='foods'), [3])
+
+    def test_migration_backfills_existing_orders(self):
+        self._merge(make_order('o1', 1), make_order('o2', 2, company='Globex'))
+        Order.query.update({'company_owner': None})
+        db.session.commit()
+
+        with db.engine.begin() as connection:
+            self.assertEqual(backfill_custom_field_columns(connection), 2)
+            self.assertEqual(backfill_custom_field_columns(connection), 0)
+        self.assertEqual(db.session.query(Order.company_owner).order_by(Order.id).all(), [('Acme',), ('Globex',)])
+
+if __name__ == '__main__':
+    unittest.main()
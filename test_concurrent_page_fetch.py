@@ -0,0 +1,98 @@
+import unittest
+import threading
+import time
+from unittest.mock import MagicMock, patch
+from app.auth import LocusAuth
+from app.config import Config
+
+class ConcurrentPageFetchTestCase(unittest.TestCase):
+    def setUp(self):
+        """Create an auth client with a small worker pool"""
+        self.auth = LocusAuth(Config)
+        self.auth.page_fetch_workers = 4
+        self.auth.page_fetch_retries = 2
+
+    def test_pages_returned_in_order(self):
+        """Pages finishing out of order are reassembled in page order"""
+        def get_page(page_num):
+            time.sleep(0.01 * (10 - page_num))
+            return {'orders': [{'id': f'order-{page_num}'}]}
+
+        results = self.auth._fetch_pages_concurrently(get_page, range(2, 10))
+        self.assertEqual([page_num for page_num, _ in results], list(range(2, 10)))
+        self.assertEqual(results[0][1]['orders'][0]['id'], 'order-2')
+
+    def test_failed_page_retried_without_dropping_later_pages(self):
+        """A page that fails once is retried and later pages are still fetched"""
+        attempts = {}
+        lock = threading.Lock()
+
+        def get_page(page_num):
+            with lock:
+                attempts[page_num] = attempts.get(page_num, 0) + 1
+                if page_num == 3 and attempts[page_num] == 1:
+                    return None
+            return {'orders': [{'id': f'order-{page_num}'}]}
+
+        results = self.auth._fetch_pages_concurrently(get_page, range(2, 7))
+        self.assertTrue(all(page_data for _, page_data in results))
+        self.assertEqual(attempts[3], 2)
+        self.assertEqual(len(results), 5)
+
+    def test_page_failing_all_retries_is_reported(self):
+        """A page that never succeeds comes back as None after all retries"""
+        def get_page(page_num):
+            if page_num == 4:
+                raise ConnectionError('stub failure')
+            return {'orders': []}
+
+        results = dict(self.auth._fetch_pages_concurrently(get_page, range(2, 6)))
+        self.assertIsNone(results[4])
+        self.assertIsNotNone(results[5])
+
+    def test_get_orders_reports_failed_pages_and_retries_pages_once(self):
+        """pagesFetched leaves out failed pages, which are retried by the page loop only"""
+        calls = []
+
+        def post(url, headers=None, json=None, retries=None, **kwargs):
+            calls.append((json['page'], retries))
+            response = MagicMock(status_code=200 if json['page'] != 3 else 503)
+            response.json.return_value = {'tasks': [], 'paginationInfo': {'numberOfPages': 4, 'total': 0}}
+            return response
+
+        with patch('app.auth.http_client.post', side_effect=post):
+            result = self.auth.get_orders('token', date='2025-01-01', fetch_all=True, force_refresh=True)
+
+        self.assertEqual((result['pagesFetched'], result['failedPages']), (3, [3]))
+        self.assertEqual([retries for page, retries in calls if page == 1], [None])
+        self.assertEqual([retries for page, retries in calls if page == 3], [0, 0, 0])
+
+    def test_header_cache_is_bounded(self):
+        """Only the most recently used tokens keep their header dicts"""
+        first = self.auth._bearer_headers('token-0')
+        for n in range(1, 100):
+            self.auth._bearer_headers(f'token-{n}')
+        self.assertLessEqual(len(self.auth._headers_cache), 32)
+        self.assertIs(self.auth._bearer_headers('token-99'), self.auth._bearer_headers('token-99'))
+        self.assertIsNot(self.auth._bearer_headers('token-0'), first)
+
+    def test_worker_pool_is_bounded(self):
+        """No more than page_fetch_workers pages are in flight at once"""
+        in_flight = [0]
+        peak = [0]
+        lock = threading.Lock()
+
+        def get_page(page_num):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            time.sleep(0.02)
+            with lock:
+                in_flight[0] -= 1
+            return {'orders': []}
+
+        self.auth._fetch_pages_concurrently(get_page, range(2, 20))
+        self.assertLessEqual(peak[0], 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+import json
+import unittest
+from datetime import date, datetime, timedelta, timezone
+from app import create_app
+from app.dashboard_stats import dashboard_stats_service
+from app.filters import filter_service
+from app.order_merge import order_merge_service
+from app.validators import GoogleAIValidator
+from models import db, DashboardStats, Order, OrderLineItem, ValidationResult
+
+class DashboardStatsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        filter_service._filter_cache.clear()
+
+        statuses = ['COMPLETED', 'CANCELLED', 'EXECUTING', 'COMPLETED']
+        created = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        for i in range(12):
+            order_id = f'order-{i:02d}'
+            db.session.add(Order(
+                id=order_id,
+                client_id='illa-frontdoor',
+                date=date(2025, 1, 1) + timedelta(days=i % 2),
+                order_status=statuses[i % 4],
+                partially_delivered=(i == 0),
+                created_at=created + timedelta(minutes=i)
+            ))
+            db.session.add(OrderLineItem(order_id=order_id, sku_id='SKU1', name='Item', quantity=10, transacted_quantity=8))
+
+        # order-00: an older invalid validation superseded by a valid one
+        db.session.add(ValidationResult(order_id='order-00', grn_image_url='a', is_valid=False, has_document=True,
+                                        confidence_score=0.2, processing_time=1.0, discrepancies='["x"]',
+                                        validation_date=datetime(2025, 1, 2, 8)))
+        db.session.add(ValidationResult(order_id='order-00', grn_image_url='b', is_valid=True, has_document=True,
+                                        confidence_score=0.9, processing_time=3.0, discrepancies='[]',
+                                        gtin_verification=json.dumps([{'gs1_verified': True, 'name_match': True},
+                                                                      {'gs1_verified': True, 'name_match': False}]),
+                                        validation_date=datetime(2025, 1, 2, 9)))
+        db.session.add(ValidationResult(order_id='order-02', grn_image_url='c', is_valid=False, has_document=False,
+                                        confidence_score=0.5, processing_time=2.0, discrepancies='["missing"]',
+                                        validation_date=datetime(2025, 1, 2, 9)))
+        db.session.commit()
+
+    def tearDown(self):
+        filter_service._filter_cache.clear()
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def _stats(self, day):
+        return DashboardStats.query.filter_by(date=day).first()
+
+    def test_backfill_builds_day_rows(self):
+        """Backfill aggregates order and latest-validation counters per day"""
+        self.assertEqual(dashboard_stats_service.backfill(), 2)
+        db.session.commit()
+
+        stats = self._stats(date(2025, 1, 1))
+        self.assertEqual(stats.total_orders, 6)
+        self.assertEqual(stats.completed_orders, 3)
+        self.assertEqual(stats.pending_orders, 3)
+        self.assertEqual(stats.partially_delivered_orders, 1)
+        self.assertEqual(json.loads(stats.status_totals), {'COMPLETED': 3, 'EXECUTING': 3})
+        self.assertEqual((stats.total_quantity, stats.delivered_quantity), (60, 48))
+        self.assertEqual((stats.validated_orders, stats.valid_grns, stats.invalid_grns), (2, 1, 1))
+        self.assertEqual((stats.grns_with_issues, stats.documents_detected, stats.no_documents_detected), (1, 1, 1))
+        self.assertEqual((stats.total_gtins_verified, stats.gtins_matched), (2, 1))
+        self.assertAlmostEqual(stats.avg_confidence_score, 0.7)
+        self.assertAlmostEqual(stats.avg_processing_time, 2.5)
+
+    def test_range_summary_sums_day_rows(self):
+        """Range summaries fill missing days on first use and sum the rows"""
+        summary = dashboard_stats_service.get_range_summary('2025-01-01', '2025-01-03')
+        self.assertTrue(summary['success'])
+        self.assertEqual(summary['days'], 3)
+        self.assertEqual(summary['total_orders'], 12)
+        self.assertEqual(summary['status_totals'], {'COMPLETED': 6, 'CANCELLED': 3, 'EXECUTING': 3})
+        self.assertEqual(summary['validated_orders'], 2)
+        self.assertEqual(summary['completion_rate'], 50.0)
+
+    def test_filter_totals_from_stats_match_group_by(self):
+        """Date-only filters take their totals from dashboard_stats with the same result as the GROUP BY"""
+        filters = {'date_from': '2025-01-01', 'date_to': '2025-01-02', 'page': 1, 'per_page': 5}
+        for extra in ({}, {'order_status': 'COMPLETED'}):
+            filter_service._filter_cache.clear()
+            stats_result = filter_service.apply_filters(dict(filters, **extra), dict(self.app.config, FILTER_TOTALS_SOURCE='stats'))
+            filter_service._filter_cache.clear()
+            query_result = filter_service.apply_filters(dict(filters, **extra), dict(self.app.config, FILTER_TOTALS_SOURCE='query'))
+            self.assertEqual(stats_result['total_count'], query_result['total_count'])
+            self.assertEqual(stats_result['status_totals'], query_result['status_totals'])
+            self.assertEqual(stats_result['day_totals'], query_result['day_totals'])
+            self.assertEqual([o['id'] for o in stats_result['orders']], [o['id'] for o in query_result['orders']])
+
+    def test_merge_refreshes_order_counters(self):
+        """Merging orders updates the day's status totals in the same transaction"""
+        dashboard_stats_service.backfill()
+        db.session.commit()
+
+        order_merge_service.merge_orders([
+            {'id': 'order-01', 'orderStatus': 'COMPLETED'},
+            {'id': 'order-new', 'orderStatus': 'CANCELLED'}
+        ], 'illa-frontdoor', date(2025, 1, 2))
+        db.session.commit()
+
+        stats = self._stats(date(2025, 1, 2))
+        self.assertEqual(stats.total_orders, 7)
+        self.assertEqual(json.loads(stats.status_totals), {'COMPLETED': 4, 'CANCELLED': 3})
+
+    def test_store_validation_applies_delta(self):
+        """Storing a validation replaces the order's previous contribution"""
+        dashboard_stats_service.backfill()
+        db.session.commit()
+
+        validator = GoogleAIValidator()
+        # order-02 was invalid without a document; the new validation is valid with a document
+        validator.store_validation_result('order-02', 'c', {
+            'is_valid': True, 'confidence_score': 0.8, 'discrepancies': [],
+            'validation_data': {'has_document': True, 'extracted_items': []}
+        }, 4.0)
+
+        stats = self._stats(date(2025, 1, 1))
+        self.assertEqual((stats.validated_orders, stats.valid_grns, stats.invalid_grns), (2, 2, 0))
+        self.assertEqual((stats.grns_with_issues, stats.documents_detected, stats.no_documents_detected), (0, 2, 0))
+        self.assertAlmostEqual(stats.avg_confidence_score, 0.85)
+        self.assertAlmostEqual(stats.avg_processing_time, 3.5)
+
+        # Same counters as a full rebuild
+        dashboard_stats_service.recompute_days([date(2025, 1, 1)])
+        rebuilt = self._stats(date(2025, 1, 1))
+        self.assertEqual((rebuilt.validated_orders, rebuilt.valid_grns, rebuilt.invalid_grns), (2, 2, 0))
+
+    def test_validation_deltas_are_applied_atomically(self):
+        """A delta lands on the stored counters even when another worker changed the row after it was loaded"""
+        dashboard_stats_service.backfill()
+        db.session.commit()
+        stats = self._stats(date(2025, 1, 1))
+        self.assertEqual(stats.validated_orders, 2)
+
+        # Another worker's delta, committed behind this session's loaded row
+        empty = dashboard_stats_service.validation_contribution(None)
+        with db.engine.begin() as connection:
+            connection.execute(DashboardStats.__table__.update().where(DashboardStats.date == date(2025, 1, 1))
+                               .values(validated_orders=DashboardStats.validated_orders + 1))
+
+        added = dict(empty, validated_orders=1, valid_grns=1, confidence_score_sum=1.0)
+        dashboard_stats_service.apply_validation_change('order-04', empty, added)
+        db.session.commit()
+        stats = self._stats(date(2025, 1, 1))
+        self.assertEqual((stats.validated_orders, stats.valid_grns), (4, 2))
+        self.assertAlmostEqual(stats.avg_confidence_score, round((0.9 + 0.5 + 1.0) / 4, 4))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+from datetime import date, datetime, timedelta, timezone
+from app import create_app
+from app.filters import filter_service
+from models import db, Order
+
+class FilterPaginationTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        filter_service._filter_cache.clear()
+
+        created = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        statuses = ['COMPLETED', 'CANCELLED', 'EXECUTING']
+        for i in range(23):
+            db.session.add(Order(
+                id=f'order-{i:02d}',
+                client_id='illa-frontdoor',
+                date=date(2025, 1, 1) + timedelta(days=i % 3),
+                order_status=statuses[i % 3] if i % 4 else 'COMPLETED',
+                created_at=created + timedelta(minutes=i)
+            ))
+        db.session.commit()
+
+    def tearDown(self):
+        filter_service._filter_cache.clear()
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def _filter(self, mode, **filters):
+        filters_data = dict({'pagination_mode': mode, 'page': 1, 'per_page': 10}, **filters)
+        return filter_service.apply_filters(filters_data, self.app.config)
+
+    def test_database_mode_matches_memory_mode(self):
+        """Pages, totals and per-day breakdowns agree between both modes"""
+        for page in (1, 2, 3):
+            db_result = self._filter('database', page=page)
+            memory_result = self._filter('memory', page=page)
+            self.assertTrue(db_result['success'])
+            self.assertEqual([o['id'] for o in db_result['orders']], [o['id'] for o in memory_result['orders']])
+            self.assertEqual(db_result['total_count'], memory_result['total_count'])
+            self.assertEqual(db_result['total_pages'], memory_result['total_pages'])
+            self.assertEqual(db_result['status_totals'], memory_result['status_totals'])
+            self.assertEqual(db_result['day_totals'], memory_result['day_totals'])
+
+    def test_database_mode_returns_only_the_page(self):
+        """Only per_page orders are materialised and no full result list is kept"""
+        result = self._filter('database', page=3)
+        self.assertEqual(len(result['orders']), 3)
+        self.assertEqual(result['total_count'], 23)
+        self.assertNotIn('full_orders', result)
+
+    def test_status_filter_totals(self):
+        """Totals reflect the filtered set, not the whole table"""
+        result = self._filter('database', order_status='CANCELLED')
+        self.assertEqual(set(result['status_totals']), {'CANCELLED'})
+        self.assertEqual(result['total_count'], sum(day['total_orders'] for day in result['day_totals'].values()))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import json
+import re
+import unittest
+from unittest.mock import patch
+from app import create_app
+from app.validators import GoogleAIValidator
+from models import db, ValidationResult
+
+def make_order(order_id):
+    return {'id': order_id, 'lineItems': [{'id': f'SKU-{order_id}', 'name': 'Juice 1L', 'quantity': 2, 'quantityUnit': 'box'}]}
+
+def make_answer(order_id):
+    return {
+        'has_document': True,
+        'validation_result': 'VALID',
+        'confidence_score': 0.9,
+        'extracted_items': [{'extracted_sku': f'SKU-{order_id}', 'extracted_name': 'Juice 1L', 'extracted_quantity': '2',
+                             'extracted_unit': 'box', 'matched_order_sku': f'SKU-{order_id}', 'match_method': 'SKU_MATCH',
+                             'status': 'MATCHED'}],
+        'discrepancies': [],
+        'summary': {'total_items_expected': 1, 'total_items_found': 1}
+    }
+
+class StubResponse:
+    def __init__(self, text):
+        self.status_code = 200
+        self._body = {'candidates': [{'content': {'parts': [{'text': text}]}}]}
+        self.text = json.dumps(self._body)
+        self.content = self.text.encode()
+        self.headers = {}
+
+    def json(self):
+        return self._body
+
+class GeminiBatchingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        self.validator = GoogleAIValidator()
+        self.validator.api_key = 'test-key'
+        self.validator.download_image = lambda url: ('aW1hZ2U=', 'jpeg')
+        self.validator.gs1_validator.lookup_product_info = lambda gtin: None
+        self.payloads = []
+        self.drop = set()
+        self.raw_answer = None
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def _post(self, url, **kwargs):
+        payload = kwargs['json']
+        self.payloads.append(payload)
+        text = ''.join(part.get('text', '') for part in payload['contents'][0]['parts'])
+        refs = re.findall(r'order_ref: "([^"]+)"', text)
+        if self.raw_answer is not None and refs:
+            return StubResponse(self.raw_answer)
+        if refs:
+            orders = [dict(make_answer(ref), order_ref=ref) for ref in refs if ref not in self.drop]
+            return StubResponse(json.dumps({'orders': orders}))
+        sku = re.search(r'"sku_id": "SKU-([^"]+)"', text).group(1)
+        return StubResponse(json.dumps(make_answer(sku)))
+
+    def _validate(self, order_ids):
+        orders = [(make_order(order_id), f'https://example.com/{order_id}.jpg') for order_id in order_ids]
+        with patch('app.validators.http_client.post', side_effect=self._post):
+            return self.validator.validate_grn_batch(orders)
+
+    def test_orders_share_one_request(self):
+        results = self._validate(['o1', 'o2', 'o3'])
+
+        self.assertEqual(len(self.payloads), 1)
+        parts = self.payloads[0]['contents'][0]['parts']
+        self.assertEqual(sum('inline_data' in part for part in parts), 3)
+        self.assertTrue(all(results[order_id]['success'] and results[order_id]['is_valid'] for order_id in ('o1', 'o2', 'o3')))
+        self.assertEqual(results['o2']['batch_size'], 3)
+        self.assertEqual(ValidationResult.query.count(), 3)
+
+    def test_orders_missing_from_the_answer_are_validated_individually(self):
+        self.drop = {'o2'}
+        results = self._validate(['o1', 'o2', 'o3'])
+
+        self.assertEqual(len(self.payloads), 2)
+        self.assertNotIn('batch_size', results['o2'])
+        self.assertTrue(results['o2']['success'])
+
+    def test_unparseable_batch_falls_back_to_single_requests(self):
+        self.raw_answer = 'Sorry, I cannot help with that.'
+        results = self._validate(['o1', 'o2'])
+
+        self.assertEqual(len(self.payloads), 3)
+        self.assertTrue(all(result['success'] for result in results.values()))
+
+    def test_truncated_answer_keeps_completed_orders(self):
+        complete = json.dumps(dict(make_answer('o1'), order_ref='o1'))
+        truncated = '{"orders": [' + complete + ', {"order_ref": "o2", "has_document": tr'
+        answers = self.validator.parse_batch_response(truncated)
+        self.assertEqual(list(answers), ['o1'])
+        self.assertEqual(answers['o1']['validation_result'], 'VALID')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+import json
+import random
+import unittest
+from unittest.mock import patch
+import requests
+from app import create_app
+from app.gemini_stream import ExtractedItemsParser
+from app.validators import GoogleAIValidator
+from models import db, ValidationResult
+
+GRN_URL = 'https://example.com/grn/o1.jpg'
+
+def make_order():
+    return {'id': 'o1', 'lineItems': [{'id': f'SKU-{n}', 'name': f'Juice {n}', 'quantity': 10, 'quantityUnit': 'box'}
+                                      for n in range(4)]}
+
+def make_answer():
+    items = [{'extracted_sku': f'SKU-{n}', 'extracted_gtin': f'622100000000{n}', 'extracted_name': f'Juice {n} "1L" {{pack}}',
+              'extracted_quantity': '10' if n != 1 else '4', 'extracted_unit': 'box', 'matched_order_sku': f'SKU-{n}',
+              'match_method': 'SKU_MATCH', 'match_confidence': 0.98, 'status': 'MATCHED'} for n in range(4)]
+    items[2]['extracted_name'] = 'عَصير مانجو \\ 1L'
+    return {
+        'has_document': True,
+        'document_description': 'GRN "delivery" note',
+        'validation_result': 'VALID',
+        'confidence_score': 0.97,
+        'extracted_items': items,
+        'discrepancies': [],
+        'summary': {'total_items_expected': 4, 'total_items_found': 4}
+    }
+
+class StreamResponse:
+    """Stand-in for a streamed requests response: one SSE event per text chunk, optionally cut off"""
+    def __init__(self, chunks, cut_after=None):
+        self.status_code = 200
+        self.headers = {'content-type': 'text/event-stream'}
+        self.chunks = chunks
+        self.cut_after = cut_after
+
+    def iter_lines(self, chunk_size=None):
+        for number, chunk in enumerate(self.chunks):
+            if number == self.cut_after:
+                raise requests.exceptions.ChunkedEncodingError('Connection broken')
+            finish = {'finishReason': 'STOP'} if number == len(self.chunks) - 1 else {}
+            event = {'candidates': [dict({'content': {'parts': [{'text': chunk}]}}, **finish)]}
+            yield f"data: {json.dumps(event, ensure_ascii=False)}".encode('utf-8')
+            yield b''
+
+    def close(self):
+        pass
+
+def split(text, rng, largest=40):
+    chunks = []
+    while text:
+        size = rng.randint(1, largest)
+        chunks.append(text[:size])
+        text = text[size:]
+    return chunks
+
+class GeminiStreamingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        self.validator = GoogleAIValidator()
+        self.validator.api_key = 'test-key'
+        self.validator.download_image = lambda url: ('aW1hZ2U=', 'jpeg')
+        self.lookups = []
+        self.validator.gs1_validator.lookup_product_info = self._lookup
+        self.answer_text = '```json\n' + json.dumps(make_answer(), ensure_ascii=False, indent=2) + '\n```'
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def _lookup(self, gtin):
+        self.lookups.append(gtin)
+        return {'product_name': 'Juice 0 "1L" {pack}', 'brand_name': 'Juhayna'} if gtin.endswith('0') else None
+
+    def _validate(self, response, on_discrepancy=None):
+        with patch('app.validators.http_client.post', return_value=response) as post:
+            result = self.validator.validate_grn_against_order(make_order(), GRN_URL, on_discrepancy)
+        return result, post
+
+    def test_parser_yields_items_in_any_chunking(self):
+        expected = make_answer()
+        for seed in range(20):
+            parser = ExtractedItemsParser()
+            streamed = []
+            for chunk in split(self.answer_text, random.Random(seed), largest=7):
+                streamed.extend(parser.feed(chunk))
+            self.assertEqual(streamed, expected['extracted_items'])
+            self.assertTrue(parser.items_complete)
+
+        self.assertEqual(parser.header_fields(), {'has_document': True, 'document_description': 'GRN "delivery" note',
+                                                  'validation_result': 'VALID', 'confidence_score': 0.97})
+
+    def test_streamed_result_matches_buffered_result(self):
+        early = []
+        streamed, post = self._validate(StreamResponse(split(self.answer_text, random.Random(1))), early.append)
+        self.assertIn(':streamGenerateContent?alt=sse', post.call_args[0][0])
+        self.assertTrue(post.call_args[1]['stream'])
+        self.assertEqual(sorted(self.lookups), [f'622100000000{n}' for n in range(4)])
+
+        self.validator.streaming = False
+        with patch('app.validators.http_client.post', return_value=StreamResponse([])) as post:
+            post.return_value.headers = {}
+            post.return_value.content = b'{}'
+            post.return_value.json = lambda: {'candidates': [{'content': {'parts': [{'text': self.answer_text}]}}]}
+            buffered = self.validator.validate_grn_against_order(make_order(), GRN_URL)
+
+        self.assertEqual(streamed['validation_data'], buffered['validation_data'])
+        self.assertEqual(streamed['input_fingerprint'], buffered['input_fingerprint'])
+        self.assertEqual({d['type'] for d in early}, {'QUANTITY_MISMATCH', 'GTIN_NOT_VERIFIED'})
+        self.assertEqual(len(early), 4)
+        self.assertEqual(streamed['streaming']['items_streamed'], 4)
+        self.assertIsNotNone(streamed['streaming']['first_discrepancy_ms'])
+        self.assertFalse(streamed['streaming']['truncated'])
+
+    def test_cut_off_stream_keeps_completed_items(self):
+        text = self.answer_text
+        cut = text.index('"SKU-3"')
+        result, _ = self._validate(StreamResponse([text[:cut], text[cut:]], cut_after=1))
+
+        self.assertTrue(result['success'])
+        self.assertTrue(result['partial'])
+        self.assertFalse(result['is_valid'])
+        self.assertTrue(result['streaming']['truncated'])
+        validation_data = result['validation_data']
+        self.assertEqual([item['extracted_sku'] for item in validation_data['extracted_items']], ['SKU-0', 'SKU-1', 'SKU-2'])
+        self.assertEqual(validation_data['document_description'], 'GRN "delivery" note')
+        self.assertIn('INCOMPLETE_RESPONSE', {d['type'] for d in result['discrepancies']})
+        self.assertNotIn('MISSING_ITEM', {d['type'] for d in result['discrepancies']})
+        self.assertTrue(result['summary']['response_truncated'])
+
+        # Not stored: the order stays unvalidated and the partial answer is never reused
+        self.assertEqual(ValidationResult.query.filter_by(order_id='o1').count(), 0)
+
+    def test_non_streamed_body_from_stream_endpoint_is_still_read(self):
+        response = StreamResponse([])
+        response.headers = {'content-type': 'application/json'}
+        response.content = b'{}'
+        response.json = lambda: {'candidates': [{'content': {'parts': [{'text': self.answer_text}]}}]}
+        result, _ = self._validate(response)
+        self.assertTrue(result['success'])
+        self.assertNotIn('streaming', result)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import patch
+from app import create_app
+from app.auth import LocusAuth
+from app.data_protection import data_protection_service
+from app.grn_documents import find_grn_url, grn_document_service
+from app.order_merge import order_merge_service
+from app.validation_jobs import validation_job_service
+from app.validators import GoogleAIValidator
+from models import db, Order, ValidationResult
+
+GRN_URL = 'https://example.com/grn/o1.jpg'
+
+def make_detail(order_id, grn_url=GRN_URL):
+    proof = {'Proof Of Delivery Document': {'Proof Of Delivery Document': grn_url}} if grn_url else {}
+    return {'id': order_id, 'orderStatus': 'COMPLETED', 'orderMetadata': {'customerProofOfCompletion': proof},
+            'lineItems': [{'id': 'SKU-1', 'name': 'Juice 1L', 'quantity': 2, 'quantityUnit': 'box'}]}
+
+class GrnDocumentsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        self.order_date = date(2025, 1, 1)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def _merge(self, *orders):
+        order_merge_service.merge_orders(list(orders), 'illa-frontdoor', self.order_date)
+        db.session.commit()
+
+    def test_finds_grn_url_at_known_paths_then_anywhere_in_the_proof(self):
+        self.assertEqual(find_grn_url(make_detail('o1')), GRN_URL)
+        self.assertEqual(find_grn_url({'proofOfDelivery': {'documentUrl': GRN_URL}}), GRN_URL)
+        nested = {'orderMetadata': {'customerProofOfCompletion': {
+            'Signature': {'note': 'signed'}, 'Photos': [{'caption': 'x'}, {'url': GRN_URL}], 'Other': 'https://example.com/2'}}}
+        self.assertEqual(find_grn_url(nested), GRN_URL)
+        self.assertIsNone(find_grn_url({'orderMetadata': {'customerProofOfCompletion': {'urls': [GRN_URL]}}}))
+        self.assertIsNone(find_grn_url(make_detail('o1', grn_url=None)))
+        self.assertIsNone(find_grn_url({'orderMetadata': 'not a dict'}))
+
+    def test_ingest_stores_grn_url_and_keeps_it_across_payloads_without_one(self):
+        self._merge(make_detail('o1'), make_detail('o2', grn_url=None))
+        self.assertEqual(db.session.get(Order, 'o1').grn_url, GRN_URL)
+        self.assertIsNone(db.session.get(Order, 'o2').grn_url)
+
+        # Task-search payloads carry no proof of completion
+        self._merge({'id': 'o1', 'orderStatus': 'COMPLETED'})
+        self.assertEqual(db.session.get(Order, 'o1').grn_url, GRN_URL)
+
+        order = db.session.get(Order, 'o2')
+        order.is_modified, order.modified_fields = True, '["order_status"]'
+        db.session.commit()
+        self._merge(make_detail('o2', grn_url='https://example.com/grn/o2.jpg'))
+        self.assertEqual(db.session.get(Order, 'o2').grn_url, 'https://example.com/grn/o2.jpg')
+
+        data_protection_service.safe_update_order(order, make_detail('o2', grn_url='https://example.com/grn/o2b.jpg'),
+                                                  'illa-frontdoor', self.order_date)
+        self.assertEqual(order.grn_url, 'https://example.com/grn/o2b.jpg')
+
+    def test_candidates_are_selected_from_stored_data(self):
+        self._merge(make_detail('with-grn'), make_detail('validated'), {'id': 'unknown', 'orderStatus': 'COMPLETED'},
+                    {'id': 'checked', 'orderStatus': 'COMPLETED'}, {'id': 'stale', 'orderStatus': 'COMPLETED'},
+                    {'id': 'in-progress', 'orderStatus': 'EXECUTING'})
+        grn_document_service.record_detail('checked', make_detail('checked', grn_url=None))
+        # Not finished yet: its GRN is still to come, so the detail is not reused and the order stays a candidate
+        grn_document_service.record_detail('in-progress', dict(make_detail('in-progress', grn_url=None), orderStatus='EXECUTING'))
+        self.assertIsNone(grn_document_service.get_fresh_detail('in-progress'))
+        grn_document_service.record_detail('stale', make_detail('stale', grn_url=None))
+        Order.query.filter_by(id='stale').update({'detail_fetched_at': datetime.now(timezone.utc) - timedelta(days=1)})
+        db.session.add(ValidationResult(order_id='validated', grn_image_url=GRN_URL, is_valid=True))
+        db.session.commit()
+
+        candidates = grn_document_service.select_candidates('illa-frontdoor', self.order_date)
+        self.assertEqual(sorted(candidates['order_ids']), ['in-progress', 'stale', 'unknown', 'with-grn'])
+        self.assertEqual((candidates['with_grn'], candidates['unknown']), (2, 3))
+
+        candidates = grn_document_service.select_candidates('illa-frontdoor', self.order_date, unvalidated_only=False)
+        self.assertEqual(sorted(candidates['order_ids']), ['in-progress', 'stale', 'unknown', 'validated', 'with-grn'])
+
+        job = SimpleNamespace(date=self.order_date, validate_mode='unvalidated_only', force_reprocess=False)
+        stored_orders = {'orders': [{'id': order_id} for order_id in
+                                    ('with-grn', 'validated', 'unknown', 'checked', 'stale', 'in-progress')]}
+        with patch.object(LocusAuth, 'get_orders', return_value=stored_orders):
+            plan = validation_job_service.plan_orders(job)
+        self.assertEqual((plan['total_orders'], plan['orders_with_grn'], plan['orders_without_grn']), (6, 2, 1))
+        self.assertEqual(sorted(plan['order_ids']), ['in-progress', 'stale', 'unknown', 'with-grn'])
+
+    def test_validation_reuses_a_fresh_stored_order_detail(self):
+        self._merge({'id': 'o1', 'orderStatus': 'COMPLETED'}, {'id': 'o2', 'orderStatus': 'COMPLETED'})
+        details = {'o1': make_detail('o1'), 'o2': make_detail('o2', grn_url=None)}
+
+        with patch.object(LocusAuth, 'get_order_detail', side_effect=lambda token, client, order_id: details[order_id]) as fetch, \
+                patch.object(GoogleAIValidator, 'find_reusable_validation', return_value=None), \
+                patch.object(GoogleAIValidator, 'validate_grn_against_order',
+                             return_value={'success': True, 'is_valid': True}) as validate:
+            for _ in range(2):
+                self.assertTrue(validation_job_service.validate_order({'id': 'o1'}, '2025-01-01', False)['success'])
+                self.assertTrue(validation_job_service.validate_order({'id': 'o2'}, '2025-01-01', False)['skipped_no_grn'])
+            self.assertEqual(fetch.call_count, 2)
+            self.assertEqual(validate.call_args[0], (details['o1'], GRN_URL))
+            self.assertEqual(db.session.get(Order, 'o1').grn_url, GRN_URL)
+
+            Order.query.filter_by(id='o1').update({'detail_fetched_at': datetime.now(timezone.utc) - timedelta(days=1)})
+            db.session.commit()
+            validation_job_service.validate_order({'id': 'o1'}, '2025-01-01', False)
+            self.assertEqual(fetch.call_count, 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import io
+import base64
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from PIL import Image
+from app.image_cache import GrnImageCache, estimate_image_tokens
+
+def make_jpeg(width, height, color=(200, 30, 30)):
+    output = io.BytesIO()
+    Image.new('RGB', (width, height), color).save(output, format='JPEG', quality=95)
+    return output.getvalue()
+
+class GrnImageCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = GrnImageCache(cache_dir=self.cache_dir, max_dimension=800)
+        self.fetches = []
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def _fetcher(self, content, content_type='image/jpeg'):
+        def fetch(url):
+            self.fetches.append(url)
+            return content, content_type
+        return fetch
+
+    def test_second_request_is_served_from_disk(self):
+        fetch = self._fetcher(make_jpeg(400, 300))
+        first = self.cache.get_image('https://grn/1.jpg', fetch)
+        second = self.cache.get_image('https://grn/1.jpg', fetch)
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.fetches, ['https://grn/1.jpg'])
+        stats = self.cache.get_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['objects']), (1, 1, 1))
+
+    def test_expired_url_entries_are_downloaded_again(self):
+        self.cache.get_image('https://grn/1.jpg', self._fetcher(make_jpeg(400, 300)))
+        url_path = self.cache._url_path('https://grn/1.jpg')
+        expired = os.stat(url_path).st_mtime - self.cache.url_ttl_seconds - 60
+        os.utime(url_path, (expired, expired))
+
+        replaced = self.cache.get_image('https://grn/1.jpg', self._fetcher(make_jpeg(400, 300, color=(30, 200, 30))))
+        self.assertEqual(self.fetches, ['https://grn/1.jpg', 'https://grn/1.jpg'])
+        self.assertEqual(self.cache.get_image('https://grn/1.jpg', self._fetcher(b'')), replaced)
+        self.assertEqual(self.cache.get_stats()['objects'], 2)
+
+    def test_large_images_are_downscaled_before_upload(self):
+        content = make_jpeg(3200, 2400)
+        image_base64, image_format = self.cache.get_image('https://grn/big.jpg', self._fetcher(content))
+
+        with Image.open(io.BytesIO(base64.b64decode(image_base64))) as image:
+            self.assertEqual(image.size, (800, 600))
+        self.assertEqual(image_format, 'jpeg')
+
+        stats = self.cache.get_stats()
+        self.assertGreater(stats['bytes_saved'], 0)
+        self.assertEqual(stats['tokens_original'], estimate_image_tokens(3200, 2400))
+        self.assertLess(stats['tokens_uploaded'], stats['tokens_original'])
+
+    def test_same_content_under_two_urls_is_stored_once(self):
+        fetch = self._fetcher(make_jpeg(400, 300))
+        self.cache.get_image('https://grn/a.jpg', fetch)
+        self.cache.get_image('https://grn/b.jpg?sig=2', fetch)
+        self.assertEqual(self.cache.get_stats()['objects'], 1)
+
+    def test_lru_eviction_keeps_disk_usage_bounded(self):
+        sizes = []
+        for i in range(4):
+            self.cache.get_image(f'https://grn/{i}.jpg', self._fetcher(make_jpeg(600, 400, (i * 60, 0, 0))))
+            sizes.append(self.cache.get_stats()['disk_bytes'])
+        self.cache.max_bytes = sizes[-1] - 1  # one more object forces evictions
+
+        self.cache.get_image('https://grn/0.jpg', self._fetcher(b''))  # touch 0 so it is most recently used
+        self.cache.get_image('https://grn/new.jpg', self._fetcher(make_jpeg(600, 400, (0, 0, 255))))
+
+        stats = self.cache.get_stats()
+        self.assertLessEqual(stats['disk_bytes'], self.cache.max_bytes)
+        self.assertGreater(stats['evictions'], 0)
+        self.assertIsNotNone(self.cache.get_image('https://grn/0.jpg', self._fetcher(b''))[0])
+        self.assertEqual(self.cache.get_image('https://grn/1.jpg', self._fetcher(b'')), (None, None))
+
+    def test_index_is_rebuilt_from_disk(self):
+        self.cache.get_image('https://grn/1.jpg', self._fetcher(make_jpeg(400, 300)))
+        reopened = GrnImageCache(cache_dir=self.cache_dir, max_dimension=800)
+        self.assertIsNotNone(reopened.get_image('https://grn/1.jpg', self._fetcher(b''))[0])
+        self.assertEqual(reopened.get_stats()['objects'], 1)
+
+    def test_pdf_passes_through_unchanged(self):
+        content = b'%PDF-1.4 fake document'
+        image_base64, image_format = self.cache.get_image('https://grn/doc.pdf', self._fetcher(content, 'application/pdf'))
+        self.assertEqual((base64.b64decode(image_base64), image_format), (content, 'pdf'))
+
+    def test_concurrent_misses_share_one_download(self):
+        content = make_jpeg(400, 300)
+        started = threading.Event()
+
+        def slow_fetch(url):
+            self.fetches.append(url)
+            started.wait(0.2)
+            return content, 'image/jpeg'
+
+        threads = [threading.Thread(target=self.cache.get_image, args=('https://grn/1.jpg', slow_fetch)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        started.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.fetches), 1)
+        self.assertTrue(os.path.isdir(os.path.join(self.cache_dir, 'objects')))
+
+if __name__ == '__main__':
+    unittest.main()
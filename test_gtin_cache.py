@@ -0,0 +1,116 @@
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from app import create_app
+from app.gtin_cache import GtinCache, GtinLookupError
+from app.validators import GoogleAIValidator
+from models import db, GtinProduct
+
+PRODUCT = {'gtin': '6221234567890', 'product_name': 'Juice 1L', 'brand_name': 'Juhayna', 'verified': True}
+
+class GtinCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        self.cache = GtinCache(max_workers=4)
+        self.lookups = []
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def _lookup(self, gtin):
+        self.lookups.append(gtin)
+        return dict(PRODUCT, gtin=gtin) if gtin.startswith('622') else None
+
+    def test_found_and_not_found_answers_are_cached(self):
+        results, batch = self.cache.get_many(['6221234567890', '1111111111111'], self._lookup)
+        self.assertEqual(results['6221234567890']['product_name'], 'Juice 1L')
+        self.assertIsNone(results['1111111111111'])
+        self.assertEqual((batch['misses'], batch['lookups']), (2, 2))
+
+        results, batch = self.cache.get_many(['6221234567890', '1111111111111'], self._lookup)
+        self.assertEqual(results['6221234567890']['brand_name'], 'Juhayna')
+        self.assertEqual((batch['hits'], batch['negative_hits'], batch['lookups']), (1, 1, 0))
+        self.assertEqual(GtinCache.with_ratio(batch)['hit_ratio'], 1.0)
+        self.assertEqual(len(self.lookups), 2)
+
+    def test_expired_rows_are_refreshed(self):
+        self.cache.get('6221234567890', self._lookup)
+        row = db.session.get(GtinProduct, '6221234567890')
+        row.expires_at = datetime.now(timezone.utc) - timedelta(minutes=1)
+        db.session.commit()
+
+        _, batch = self.cache.get_many(['6221234567890'], self._lookup)
+        self.assertEqual((batch['refreshes'], batch['lookups']), (1, 1))
+        self.assertEqual(db.session.get(GtinProduct, '6221234567890').lookup_count, 2)
+
+    def test_callers_session_is_left_alone(self):
+        pending = GtinProduct(gtin='9999999999999', found=False, expires_at=datetime.now(timezone.utc))
+        db.session.add(pending)
+
+        self.cache.get_many(['6221234567890', '1111111111111'], self._lookup)
+        self.assertIn(pending, db.session.new)
+        self.assertTrue(db.session.get(GtinProduct, '6221234567890').found)
+
+    def test_failed_lookups_are_not_cached(self):
+        def failing(gtin):
+            raise GtinLookupError('GS1 API returned 503')
+
+        results, batch = self.cache.get_many(['6221234567890'], failing)
+        self.assertIsNone(results['6221234567890'])
+        self.assertEqual(batch['errors'], 1)
+        self.assertIsNone(db.session.get(GtinProduct, '6221234567890'))
+
+    def test_concurrent_requests_share_one_lookup(self):
+        release = threading.Event()
+
+        def slow_lookup(gtin):
+            self.lookups.append(gtin)
+            release.wait(1)
+            return dict(PRODUCT, gtin=gtin)
+
+        results = []
+        first = threading.Thread(target=lambda: results.append(self.cache._lookup_coalesced(['6221234567890'], slow_lookup, {})))
+        first.start()
+        while not self.cache._inflight:
+            time.sleep(0.001)
+        second = threading.Thread(target=lambda: results.append(self.cache._lookup_coalesced(['6221234567890'], slow_lookup, {})))
+        second.start()
+        deadline = time.time() + 1
+        while not self.cache.stats['coalesced'] and time.time() < deadline:
+            time.sleep(0.001)
+        release.set()
+        first.join()
+        second.join()
+
+        self.assertEqual(len(self.lookups), 1)
+        self.assertEqual(self.cache.stats['coalesced'], 1)
+        self.assertTrue(all(answer['6221234567890'][1]['gtin'] == '6221234567890' for answer in results))
+
+    def test_gtin_verification_looks_up_each_gtin_once(self):
+        validator = GoogleAIValidator()
+        validator.gs1_validator.lookup_product_info = self._lookup
+        validation_data = {
+            'validation_result': 'VALID',
+            'extracted_items': [
+                {'extracted_gtin': '6221234567890', 'extracted_name': 'Juhayna Juice 1L'},
+                {'extracted_gtin': '6221234567890', 'extracted_name': 'Juhayna Juice 1L'},
+                {'extracted_gtin': '1111111111111', 'extracted_name': 'Unknown'},
+            ],
+            'discrepancies': [],
+            'summary': {}
+        }
+
+        result = validator.enhance_with_gtin_verification(validation_data)
+        self.assertEqual(sorted(self.lookups), ['1111111111111', '6221234567890'])
+        self.assertEqual(len(result['gtin_verification']), 3)
+        self.assertEqual(result['summary']['gtins_verified'], 2)
+        self.assertTrue(any(d['type'] == 'GTIN_NOT_VERIFIED' for d in result['discrepancies']))
+
+if __name__ == '__main__':
+    unittest.main()
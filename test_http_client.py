@@ -0,0 +1,107 @@
+import unittest
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from app.http_client import HttpClient
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    fail_remaining = 0
+    retry_after = None
+    client_ports = set()
+
+    def do_GET(self):
+        StubHandler.client_ports.add(self.client_address[1])
+        if StubHandler.fail_remaining > 0:
+            StubHandler.fail_remaining -= 1
+            status = 503
+        else:
+            status = 200
+        body = b'{"ok": true}'
+        self.send_response(status)
+        self.send_header('content-type', 'application/json')
+        if status != 200 and StubHandler.retry_after is not None:
+            self.send_header('Retry-After', StubHandler.retry_after)
+        self.send_header('content-length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('content-length', 0)))
+        self.do_GET()
+
+    def log_message(self, *args):
+        pass
+
+class HttpClientTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f'http://127.0.0.1:{cls.server.server_address[1]}/'
+        cls.host = f'127.0.0.1:{cls.server.server_address[1]}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+
+    def setUp(self):
+        StubHandler.fail_remaining = 0
+        StubHandler.retry_after = None
+        StubHandler.client_ports = set()
+        self.client = HttpClient(max_retries=3, backoff_base=0.01)
+
+    def test_retries_5xx_then_succeeds(self):
+        """A 503 is retried with backoff and the retry is counted"""
+        StubHandler.fail_remaining = 2
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        metrics = self.client.get_metrics()[self.host]
+        self.assertEqual(metrics['retries'], 2)
+        self.assertEqual(metrics['requests'], 3)
+        self.assertEqual(metrics['status_codes'][503], 2)
+
+    def test_gives_up_after_max_retries(self):
+        """The last 5xx response is returned once retries are exhausted"""
+        StubHandler.fail_remaining = 10
+        response = self.client.get(self.url, retries=1)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.client.get_metrics()[self.host]['retries'], 1)
+
+    def test_retry_after_beyond_max_backoff_fails_the_attempt(self):
+        """A Retry-After longer than max_backoff is not slept on; a shorter one is honoured"""
+        self.client.max_backoff = 1
+        StubHandler.fail_remaining = 1
+        StubHandler.retry_after = '3600'
+        self.assertEqual(self.client.get(self.url).status_code, 503)
+        self.assertEqual(self.client.get_metrics()[self.host]['retries'], 0)
+
+        StubHandler.fail_remaining = 1
+        StubHandler.retry_after = '0'
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertEqual(self.client.get_metrics()[self.host]['retries'], 1)
+
+    def test_posts_are_only_retried_on_429(self):
+        """A 5xx POST may already have been processed: it is returned without a retry unless marked idempotent"""
+        StubHandler.fail_remaining = 1
+        self.assertEqual(self.client.post(self.url, json={}).status_code, 503)
+        self.assertEqual(self.client.get_metrics()[self.host]['retries'], 0)
+
+        StubHandler.fail_remaining = 1
+        self.assertEqual(self.client.post(self.url, json={}, idempotent=True).status_code, 200)
+        self.assertEqual(self.client.get_metrics()[self.host]['retries'], 1)
+
+    def test_connections_are_kept_alive(self):
+        """Sequential calls to one host reuse the same pooled connection"""
+        for _ in range(5):
+            self.client.get(self.url)
+        self.assertEqual(len(StubHandler.client_ports), 1)
+
+    def test_latency_histogram_counts_every_request(self):
+        """Each request lands in exactly one latency bucket"""
+        for _ in range(4):
+            self.client.get(self.url)
+        histogram = self.client.get_metrics()[self.host]['latency_histogram']
+        self.assertEqual(sum(histogram.values()), 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import json
+import unittest
+from datetime import datetime, timedelta, timezone
+from app import create_app
+from app.name_matcher import NameIndex, normalize_name, sku_catalogue
+from app.validators import GoogleAIValidator
+from models import db, Order, OrderLineItem, GtinProduct
+
+class NameMatcherTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        self.validator = GoogleAIValidator()
+
+    def tearDown(self):
+        sku_catalogue.configure(self.app.config)
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_normalization(self):
+        self.assertEqual(normalize_name("  أإآ ة ي Hello, World!! ًٌٍَ"), "ااا ه ى hello world")
+        self.assertEqual(self.validator.normalize_text_for_matching("عَصير  Mango-Juice"), "عصىر mango juice")
+        self.assertEqual(self.validator.extract_meaningful_words("the juice of a mango x"), {'juice', 'mango'})
+
+    def test_bilingual_match_scores_are_unchanged(self):
+        self.assertEqual(self.validator.calculate_bilingual_match(
+            "Juhayna Juice 1L", {'product_name': 'Juhayna Pure Juice 1L', 'brand_name': 'Juhayna'}),
+            (True, 0.8648648648648649))
+        self.assertEqual(self.validator.calculate_bilingual_match(
+            "Familia toilet roll", {'product_name': 'Fine toilet paper', 'brand_name': 'Fine'}),
+            (False, 0.6111111111111112))
+        self.assertEqual(self.validator.calculate_bilingual_match(
+            "عصير مانجو", {'product_names': {'arabic': 'عَصير مانجو'}}), (True, 1.0))
+
+    def test_index_finds_noisy_names(self):
+        index = NameIndex()
+        for key, name in [('A', 'Juhayna Mango Juice 1L'), ('B', 'Juhayna Orange Juice 1L'),
+                          ('C', 'Chipsy Salt 100g'), ('D', 'مناديل فاين 10 قطع')]:
+            index.add(key, name)
+
+        self.assertEqual(index.search('Juhayna Mangp Juce 1L', limit=1)[0][0], 'A')
+        self.assertEqual(index.search('مَناديل فاين', limit=1)[0][0], 'D')
+        self.assertEqual([key for key, _, _ in index.search('Juhayna Juice', limit=2)], ['A', 'B'])
+        self.assertEqual(index.search('Juhayna Mango Juice 1L', min_score=0.99), [('A', 'Juhayna Mango Juice 1L', 1.0)])
+        self.assertEqual(index.search('zzzz'), [])
+
+    def test_catalogue_matches_unmatched_grn_items(self):
+        now = datetime.now(timezone.utc)
+        db.session.add(Order(id='o1', client_id='illa-frontdoor', date=now.date(), order_status='COMPLETED'))
+        db.session.add(OrderLineItem(order_id='o1', sku_id='SKU-1', name='Edita Molto Croissant Chocolate', quantity=2))
+        db.session.add(GtinProduct(gtin='6221000000001', found=True, fetched_at=now, expires_at=now + timedelta(days=1),
+                                   product_info=json.dumps({'product_name': 'Domty Feta Cheese 500g'})))
+        db.session.commit()
+
+        validation_data = {'extracted_items': [
+            {'extracted_name': 'Molto Croissant Choclate', 'matched_order_sku': None},
+            {'extracted_name': 'Domty Feta Chees 500g', 'matched_order_sku': ''},
+            {'extracted_name': 'Edita Molto Croissant', 'matched_order_sku': 'SKU-1'},
+            {'extracted_name': 'Unrelated pallet label', 'matched_order_sku': None},
+        ]}
+        items = self.validator.annotate_catalogue_matches(validation_data)['extracted_items']
+
+        self.assertEqual(items[0]['catalogue_match']['sku_id'], 'SKU-1')
+        self.assertEqual(items[1]['catalogue_match']['sku_id'], 'gtin:6221000000001')
+        self.assertNotIn('catalogue_match', items[2])
+        self.assertIsNone(items[3]['catalogue_match'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+import json
+from datetime import date
+from sqlalchemy import inspect
+from app import create_app
+from app.filters import filter_service
+from app.projections import order_load_options, serialize_order, attach_line_item_previews
+from models import db, Order, OrderLineItem
+
+class OrderProjectionTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        filter_service._filter_cache.clear()
+
+        db.session.add(Order(
+            id='o1', client_id='illa-frontdoor', date=date(2025, 1, 1), order_status='COMPLETED',
+            location_name='Store 1', custom_fields=json.dumps({'company_owner': 'Acme'}),
+            raw_data=json.dumps({'id': 'o1', 'payload': 'x' * 10000})
+        ))
+        for i in range(5):
+            db.session.add(OrderLineItem(order_id='o1', sku_id=f'SKU-{i}', name=f'Item {i}', quantity=2, transacted_quantity=1))
+        db.session.commit()
+        db.session.expunge_all()
+
+    def tearDown(self):
+        filter_service._filter_cache.clear()
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_list_shape_never_loads_raw_data(self):
+        """The list projection leaves raw_data unloaded and out of the output"""
+        order = Order.query.options(*order_load_options('list')).first()
+        data = serialize_order(order, 'list')
+        self.assertIn('raw_data', inspect(order).unloaded)
+        self.assertNotIn('raw_data', data)
+        self.assertEqual(data['location_name'], 'Store 1')
+        self.assertEqual(data['date'], '2025-01-01')
+
+    def test_export_shape_decodes_small_json_fields(self):
+        """The export projection includes custom fields but not raw_data"""
+        order = Order.query.options(*order_load_options('export')).first()
+        data = serialize_order(order, 'export')
+        self.assertEqual(data['custom_fields'], {'company_owner': 'Acme'})
+        self.assertNotIn('raw_data', data)
+
+    def test_detail_shape_is_full_to_dict(self):
+        """The detail projection matches Order.to_dict()"""
+        order = Order.query.first()
+        self.assertEqual(serialize_order(order, 'detail'), order.to_dict())
+
+    def test_line_item_preview(self):
+        """List rows carry the full line item count and a three-item preview"""
+        data = attach_line_item_previews([{'id': 'o1'}])[0]
+        self.assertEqual(data['line_item_count'], 5)
+        self.assertEqual([item['id'] for item in data['line_items_preview']], ['SKU-0', 'SKU-1', 'SKU-2'])
+
+    def test_filter_results_use_list_shape(self):
+        """apply_filters returns list-shaped rows unless another shape is requested"""
+        listed = filter_service.apply_filters({'page': 1, 'per_page': 10}, self.app.config)['orders'][0]
+        detailed = filter_service.apply_filters({'page': 1, 'per_page': 10, 'shape': 'detail'}, self.app.config)['orders'][0]
+        self.assertNotIn('raw_data', listed)
+        self.assertEqual(listed['line_item_count'], 5)
+        self.assertEqual(detailed['raw_data']['id'], 'o1')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import copy
+import unittest
+from app.quantity_reconciliation import OrderLines, parse_package_quantity
+from app.validators import GoogleAIValidator
+
+ORDER_ITEMS = [
+    {'sku_id': 'JUH-1L', 'name': 'Juhayna Juice 1L 6x4', 'quantity': 48, 'unit': 'unit'},
+    {'sku_id': 'DOM-500', 'name': 'Domty Cheese 500g', 'quantity': 2, 'unit': 'kg'},
+    {'sku_id': 'CHP-20', 'name': 'Chipsy Salt', 'quantity': 10, 'unit': 'box'},
+    {'sku_id': 'CHP-20', 'name': 'Chipsy Salt (duplicate line)', 'quantity': 99, 'unit': 'box'},
+]
+
+def make_validation_data():
+    return {
+        'validation_result': 'VALID',
+        'confidence_score': 0.97,
+        'extracted_items': [
+            {'extracted_sku': 'JUH-1L', 'extracted_name': 'Juhayna Juice 1L', 'extracted_quantity': '2', 'extracted_unit': 'cartons',
+             'matched_order_sku': 'JUH-1L', 'match_confidence': 0.95},
+            {'extracted_sku': 'DOM-500', 'extracted_name': 'Domty Cheese', 'extracted_quantity': '800', 'extracted_unit': 'grams',
+             'matched_order_sku': 'DOM-500', 'match_confidence': 0.9},
+            {'extracted_sku': 'CHP-20', 'extracted_name': 'Chipsy Salt', 'extracted_quantity': '1', 'package_config': '(4+1)*2',
+             'extracted_unit': 'Box', 'matched_order_sku': 'CHP-20', 'match_confidence': 0.92},
+            {'extracted_sku': 'XYZ', 'extracted_name': 'Unordered item', 'extracted_quantity': '3', 'matched_order_sku': None,
+             'match_confidence': 0.2},
+        ],
+        'discrepancies': [{'type': 'MISSING_ITEM', 'description': 'from the model'}],
+        'summary': {}
+    }
+
+class QuantityReconciliationTestCase(unittest.TestCase):
+    def setUp(self):
+        self.validator = GoogleAIValidator()
+
+    def test_unit_helpers_are_unchanged(self):
+        self.assertEqual(self.validator.normalize_unit(' Cartons '), 'box')
+        self.assertEqual(self.validator.normalize_unit(None), 'unit')
+        self.assertEqual(self.validator.normalize_unit('Crate'), 'crate')
+        self.assertEqual(self.validator.parse_package_quantity('(5+1)*4'), (24, 'calculated'))
+        self.assertEqual(self.validator.parse_package_quantity(' 7.5 pcs'), (7.5, 'direct'))
+        self.assertEqual(self.validator.parse_package_quantity(''), (None, None))
+        self.assertEqual(parse_package_quantity('6x12'), (72, 'calculated'))
+        self.assertEqual(self.validator.convert_quantity_units(2, 'box', 'pcs', 'Tissues 6X4'), (48, 24))
+        self.assertEqual(self.validator.convert_quantity_units(2, 'box', 'pcs'), (24, 12))
+        self.assertEqual(self.validator.convert_quantity_units(24, 'units', 'box'), (2.0, 1 / 12))
+        self.assertEqual(self.validator.convert_quantity_units(1500, 'g', 'kg'), (1.5, 0.001))
+        self.assertEqual(self.validator.convert_quantity_units(3, 'bag', 'kg'), (3, None))
+
+    def test_reconciles_every_item_against_its_order_line(self):
+        result = self.validator.validate_quantities_with_uom(make_validation_data(), ORDER_ITEMS)
+        items = result['extracted_items']
+
+        self.assertEqual(items[0]['status'], 'MATCHED')
+        self.assertEqual(items[0]['quantity_equivalent'], 48.0)  # 2 boxes of 6x4
+        self.assertEqual(items[1]['status'], 'QUANTITY_MISMATCH')
+        self.assertEqual(items[2]['status'], 'MATCHED')  # (4+1)*2 boxes against the first CHP-20 line
+        self.assertNotIn('status', items[3])
+        self.assertEqual(result['discrepancies'], [
+            {'type': 'MISSING_ITEM', 'description': 'from the model'},
+            {'type': 'QUANTITY_MISMATCH', 'description': 'Quantity mismatch for DOM-500', 'expected': '2 kg',
+             'actual': '800 grams (≈0.8 kg)', 'sku_id': 'DOM-500', 'severity': 'HIGH', 'percentage_diff': 60.0},
+        ])
+        self.assertEqual(result['uom_analysis'], {'conversions_attempted': 3, 'successful_conversions': 2,
+                                                  'unresolved_uom_issues': 1})
+
+        # The streaming path checks one item at a time and must agree
+        order_lines = OrderLines(ORDER_ITEMS)
+        outcomes = [self.validator.check_item_quantity(item, order_lines) for item in make_validation_data()['extracted_items']]
+        self.assertEqual([outcome and outcome[:2] for outcome in outcomes], [(True, True), (True, False), (True, True), None])
+        self.assertEqual(outcomes[1][2], result['discrepancies'][1])
+
+    def test_unreadable_quantity_stops_the_pass_like_before(self):
+        validation_data = make_validation_data()
+        validation_data['extracted_items'][1]['extracted_quantity'] = 'twelve'
+        result = self.validator.validate_quantities_with_uom(validation_data, ORDER_ITEMS)
+
+        self.assertEqual(result['extracted_items'][0]['status'], 'MATCHED')
+        self.assertNotIn('status', result['extracted_items'][2])
+        self.assertEqual(result['discrepancies'], [{'type': 'MISSING_ITEM', 'description': 'from the model'}])
+        self.assertNotIn('uom_analysis', result)
+
+    def test_conservative_missing_item_logic(self):
+        result = self.validator.apply_conservative_missing_item_logic(make_validation_data(), ORDER_ITEMS)
+        self.assertEqual(result['discrepancies'], [])
+        self.assertEqual(result['summary'], {'missing_items_conservative': 0, 'conservative_analysis_applied': True})
+        self.assertEqual(result['validation_result'], 'VALID')
+
+        # An extracted item without a name leaves the answer as the model gave it
+        validation_data = make_validation_data()
+        validation_data['extracted_items'][3]['extracted_name'] = None
+        original = copy.deepcopy(validation_data)
+        self.assertEqual(self.validator.apply_conservative_missing_item_logic(validation_data, ORDER_ITEMS), original)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+from app import create_app
+from migrations.add_performance_indexes import add_performance_indexes
+from migrations.explain_queries import collect_plans, explain_statement
+from models import db, Order
+
+class QueryPlanTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_hot_queries_use_indexes(self):
+        """No hot service query falls back to a full table scan"""
+        results = collect_plans()
+        self.assertTrue(results)
+        for result in results:
+            self.assertTrue(result['ok'], f"{result['name']}: {result['plan']}")
+
+    def test_detects_sequential_scan(self):
+        """A filter on an unindexed column is reported"""
+        statement = db.session.query(Order).filter(Order.location_city == 'Cairo').statement
+        _, seq_scans = explain_statement(statement, ('orders',))
+        self.assertEqual(seq_scans, ['orders'])
+
+    def test_migration_is_idempotent(self):
+        """Index statements apply cleanly on top of create_all and can be re-run"""
+        self.assertTrue(add_performance_indexes())
+        self.assertTrue(add_performance_indexes())
+        self.assertTrue(all(result['ok'] for result in collect_plans()))
+
+if __name__ == '__main__':
+    unittest.main()
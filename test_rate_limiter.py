@@ -0,0 +1,101 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from app.config import TestingConfig
+from app.rate_limiter import TokenBucket, FileBucketState, RateLimiterRegistry, RateLimitTimeout
+
+class TokenBucketTestCase(unittest.TestCase):
+    def test_try_acquire_never_blocks(self):
+        bucket = TokenBucket('test', rate_per_minute=60, capacity=2)
+        self.assertTrue(bucket.try_acquire())
+        self.assertTrue(bucket.try_acquire())
+        start = time.perf_counter()
+        self.assertFalse(bucket.try_acquire())
+        self.assertLess(time.perf_counter() - start, 0.05)
+        self.assertEqual(bucket.get_metrics()['rejected'], 1)
+
+    def test_waiting_caller_does_not_hold_the_lock(self):
+        bucket = TokenBucket('test', rate_per_minute=300, capacity=1)  # one token every 0.2s
+        bucket.try_acquire()
+        waiter = threading.Thread(target=bucket.acquire)
+        waiter.start()
+        time.sleep(0.02)
+
+        start = time.perf_counter()
+        self.assertFalse(bucket.acquire(timeout=0))  # answered immediately while the waiter sleeps
+        self.assertLess(time.perf_counter() - start, 0.05)
+        waiter.join()
+
+        metrics = bucket.get_metrics()
+        self.assertEqual((metrics['throttled'], metrics['timeouts']), (1, 1))
+        self.assertGreater(metrics['total_wait_seconds'], 0.1)
+
+    def test_reservations_are_served_in_arrival_order(self):
+        bucket = TokenBucket('test', rate_per_minute=600, capacity=1)
+        waits = [bucket._reserve(1, None) for _ in range(4)]
+        self.assertEqual(waits[0], 0)
+        self.assertEqual(waits, sorted(waits))
+        self.assertAlmostEqual(waits[3] - waits[2], 0.1, delta=0.02)
+
+    def test_async_acquire(self):
+        bucket = TokenBucket('test', rate_per_minute=600, capacity=1)
+
+        async def run():
+            start = time.perf_counter()
+            await asyncio.gather(*(bucket.acquire_async() for _ in range(3)))
+            return time.perf_counter() - start
+
+        elapsed = asyncio.run(run())
+        self.assertGreaterEqual(elapsed, 0.18)
+        self.assertEqual(bucket.get_metrics()['throttled'], 2)
+
+    def test_concurrency_slot_timeout(self):
+        bucket = TokenBucket('test', rate_per_minute=6000, max_concurrent=1)
+        with bucket.slot():
+            with self.assertRaises(RateLimitTimeout):
+                with bucket.slot(timeout=0.05):
+                    pass
+            self.assertEqual(bucket.get_metrics()['in_flight'], 1)
+        with bucket.slot(timeout=0.05):
+            pass
+
+    def test_file_state_is_shared_between_buckets(self):
+        shared_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(shared_dir, 'gs1.bucket')
+            worker_a = TokenBucket('gs1', rate_per_minute=1, capacity=2, state=FileBucketState(2, path))
+            worker_b = TokenBucket('gs1', rate_per_minute=1, capacity=2, state=FileBucketState(2, path))
+            self.assertTrue(worker_a.try_acquire())
+            self.assertTrue(worker_b.try_acquire())
+            self.assertFalse(worker_a.try_acquire())
+        finally:
+            shutil.rmtree(shared_dir, ignore_errors=True)
+
+class RateLimiterRegistryTestCase(unittest.TestCase):
+    def test_limits_come_from_config_and_hosts_map_to_upstreams(self):
+        registry = RateLimiterRegistry()
+        registry.configure(TestingConfig)
+
+        self.assertEqual(registry.for_host('oms.locus-api.com').name, 'locus')
+        self.assertEqual(registry.for_host('www.gs1.org').name, 'gs1')
+        self.assertEqual(registry.for_host('generativelanguage.googleapis.com:443').name, 'gemini')
+        self.assertIsNone(registry.for_host('127.0.0.1:8080'))
+
+        gemini = registry.get('gemini').get_metrics()
+        self.assertEqual(gemini['max_concurrent'], TestingConfig.MAX_CONCURRENT_API_CALLS)
+        # Burst plus a minute of refill never exceed the per-minute quota
+        self.assertEqual((gemini['capacity'], gemini['capacity'] + gemini['rate_per_minute']),
+                         (1, TestingConfig.MAX_API_CALLS_PER_MINUTE))
+
+    def test_gemini_burst_is_capped_below_the_per_minute_quota(self):
+        registry = RateLimiterRegistry()
+        registry.configure(type('Config', (), {'MAX_API_CALLS_PER_MINUTE': 12, 'GEMINI_BURST': 30}))
+        gemini = registry.get('gemini').get_metrics()
+        self.assertEqual((gemini['capacity'], gemini['rate_per_minute']), (11, 1))
+
+if __name__ == '__main__':
+    unittest.main()
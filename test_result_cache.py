@@ -0,0 +1,98 @@
+import time
+import unittest
+from datetime import date, datetime, timedelta, timezone
+from app import create_app
+from app.cache import LRUCache, LocalRedis, SharedCache, result_cache, date_tag, order_tag
+from app.editing_routes import EditingService
+from app.filters import filter_service
+from models import db, Order
+
+class LRUCacheTestCase(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)  # 'b' is now least recently used
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        stats = cache.get_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions'], stats['size']), (2, 1, 1, 2))
+
+    def test_ttl_expiry(self):
+        cache = LRUCache(default_ttl=0.01)
+        cache.set('a', 1)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get_stats()['expirations'], 1)
+
+    def test_tag_invalidation(self):
+        cache = LRUCache()
+        cache.set('day1', 1, tags=[date_tag('2025-01-01'), order_tag('o1')])
+        cache.set('day2', 2, tags=[date_tag('2025-01-02')])
+        self.assertEqual(cache.invalidate_tags([order_tag('o1')]), 1)
+        self.assertIsNone(cache.get('day1'))
+        self.assertEqual(cache.get('day2'), 2)
+
+class SharedCacheTestCase(unittest.TestCase):
+    def test_workers_share_entries_and_invalidations(self):
+        """Two backends on one store see each other's writes, invalidations and counters"""
+        store = LocalRedis()
+        worker_a = SharedCache(store)
+        worker_b = SharedCache(store)
+
+        worker_a.set('result', {'total': 3}, tags=[date_tag('2025-01-01')])
+        self.assertEqual(worker_b.get('result'), {'total': 3})
+
+        self.assertEqual(worker_b.invalidate_tags([date_tag('2025-01-01')]), 1)
+        self.assertIsNone(worker_a.get('result'))
+
+        stats = worker_a.get_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['sets'], stats['invalidations']), (1, 1, 1, 1))
+
+    def test_store_bound_counts_evictions(self):
+        store = LocalRedis(max_keys=3)
+        cache = SharedCache(store)
+        for i in range(5):
+            cache.set(f'k{i}', i)
+        self.assertGreater(cache.get_stats()['evictions'], 0)
+
+class FilterCacheInvalidationTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        result_cache.clear()
+
+        created = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        for i in range(6):
+            db.session.add(Order(id=f'order-{i}', client_id='illa-frontdoor', date=date(2025, 1, 1) + timedelta(days=i % 2),
+                                 order_status='EXECUTING', created_at=created + timedelta(minutes=i)))
+        db.session.commit()
+
+    def tearDown(self):
+        result_cache.clear()
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def _filter(self, day):
+        return filter_service.apply_filters({'date_from': day, 'date_to': day, 'page': 1, 'per_page': 10}, self.app.config)
+
+    def test_edit_drops_only_the_orders_date(self):
+        """Editing one order invalidates cached results for its date and keeps other dates"""
+        self._filter('2025-01-01')
+        self._filter('2025-01-02')
+        self.assertTrue(self._filter('2025-01-02').get('from_cache'))
+
+        result = EditingService().update_order_data('order-1', {'order_status': 'COMPLETED'}, 'tester')
+        self.assertTrue(result['success'])
+
+        self.assertTrue(self._filter('2025-01-01').get('from_cache'))
+        refreshed = self._filter('2025-01-02')
+        self.assertFalse(refreshed.get('from_cache', False))
+        self.assertEqual(refreshed['status_totals'], {'COMPLETED': 1, 'EXECUTING': 2})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+from datetime import date
+from app.tours import tour_day_range, tour_service
+from models import db, Order, Tour
+from order_fixtures import OrderTestCase, make_order
+
+class TourDayTestCase(OrderTestCase):
+    def _seed(self):
+        self._merge(make_order('o1', 1, company='Early', tour_date='2025-01-01-23-59-59'),
+                    make_order('o2', 2, tour_date='2025-01-02-00-00-00'),
+                    make_order('o3', 3, tour_date='2025-01-02-21-15-02'),
+                    make_order('o4', 4, company='Late', tour_date='2025-01-03-08-00-00'))
+
+    def test_tour_day_follows_tour_date(self):
+        self.assertEqual(Tour.parse_tour_day('2024-09-23-21-15-02'), date(2024, 9, 23))
+        self.assertIsNone(Tour.parse_tour_day('garbage'))
+        self.assertIsNone(Tour.parse_tour_day(None))
+        self.assertEqual(tour_day_range(date_from='2025-01-02', date_to='2025-01-05', offset_days=-1),
+                         (date(2025, 1, 1), date(2025, 1, 4)))
+        self.assertEqual(tour_day_range(), (None, None))
+
+        self._seed()
+        self.assertEqual(db.session.get(Order, 'o3').tour_day, date(2025, 1, 2))
+        self.assertEqual(Tour.query.filter_by(tour_number=4).first().tour_day, date(2025, 1, 3))
+
+        # ORM assignments (refresh, safe update, edits) keep the day in step
+        order = db.session.get(Order, 'o3')
+        order.tour_date = '2025-02-10-07-00-00'
+        self.assertEqual(order.tour_day, date(2025, 2, 10))
+        tour = Tour(tour_id='2025-03-01-09-00-00*plan1*tour-9', tour_date='2025-03-01-09-00-00',
+                    tour_plan_id='plan1', tour_name='tour-9', tour_number=9)
+        self.assertEqual(tour.tour_day, date(2025, 3, 1))
+
+    def test_date_filters_select_whole_tour_days(self):
+        self._seed()
+        self.assertEqual(self._tour_numbers(date='2025-01-02'), [2, 3])
+        self.assertEqual(self._tour_numbers(date_from='2025-01-01'), [1])
+        self.assertEqual(self._tour_numbers(date_from='2025-01-01', date_to='2025-01-02'), [1, 2, 3])
+        self.assertEqual(self._tour_numbers(date_from='2025-01-02', date_to='2025-01-03'), [2, 3, 4])
+        self.assertEqual(self._tour_numbers(), [1, 2, 3, 4])
+
+        stats = tour_service.get_tour_summary_stats(date_from='2025-01-02', date_to='2025-01-03')
+        self.assertEqual((stats['total_tours'], stats['total_orders']), (3, 3))
+        self.assertEqual(tour_service.get_filter_options(date='2025-01-03')['riders'], ['Rider 4'])
+
+        # Company owners of the orders on the same tour days, as the company filter matches them
+        self.assertEqual(tour_service.get_filter_options(date='2025-01-01')['companies'], ['Early'])
+        self.assertEqual(tour_service.get_filter_options(date_from='2025-01-02', date_to='2025-01-03')['companies'],
+                         ['Acme', 'Late'])
+        self.assertEqual(self._tour_numbers(company_owner='Late', date_from='2025-01-02', date_to='2025-01-03'), [4])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+from sqlalchemy import event
+from app.editing_routes import EditingService
+from app.order_merge import order_merge_service
+from app.tours import tour_service
+from models import db, Tour
+from order_fixtures import CLIENT_ID, OrderTestCase, make_order
+
+class TourFacetsTestCase(OrderTestCase):
+    def setUp(self):
+        super().setUp()
+        self.queries = 0
+        event.listen(db.engine, 'before_cursor_execute', self._count_query)
+
+    def tearDown(self):
+        event.remove(db.engine, 'before_cursor_execute', self._count_query)
+        super().tearDown()
+
+    def _count_query(self, *args):
+        self.queries += 1
+
+    def _seed(self):
+        self._merge(make_order('o1', 1, rider='Rider A'), make_order('o2', 1, rider='Rider A', city='Giza', company='Globex'),
+                    make_order('o3', 2, rider='Rider A'), make_order('o4', 3, rider='Rider B'),
+                    make_order('o5', 4, rider='Rider C', city='Alex', tour_date='2025-01-05-08-00-00'))
+
+    def test_facets_have_tour_counts_per_value(self):
+        self._seed()
+        self.queries = 0
+        options = tour_service.get_filter_options(date='2025-01-02')
+        self.assertEqual(self.queries, 2)
+
+        self.assertEqual((options['riders'], options['total_tours']), (['Rider A', 'Rider B'], 3))
+        self.assertEqual(options['counts']['riders'], {'Rider A': 2, 'Rider B': 1})
+        self.assertEqual(options['counts']['vehicles'], {'VEH-A': 2, 'VEH-B': 1})
+        self.assertEqual(options['counts']['cities'], {'Cairo': 3, 'Giza': 1})
+
+        # Company owners come from the orders on the same days' tours
+        self.assertEqual(options['counts']['companies'], {'Acme': 3, 'Globex': 1})
+        self.assertEqual(tour_service.get_filter_options(date='2025-01-03')['companies'], [])
+
+        options = tour_service.get_filter_options()
+        self.assertEqual((options['cities'], options['total_tours']), (['Alex', 'Cairo', 'Giza'], 4))
+        self.assertFalse(tour_service.get_filter_options(date='not-a-date')['success'])
+
+    def test_facets_are_cached_until_tours_of_their_days_change(self):
+        self._seed()
+        self.assertFalse(tour_service.get_filter_options(date='2025-01-02')['from_cache'])
+        self.queries = 0
+        self.assertTrue(tour_service.get_filter_options(date='2025-01-02')['from_cache'])
+        self.assertEqual(self.queries, 0)
+
+        # A new tour on another day leaves the entry alone; one on the same day drops it
+        tour_service.get_filter_options(date_from='2025-01-05', date_to='2025-01-06')
+        self._merge(make_order('o6', 5, rider='Rider D', city='Luxor', tour_date='2025-01-06-08-00-00'))
+        self.assertTrue(tour_service.get_filter_options(date='2025-01-02')['from_cache'])
+        options = tour_service.get_filter_options(date_from='2025-01-05', date_to='2025-01-06')
+        self.assertEqual((options['from_cache'], options['riders']), (False, ['Rider C', 'Rider D']))
+
+        # Manual tour edits
+        tour = Tour.query.filter_by(tour_number=3).first()
+        EditingService().update_tour_data(tour.tour_id, {'rider_name': 'Rider Z'}, 'tester')
+        options = tour_service.get_filter_options(date='2025-01-02')
+        self.assertEqual((options['from_cache'], options['riders']), (False, ['Rider A', 'Rider Z']))
+
+        # An order moving to another tour of the day, once the merge commits
+        tour_service.get_filter_options(date='2025-01-02')
+        order_merge_service.merge_orders([make_order('o2', 3, rider='Rider Z', city='Giza', company='Globex')], CLIENT_ID, self.order_date)
+        self.assertTrue(tour_service.get_filter_options(date='2025-01-02')['from_cache'])
+        db.session.commit()
+        self.assertFalse(tour_service.get_filter_options(date='2025-01-02')['from_cache'])
+
+if __name__ == '__main__':
+    unittest.main()
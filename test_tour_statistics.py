@@ -0,0 +1,165 @@
+import unittest
+import json
+from sqlalchemy import event
+from app.auth import LocusAuth
+from app.editing_routes import EditingService
+from app.tours import tour_service
+from models import db, Tour
+from order_fixtures import CLIENT_ID, TOUR_DATE, OrderTestCase, make_order, tour_id
+
+class TourStatisticsTestCase(OrderTestCase):
+    def _snapshot(self):
+        return {tour.tour_id: (tour.total_orders, tour.completed_orders, tour.cancelled_orders, tour.pending_orders,
+                               tour.tour_status, set(json.loads(tour.delivery_cities)), set(json.loads(tour.delivery_areas)),
+                               tour.rider_name, tour.vehicle_registration)
+                for tour in Tour.query.all()}
+
+    def test_bulk_refresh_matches_the_per_tour_statistics(self):
+        self._merge(
+            make_order('a1', 1), make_order('a2', 1, city='Giza'),
+            make_order('b1', 2, status='CANCELLED'), make_order('b2', 2, status='CANCELLED'),
+            make_order('c1', 3, status='WAITING'), make_order('c2', 3, status='COMPLETED', area='Store c1'),
+            make_order('d1', 4, status='WAITING', city=None),
+        )
+
+        result = tour_service.refresh_all_tour_data(self.order_date.isoformat())
+        self.assertTrue(result['success'])
+        self.assertEqual((result['processed_orders'], result['updated_tours']), (7, 4))
+        bulk = self._snapshot()
+        self.assertEqual(bulk[tour_id(1)][:6], (2, 2, 0, 0, 'COMPLETED', {'Cairo', 'Giza'}))
+        self.assertEqual(bulk[tour_id(2)][4], 'CANCELLED')
+        self.assertEqual(bulk[tour_id(3)][4:7], ('ONGOING', {'Cairo'}, {'Store c1'}))
+        self.assertEqual(bulk[tour_id(4)][4:6], ('WAITING', set()))
+
+        tour = Tour.query.filter_by(tour_id=tour_id(1)).first()
+        self.assertEqual((tour.tour_name, tour.tour_number, tour.tour_plan_id), ('tour-1', 1, 'plan1'))
+        self.assertEqual((tour.tour_start_time.hour, tour.tour_end_time.minute), (9, 30))
+
+        for number in range(1, 5):
+            tour_service.update_tour_statistics(tour_id(number))
+        self.assertEqual(self._snapshot(), bulk)
+
+    def test_bulk_refresh_keeps_manually_modified_fields(self):
+        self._merge(make_order('a1', 1, status='WAITING'), make_order('a2', 1, status='WAITING'))
+        tour_service.refresh_all_tour_data(self.order_date.isoformat())
+
+        tour = Tour.query.filter_by(tour_id=tour_id(1)).first()
+        tour.tour_status, tour.rider_name = 'CANCELLED', 'Edited Rider'
+        tour.is_modified, tour.modified_fields = True, json.dumps(['tour_status', 'rider_name'])
+        db.session.commit()
+
+        self._merge(make_order('a1', 1, status='COMPLETED'), make_order('a3', 1, status='COMPLETED', city='Giza'))
+        tour_service.refresh_all_tour_data(self.order_date.isoformat())
+
+        db.session.refresh(tour)
+        self.assertEqual((tour.tour_status, tour.rider_name), ('CANCELLED', 'Edited Rider'))
+        self.assertEqual((tour.total_orders, tour.completed_orders, tour.pending_orders), (3, 2, 1))
+        self.assertEqual(set(json.loads(tour.delivery_cities)), {'Cairo', 'Giza'})
+
+    def test_bulk_refresh_query_count_does_not_grow_with_tours(self):
+        def count_queries(tour_count):
+            self._merge(*[make_order(f'{tour_count}-{n}', n) for n in range(tour_count)])
+            statements = []
+            listener = lambda *args: statements.append(args[2])
+            event.listen(db.engine, 'before_cursor_execute', listener)
+            try:
+                tour_service.bulk_update_tour_statistics({tour_id(n): None for n in range(tour_count)})
+                db.session.commit()
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', listener)
+            return len(statements)
+
+        self.assertEqual(count_queries(5), count_queries(60))
+        self.assertEqual(Tour.query.count(), 60)
+
+    def _counters(self, number):
+        tour = Tour.query.filter_by(tour_id=tour_id(number)).first()
+        db.session.refresh(tour)
+        return (tour.total_orders, tour.completed_orders, tour.cancelled_orders, tour.pending_orders,
+                tour.waiting_orders, tour.tour_status)
+
+    def _assert_no_drift(self):
+        report = tour_service.reconcile_tour_statistics(repair=False)
+        self.assertEqual((report['drifted_tours'], report['missing_tours']), (0, 0), report)
+
+    def test_order_changes_keep_tour_counters_current_without_a_refresh(self):
+        self._merge(make_order('a1', 1, status='WAITING'), make_order('a2', 1, status='WAITING'))
+        self.assertEqual(self._counters(1), (2, 0, 0, 2, 2, 'WAITING'))
+
+        # Status change and a new order through the bulk merge
+        self._merge(make_order('a1', 1, status='COMPLETED'), make_order('a3', 1, status='CANCELLED'))
+        self.assertEqual(self._counters(1), (3, 1, 1, 1, 1, 'ONGOING'))
+
+        # Edit through the editing service, then the API update of an edited order
+        EditingService().update_order_data('a2', {'order_status': 'COMPLETED'}, 'tester')
+        self.assertEqual(self._counters(1), (3, 2, 1, 0, 0, 'COMPLETED'))
+        self._merge(make_order('a2', 2, status='COMPLETED'))
+        self.assertEqual(self._counters(1), (2, 1, 1, 0, 0, 'COMPLETED'))
+        self.assertEqual(self._counters(2), (1, 1, 0, 0, 0, 'COMPLETED'))
+        self._assert_no_drift()
+
+        # Clearing the day's cache deletes the unmodified orders
+        self.assertTrue(LocusAuth().clear_orders_cache(CLIENT_ID, self.order_date.isoformat()))
+        self.assertEqual(self._counters(1), (0, 0, 0, 0, 0, 'WAITING'))
+        self.assertEqual(self._counters(2), (1, 1, 0, 0, 0, 'COMPLETED'))
+        self._assert_no_drift()
+
+    def _locations(self, number):
+        tour = Tour.query.filter_by(tour_id=tour_id(number)).first()
+        db.session.refresh(tour)
+        return set(json.loads(tour.delivery_cities)), set(json.loads(tour.delivery_areas))
+
+    def test_order_changes_keep_tour_locations_current(self):
+        self._merge(make_order('a1', 1), make_order('a2', 1, city='Giza'))
+        self.assertEqual(self._locations(1), ({'Cairo', 'Giza'}, {'Store a1', 'Store a2'}))
+
+        # An order changing city, one moving to another tour and a new order
+        self._merge(make_order('a1', 1, city='Alex'), make_order('a2', 2, city='Giza'), make_order('a3', 1, area='Mall'))
+        self.assertEqual(self._locations(1), ({'Alex', 'Cairo'}, {'Store a1', 'Mall'}))
+        self.assertEqual(self._locations(2), ({'Giza'}, {'Store a2'}))
+        self._assert_no_drift()
+
+        # Manual edits of an order's city
+        EditingService().update_order_data('a3', {'location_city': 'Luxor'}, 'tester')
+        self.assertEqual(self._locations(1)[0], {'Alex', 'Luxor'})
+        self._assert_no_drift()
+
+        # Stale location lists are drift
+        Tour.query.filter_by(tour_id=tour_id(2)).update({'delivery_cities': json.dumps(['Cairo'])})
+        db.session.commit()
+        report = tour_service.reconcile_tour_statistics(repair=False)
+        self.assertEqual(report['drifted_tours'], 1)
+        tour_service.reconcile_tour_statistics()
+        self.assertEqual(self._locations(2)[0], {'Giza'})
+
+    def test_counter_deltas_keep_an_edited_tour_status(self):
+        self._merge(make_order('a1', 1, status='WAITING'))
+        tour = Tour.query.filter_by(tour_id=tour_id(1)).first()
+        tour.tour_status, tour.is_modified, tour.modified_fields = 'CANCELLED', True, json.dumps(['tour_status'])
+        db.session.commit()
+
+        self._merge(make_order('a1', 1, status='COMPLETED'), make_order('a2', 1, status='COMPLETED'))
+        self.assertEqual(self._counters(1), (2, 2, 0, 0, 0, 'CANCELLED'))
+        self._assert_no_drift()
+
+    def test_reconciliation_finds_and_repairs_drift(self):
+        self._merge(make_order('a1', 1), make_order('a2', 1, status='WAITING'), make_order('b1', 2))
+        Tour.query.filter_by(tour_id=tour_id(1)).update({'total_orders': 7, 'tour_status': 'COMPLETED'})
+        Tour.query.filter_by(tour_id=tour_id(2)).delete()
+        db.session.add(Tour(tour_id=tour_id(9), tour_date=TOUR_DATE,
+                            tour_plan_id='plan1', tour_name='tour-9', tour_number=9, total_orders=4, tour_status='ONGOING'))
+        db.session.commit()
+
+        report = tour_service.reconcile_tour_statistics(TOUR_DATE[:10], self.order_date.isoformat(), repair=False)
+        self.assertEqual((report['checked_tours'], report['drifted_tours'], report['missing_tours']), (2, 2, 1))
+        self.assertEqual(Tour.query.count(), 2)
+
+        report = tour_service.reconcile_tour_statistics(TOUR_DATE[:10], self.order_date.isoformat())
+        self.assertTrue(report['repaired'])
+        self.assertEqual(self._counters(1), (2, 1, 0, 1, 1, 'ONGOING'))
+        self.assertEqual(self._counters(2), (1, 1, 0, 0, 0, 'COMPLETED'))
+        self.assertEqual(self._counters(9), (0, 0, 0, 0, 0, 'WAITING'))
+        self._assert_no_drift()
+
+if __name__ == '__main__':
+    unittest.main()
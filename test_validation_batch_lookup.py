@@ -0,0 +1,74 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from app import create_app
+from app.config import TestingConfig
+from app.validators import GoogleAIValidator
+from app.filters import filter_service
+from datetime import date
+from models import db, Order, ValidationResult
+
+class ValidationBatchLookupTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        self.validator = GoogleAIValidator(TestingConfig)
+
+        now = datetime.now(timezone.utc)
+        # o1: older valid result, newer invalid result; o2: single valid result
+        db.session.add_all([
+            ValidationResult(order_id='o1', validation_date=now - timedelta(days=2), is_valid=True, confidence_score=0.9),
+            ValidationResult(order_id='o1', validation_date=now - timedelta(days=1), is_valid=False, confidence_score=0.4),
+            ValidationResult(order_id='o2', validation_date=now, is_valid=True, has_document=True, confidence_score=0.8),
+        ])
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_batch_returns_latest_per_order(self):
+        """Only the most recent result per order is returned"""
+        results = self.validator.get_latest_validation_results(['o1', 'o2', 'o3'])
+        self.assertEqual(set(results), {'o1', 'o2'})
+        self.assertFalse(results['o1']['is_valid'])
+        self.assertEqual(results['o1']['confidence_score'], 0.4)
+
+    def test_batch_matches_single_lookup(self):
+        """Batch results match get_stored_validation_result for each order"""
+        results = self.validator.get_latest_validation_results(['o1', 'o2'])
+        for order_id in ('o1', 'o2'):
+            self.assertEqual(results[order_id]['id'], self.validator.get_stored_validation_result(order_id)['id'])
+
+    def test_validation_filters_use_latest_result(self):
+        """Filter service 'invalid' / 'valid' follow the latest result, in SQL"""
+        for order_id in ('o1', 'o2', 'o3'):
+            db.session.add(Order(id=order_id, client_id='illa-frontdoor', date=date(2025, 1, 1), order_status='COMPLETED'))
+        db.session.commit()
+
+        def filtered_ids(filters_data):
+            query = filter_service._apply_validation_filters(db.session.query(Order), filters_data)
+            return sorted(order.id for order in query.all())
+
+        self.assertEqual(filtered_ids({'has_validation': 'invalid'}), ['o1'])
+        self.assertEqual(filtered_ids({'has_validation': 'valid', 'confidence_min': '0.5'}), ['o2'])
+        self.assertEqual(filtered_ids({'has_validation': 'valid', 'confidence_max': '0.5'}), [])
+        self.assertEqual(filtered_ids({'has_validation': 'validated'}), ['o1', 'o2'])
+        self.assertEqual(filtered_ids({'has_validation': 'unvalidated'}), ['o3'])
+        self.assertEqual(filtered_ids({'has_validation': 'all'}), ['o1', 'o2', 'o3'])
+
+    def test_validation_filters_rank_only_candidate_orders(self):
+        """The latest-result ranking is limited to the orders the other filters kept"""
+        for order_id, order_date in (('o1', date(2025, 1, 1)), ('o2', date(2025, 1, 2))):
+            db.session.add(Order(id=order_id, client_id='illa-frontdoor', date=order_date, order_status='COMPLETED'))
+        db.session.commit()
+
+        query = filter_service._apply_validation_filters(
+            db.session.query(Order).filter(Order.date == date(2025, 1, 2)), {'has_validation': 'validated'})
+        self.assertIn('WHERE validation_results.order_id IN (SELECT orders.id', str(query.statement.compile()))
+        self.assertEqual([order.id for order in query.all()], ['o2'])
+
+if __name__ == '__main__':
+    unittest.main()
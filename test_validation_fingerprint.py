@@ -0,0 +1,67 @@
+import unittest
+from unittest.mock import patch
+from app import create_app
+from app.validators import GoogleAIValidator
+from models import db, ValidationResult
+
+GRN_URL = 'https://example.com/grn/o1.jpg'
+
+def make_order(quantity=2):
+    return {'id': 'o1', 'lineItems': [{'id': 'SKU-1', 'name': 'Juice 1L', 'quantity': quantity, 'quantityUnit': 'box'}]}
+
+class ValidationFingerprintTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        self.validator = GoogleAIValidator()
+        self.image = 'aW1hZ2UtMQ=='
+        self.validator.download_image = lambda url: (self.image, 'jpeg')
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def _store(self, order, fingerprinted=True):
+        fingerprint = self.validator.compute_input_fingerprint(self.validator.prepare_order_items(order), self.image) \
+            if fingerprinted else None
+        self.validator.store_validation_result('o1', GRN_URL, {'is_valid': True, 'validation_data': {'has_document': True}},
+                                               1.0, fingerprint)
+
+    def test_fingerprint_ignores_formatting_and_item_order(self):
+        items = [{'sku_id': 'A', 'name': 'Juice ', 'quantity': 2, 'unit': 'BOX', 'weight': 0, 'weight_unit': ''},
+                 {'sku_id': 'B', 'name': 'Milk', 'quantity': '1', 'unit': 'unit', 'weight': None, 'weight_unit': 'KG'}]
+        same = [dict(items[1], quantity=1.0, weight=0, weight_unit='kg'), dict(items[0], name='Juice', unit='box')]
+        self.assertEqual(self.validator.compute_input_fingerprint(items, self.image),
+                         self.validator.compute_input_fingerprint(same, self.image))
+
+    def test_unchanged_inputs_reuse_the_stored_result(self):
+        self._store(make_order())
+        result = self.validator.find_reusable_validation(make_order(), GRN_URL)
+        self.assertTrue(result['fingerprint_match'])
+        self.assertEqual(len(result['input_fingerprint']), 64)
+
+    def test_changed_line_items_image_or_prompt_revalidate(self):
+        self._store(make_order())
+        self.assertIsNone(self.validator.find_reusable_validation(make_order(quantity=3), GRN_URL))
+
+        with patch('app.validators.PROMPT_VERSION', 'grn-test'):
+            self.assertIsNone(self.validator.find_reusable_validation(make_order(), GRN_URL))
+
+        self.image = 'aW1hZ2UtMg=='
+        self.assertIsNone(self.validator.find_reusable_validation(make_order(), GRN_URL))
+
+    def test_results_without_fingerprint_are_reused_unless_forced(self):
+        self._store(make_order(), fingerprinted=False)
+        self.assertIsNotNone(self.validator.find_reusable_validation(make_order(), GRN_URL))
+        self.assertIsNone(self.validator.find_reusable_validation(make_order(), GRN_URL, reuse_unfingerprinted=False))
+
+        self._store(make_order())
+        self.assertEqual(ValidationResult.query.count(), 1)
+        self.assertTrue(self.validator.find_reusable_validation(make_order(), GRN_URL, reuse_unfingerprinted=False))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,189 @@
+import json
+import time
+import unittest
+from datetime import date, datetime, timedelta, timezone
+from app import create_app
+from app.validation_jobs import validation_job_service
+from models import db, ValidationJob, ValidationJobItem
+
+class ValidationJobTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        self.handlers = (validation_job_service.plan_orders, validation_job_service.validate_order,
+                         validation_job_service.validate_batch)
+        self.runner = validation_job_service.runner
+        self.batch_size = validation_job_service.batch_size
+        validation_job_service.runner = 'process'  # tests drive the worker themselves
+        self.validated = []
+        validation_job_service.register_handlers(self._plan, self._validate)
+
+    def tearDown(self):
+        validation_job_service.register_handlers(*self.handlers)
+        validation_job_service.runner = self.runner
+        validation_job_service.batch_size = self.batch_size
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def _plan(self, job):
+        return {'total_orders': 6, 'orders_with_grn': 5, 'orders_without_grn': 1,
+                'order_ids': [f'order-{i}' for i in range(4)]}
+
+    def _validate(self, order, day, force_reprocess):
+        self.validated.append(order['id'])
+        if order['id'] == 'order-3':
+            return {'order_id': order['id'], 'success': False, 'error': 'No GRN document found', 'is_valid': False}
+        return {'order_id': order['id'], 'success': True, 'is_valid': order['id'] != 'order-1',
+                'from_cache': order['id'] == 'order-0', 'fingerprint_match': order['id'] == 'order-0', 'discrepancies': []}
+
+    def test_job_runs_to_completion_with_checkpoints(self):
+        job = validation_job_service.enqueue(date(2025, 1, 1), max_workers=2)
+        claimed = validation_job_service.claim_next_job()
+        self.assertEqual(claimed.id, job.id)
+        validation_job_service.run_job(claimed)
+
+        status = validation_job_service.get_status(job.id, include_results=True)
+        self.assertEqual(status['status'], 'completed')
+        self.assertEqual((status['orders_to_process'], status['processed'], status['errors'], status['skipped']), (4, 3, 1, 2))
+        self.assertEqual((status['api_calls_made'], status['cached_results']), (3, 1))
+        self.assertEqual((status['unchanged_orders'], status['gemini_calls_avoided']), (1, 2))
+        self.assertEqual([r['sequence'] for r in status['results']], [1, 2, 3, 4])
+        self.assertGreater(status['orders_per_minute'], 0)
+        self.assertIsNotNone(status['gtin_cache'])
+
+        self.assertEqual(len(validation_job_service.get_events(job.id, after_sequence=2)), 2)
+
+    def test_orders_are_validated_in_batches(self):
+        batches = []
+
+        def validate_batch(orders, day, force_reprocess):
+            batches.append([order['id'] for order in orders])
+            return {order['id']: self._validate(order, day, force_reprocess) for order in orders}
+
+        validation_job_service.register_handlers(self._plan, self._validate, validate_batch)
+        validation_job_service.batch_size = 3
+        job = validation_job_service.enqueue(date(2025, 1, 1), max_workers=2)
+        validation_job_service.run_job(validation_job_service.claim_next_job())
+
+        self.assertEqual(batches, [['order-0', 'order-1', 'order-2']])
+        self.assertEqual(sorted(self.validated), ['order-0', 'order-1', 'order-2', 'order-3'])
+        status = validation_job_service.get_status(job.id)
+        self.assertEqual((status['status'], status['processed'], status['errors']), ('completed', 3, 1))
+
+    def test_restarted_job_resumes_pending_orders_only(self):
+        job = validation_job_service.enqueue(date(2025, 1, 1))
+        claimed = validation_job_service.claim_next_job()
+        validation_job_service._plan(claimed)
+        validation_job_service._checkpoint(claimed, 'order-0', self._validate({'id': 'order-0'}, None, False))
+        self.validated.clear()
+
+        # The worker died: nothing heartbeats the job any more
+        claimed.heartbeat_at = datetime.now(timezone.utc) - timedelta(seconds=validation_job_service.stale_after + 5)
+        db.session.commit()
+
+        resumed = validation_job_service.claim_next_job()
+        self.assertEqual((resumed.id, resumed.attempts), (job.id, 2))
+        validation_job_service.run_job(resumed)
+
+        self.assertEqual(sorted(self.validated), ['order-1', 'order-2', 'order-3'])
+        status = validation_job_service.get_status(job.id)
+        self.assertEqual((status['status'], status['completed']), ('completed', 4))
+
+    def test_planning_heartbeats_and_replanning_keeps_existing_items(self):
+        heartbeats = []
+        interval = validation_job_service.heartbeat_interval
+        validation_job_service.heartbeat_interval = 0.05
+
+        def slow_plan(job):
+            for _ in range(2):
+                heartbeats.append(db.session.query(ValidationJob.heartbeat_at).filter_by(id=job.id).scalar())
+                db.session.commit()
+                time.sleep(0.3)
+            return self._plan(job)
+
+        validation_job_service.register_handlers(slow_plan, self._validate)
+        job = validation_job_service.enqueue(date(2025, 1, 1))
+        claimed = validation_job_service.claim_next_job()
+        # A worker that was reclaimed mid-plan already inserted some of the items
+        db.session.add(ValidationJobItem(job_id=job.id, order_id='order-1', status='pending'))
+        db.session.commit()
+        try:
+            validation_job_service.run_job(claimed)
+        finally:
+            validation_job_service.heartbeat_interval = interval
+
+        self.assertGreater(heartbeats[1], heartbeats[0])
+        self.assertEqual(sorted(self.validated), ['order-0', 'order-1', 'order-2', 'order-3'])
+        self.assertEqual(ValidationJobItem.query.filter_by(job_id=job.id).count(), 4)
+        self.assertEqual(validation_job_service.get_status(job.id)['status'], 'completed')
+
+    def test_running_job_with_fresh_heartbeat_is_not_claimed_twice(self):
+        validation_job_service.enqueue(date(2025, 1, 1))
+        self.assertIsNotNone(validation_job_service.claim_next_job())
+        self.assertIsNone(validation_job_service.claim_next_job())
+
+    def test_enqueue_reuses_active_job_and_cancel_stops_it(self):
+        first = validation_job_service.enqueue(date(2025, 1, 1))
+        self.assertEqual(validation_job_service.enqueue(date(2025, 1, 1)).id, first.id)
+
+        self.assertTrue(validation_job_service.cancel(first.id))
+        self.assertIsNone(validation_job_service.claim_next_job())
+        self.assertNotEqual(validation_job_service.enqueue(date(2025, 1, 1)).id, first.id)
+
+    def test_idle_thread_worker_looks_again_when_a_job_is_enqueued_as_it_stops(self):
+        passes = []
+
+        def claim_next_job():
+            passes.append(1)
+            if len(passes) == 1:
+                # enqueue commits while this pass finds the queue empty; the thread is still alive
+                validation_job_service.ensure_thread_worker(self.app)
+            return None
+
+        validation_job_service.claim_next_job = claim_next_job
+        try:
+            validation_job_service.ensure_thread_worker(self.app)
+            thread = validation_job_service._thread
+            thread.join(5)
+        finally:
+            del validation_job_service.claim_next_job
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(len(passes), 2)
+        self.assertIsNone(validation_job_service._thread)
+
+    def test_metrics_report_queue_depth_and_throughput(self):
+        done = validation_job_service.enqueue(date(2025, 1, 1))
+        validation_job_service.run_job(validation_job_service.claim_next_job())
+        waiting = validation_job_service.enqueue(date(2025, 1, 2))
+        db.session.add_all([ValidationJobItem(job_id=waiting.id, order_id=f'o{i}', status='pending') for i in range(3)])
+        db.session.commit()
+
+        metrics = validation_job_service.get_metrics(window_minutes=5)
+        self.assertEqual((metrics['queued_jobs'], metrics['queue_depth_orders']), (1, 3))
+        self.assertEqual(metrics['orders_completed_in_window'], 4)
+        self.assertEqual(metrics['jobs_by_status'].get('completed'), 1)
+        self.assertEqual(db.session.get(ValidationJob, done.id).status, 'completed')
+
+    def test_endpoints_queue_job_and_stream_completions(self):
+        client = self.app.test_client()
+        response = client.post('/validate-all-orders?date=2025-01-01', json={'max_workers': 2})
+        self.assertEqual(response.status_code, 202)
+        job_id = response.get_json()['job_id']
+
+        validation_job_service.run_job(validation_job_service.claim_next_job())
+
+        status = client.get(f'/api/validation-jobs/{job_id}').get_json()
+        self.assertEqual(status['job']['status'], 'completed')
+
+        stream = client.get(f'/api/validation-jobs/{job_id}/events', headers={'Last-Event-ID': '1'}).get_data(as_text=True)
+        orders = [json.loads(line[len('data: '):]) for block in stream.split('\n\n') if 'event: order' in block
+                  for line in block.split('\n') if line.startswith('data: ')]
+        self.assertEqual([order['sequence'] for order in orders], [2, 3, 4])
+        self.assertIn('event: done', stream)
+
+if __name__ == '__main__':
+    unittest.main()
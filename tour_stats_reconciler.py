@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+LocusAssist - tour statistics reconciliation
+Tour counters are updated incrementally as orders change. This job periodically compares them
+with the orders of the last few tour days and rebuilds the tours that drifted.
+"""
+
+import os
+import sys
+import time
+import argparse
+import logging
+from datetime import date, timedelta
+from app import create_app
+from app.tours import tour_service
+
+logger = logging.getLogger(__name__)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='LocusAssist tour statistics reconciliation')
+    parser.add_argument('--config', default=os.environ.get('FLASK_ENV', 'development'), help='App config name')
+    parser.add_argument('--days', type=int, help='Tour days to check, ending today (default: TOUR_STATS_RECONCILE_DAYS)')
+    parser.add_argument('--interval', type=float, help='Seconds between runs (default: TOUR_STATS_RECONCILE_SECONDS)')
+    parser.add_argument('--once', action='store_true', help='Run once and exit (exit code 1 when drift was found)')
+    parser.add_argument('--check-only', action='store_true', help='Report drift without repairing it')
+    args = parser.parse_args()
+
+    app = create_app(args.config)
+    days = args.days or app.config['TOUR_STATS_RECONCILE_DAYS']
+    interval = args.interval or app.config['TOUR_STATS_RECONCILE_SECONDS']
+
+    try:
+        while True:
+            date_to = date.today()
+            date_from = date_to - timedelta(days=days - 1)
+            with app.app_context():
+                result = tour_service.reconcile_tour_statistics(date_from.isoformat(), date_to.isoformat(),
+                                                                repair=not args.check_only)
+            drift = result.get('drifted_tours', 0) + result.get('missing_tours', 0)
+            logger.info(f"Tour stats reconciliation {date_from} - {date_to}: {result}")
+
+            if args.once:
+                sys.exit(1 if drift or not result['success'] else 0)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("Tour statistics reconciliation stopped")
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+LocusAssist - background validation worker
+Runs queued validate-all-orders jobs (and resumes jobs whose worker died) outside the web process.
+Set VALIDATION_JOB_RUNNER=process on the web app so it only queues jobs.
+"""
+
+import os
+import argparse
+import logging
+from app import create_app
+from app.validation_jobs import validation_job_service
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='LocusAssist validation job worker')
+    parser.add_argument('--config', default=os.environ.get('FLASK_ENV', 'development'), help='App config name')
+    parser.add_argument('--once', action='store_true', help='Exit when the queue is empty instead of polling')
+    args = parser.parse_args()
+
+    app = create_app(args.config)
+    logging.getLogger(__name__).info(f"Validation worker {validation_job_service.worker_id} polling every "
+                                     f"{validation_job_service.poll_interval}s")
+    try:
+        validation_job_service.run_worker(app, stop_when_idle=args.once)
+    except KeyboardInterrupt:
+        print("Validation worker stopped")